@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Index, LargeBinary
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -26,6 +26,74 @@ class LoginActivity(Base):
     last_login = Column(DateTime)
     login_count = Column(Integer)
 
+class LoginEvent(Base):
+    __tablename__ = 'login_events'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    workshop_id = Column(Integer, nullable=False, default=0)
+    device_info = Column(String)
+    occurred_at = Column(DateTime, nullable=False, index=True)
+    ingested_at = Column(DateTime, nullable=False, server_default=func.now())
+
+class LoginHourly(Base):
+    __tablename__ = 'login_hourly'
+    workshop_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    logins = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index('ix_login_hourly_bucket', bucket_start),)
+
+class LoginDaily(Base):
+    __tablename__ = 'login_daily'
+    workshop_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    logins = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index('ix_login_daily_bucket', bucket_start),)
+
+class RollupWatermark(Base):
+    __tablename__ = 'rollup_watermarks'
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
+class ActiveUserSketch(Base):
+    __tablename__ = 'active_user_sketches'
+    workshop_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+
+class LearnerActiveWeek(Base):
+    __tablename__ = 'learner_active_weeks'
+    workshop_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    week = Column(Integer, primary_key=True)
+
+class LearnerCohort(Base):
+    __tablename__ = 'learner_cohorts'
+    workshop_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    first_week = Column(Integer, nullable=False)
+    __table_args__ = (Index('ix_learner_cohorts_workshop_week', workshop_id, first_week),)
+
+class RetentionCount(Base):
+    __tablename__ = 'retention_counts'
+    workshop_id = Column(Integer, primary_key=True)
+    cohort_week = Column(Integer, primary_key=True)
+    week = Column(Integer, primary_key=True)
+    learners = Column(Integer, nullable=False, default=0)
+
+class QuantileSketch(Base):
+    __tablename__ = 'quantile_sketches'
+    workshop_id = Column(Integer, primary_key=True)
+    module_id = Column(Integer, primary_key=True)
+    metric = Column(String(20), primary_key=True)
+    digest = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+
+class IngestionWatermark(Base):
+    __tablename__ = 'ingestion_watermarks'
+    workshop_id = Column(Integer, primary_key=True)
+    sequence = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
 class AtRiskStudent(Base):
     __tablename__ = 'at_risk_students'
     id = Column(Integer, primary_key=True)
@@ -2,22 +2,111 @@
 API routes for the analytics service.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..services import analytics_service
+from ..services import active_users, analytics_service, distributions, login_rollups, response_cache, retention, risk_scoring
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
+def cached(db: Session, key: tuple, workshop_id: Optional[int], compute) -> Response:
+    """Serve ``compute()`` from the response cache while the workshop's watermark is unchanged."""
+    mark = response_cache.watermark(db, workshop_id)
+    return Response(content=response_cache.cache.get(key, mark, compute), media_type="application/json")
+
+
 @router.get("/dashboard")
 def dashboard(workshop_id: int, db: Session = Depends(get_db)):
-    data = analytics_service.get_dashboard(db, workshop_id)
-    return data
+    return cached(db, ("dashboard", workshop_id), workshop_id,
+                  lambda: analytics_service.get_dashboard(db, workshop_id))
+
+
+@router.get("/dashboard/learners")
+def dashboard_learners(
+    workshop_id: int,
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    return analytics_service.get_dashboard_learners(db, workshop_id, after, limit)
+
+
+@router.get("/workshops/{workshop_id}/distributions")
+def workshop_distributions(workshop_id: int, db: Session = Depends(get_db)):
+    return distributions.workshop_distributions(db, workshop_id)
 
 
 @router.get("/at-risk")
-def at_risk(db: Session = Depends(get_db)):
-    data = analytics_service.get_at_risk_students(db)
-    return data
\ No newline at end of file
+def at_risk(
+    limit: int = Query(20, ge=1, le=500),
+    cursor: Optional[str] = None,
+    workshop_id: Optional[int] = None,
+    trainer_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    # Not behind ``cached``: the first page comes from the top-K cache, which the
+    # scoring job refreshes, and must not cost a watermark query
+    try:
+        return analytics_service.get_at_risk_students(db, limit, cursor, workshop_id, trainer_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.post("/at-risk/score", status_code=status.HTTP_202_ACCEPTED)
+def score_at_risk(full: bool = False):
+    """Queue a scoring run; it runs in the background (see ``GET /at-risk/score``)."""
+    return risk_scoring.job.request(full=full)
+
+
+@router.get("/at-risk/score")
+def scoring_status():
+    return risk_scoring.job.status()
+
+
+@router.get("/logins")
+def logins(
+    start: datetime,
+    end: datetime,
+    bucket: str = Query("day", regex="^(hour|day)$"),
+    workshop_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    try:
+        return login_rollups.login_counts(db, start, end, bucket, workshop_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.get("/active-users")
+def active_learners(day: Optional[date] = None, workshop_id: Optional[int] = None, db: Session = Depends(get_db)):
+    return active_users.active_users(db, day or datetime.utcnow().date(), workshop_id)
+
+
+@router.get("/retention")
+def retention_matrix(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    workshop_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(weeks=51)
+    try:
+        return retention.retention(db, start, end, workshop_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@router.get("/ingestion")
+def ingestion_metrics(request: Request):
+    consumer = getattr(request.app.state, "event_consumer", None)
+    if consumer is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event consumer is not running in this process")
+    return consumer.metrics()
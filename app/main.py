@@ -2,12 +2,22 @@
 Entrypoint for the analytics service.
 """
 
+import os
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import engine
+from .database import SessionLocal, engine
 from .models.base import Base
 from .api.routes_analytics import router as analytics_router
+from .services import login_rollups, risk_scoring
+from .services.broker import broker_from_env
+from .services.event_consumer import EventConsumer
+
+RUN_EVENT_CONSUMER = os.getenv("RUN_EVENT_CONSUMER", "false").lower() in ("1", "true", "yes")
+RUN_LOGIN_COMPACTOR = os.getenv("RUN_LOGIN_COMPACTOR", "false").lower() in ("1", "true", "yes")
+RUN_RISK_SCORER = os.getenv("RUN_RISK_SCORER", "false").lower() in ("1", "true", "yes")
 
 
 def init_db() -> None:
@@ -24,7 +34,34 @@ def create_app() -> FastAPI:
     )
     init_db()
     app.include_router(analytics_router)
+    app.state.event_consumer = None
+    if RUN_EVENT_CONSUMER:
+        start_event_consumer(app)
+    if RUN_LOGIN_COMPACTOR:
+        run_in_background(app, "login-compactor", lambda stop: login_rollups.run_compactor(SessionLocal, stop))
+    if RUN_RISK_SCORER:
+        run_in_background(app, "risk-scheduler", lambda stop: risk_scoring.run_scheduler(risk_scoring.job, stop))
     return app
 
 
+def run_in_background(app: FastAPI, name: str, target) -> None:
+    """Run ``target(stop_event)`` in a daemon thread between app startup and shutdown."""
+    stop = threading.Event()
+
+    @app.on_event("startup")
+    def _start() -> None:
+        threading.Thread(target=target, args=(stop,), daemon=True, name=name).start()
+
+    @app.on_event("shutdown")
+    def _stop() -> None:
+        stop.set()
+
+
+def start_event_consumer(app: FastAPI) -> None:
+    """Run the event consumer in a background thread for the lifetime of the app."""
+    consumer = EventConsumer(broker_from_env("analytics"), SessionLocal, group="analytics")
+    app.state.event_consumer = consumer
+    run_in_background(app, "event-consumer", consumer.run_forever)
+
+
 app = create_app()
\ No newline at end of file
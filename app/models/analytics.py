@@ -2,7 +2,7 @@
 SQLAlchemy models for the analytics service.
 """
 
-from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Boolean, Date, DateTime, ForeignKey, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.sql import func
 
 from .base import Base
@@ -10,36 +10,167 @@ from .base import Base
 
 class StudentModuleProgress(Base):
     __tablename__ = "student_module_progress"
+    __table_args__ = (
+        UniqueConstraint("user_id", "workshop_id", name="uq_student_module_progress_user_workshop"),
+        Index("ix_student_module_progress_workshop_user", "workshop_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
     workshop_id = Column(Integer, nullable=False)
     modules_completed = Column(Integer, nullable=False)
     percent_complete = Column(Float, nullable=False)
+    started_at = Column(DateTime(timezone=False), server_default=func.now())
     updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now())
 
 
 class QuizScoresSummary(Base):
     __tablename__ = "quiz_scores_summary"
+    __table_args__ = (
+        UniqueConstraint("user_id", "quiz_id", name="uq_quiz_scores_summary_user_quiz"),
+        Index("ix_quiz_scores_summary_workshop_quiz", "workshop_id", "quiz_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
     quiz_id = Column(Integer, nullable=False)
+    workshop_id = Column(Integer, nullable=True)
     average_score = Column(Float, nullable=False)
     pass_fail = Column(Boolean, nullable=False)
+    attempts = Column(Integer, nullable=False, default=1)
+    last_score = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now())
 
 
 class LoginActivity(Base):
     __tablename__ = "login_activity"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, unique=True)
     device_info = Column(String(255), nullable=True)
     last_login = Column(DateTime(timezone=False), server_default=func.now())
     login_count = Column(Integer, default=1)
 
 
+class LoginEvent(Base):
+    """Append-only raw logins, kept for ``LOGIN_EVENT_RETENTION_DAYS``."""
+    __tablename__ = "login_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    workshop_id = Column(Integer, nullable=False, default=0)  # 0: not tied to a workshop
+    device_info = Column(String(255), nullable=True)
+    occurred_at = Column(DateTime(timezone=False), nullable=False, index=True)
+    ingested_at = Column(DateTime(timezone=False), nullable=False, server_default=func.now())
+
+
+class LoginHourly(Base):
+    __tablename__ = "login_hourly"
+    workshop_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime(timezone=False), primary_key=True)
+    logins = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index("ix_login_hourly_bucket", bucket_start),)
+
+
+class LoginDaily(Base):
+    __tablename__ = "login_daily"
+    workshop_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime(timezone=False), primary_key=True)
+    logins = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index("ix_login_daily_bucket", bucket_start),)
+
+
+class RollupWatermark(Base):
+    """Highest raw event id folded into the rollups, per rollup job."""
+    __tablename__ = "rollup_watermarks"
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
+
+class ActiveUserSketch(Base):
+    """HyperLogLog sketch of the learners active per workshop and day (workshop 0: platform-wide)."""
+    __tablename__ = "active_user_sketches"
+    workshop_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+
+
+class LearnerActiveWeek(Base):
+    """Weeks in which a learner was active, per workshop (workshop 0: platform-wide).
+
+    ``week`` counts weeks since Monday 1970-01-05.
+    """
+    __tablename__ = "learner_active_weeks"
+    workshop_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    week = Column(Integer, primary_key=True)
+
+
+class LearnerCohort(Base):
+    """First active week of each learner, per workshop (workshop 0: platform-wide)."""
+    __tablename__ = "learner_cohorts"
+    workshop_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    first_week = Column(Integer, nullable=False)
+    __table_args__ = (Index("ix_learner_cohorts_workshop_week", workshop_id, first_week),)
+
+
+class RetentionCount(Base):
+    """Learners of a cohort (first active week) active in a given week, per workshop."""
+    __tablename__ = "retention_counts"
+    workshop_id = Column(Integer, primary_key=True)
+    cohort_week = Column(Integer, primary_key=True)
+    week = Column(Integer, primary_key=True)
+    learners = Column(Integer, nullable=False, default=0)
+
+
+class QuantileSketch(Base):
+    """t-digest of a per-module metric (``time_spent`` per session, quiz ``score``)."""
+    __tablename__ = "quantile_sketches"
+    workshop_id = Column(Integer, primary_key=True)
+    module_id = Column(Integer, primary_key=True)
+    metric = Column(String(20), primary_key=True)
+    digest = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=False), nullable=True)
+
+
 class AtRiskStudent(Base):
     __tablename__ = "at_risk_students"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
+    workshop_id = Column(Integer, nullable=True)
     risk_score = Column(Float, nullable=False)
     flagged_reason = Column(String(255), nullable=True)
-    flagged_by = Column(Integer, nullable=True)
\ No newline at end of file
+    flagged_by = Column(Integer, nullable=True)
+    scored_at = Column(DateTime(timezone=False), nullable=True)
+    # Listing order is (risk_score DESC, user_id, workshop_id), overall and per workshop
+    __table_args__ = (
+        UniqueConstraint("user_id", "workshop_id", name="uq_at_risk_students_user_workshop"),
+        Index("ix_at_risk_students_risk", risk_score.desc(), user_id, workshop_id),
+        Index("ix_at_risk_students_workshop_risk", workshop_id, risk_score.desc(), user_id),
+    )
+
+
+class WorkshopTrainer(Base):
+    """Trainer of each workshop, from workshop catalog events."""
+    __tablename__ = "workshop_trainers"
+    workshop_id = Column(Integer, primary_key=True)
+    trainer_id = Column(Integer, nullable=False, index=True)
+
+
+class RiskDirtyLearner(Base):
+    """Learners with new activity since they were last scored."""
+    __tablename__ = "risk_dirty_learners"
+    user_id = Column(Integer, primary_key=True)
+    marked_at = Column(DateTime(timezone=False), nullable=False)
+
+
+class IngestionWatermark(Base):
+    """Sequence advanced whenever data of a workshop changes (workshop 0: any change)."""
+    __tablename__ = "ingestion_watermarks"
+    workshop_id = Column(Integer, primary_key=True)
+    sequence = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=False), nullable=True)
+
+
+class ProcessedEvent(Base):
+    """Ids of events already applied, so redelivered events are skipped; pruned after the redelivery window."""
+    __tablename__ = "processed_events"
+    event_id = Column(String(64), primary_key=True)
+    processed_at = Column(DateTime(timezone=False), server_default=func.now(), nullable=False, index=True)
@@ -1,30 +1,31 @@
 """
-Business logic for analytics.  In a production system this service would
-subscribe to Kafka topics and update the analytics tables accordingly.
-Here we provide simple functions to query aggregated data.
+Business logic for analytics.  The analytics tables are filled from
+learner events by ``event_consumer.EventConsumer``; the functions here
+query the aggregated data.
 """
 
+from typing import Optional
+
 from sqlalchemy.orm import Session
-from ..models.analytics import StudentModuleProgress, QuizScoresSummary, LoginActivity, AtRiskStudent
+from . import at_risk, dashboard
 
 
 def get_dashboard(db: Session, workshop_id: int):
-    """Return high‑level metrics for a workshop."""
-    module_stats = db.query(StudentModuleProgress).filter(StudentModuleProgress.workshop_id == workshop_id).all()
-    quiz_stats = db.query(QuizScoresSummary).filter(QuizScoresSummary.quiz_id == workshop_id).all()
-    return {
-        "completion": [
-            {"user_id": m.user_id, "percent_complete": m.percent_complete} for m in module_stats
-        ],
-        "quiz_scores": [
-            {"user_id": q.user_id, "average_score": q.average_score, "pass_fail": q.pass_fail} for q in quiz_stats
-        ],
-    }
-
-
-def get_at_risk_students(db: Session):
-    """List students flagged as at risk."""
-    risks = db.query(AtRiskStudent).order_by(AtRiskStudent.risk_score.desc()).all()
-    return [
-        {"user_id": r.user_id, "risk_score": r.risk_score, "reason": r.flagged_reason} for r in risks
-    ]
\ No newline at end of file
+    """Return completion and quiz score distributions for a workshop."""
+    return dashboard.workshop_dashboard(db, workshop_id)
+
+
+def get_dashboard_learners(db: Session, workshop_id: int, after: Optional[int] = None, limit: int = 100):
+    """Return one page of per-learner rows for a workshop."""
+    return dashboard.learner_page(db, workshop_id, after, limit)
+
+
+def get_at_risk_students(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    workshop_id: Optional[int] = None,
+    trainer_id: Optional[int] = None,
+):
+    """List students at risk, highest risk first, one page at a time."""
+    return at_risk.list_at_risk(db, limit, cursor, workshop_id, trainer_id)
\ No newline at end of file
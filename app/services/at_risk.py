@@ -0,0 +1,179 @@
+"""
+At-risk listing.
+
+Learners are listed by descending risk, a page at a time, with a keyset
+cursor on ``(risk_score, user_id, workshop_id)`` (a learner can be at risk
+in several workshops) so every page is an index range scan.  Entries
+without a workshop (flagged by hand) sort first among a learner's ties.
+Results can be filtered by workshop or by trainer, through
+``workshop_trainers``, which the workshop service keeps current with
+``workshop.catalog`` events.
+
+The highest ``AT_RISK_TOP_K`` entries overall, per workshop and per
+trainer are also kept in memory.  The scoring job refreshes them after
+each run; other processes pick up new scores within
+``AT_RISK_TOP_K_TTL`` seconds.  One request at a time reloads an expired
+cache while the others keep serving the previous entries.  First pages
+no longer than K are served from memory without a query.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..models.analytics import AtRiskStudent, WorkshopTrainer
+
+AT_RISK_TOP_K = int(os.getenv("AT_RISK_TOP_K", "50"))
+AT_RISK_TOP_K_TTL = float(os.getenv("AT_RISK_TOP_K_TTL", "60"))
+
+Cursor = Tuple[float, int, Optional[int]]
+
+
+def encode_cursor(item: dict) -> str:
+    workshop_id = "" if item["workshop_id"] is None else item["workshop_id"]
+    return f"{item['risk_score']!r}:{item['user_id']}:{workshop_id}"
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    score, user_id, workshop_id = cursor.split(":")
+    return float(score), int(user_id), int(workshop_id) if workshop_id else None
+
+
+def _item(row) -> dict:
+    return {
+        "user_id": row.user_id,
+        "workshop_id": row.workshop_id,
+        "risk_score": row.risk_score,
+        "reason": row.flagged_reason,
+    }
+
+
+def _order():
+    # NULLS FIRST is SQLite's default for ASC; PostgreSQL sorts the few ties after the index scan
+    return (AtRiskStudent.risk_score.desc(), AtRiskStudent.user_id, AtRiskStudent.workshop_id.asc().nulls_first())
+
+
+def query_at_risk(
+    db: Session,
+    limit: int,
+    cursor: Optional[Cursor] = None,
+    workshop_id: Optional[int] = None,
+    trainer_id: Optional[int] = None,
+) -> List[dict]:
+    query = db.query(
+        AtRiskStudent.user_id, AtRiskStudent.workshop_id, AtRiskStudent.risk_score, AtRiskStudent.flagged_reason
+    )
+    if workshop_id is not None:
+        query = query.filter(AtRiskStudent.workshop_id == workshop_id)
+    if trainer_id is not None:
+        query = query.join(WorkshopTrainer, WorkshopTrainer.workshop_id == AtRiskStudent.workshop_id).filter(
+            WorkshopTrainer.trainer_id == trainer_id
+        )
+    if cursor is not None:
+        score, user_id, after_workshop = cursor
+        if after_workshop is None:
+            later_workshop = AtRiskStudent.workshop_id.isnot(None)
+        else:
+            later_workshop = AtRiskStudent.workshop_id > after_workshop
+        query = query.filter(or_(
+            AtRiskStudent.risk_score < score,
+            and_(AtRiskStudent.risk_score == score, AtRiskStudent.user_id > user_id),
+            and_(AtRiskStudent.risk_score == score, AtRiskStudent.user_id == user_id, later_workshop),
+        ))
+    return [_item(row) for row in query.order_by(*_order()).limit(limit)]
+
+
+class TopKCache:
+    """Top ``k`` at-risk entries overall, per workshop and per trainer."""
+
+    def __init__(self, k: int = AT_RISK_TOP_K, ttl: float = AT_RISK_TOP_K_TTL):
+        self.k = k
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._overall: List[dict] = []
+        self._by_workshop: Dict[int, List[dict]] = {}
+        self._by_trainer: Dict[int, List[dict]] = {}
+
+    def refresh(self, db: Session) -> None:
+        overall = query_at_risk(db, self.k)
+        rank = func.row_number().over(partition_by=AtRiskStudent.workshop_id, order_by=_order()).label("rank")
+        ranked = select(
+            AtRiskStudent.user_id,
+            AtRiskStudent.workshop_id,
+            AtRiskStudent.risk_score,
+            AtRiskStudent.flagged_reason,
+            rank,
+        ).subquery()
+        by_workshop: Dict[int, List[dict]] = {}
+        for row in db.execute(
+            select(ranked).where(ranked.c.rank <= self.k).order_by(
+                ranked.c.workshop_id, ranked.c.risk_score.desc(), ranked.c.user_id
+            )
+        ):
+            by_workshop.setdefault(row.workshop_id, []).append(_item(row))
+
+        # A trainer's top K is within the union of their workshops' top K
+        by_trainer: Dict[int, List[dict]] = {}
+        for trainer_id, workshop_id in db.query(WorkshopTrainer.trainer_id, WorkshopTrainer.workshop_id):
+            by_trainer.setdefault(trainer_id, []).extend(by_workshop.get(workshop_id, []))
+        for trainer_id, items in by_trainer.items():
+            items.sort(key=lambda i: (-i["risk_score"], i["user_id"], i["workshop_id"]))
+            del items[self.k:]
+
+        with self._lock:
+            self._overall, self._by_workshop, self._by_trainer = overall, by_workshop, by_trainer
+            self._loaded_at = time.monotonic()
+
+    def _expired(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def get(self, db: Session, limit: int, workshop_id: Optional[int] = None,
+            trainer_id: Optional[int] = None) -> Optional[List[dict]]:
+        """First page from memory, or None if it cannot be answered from the cache."""
+        if limit > self.k or (workshop_id is not None and trainer_id is not None):
+            return None
+        if self._expired():
+            # Single flight: the first load is waited for, later reloads are not
+            if self._refreshing.acquire(blocking=self._loaded_at is None):
+                try:
+                    if self._expired():
+                        self.refresh(db)
+                finally:
+                    self._refreshing.release()
+        with self._lock:
+            if workshop_id is not None:
+                items = self._by_workshop.get(workshop_id, [])
+            elif trainer_id is not None:
+                items = self._by_trainer.get(trainer_id, [])
+            else:
+                items = self._overall
+            return items[:limit]
+
+
+top_k = TopKCache()
+
+
+def list_at_risk(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    workshop_id: Optional[int] = None,
+    trainer_id: Optional[int] = None,
+) -> dict:
+    items = None
+    if cursor is None:
+        items = top_k.get(db, limit, workshop_id, trainer_id)
+    if items is None:
+        items = query_at_risk(
+            db, limit, decode_cursor(cursor) if cursor else None, workshop_id, trainer_id
+        )
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]) if len(items) == limit else None,
+    }
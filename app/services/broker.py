@@ -0,0 +1,188 @@
+"""
+Message broker access for the analytics service.
+
+Learner events are published by other services to Kafka topics.  The
+consumer only needs three operations from a broker: poll a batch of
+messages for a consumer group, commit the offsets it has finished with,
+and report end offsets for lag.  ``KafkaBroker`` provides them on top of
+``kafka-python``; ``InMemoryBroker`` and ``FileBroker`` are stand-ins for
+tests and local development without Kafka.
+
+The file broker keeps one JSON-lines file per topic in a directory (a
+single partition, offset = line number) and committed offsets in
+``offsets.json``, so publishers in other services can feed it by
+appending lines.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+TOPIC_PROGRESS = "learner.progress"
+TOPIC_QUIZ = "learner.quiz"
+TOPIC_LOGIN = "learner.login"
+TOPIC_WORKSHOP = "workshop.catalog"
+LEARNER_TOPICS = (TOPIC_PROGRESS, TOPIC_QUIZ, TOPIC_LOGIN)
+ANALYTICS_TOPICS = LEARNER_TOPICS + (TOPIC_WORKSHOP,)
+
+TopicPartition = Tuple[str, int]
+
+
+class Message(NamedTuple):
+    topic: str
+    partition: int
+    offset: int
+    value: dict
+
+
+class InMemoryBroker:
+    """Single-partition topics held in lists; offsets are list indexes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics: Dict[str, List[dict]] = {}
+        self._committed: Dict[str, Dict[TopicPartition, int]] = {}
+
+    def publish(self, topic: str, value: dict) -> None:
+        with self._lock:
+            self._topics.setdefault(topic, []).append(value)
+
+    def _log(self, topic: str) -> List[dict]:
+        return self._topics.get(topic, [])
+
+    def poll(self, group: str, topics: Iterable[str], max_records: int) -> List[Message]:
+        with self._lock:
+            committed = self._committed.setdefault(group, {})
+            messages: List[Message] = []
+            for topic in topics:
+                log = self._log(topic)
+                start = committed.get((topic, 0), 0)
+                for offset in range(start, min(len(log), start + max_records - len(messages))):
+                    messages.append(Message(topic, 0, offset, log[offset]))
+            return messages
+
+    def commit(self, group: str, offsets: Dict[TopicPartition, int]) -> None:
+        """Record ``offsets`` (the next offset to read) for ``group``."""
+        with self._lock:
+            committed = self._committed.setdefault(group, {})
+            for tp, offset in offsets.items():
+                committed[tp] = max(committed.get(tp, 0), offset)
+
+    def committed(self, group: str) -> Dict[TopicPartition, int]:
+        with self._lock:
+            return dict(self._committed.get(group, {}))
+
+    def end_offsets(self, topics: Iterable[str]) -> Dict[TopicPartition, int]:
+        with self._lock:
+            return {(topic, 0): len(self._log(topic)) for topic in topics}
+
+
+class FileBroker(InMemoryBroker):
+    """Durable stand-in: ``<root>/<topic>.jsonl`` per topic and ``<root>/offsets.json``."""
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = root
+        self._read: Dict[str, list] = {}
+        os.makedirs(root, exist_ok=True)
+        self._offsets_path = os.path.join(root, "offsets.json")
+        if os.path.exists(self._offsets_path):
+            with open(self._offsets_path) as fh:
+                for group, offsets in json.load(fh).items():
+                    self._committed[group] = {
+                        (tp.rsplit(":", 1)[0], int(tp.rsplit(":", 1)[1])): offset for tp, offset in offsets.items()
+                    }
+
+    def _path(self, topic: str) -> str:
+        return os.path.join(self.root, f"{topic}.jsonl")
+
+    def publish(self, topic: str, value: dict) -> None:
+        with self._lock:
+            with open(self._path(topic), "a") as fh:
+                fh.write(json.dumps(value) + "\n")
+
+    def _log(self, topic: str) -> List[dict]:
+        # Pick up lines appended since the last call, including by other processes
+        path = self._path(topic)
+        if not os.path.exists(path):
+            return []
+        position, log = self._read.setdefault(topic, [0, []])
+        with open(path) as fh:
+            fh.seek(position)
+            while True:
+                line = fh.readline()
+                if not line.endswith("\n"):
+                    break  # partial line still being written
+                position += len(line.encode("utf-8"))
+                if line.strip():
+                    log.append(json.loads(line))
+        self._read[topic][0] = position
+        return log
+
+    def commit(self, group: str, offsets: Dict[TopicPartition, int]) -> None:
+        super().commit(group, offsets)
+        with self._lock:
+            data = {
+                g: {f"{topic}:{partition}": offset for (topic, partition), offset in tps.items()}
+                for g, tps in self._committed.items()
+            }
+            tmp_path = self._offsets_path + ".tmp"
+            with open(tmp_path, "w") as fh:
+                json.dump(data, fh)
+            os.replace(tmp_path, self._offsets_path)
+
+
+class KafkaBroker:
+    """``kafka-python`` consumer with auto-commit disabled; offsets are committed explicitly."""
+
+    def __init__(self, bootstrap_servers: str, group: str, topics: Iterable[str]):
+        from kafka import KafkaConsumer, TopicPartition as KafkaTopicPartition
+
+        self._tp = KafkaTopicPartition
+        self.group = group
+        self.topics = list(topics)
+        self._consumer = KafkaConsumer(
+            *self.topics,
+            bootstrap_servers=bootstrap_servers,
+            group_id=group,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            value_deserializer=lambda raw: json.loads(raw.decode("utf-8")),
+        )
+
+    def poll(self, group: str, topics: Iterable[str], max_records: int) -> List[Message]:
+        records = self._consumer.poll(timeout_ms=1000, max_records=max_records)
+        return [
+            Message(tp.topic, tp.partition, record.offset, record.value)
+            for tp, batch in records.items()
+            for record in batch
+        ]
+
+    def commit(self, group: str, offsets: Dict[TopicPartition, int]) -> None:
+        from kafka.structs import OffsetAndMetadata
+
+        self._consumer.commit({
+            self._tp(topic, partition): OffsetAndMetadata(offset, None)
+            for (topic, partition), offset in offsets.items()
+        })
+
+    def committed(self, group: str) -> Dict[TopicPartition, int]:
+        result = {}
+        for tp in self._consumer.assignment():
+            offset = self._consumer.committed(tp)
+            if offset is not None:
+                result[(tp.topic, tp.partition)] = offset
+        return result
+
+    def end_offsets(self, topics: Iterable[str]) -> Dict[TopicPartition, int]:
+        assignment = [tp for tp in self._consumer.assignment() if tp.topic in set(topics)]
+        return {(tp.topic, tp.partition): offset for tp, offset in self._consumer.end_offsets(assignment).items()}
+
+
+def broker_from_env(group: str, topics: Iterable[str] = ANALYTICS_TOPICS):
+    """``KAFKA_BOOTSTRAP_SERVERS`` selects Kafka; otherwise ``EVENT_BROKER_DIR`` selects the file broker."""
+    servers = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
+    if servers:
+        return KafkaBroker(servers, group, topics)
+    return FileBroker(os.getenv("EVENT_BROKER_DIR", "events"))
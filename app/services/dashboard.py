@@ -0,0 +1,150 @@
+"""
+Vectorized dashboard aggregation.
+
+A workshop's progress and quiz summary rows are loaded with one query per
+table straight into NumPy arrays (raw DBAPI tuples, no ORM objects or
+SQLAlchemy rows) and reduced to distributions: completion histogram and
+percentiles, and per quiz the pass rate, mean and score distribution.
+Per-quiz figures are computed for all quizzes at once by grouping on the
+sorted quiz id array, so the cost is dominated by fetching the rows.
+
+Per-learner rows are served separately, a page at a time, by
+``learner_page``.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.analytics import QuizScoresSummary, StudentModuleProgress
+
+PERCENTILES = (25, 50, 90)
+# Ten 10-point buckets over 0-100; the last bucket includes 100
+BIN_EDGES = np.linspace(0.0, 100.0, 11)
+
+
+def fetch_array(db: Session, stmt) -> np.ndarray:
+    """Run ``stmt`` and return its rows as a 2-D float array; NULLs become NaN."""
+    result = db.connection().execute(stmt)
+    rows = result.cursor.fetchall()
+    result.close()
+    return np.array(rows, dtype=float).reshape(len(rows), len(stmt.selected_columns))
+
+
+def fetch_columns(db: Session, stmt, dtypes) -> List[np.ndarray]:
+    """Run ``stmt`` and return one array per selected column, converted to ``dtypes``."""
+    result = db.connection().execute(stmt)
+    rows = result.cursor.fetchall()
+    result.close()
+    if not rows:
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+    return [np.array(column, dtype=dtype) for column, dtype in zip(zip(*rows), dtypes)]
+
+
+def _histogram(values: np.ndarray) -> dict:
+    counts, _ = np.histogram(values, bins=BIN_EDGES)
+    return {"bin_edges": BIN_EDGES.tolist(), "counts": counts.tolist()}
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    if not len(values):
+        return {f"p{q}": None for q in PERCENTILES}
+    return {f"p{q}": float(v) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def completion_stats(percent: np.ndarray, modules: np.ndarray) -> dict:
+    return {
+        "learners": int(len(percent)),
+        "completed": int(np.count_nonzero(percent >= 100.0)),
+        "mean_percent": float(percent.mean()) if len(percent) else None,
+        "mean_modules_completed": float(modules.mean()) if len(modules) else None,
+        "percentiles": _percentiles(percent),
+        "histogram": _histogram(percent),
+    }
+
+
+def quiz_stats(quiz_ids: np.ndarray, scores: np.ndarray, passed: np.ndarray) -> List[dict]:
+    """Distribution per quiz, computed for all quizzes in one pass over the sorted arrays."""
+    if not len(quiz_ids):
+        return []
+    order = np.lexsort((scores, quiz_ids))
+    quiz_ids, scores, passed = quiz_ids[order], scores[order], passed[order]
+    quizzes, starts, counts = np.unique(quiz_ids, return_index=True, return_counts=True)
+    group = np.repeat(np.arange(len(quizzes)), counts)
+
+    pass_rate = np.bincount(group, weights=passed) / counts
+    mean = np.bincount(group, weights=scores) / counts
+    bins = np.clip(np.searchsorted(BIN_EDGES, scores, side="right") - 1, 0, len(BIN_EDGES) - 2)
+    histograms = np.bincount(group * (len(BIN_EDGES) - 1) + bins, minlength=len(quizzes) * (len(BIN_EDGES) - 1))
+    histograms = histograms.reshape(len(quizzes), len(BIN_EDGES) - 1)
+
+    # Scores are sorted within each quiz, so percentiles are interpolated positions in each slice
+    positions = np.array(PERCENTILES) / 100.0
+    rank = positions[None, :] * (counts[:, None] - 1)
+    low = np.floor(rank).astype(np.int64)
+    high = np.minimum(low + 1, counts[:, None] - 1)
+    frac = rank - low
+    pct = scores[starts[:, None] + low] * (1 - frac) + scores[starts[:, None] + high] * frac
+
+    return [
+        {
+            "quiz_id": int(quizzes[i]),
+            "learners": int(counts[i]),
+            "pass_rate": float(pass_rate[i]),
+            "mean_score": float(mean[i]),
+            "percentiles": {f"p{q}": float(v) for q, v in zip(PERCENTILES, pct[i])},
+            "histogram": {"bin_edges": BIN_EDGES.tolist(), "counts": histograms[i].tolist()},
+        }
+        for i in range(len(quizzes))
+    ]
+
+
+def workshop_dashboard(db: Session, workshop_id: int) -> dict:
+    progress = fetch_array(db, select(
+        StudentModuleProgress.percent_complete, StudentModuleProgress.modules_completed
+    ).where(StudentModuleProgress.workshop_id == workshop_id))
+    quizzes = fetch_array(db, select(
+        QuizScoresSummary.quiz_id, QuizScoresSummary.average_score, QuizScoresSummary.pass_fail
+    ).where(QuizScoresSummary.workshop_id == workshop_id))
+    return {
+        "workshop_id": workshop_id,
+        "completion": completion_stats(progress[:, 0], progress[:, 1]),
+        "quizzes": quiz_stats(quizzes[:, 0].astype(np.int64), quizzes[:, 1], quizzes[:, 2]),
+    }
+
+
+def learner_page(db: Session, workshop_id: int, after: Optional[int] = None, limit: int = 100) -> dict:
+    """Per-learner progress and quiz scores, keyset-paginated by user id."""
+    query = (
+        db.query(StudentModuleProgress)
+        .filter(StudentModuleProgress.workshop_id == workshop_id)
+        .order_by(StudentModuleProgress.user_id)
+    )
+    if after is not None:
+        query = query.filter(StudentModuleProgress.user_id > after)
+    progress = query.limit(limit).all()
+    user_ids = [p.user_id for p in progress]
+    scores = {}
+    if user_ids:
+        for q in (
+            db.query(QuizScoresSummary)
+            .filter(QuizScoresSummary.workshop_id == workshop_id, QuizScoresSummary.user_id.in_(user_ids))
+            .order_by(QuizScoresSummary.quiz_id)
+        ):
+            scores.setdefault(q.user_id, []).append(
+                {"quiz_id": q.quiz_id, "average_score": q.average_score, "pass_fail": q.pass_fail}
+            )
+    return {
+        "items": [
+            {
+                "user_id": p.user_id,
+                "percent_complete": p.percent_complete,
+                "modules_completed": p.modules_completed,
+                "quiz_scores": scores.get(p.user_id, []),
+            }
+            for p in progress
+        ],
+        "next_after": user_ids[-1] if len(user_ids) == limit else None,
+    }
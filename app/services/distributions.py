@@ -0,0 +1,85 @@
+"""
+Per-module distributions of time spent and quiz scores.
+
+The event consumer folds every progress event's ``time_spent`` (seconds
+spent in that session) and every quiz attempt's ``score`` (percentage) into
+a t-digest per (workshop, module, metric), stored in
+``quantile_sketches``.  Digests are updated read-modify-write inside the
+consumer's transaction: missing rows are first inserted empty
+(``DO NOTHING``) and every row is then locked ``FOR UPDATE`` before it is
+read, so concurrent consumers cannot drop each other's samples.  A
+workshop's distributions are answered from one small row per module and
+metric, however many events there were.
+Workshop-wide figures merge the module digests.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from ..models.analytics import QuantileSketch
+from .tdigest import TDigest
+from .upsert import upsert
+
+METRICS = ("time_spent", "score")
+QUANTILES = (0.5, 0.9, 0.99)
+
+Key = Tuple[int, int, str]
+
+
+def record(db: Session, samples: Iterable[Tuple[int, int, str, float]]) -> None:
+    """Add ``(workshop_id, module_id, metric, value)`` samples; part of the caller's transaction."""
+    values: Dict[Key, List[float]] = defaultdict(list)
+    for workshop_id, module_id, metric, value in samples:
+        values[(workshop_id, module_id, metric)].append(float(value))
+    if not values:
+        return
+    keys = sorted(values)  # a consistent lock order
+    now = datetime.utcnow()
+    empty = TDigest().to_bytes()
+    upsert(db, QuantileSketch, [
+        {"workshop_id": key[0], "module_id": key[1], "metric": key[2], "digest": empty, "updated_at": now}
+        for key in keys
+    ], ["workshop_id", "module_id", "metric"], None)
+    existing = {
+        (row.workshop_id, row.module_id, row.metric): TDigest.from_bytes(row.digest)
+        for row in db.query(QuantileSketch)
+        .filter(tuple_(QuantileSketch.workshop_id, QuantileSketch.module_id, QuantileSketch.metric).in_(keys))
+        .order_by(QuantileSketch.workshop_id, QuantileSketch.module_id, QuantileSketch.metric)
+        .with_for_update()
+    }
+    rows = []
+    for key in keys:
+        digest = existing[key]
+        digest.add(values[key])
+        rows.append({"workshop_id": key[0], "module_id": key[1], "metric": key[2], "digest": digest.to_bytes(), "updated_at": now})
+    upsert(db, QuantileSketch, rows, ["workshop_id", "module_id", "metric"],
+           lambda t, ex: {"digest": ex.digest, "updated_at": ex.updated_at})
+
+
+def _summary(digest: TDigest) -> dict:
+    return {
+        "count": int(digest.count),
+        **{f"p{round(q * 100)}": digest.quantile(q) for q in QUANTILES},
+    }
+
+
+def workshop_distributions(db: Session, workshop_id: int) -> dict:
+    """p50/p90/p99 of each metric per module and for the whole workshop."""
+    modules: Dict[int, Dict[str, TDigest]] = defaultdict(dict)
+    overall = {metric: TDigest() for metric in METRICS}
+    for row in db.query(QuantileSketch).filter(QuantileSketch.workshop_id == workshop_id).order_by(QuantileSketch.module_id):
+        digest = TDigest.from_bytes(row.digest)
+        modules[row.module_id][row.metric] = digest
+        overall[row.metric].merge(digest)
+    return {
+        "workshop_id": workshop_id,
+        "overall": {metric: _summary(digest) for metric, digest in overall.items()},
+        "modules": [
+            {"module_id": module_id, **{metric: _summary(digests.get(metric, TDigest())) for metric in METRICS}}
+            for module_id, digests in modules.items()
+        ],
+    }
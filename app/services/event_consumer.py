@@ -0,0 +1,334 @@
+"""
+Consumer that applies learner events to the analytics tables.
+
+Progress, quiz and login events are read from the broker in micro-batches.
+Each batch is applied with one bulk upsert per table, after events whose
+id is already in ``processed_events`` have been dropped; the new ids are
+recorded in the same transaction.  Broker offsets are committed only after
+the database commit, so a crash in between leads to redelivery, which the
+event id check turns into a no-op.  Ids are kept for
+``PROCESSED_EVENT_RETENTION_HOURS`` (default 168), which must cover the
+broker's redelivery window; the consumer loop prunes older ones every
+``PROCESSED_EVENT_PRUNE_SECONDS`` (existing databases need
+``CREATE INDEX ix_processed_events_processed_at ON processed_events (processed_at)``).
+The learner of every event is also
+added to the daily active-user sketches (``active_users``) and the weekly
+activity rollup (``retention``), and the ingestion watermarks of the
+affected workshops are advanced (``response_cache``).
+
+Event payloads (``ts`` is an ISO-8601 timestamp):
+
+- ``progress``: ``user_id``, ``workshop_id``, ``modules_completed``, ``percent_complete``,
+  optionally ``module_id`` and ``time_spent`` (seconds in this session)
+- ``quiz``: ``user_id``, ``quiz_id``, ``workshop_id``, ``score`` (percentage), ``passed``,
+  optionally ``module_id``
+- ``login``: ``user_id``, ``device_info``, optionally ``workshop_id``
+- ``workshop``: ``workshop_id``, ``trainer_id`` (None once the workshop is deleted),
+  published by the workshop service
+
+Run standalone with ``python -m app.services.event_consumer``.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+
+from ..models.analytics import LoginActivity, LoginEvent, ProcessedEvent, QuizScoresSummary, StudentModuleProgress, WorkshopTrainer
+from . import active_users, distributions, response_cache, retention
+from .broker import ANALYTICS_TOPICS, TOPIC_LOGIN, TOPIC_PROGRESS, TOPIC_QUIZ, TOPIC_WORKSHOP, Message
+from .risk_scoring import mark_dirty
+from .upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_EVENT_RETENTION_HOURS = float(os.getenv("PROCESSED_EVENT_RETENTION_HOURS", "168"))
+PROCESSED_EVENT_PRUNE_SECONDS = float(os.getenv("PROCESSED_EVENT_PRUNE_SECONDS", "600"))
+
+TOPIC_EVENT_TYPES = {TOPIC_PROGRESS: "progress", TOPIC_QUIZ: "quiz", TOPIC_LOGIN: "login", TOPIC_WORKSHOP: "workshop"}
+
+
+def _ts(event: dict) -> datetime:
+    ts = event.get("ts")
+    return datetime.fromisoformat(ts) if ts else datetime.utcnow()
+
+
+def apply_progress(db: Session, events: List[dict]) -> None:
+    latest: Dict[tuple, dict] = {}
+    for event in events:
+        key = (event["user_id"], event["workshop_id"])
+        ts = _ts(event)
+        first = latest[key]["started_at"] if key in latest else ts
+        if key not in latest or ts >= latest[key]["updated_at"]:
+            latest[key] = {
+                "user_id": event["user_id"],
+                "workshop_id": event["workshop_id"],
+                "modules_completed": event["modules_completed"],
+                "percent_complete": event["percent_complete"],
+                "updated_at": ts,
+            }
+        # Only used when the row is inserted
+        latest[key]["started_at"] = min(first, ts)
+    upsert(
+        db,
+        StudentModuleProgress,
+        list(latest.values()),
+        ["user_id", "workshop_id"],
+        lambda t, ex: {
+            "modules_completed": ex.modules_completed,
+            "percent_complete": ex.percent_complete,
+            "updated_at": ex.updated_at,
+        },
+        # Ignore progress older than what is already stored
+        where=lambda t, ex: or_(t.c.updated_at.is_(None), t.c.updated_at <= ex.updated_at),
+    )
+    distributions.record(db, [
+        (event["workshop_id"], event["module_id"], "time_spent", event["time_spent"])
+        for event in events if event.get("module_id") is not None and event.get("time_spent")
+    ])
+
+
+def apply_quiz(db: Session, events: List[dict]) -> None:
+    totals: Dict[tuple, dict] = {}
+    for event in events:
+        key = (event["user_id"], event["quiz_id"])
+        row = totals.setdefault(key, {"user_id": key[0], "quiz_id": key[1], "score": 0.0, "attempts": 0, "pass_fail": False, "workshop_id": None})
+        row["workshop_id"] = event.get("workshop_id", row["workshop_id"])
+        row["last_score"] = float(event["score"])
+        row["score"] += float(event["score"])
+        row["attempts"] += 1
+        row["pass_fail"] = row["pass_fail"] or bool(event.get("passed"))
+    rows = [
+        {
+            "user_id": r["user_id"],
+            "quiz_id": r["quiz_id"],
+            "workshop_id": r["workshop_id"],
+            "average_score": r["score"] / r["attempts"],
+            "pass_fail": r["pass_fail"],
+            "attempts": r["attempts"],
+            "last_score": r["last_score"],
+            "updated_at": datetime.utcnow(),
+        }
+        for r in totals.values()
+    ]
+
+    def update(t, ex):
+        attempts = func.coalesce(t.c.attempts, 1)
+        return {
+            "average_score": (t.c.average_score * attempts + ex.average_score * ex.attempts) / (attempts + ex.attempts),
+            "attempts": attempts + ex.attempts,
+            "pass_fail": or_(t.c.pass_fail, ex.pass_fail),
+            "workshop_id": func.coalesce(ex.workshop_id, t.c.workshop_id),
+            "last_score": ex.last_score,
+            "updated_at": ex.updated_at,
+        }
+
+    upsert(db, QuizScoresSummary, rows, ["user_id", "quiz_id"], update)
+    distributions.record(db, [
+        (event["workshop_id"], event["module_id"], "score", event["score"])
+        for event in events if event.get("module_id") is not None and event.get("workshop_id") is not None
+    ])
+
+
+def apply_login(db: Session, events: List[dict]) -> None:
+    totals: Dict[int, dict] = {}
+    for event in events:
+        row = totals.setdefault(event["user_id"], {"user_id": event["user_id"], "login_count": 0, "last_login": None, "device_info": None})
+        row["login_count"] += 1
+        if row["last_login"] is None or _ts(event) >= row["last_login"]:
+            row["last_login"] = _ts(event)
+            row["device_info"] = event.get("device_info")
+
+    def update(t, ex):
+        newer = or_(t.c.last_login.is_(None), ex.last_login >= t.c.last_login)
+        return {
+            "login_count": func.coalesce(t.c.login_count, 0) + ex.login_count,
+            "last_login": case((newer, ex.last_login), else_=t.c.last_login),
+            "device_info": case((newer, ex.device_info), else_=t.c.device_info),
+        }
+
+    upsert(db, LoginActivity, list(totals.values()), ["user_id"], update)
+    db.bulk_insert_mappings(LoginEvent, [
+        {
+            "user_id": event["user_id"],
+            "workshop_id": event.get("workshop_id") or 0,
+            "device_info": event.get("device_info"),
+            "occurred_at": _ts(event),
+        }
+        for event in events
+    ])
+
+
+def apply_workshop(db: Session, events: List[dict]) -> None:
+    trainers = {event["workshop_id"]: event["trainer_id"] for event in events}
+    deleted = [workshop_id for workshop_id, trainer_id in trainers.items() if trainer_id is None]
+    if deleted:
+        db.query(WorkshopTrainer).filter(WorkshopTrainer.workshop_id.in_(deleted)).delete(synchronize_session=False)
+    upsert(
+        db,
+        WorkshopTrainer,
+        [{"workshop_id": workshop_id, "trainer_id": trainer_id}
+         for workshop_id, trainer_id in trainers.items() if trainer_id is not None],
+        ["workshop_id"],
+        lambda t, ex: {"trainer_id": ex.trainer_id},
+    )
+
+
+EVENT_APPLIERS: Dict[str, Callable[[Session, List[dict]], None]] = {
+    "progress": apply_progress,
+    "quiz": apply_quiz,
+    "login": apply_login,
+    "workshop": apply_workshop,
+}
+
+
+@dataclass
+class ConsumerMetrics:
+    batches: int = 0
+    events_applied: int = 0
+    duplicates_skipped: int = 0
+    unknown_skipped: int = 0
+    busy_seconds: float = 0.0
+    last_batch_size: int = 0
+    last_batch_seconds: float = 0.0
+
+
+class EventConsumer:
+    def __init__(self, broker, session_factory, group: str = "analytics", topics=ANALYTICS_TOPICS, batch_size: int = 500):
+        self.broker = broker
+        self.session_factory = session_factory
+        self.group = group
+        self.topics = list(topics)
+        self.batch_size = batch_size
+        self.stats = ConsumerMetrics()
+        self._pruned_at = 0.0  # time.monotonic() of the last prune
+
+    def _event_id(self, message: Message) -> str:
+        return str(message.value.get("event_id") or f"{message.topic}:{message.partition}:{message.offset}")
+
+    def apply(self, db: Session, messages: List[Message]) -> int:
+        """Apply a batch inside the caller's transaction; return the number of new events."""
+        batch: Dict[str, Message] = {}
+        for message in messages:
+            batch.setdefault(self._event_id(message), message)
+        ids = list(batch)
+        seen = {
+            event_id
+            for (event_id,) in db.query(ProcessedEvent.event_id).filter(ProcessedEvent.event_id.in_(ids))
+        }
+        by_type: Dict[str, List[dict]] = defaultdict(list)
+        for event_id, message in batch.items():
+            if event_id in seen:
+                continue
+            event_type = message.value.get("type") or TOPIC_EVENT_TYPES.get(message.topic)
+            if event_type not in EVENT_APPLIERS:
+                self.stats.unknown_skipped += 1
+                logger.warning("Skipping event %s of unknown type %r", event_id, event_type)
+                continue
+            by_type[event_type].append(message.value)
+        for event_type, events in by_type.items():
+            EVENT_APPLIERS[event_type](db, events)
+        active = [event for events in by_type.values() for event in events if "user_id" in event]
+        mark_dirty(db, {event["user_id"] for event in active})
+        activity = [(event["user_id"], event.get("workshop_id"), _ts(event).date()) for event in active]
+        active_users.record(db, activity)
+        retention.record(db, activity)
+        response_cache.advance(db, [event.get("workshop_id") for events in by_type.values() for event in events])
+        fresh = [event_id for event_id in ids if event_id not in seen]
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(ProcessedEvent, [{"event_id": event_id, "processed_at": now} for event_id in fresh])
+        self.stats.duplicates_skipped += len(messages) - len(fresh)
+        return sum(len(events) for events in by_type.values())
+
+    def run_once(self) -> int:
+        """Poll, apply and commit one micro-batch; return the number of messages handled."""
+        messages = self.broker.poll(self.group, self.topics, self.batch_size)
+        if not messages:
+            return 0
+        started = time.perf_counter()
+        with self.session_factory() as db:
+            try:
+                applied = self.apply(db, messages)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        offsets: Dict[tuple, int] = {}
+        for message in messages:
+            tp = (message.topic, message.partition)
+            offsets[tp] = max(offsets.get(tp, 0), message.offset + 1)
+        self.broker.commit(self.group, offsets)
+
+        elapsed = time.perf_counter() - started
+        self.stats.batches += 1
+        self.stats.events_applied += applied
+        self.stats.busy_seconds += elapsed
+        self.stats.last_batch_size = len(messages)
+        self.stats.last_batch_seconds = elapsed
+        logger.info("Applied %d/%d events in %.3fs, lag %d", applied, len(messages), elapsed, self.metrics()["total_lag"])
+        return len(messages)
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Forget processed ids older than the redelivery window; return how many."""
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=PROCESSED_EVENT_RETENTION_HOURS)
+        with self.session_factory() as db:
+            removed = (
+                db.query(ProcessedEvent)
+                .filter(ProcessedEvent.processed_at < cutoff)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        self._pruned_at = time.monotonic()
+        if removed:
+            logger.info("Pruned %d processed event ids", removed)
+        return removed
+
+    def run_forever(self, stop: threading.Event, idle_sleep: float = 0.5) -> None:
+        while not stop.is_set():
+            try:
+                if time.monotonic() - self._pruned_at >= PROCESSED_EVENT_PRUNE_SECONDS:
+                    self.prune()
+                if not self.run_once():
+                    stop.wait(idle_sleep)
+            except Exception:
+                logger.exception("Event batch failed; retrying")
+                stop.wait(idle_sleep)
+
+    def metrics(self) -> dict:
+        """Lag per partition and throughput figures."""
+        committed = self.broker.committed(self.group)
+        lag = {
+            f"{topic}:{partition}": end - committed.get((topic, partition), 0)
+            for (topic, partition), end in self.broker.end_offsets(self.topics).items()
+        }
+        s = self.stats
+        return {
+            "lag": lag,
+            "total_lag": sum(lag.values()),
+            "batches": s.batches,
+            "events_applied": s.events_applied,
+            "duplicates_skipped": s.duplicates_skipped,
+            "unknown_skipped": s.unknown_skipped,
+            "events_per_second": s.events_applied / s.busy_seconds if s.busy_seconds else 0.0,
+            "last_batch_events_per_second": s.last_batch_size / s.last_batch_seconds if s.last_batch_seconds else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+    from .broker import broker_from_env
+
+    logging.basicConfig(level=logging.INFO)
+    group = "analytics"
+    consumer = EventConsumer(broker_from_env(group), SessionLocal, group=group)
+    try:
+        consumer.run_forever(threading.Event())
+    except KeyboardInterrupt:
+        pass
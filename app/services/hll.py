@@ -0,0 +1,83 @@
+"""
+HyperLogLog distinct counter.
+
+A sketch is ``m = 2**p`` one-byte registers.  Each user id is hashed to 64
+bits (SplitMix64); the top ``p`` bits pick a register, which keeps the
+largest "position of the first 1 bit" seen in the remaining bits.
+Sketches are merged with an element-wise maximum, so the count for any
+union of days or workshops is a merge followed by one estimate.
+
+With the default ``p = 12`` a sketch is 4 KiB (much less compressed for
+small cohorts) and the relative standard error is ``1.04 / sqrt(m)``,
+about 1.6%; 99.7% of estimates fall within three standard errors (4.9%).
+Small cardinalities use linear counting and are close to exact.
+"""
+
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+DEFAULT_PRECISION = 12
+
+
+def hash64(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer applied to integer ids."""
+    with np.errstate(over="ignore"):
+        x = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length += high * shift
+        x = np.where(high, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+
+def standard_error(precision: int = DEFAULT_PRECISION) -> float:
+    return 1.04 / np.sqrt(2 ** precision)
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: np.ndarray = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(2 ** precision, dtype=np.uint8)
+
+    def add(self, user_ids: Iterable[int]) -> None:
+        hashes = hash64(np.fromiter(user_ids, dtype=np.int64))
+        if not len(hashes):
+            return
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        rest = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        rank = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return m * np.log(m / zeros)
+        return float(estimate)
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).copy()
+        return cls(int(np.log2(len(registers))), registers)
@@ -0,0 +1,242 @@
+"""
+Hourly and daily login rollups.
+
+The event consumer appends every login to ``login_events``.  The
+compactor folds new raw rows (by id, past ``rollup_watermarks``) into
+``login_hourly`` and ``login_daily`` with additive upserts, so late events
+simply increment older buckets.  Rows younger than
+``ROLLUP_SETTLE_SECONDS`` are left for the next pass, so a transaction
+that commits a lower id late is not skipped.
+
+Raw rows are deleted in batches once they are rolled up and older than
+``LOGIN_EVENT_RETENTION_DAYS``; hourly buckets are kept for
+``LOGIN_HOURLY_RETENTION_DAYS`` and daily buckets indefinitely.
+
+``login_counts`` answers a time range by splitting it into the coarsest
+pieces each source can answer exactly: whole days from the daily table,
+whole hours at the edges from the hourly table and the remaining minutes
+from raw rows.  Raw rows not yet rolled up are added to the rollup
+pieces, so results do not lag behind ingestion.  A piece that needs a
+source past its retention (minutes before ``LOGIN_EVENT_RETENTION_DAYS``,
+hours before ``LOGIN_HOURLY_RETENTION_DAYS``) cannot be answered and the
+range is refused rather than counted short.
+
+Run the compactor standalone with ``python -m app.services.login_rollups``.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..models.analytics import LoginDaily, LoginEvent, LoginHourly, RollupWatermark
+from .dashboard import fetch_columns
+from .upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+LOGIN_EVENT_RETENTION_DAYS = float(os.getenv("LOGIN_EVENT_RETENTION_DAYS", "7"))
+LOGIN_HOURLY_RETENTION_DAYS = float(os.getenv("LOGIN_HOURLY_RETENTION_DAYS", "90"))
+ROLLUP_SETTLE_SECONDS = float(os.getenv("ROLLUP_SETTLE_SECONDS", "30"))
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "50000"))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "10000"))
+COMPACT_INTERVAL_SECONDS = float(os.getenv("COMPACT_INTERVAL_SECONDS", "60"))
+
+WATERMARK = "login_events"
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def _watermark(db: Session) -> int:
+    row = db.query(RollupWatermark).get(WATERMARK)
+    return row.last_id if row else 0
+
+
+def _add_to(db: Session, model, unit: str, workshops: np.ndarray, occurred: np.ndarray) -> None:
+    buckets = occurred.astype(f"datetime64[{unit}]")
+    keys = np.rec.fromarrays([workshops, buckets.astype(np.int64)])
+    (unique, counts) = np.unique(keys, return_counts=True)
+    upsert(db, model, [
+        {
+            "workshop_id": int(workshop_id),
+            "bucket_start": np.datetime64(int(bucket), unit).astype("datetime64[us]").item(),
+            "logins": int(count),
+        }
+        for (workshop_id, bucket), count in zip(unique.tolist(), counts.tolist())
+    ], ["workshop_id", "bucket_start"], lambda t, ex: {"logins": t.c.logins + ex.logins})
+
+
+def compact(db: Session, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """Fold one batch of new raw logins into the rollups; return how many were folded."""
+    last_id = _watermark(db)
+    settled = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+    ids, workshops, occurred = fetch_columns(
+        db,
+        select(LoginEvent.id, LoginEvent.workshop_id, LoginEvent.occurred_at)
+        .where(LoginEvent.id > last_id, LoginEvent.ingested_at <= settled)
+        .order_by(LoginEvent.id)
+        .limit(batch_size),
+        [np.int64, np.int64, "datetime64[us]"],
+    )
+    if not len(ids):
+        return 0
+    _add_to(db, LoginHourly, "h", workshops, occurred)
+    _add_to(db, LoginDaily, "D", workshops, occurred)
+    upsert(db, RollupWatermark, [{"name": WATERMARK, "last_id": int(ids.max())}], ["name"],
+           lambda t, ex: {"last_id": ex.last_id})
+    db.commit()
+    return len(ids)
+
+
+def purge(db: Session, now: Optional[datetime] = None, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete expired raw rows (only rolled-up ones) in batches, and expired hourly buckets."""
+    now = now or datetime.utcnow()
+    last_id = _watermark(db)
+    raw_cutoff = now - timedelta(days=LOGIN_EVENT_RETENTION_DAYS)
+    removed = 0
+    while True:
+        ids = [
+            row_id for (row_id,) in db.query(LoginEvent.id)
+            .filter(LoginEvent.id <= last_id, LoginEvent.occurred_at < raw_cutoff)
+            .order_by(LoginEvent.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+        db.execute(delete(LoginEvent).where(LoginEvent.id.in_(ids)))
+        db.commit()
+        removed += len(ids)
+    db.execute(delete(LoginHourly).where(LoginHourly.bucket_start < now - timedelta(days=LOGIN_HOURLY_RETENTION_DAYS)))
+    db.commit()
+    return removed
+
+
+def run_compactor(session_factory, stop: threading.Event, interval: float = COMPACT_INTERVAL_SECONDS) -> None:
+    while not stop.is_set():
+        try:
+            with session_factory() as db:
+                while compact(db) == ROLLUP_BATCH_SIZE:
+                    pass
+                purge(db)
+        except Exception:
+            logger.exception("Login rollup pass failed")
+        stop.wait(interval)
+
+
+# Range queries
+
+def _ceil(ts: datetime, step: timedelta) -> datetime:
+    floor = _floor(ts, step)
+    return floor if floor == ts else floor + step
+
+
+def _floor(ts: datetime, step: timedelta) -> datetime:
+    if step == DAY:
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def plan(start: datetime, end: datetime, coarsest: timedelta = DAY) -> List[Tuple[str, datetime, datetime]]:
+    """Split ``[start, end)`` into (source, from, to) pieces using sources no coarser than ``coarsest``."""
+    pieces = []
+    day_start, day_end = _ceil(start, DAY), _floor(end, DAY)
+    if coarsest == DAY and day_start < day_end:
+        hour_head, hour_tail = (start, day_start), (day_end, end)
+        pieces.append(("daily", day_start, day_end))
+    else:
+        hour_head, hour_tail = (start, end), None
+    for span in filter(None, (hour_head, hour_tail)):
+        lo, hi = span
+        h_start, h_end = _ceil(lo, HOUR), _floor(hi, HOUR)
+        if h_start < h_end:
+            pieces.append(("hourly", h_start, h_end))
+            pieces.extend(("raw", a, b) for a, b in ((lo, h_start), (h_end, hi)) if a < b)
+        elif lo < hi:
+            pieces.append(("raw", lo, hi))
+    return sorted(pieces, key=lambda piece: piece[1])
+
+
+SOURCES = {"daily": LoginDaily, "hourly": LoginHourly}
+
+
+def _check_retention(pieces: List[Tuple[str, datetime, datetime]], now: datetime) -> None:
+    """Raise ValueError if a piece reads a source whose rows before it may have been purged."""
+    kept = {
+        "raw": (now - timedelta(days=LOGIN_EVENT_RETENTION_DAYS), "whole hours"),
+        "hourly": (now - timedelta(days=LOGIN_HOURLY_RETENTION_DAYS), "whole days"),
+    }
+    for source, lo, _ in pieces:
+        if source in kept and lo < kept[source][0]:
+            since, unit = kept[source]
+            raise ValueError(f"Logins before {since:%Y-%m-%d %H:%M} are only kept in {unit}; "
+                             f"align start and end to {unit} or use a coarser bucket")
+
+
+def login_counts(db: Session, start: datetime, end: datetime, bucket: str = "day",
+                 workshop_id: Optional[int] = None, now: Optional[datetime] = None) -> dict:
+    """
+    Logins in ``[start, end)`` per ``bucket`` ("hour" or "day"), for one
+    workshop or all.  Raises ValueError for a range whose edges fall in
+    data already past retention.
+    """
+    if bucket not in ("hour", "day"):
+        raise ValueError(f"Unknown bucket {bucket!r}")
+    step = DAY if bucket == "day" else HOUR
+    pieces = plan(start, end, coarsest=step)
+    _check_retention(pieces, now or datetime.utcnow())
+    last_id = _watermark(db)
+    series: Dict[datetime, int] = {}
+
+    def add(ts: datetime, count: int) -> None:
+        key = _floor(ts, step)
+        series[key] = series.get(key, 0) + count
+
+    def raw(lo: datetime, hi: datetime, after_id: int = 0):
+        query = db.query(LoginEvent.occurred_at).filter(
+            LoginEvent.occurred_at >= lo, LoginEvent.occurred_at < hi, LoginEvent.id > after_id
+        )
+        if workshop_id is not None:
+            query = query.filter(LoginEvent.workshop_id == workshop_id)
+        return query
+
+    for source, lo, hi in pieces:
+        if source == "raw":
+            for (occurred_at,) in raw(lo, hi):
+                add(occurred_at, 1)
+            continue
+        model = SOURCES[source]
+        query = db.query(model.bucket_start, func.sum(model.logins)).filter(
+            model.bucket_start >= lo, model.bucket_start < hi
+        )
+        if workshop_id is not None:
+            query = query.filter(model.workshop_id == workshop_id)
+        for bucket_start, logins in query.group_by(model.bucket_start):
+            add(bucket_start, int(logins))
+        # Raw rows the compactor has not folded in yet
+        for (occurred_at,) in raw(lo, hi, after_id=last_id):
+            add(occurred_at, 1)
+
+    return {
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "workshop_id": workshop_id,
+        "total": sum(series.values()),
+        "series": [{"bucket_start": key, "logins": series[key]} for key in sorted(series)],
+        "sources": [{"source": source, "start": lo, "end": hi} for source, lo, hi in pieces],
+    }
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        run_compactor(SessionLocal, threading.Event())
+    except KeyboardInterrupt:
+        pass
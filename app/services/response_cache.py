@@ -0,0 +1,115 @@
+"""
+Response cache keyed by the ingestion watermark.
+
+``ingestion_watermarks`` holds a sequence per workshop (workshop 0:
+platform-wide) that the event consumer advances by the number of events
+it applies for the workshop, in the same transaction.  The risk scoring
+job advances the workshops it rescored.  Anything else that writes the
+analytics tables must call ``advance`` too, or cached responses go stale.
+
+``ResponseCache`` keeps the encoded JSON of recent responses with the
+watermark they were computed at.  A request whose watermark is unchanged
+gets the cached bytes; otherwise the response is recomputed once, and
+concurrent requests for the same key wait for that computation instead
+of running their own.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from ..models.analytics import IngestionWatermark
+from .upsert import upsert
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+PLATFORM = 0
+
+
+def advance(db: Session, workshop_ids: Iterable[Optional[int]]) -> None:
+    """Advance each listed workshop's watermark and the platform's; part of the caller's transaction."""
+    counts: Dict[int, int] = {}
+    for workshop_id in workshop_ids:
+        counts[PLATFORM] = counts.get(PLATFORM, 0) + 1
+        if workshop_id:
+            counts[workshop_id] = counts.get(workshop_id, 0) + 1
+    now = datetime.utcnow()
+    upsert(db, IngestionWatermark, [
+        {"workshop_id": workshop_id, "sequence": count, "updated_at": now} for workshop_id, count in counts.items()
+    ], ["workshop_id"], lambda t, ex: {"sequence": t.c.sequence + ex.sequence, "updated_at": ex.updated_at})
+
+
+def watermark(db: Session, workshop_id: Optional[int] = None) -> int:
+    sequence = (
+        db.query(IngestionWatermark.sequence)
+        .filter(IngestionWatermark.workshop_id == (workshop_id or PLATFORM))
+        .scalar()
+    )
+    return sequence or 0
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.body: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[int, bytes]]" = OrderedDict()
+        self._flights: Dict[tuple, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, mark: int, compute: Callable[[], object]) -> bytes:
+        """JSON bytes for ``key`` at watermark ``mark``, computing them at most once at a time."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mark:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get((key, mark))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(key, mark)] = _Flight()
+                self.misses += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.body
+        try:
+            flight.body = json.dumps(jsonable_encoder(compute())).encode()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[(key, mark)]
+                if flight.error is None:
+                    # Never replace an entry computed at a later watermark
+                    current = self._entries.get(key)
+                    if current is None or current[0] <= mark:
+                        self._entries[key] = (mark, flight.body)
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self.size:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ResponseCache()
@@ -0,0 +1,211 @@
+"""
+Week-over-week cohort retention.
+
+The event consumer rolls activity up into ``learner_active_weeks`` (one
+row per learner, workshop and active week), keeps each learner's first
+active week in ``learner_cohorts`` and maintains ``retention_counts``, the
+number of learners of each cohort active in each week.  A late event that
+moves a learner into an earlier cohort moves their counted weeks with
+them.  A learner's cohort row is inserted (``DO NOTHING``) before it is
+locked, so concurrent consumers serialise on new learners as well as
+known ones.  Like the active-user sketches, workshop 0 holds platform-wide
+activity.  Weeks are numbered from Monday 1970-01-05.
+
+``retention`` reads at most weeks x weeks count rows for the requested
+range and lays them out as the cohort x weeks-since matrix with one
+weighted ``np.bincount``, so its cost does not depend on the number of
+learners.  Results are cached per (workshop, range) for
+``RETENTION_CACHE_TTL`` seconds.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.analytics import LearnerActiveWeek, LearnerCohort, RetentionCount
+from .dashboard import fetch_columns
+from .upsert import upsert
+
+RETENTION_CACHE_TTL = float(os.getenv("RETENTION_CACHE_TTL", "300"))
+RETENTION_CACHE_SIZE = int(os.getenv("RETENTION_CACHE_SIZE", "256"))
+LOOKUP_CHUNK = 1000
+
+MAX_WEEKS = 104
+PLATFORM = 0
+EPOCH = date(1970, 1, 5)  # a Monday
+
+Learner = Tuple[int, int]
+
+
+def week_of(day: date) -> int:
+    return (day - EPOCH).days // 7
+
+
+def week_start(week: int) -> date:
+    return EPOCH + timedelta(weeks=week)
+
+
+def _known(db: Session, learners: Iterable[Learner]) -> Tuple[Dict[Learner, int], Dict[Learner, Set[int]]]:
+    """Current cohort (locked) and active weeks of ``(workshop_id, user_id)`` learners."""
+    by_workshop: Dict[int, list] = defaultdict(list)
+    for workshop_id, user_id in learners:
+        by_workshop[workshop_id].append(user_id)
+    cohorts: Dict[Learner, int] = {}
+    weeks: Dict[Learner, Set[int]] = defaultdict(set)
+    for workshop_id, user_ids in by_workshop.items():
+        for i in range(0, len(user_ids), LOOKUP_CHUNK):
+            chunk = user_ids[i:i + LOOKUP_CHUNK]
+            cohorts.update(
+                ((workshop_id, user_id), first_week)
+                for user_id, first_week in db.query(LearnerCohort.user_id, LearnerCohort.first_week)
+                .filter(LearnerCohort.workshop_id == workshop_id, LearnerCohort.user_id.in_(chunk))
+                .with_for_update()
+            )
+            for user_id, week in db.query(LearnerActiveWeek.user_id, LearnerActiveWeek.week).filter(
+                LearnerActiveWeek.workshop_id == workshop_id, LearnerActiveWeek.user_id.in_(chunk)
+            ):
+                weeks[(workshop_id, user_id)].add(week)
+    return cohorts, weeks
+
+
+def record(db: Session, activity: Iterable[Tuple[int, Optional[int], date]]) -> None:
+    """Add ``(user_id, workshop_id, day)`` activity to the weekly rollups; part of the caller's transaction."""
+    batch: Dict[Learner, Set[int]] = defaultdict(set)
+    for user_id, workshop_id, day in activity:
+        week = week_of(day)
+        batch[(PLATFORM, user_id)].add(week)
+        batch[(workshop_id or PLATFORM, user_id)].add(week)
+    if not batch:
+        return
+    # New learners get their cohort row now, so it can be locked like any other
+    upsert(db, LearnerCohort, [
+        {"workshop_id": workshop_id, "user_id": user_id, "first_week": min(weeks)}
+        for (workshop_id, user_id), weeks in sorted(batch.items())
+    ], ["workshop_id", "user_id"], None)
+    cohorts, known = _known(db, batch)
+
+    deltas: Counter = Counter()
+    new_weeks, moved = [], []
+    for learner, weeks in batch.items():
+        workshop_id = learner[0]
+        old = cohorts.get(learner)
+        first = min(weeks) if old is None else min(old, min(weeks))
+        if old is not None and first < old:
+            # A late event: the learner's counted weeks move to the earlier cohort
+            for week in known[learner]:
+                deltas[(workshop_id, old, week)] -= 1
+                deltas[(workshop_id, first, week)] += 1
+        for week in weeks - known[learner]:
+            deltas[(workshop_id, first, week)] += 1
+            new_weeks.append({"workshop_id": workshop_id, "user_id": learner[1], "week": week})
+        if first != old:
+            moved.append({"workshop_id": workshop_id, "user_id": learner[1], "first_week": first})
+
+    db.bulk_insert_mappings(LearnerActiveWeek, new_weeks)
+    upsert(db, LearnerCohort, moved, ["workshop_id", "user_id"], lambda t, ex: {"first_week": ex.first_week})
+    upsert(db, RetentionCount, [
+        {"workshop_id": workshop_id, "cohort_week": cohort_week, "week": week, "learners": delta}
+        for (workshop_id, cohort_week, week), delta in deltas.items() if delta
+    ], ["workshop_id", "cohort_week", "week"], lambda t, ex: {"learners": t.c.learners + ex.learners})
+
+
+def retention_matrix(cohorts: np.ndarray, weeks: np.ndarray, learners: Optional[np.ndarray], start: int,
+                     count: int) -> np.ndarray:
+    """Learners per (cohort, weeks since first activity) for ``count`` cohorts from week ``start``.
+
+    ``learners`` weights each (cohort, week) entry; None counts every entry once.
+    """
+    cohort = cohorts - start
+    since = weeks - cohorts
+    keep = (cohort >= 0) & (cohort < count) & (since >= 0) & (since < count)
+    cells = np.bincount(
+        cohort[keep] * count + since[keep],
+        weights=None if learners is None else learners[keep],
+        minlength=count * count,
+    )
+    return cells.astype(np.int64).reshape(count, count)
+
+
+def compute(db: Session, workshop_id: int, start: int, end: int) -> dict:
+    """Retention for the cohorts of weeks ``start`` to ``end`` inclusive."""
+    cohorts, weeks, learners = fetch_columns(db, select(
+        RetentionCount.cohort_week, RetentionCount.week, RetentionCount.learners
+    ).where(
+        RetentionCount.workshop_id == workshop_id,
+        RetentionCount.cohort_week >= start,
+        RetentionCount.cohort_week <= end,
+        RetentionCount.week <= end,
+    ), [np.int64, np.int64, np.int64])
+    count = end - start + 1
+    matrix = retention_matrix(cohorts, weeks, learners, start, count)
+    sizes = matrix[:, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(sizes[:, None] > 0, matrix / sizes[:, None], 0.0).round(4)
+    return {
+        "workshop_id": workshop_id or None,
+        "start": week_start(start),
+        "end": week_start(end) + timedelta(days=6),
+        "cohorts": [
+            {
+                "week_start": week_start(start + i),
+                "size": int(sizes[i]),
+                # Only weeks up to the end of the range are observable
+                "active": matrix[i, :count - i].tolist(),
+                "rates": rates[i, :count - i].tolist(),
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class RetentionCache:
+    """Least recently used results, each valid for ``ttl`` seconds."""
+
+    def __init__(self, size: int = RETENTION_CACHE_SIZE, ttl: float = RETENTION_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = RetentionCache()
+
+
+def retention(db: Session, start: date, end: date, workshop_id: Optional[int] = None) -> dict:
+    """Cohort retention for cohorts whose first active week falls in ``[start, end]``."""
+    if end < start:
+        raise ValueError("end must not be before start")
+    if week_of(end) - week_of(start) >= MAX_WEEKS:
+        raise ValueError(f"At most {MAX_WEEKS} weeks of cohorts per request")
+    key = (workshop_id or PLATFORM, week_of(start), week_of(end))
+    result = cache.get(key)
+    if result is None:
+        result = compute(db, *key)
+        cache.put(key, result)
+    return result
@@ -0,0 +1,299 @@
+"""
+Batch at-risk scoring.
+
+Scores every enrolled (learner, workshop) pair from five features, each
+scaled to 0..1 where 1 is worst:
+
+- ``velocity``: percent completed per day since the learner started
+- ``scores``: attempt-weighted average quiz score in the workshop
+- ``trend``: latest quiz score against the running average
+- ``recency``: days since the last login
+- ``frequency``: logins per week since the learner started
+
+The risk score is the weighted sum of the features and the flagged reason
+names the largest contribution.  Features are computed for all learners
+at once on NumPy arrays loaded from raw rows.
+
+Runs are incremental: the event consumer marks learners with new
+activity in ``risk_dirty_learners`` and a run rescores only those, plus
+learners whose score is older than ``RISK_RESCORE_HOURS`` (inactivity
+keeps growing without any event).  The first run, or ``full=True``,
+scores everybody.  Results are written with one bulk upsert, and only the
+dirty marks the run read are cleared, so a learner marked again meanwhile
+is scored by the next run.
+
+In the service, ``job`` runs scoring in a background thread: every
+``RISK_SCORING_INTERVAL_SECONDS`` with ``RUN_RISK_SCORER=true``, and when
+``POST /analytics/at-risk/score`` asks for a run.  Requests made while a
+run is in progress are folded into one follow-up run.  From the command
+line, run ``python -m app.services.risk_scoring [--full]``.
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, delete, select
+from sqlalchemy.orm import Session
+
+from ..models.analytics import AtRiskStudent, LoginActivity, QuizScoresSummary, RiskDirtyLearner, StudentModuleProgress
+from . import at_risk, response_cache
+from .dashboard import fetch_columns
+from .upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+RISK_RESCORE_HOURS = float(os.getenv("RISK_RESCORE_HOURS", "24"))
+RISK_SCORING_INTERVAL_SECONDS = float(os.getenv("RISK_SCORING_INTERVAL_SECONDS", "900"))
+LOOKUP_CHUNK = 10000
+
+FEATURES = ("velocity", "scores", "trend", "recency", "frequency")
+WEIGHTS = np.array([0.3, 0.25, 0.15, 0.2, 0.1])
+REASONS = ("slow progress", "low quiz scores", "declining quiz scores", "inactive", "infrequent logins")
+TARGET_VELOCITY = 5.0  # percent per day
+TARGET_LOGINS_PER_WEEK = 3.0
+INACTIVE_DAYS = 30.0
+TREND_SCALE = 50.0  # score points of decline counted as fully declining
+
+DAY = np.timedelta64(1, "D")
+
+
+def mark_dirty(db: Session, user_ids: Iterable[int]) -> None:
+    """Record that ``user_ids`` need rescoring; part of the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "marked_at": now} for user_id in sorted(set(user_ids))]
+    if rows:
+        upsert(db, RiskDirtyLearner, rows, ["user_id"], lambda t, ex: {"marked_at": ex.marked_at})
+
+
+def _pair_keys(user_ids: np.ndarray, workshop_ids: np.ndarray) -> np.ndarray:
+    return (user_ids.astype(np.int64) << 32) | workshop_ids.astype(np.int64)
+
+
+def _gather(sorted_keys: np.ndarray, values: np.ndarray, keys: np.ndarray, default: float) -> np.ndarray:
+    """``values`` of the entries of ``sorted_keys`` matching ``keys``, ``default`` where there is none."""
+    if not len(sorted_keys):
+        return np.full(len(keys), default)
+    idx = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[idx] == keys, values[idx], default)
+
+
+def _load(db: Session, stmt, user_column, dtypes, users: Optional[np.ndarray]) -> List[np.ndarray]:
+    if users is None:
+        return fetch_columns(db, stmt, dtypes)
+    parts = [
+        fetch_columns(db, stmt.where(user_column.in_(users[i:i + LOOKUP_CHUNK].tolist())), dtypes)
+        for i in range(0, len(users), LOOKUP_CHUNK)
+    ]
+    if not parts:
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+    return [np.concatenate(columns) for columns in zip(*parts)]
+
+
+def compute_features(now: np.datetime64, progress, quizzes, logins) -> np.ndarray:
+    """Feature matrix (rows x FEATURES) for the progress rows, with values in 0..1."""
+    p_user, p_workshop, percent, started = progress
+    q_user, q_workshop, average, last, attempts = quizzes
+    l_user, last_login, login_count = logins
+
+    days_enrolled = np.maximum(np.nan_to_num((now - started) / DAY, nan=1.0), 1.0)
+    velocity = 1 - np.clip(percent / days_enrolled / TARGET_VELOCITY, 0, 1)
+
+    # Quiz rows aggregated per (learner, workshop), weighted by attempts
+    known = ~np.isnan(q_workshop)
+    weights = np.maximum(np.nan_to_num(attempts[known], nan=1.0), 1.0)
+    average = average[known]
+    last = np.where(np.isnan(last[known]), average, last[known])
+    pairs, inverse = np.unique(_pair_keys(q_user[known], q_workshop[known]), return_inverse=True)
+    mean_score = np.bincount(inverse, weights=average * weights, minlength=len(pairs)) / np.bincount(
+        inverse, weights=weights, minlength=len(pairs))
+    mean_trend = np.bincount(inverse, weights=last - average, minlength=len(pairs)) / np.bincount(
+        inverse, minlength=len(pairs))
+    p_keys = _pair_keys(p_user, p_workshop)
+    # No quiz taken yet counts as no evidence either way
+    scores = 1 - np.clip(_gather(pairs, mean_score, p_keys, 100.0) / 100, 0, 1)
+    trend = np.clip(-_gather(pairs, mean_trend, p_keys, 0.0) / TREND_SCALE, 0, 1)
+
+    order = np.argsort(l_user)
+    idle_days = np.nan_to_num((now - last_login[order]) / DAY, nan=INACTIVE_DAYS)
+    recency = np.clip(_gather(l_user[order], idle_days, p_user, INACTIVE_DAYS) / INACTIVE_DAYS, 0, 1)
+    per_week = _gather(l_user[order], login_count[order], p_user, 0.0) / (days_enrolled / 7)
+    frequency = 1 - np.clip(per_week / TARGET_LOGINS_PER_WEEK, 0, 1)
+
+    return np.column_stack([velocity, scores, trend, recency, frequency])
+
+
+def risk_scores(features: np.ndarray, percent: np.ndarray):
+    """Weighted risk and the index of the largest contribution; completed learners score 0."""
+    contributions = features * WEIGHTS
+    risk = np.where(percent >= 100, 0.0, contributions.sum(axis=1)).round(4)
+    return risk, contributions.argmax(axis=1)
+
+
+def run(db: Session, full: bool = False, rescore_after: timedelta = timedelta(hours=RISK_RESCORE_HOURS)) -> dict:
+    """Score changed (or all) learners and upsert ``at_risk_students``; return run statistics."""
+    clock = time.perf_counter()
+    started = datetime.utcnow()
+    if not full and db.query(AtRiskStudent.id).first() is None:
+        full = True
+    dirty = db.execute(select(RiskDirtyLearner.user_id, RiskDirtyLearner.marked_at)).all()
+    users = None
+    if not full:
+        stale = select(AtRiskStudent.user_id).where(AtRiskStudent.scored_at < started - rescore_after)
+        users = np.unique(np.concatenate([
+            np.fromiter((user_id for user_id, _ in dirty), dtype=np.int64, count=len(dirty)),
+            fetch_columns(db, stale, [np.int64])[0],
+        ]))
+
+    progress = _load(db, select(
+        StudentModuleProgress.user_id,
+        StudentModuleProgress.workshop_id,
+        StudentModuleProgress.percent_complete,
+        StudentModuleProgress.started_at,
+    ), StudentModuleProgress.user_id, [np.int64, np.int64, float, "datetime64[us]"], users)
+    quizzes = _load(db, select(
+        QuizScoresSummary.user_id,
+        QuizScoresSummary.workshop_id,
+        QuizScoresSummary.average_score,
+        QuizScoresSummary.last_score,
+        QuizScoresSummary.attempts,
+    ), QuizScoresSummary.user_id, [np.int64, float, float, float, float], users)
+    logins = _load(db, select(
+        LoginActivity.user_id, LoginActivity.last_login, LoginActivity.login_count,
+    ), LoginActivity.user_id, [np.int64, "datetime64[us]", float], users)
+    loaded = time.perf_counter()
+
+    now = np.datetime64(started, "us")
+    features = compute_features(now, progress, quizzes, logins)
+    risk, reason = risk_scores(features, progress[2])
+    completed = progress[2] >= 100
+    computed = time.perf_counter()
+
+    rows = [
+        {
+            "user_id": user_id,
+            "workshop_id": workshop_id,
+            "risk_score": score,
+            "flagged_reason": None if done else REASONS[r],
+            "scored_at": started,
+        }
+        for user_id, workshop_id, score, r, done in zip(
+            progress[0].tolist(), progress[1].tolist(), risk.tolist(), reason.tolist(), completed.tolist()
+        )
+    ]
+    upsert(db, AtRiskStudent, rows, ["user_id", "workshop_id"], lambda t, ex: {
+        "risk_score": ex.risk_score,
+        "flagged_reason": ex.flagged_reason,
+        "scored_at": ex.scored_at,
+    })
+    if dirty:
+        # A mark committed after the read above, or renewed since, stays for the next run
+        marks = RiskDirtyLearner.__table__
+        db.execute(
+            delete(marks).where(marks.c.user_id == bindparam("b_user_id"), marks.c.marked_at == bindparam("b_marked_at")),
+            [{"b_user_id": user_id, "b_marked_at": marked_at} for user_id, marked_at in dirty],
+        )
+    response_cache.advance(db, np.unique(progress[1]).tolist())
+    db.commit()
+    at_risk.top_k.refresh(db)
+    stats = {
+        "full": full,
+        "learners": int(len(np.unique(progress[0]))),
+        "scored": len(rows),
+        "load_seconds": round(loaded - clock, 3),
+        "compute_seconds": round(computed - loaded, 3),
+        "write_seconds": round(time.perf_counter() - computed, 3),
+    }
+    logger.info("Risk scoring run: %s", stats)
+    return stats
+
+
+class ScoringJob:
+    """Runs ``run`` in one background thread at a time; callers only ask for a run."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Optional[bool] = None  # None, or whether the next run is full
+        self.last_run: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from ..database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def request(self, full: bool = False) -> dict:
+        """Queue a run (full if any request asked for one) and return the job status."""
+        with self._lock:
+            self._pending = bool(self._pending) or full
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, daemon=True, name="risk-scoring")
+                self._thread.start()
+            return self._status()
+
+    def status(self) -> dict:
+        with self._lock:
+            return self._status()
+
+    def _status(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "pending": self._pending is not None,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until queued runs are done; for tests and shutdown."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._thread = None
+                    return
+                full, self._pending = self._pending, None
+            stats, error = None, None
+            try:
+                with self.session_factory() as db:
+                    stats = run(db, full=full)
+            except Exception as exc:
+                logger.exception("Risk scoring run failed")
+                error = str(exc)
+            with self._lock:
+                self.last_run = stats or self.last_run
+                self.last_error = error
+
+
+job = ScoringJob()
+
+
+def run_scheduler(scoring_job: ScoringJob, stop: threading.Event,
+                  interval: float = RISK_SCORING_INTERVAL_SECONDS) -> None:
+    while not stop.is_set():
+        scoring_job.request()
+        stop.wait(interval)
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Score learners at risk")
+    parser.add_argument("--full", action="store_true", help="rescore every learner")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        print(run(db, full=args.full))
@@ -0,0 +1,45 @@
+"""
+Dialect-aware bulk upsert shared by the ingestion and scoring jobs.
+"""
+
+from typing import Callable, List, Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+UPSERT_CHUNK = 50000
+
+
+def upsert(db: Session, model, rows: List[dict], keys: List[str], update: Optional[Callable],
+           where: Optional[Callable] = None) -> None:
+    """
+    Bulk ``INSERT ... ON CONFLICT (keys) DO UPDATE``.
+
+    ``update(table, excluded)`` returns the SET clause and ``where`` an
+    optional condition; both receive the target table and the row that
+    failed to insert.  Without ``update`` existing rows are left alone
+    (``DO NOTHING``).  Callers must pre-aggregate rows so that a key
+    appears at most once per call.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect}")
+    if not rows:
+        return
+    # One statement executed for many parameter sets: compiled once, and
+    # batched by the driver (execute_values on psycopg2)
+    stmt = insert(model.__table__)
+    if update is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_=update(model.__table__, stmt.excluded),
+            where=where(model.__table__, stmt.excluded) if where else None,
+        )
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        db.execute(stmt, rows[start:start + UPSERT_CHUNK])
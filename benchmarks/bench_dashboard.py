@@ -0,0 +1,98 @@
+"""
+Dashboard aggregation at 10k and 1M learner rows.
+
+Seeds one workshop with ``N`` progress rows and ``N`` quiz summary rows
+spread over five quizzes, then times:
+
+- ``rows``: the previous approach, loading every row through the ORM and
+  returning one JSON entry per learner.
+- ``engine``: ``dashboard.workshop_dashboard``, NumPy distributions.
+
+    python benchmarks/bench_dashboard.py --sizes 10000 1000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def seed(engine, models, rows):
+    rng = np.random.default_rng(0)
+    percent = rng.uniform(0, 100, rows).round(2)
+    scores = rng.uniform(0, 100, rows).round(2)
+    with engine.begin() as conn:
+        conn.execute(models.StudentModuleProgress.__table__.delete())
+        conn.execute(models.QuizScoresSummary.__table__.delete())
+        conn.execute(models.StudentModuleProgress.__table__.insert(), [
+            {"user_id": i, "workshop_id": 1, "modules_completed": int(p // 20), "percent_complete": float(p)}
+            for i, p in enumerate(percent)
+        ])
+        conn.execute(models.QuizScoresSummary.__table__.insert(), [
+            {"user_id": i // 5, "quiz_id": 100 + i % 5, "workshop_id": 1, "average_score": float(s),
+             "pass_fail": bool(s >= 70), "attempts": 1}
+            for i, s in enumerate(scores)
+        ])
+
+
+def legacy_rows(db, models, workshop_id):
+    progress = db.query(models.StudentModuleProgress).filter(models.StudentModuleProgress.workshop_id == workshop_id).all()
+    quizzes = db.query(models.QuizScoresSummary).filter(models.QuizScoresSummary.workshop_id == workshop_id).all()
+    return {
+        "completion": [{"user_id": m.user_id, "percent_complete": m.percent_complete} for m in progress],
+        "quiz_scores": [{"user_id": q.user_id, "average_score": q.average_score, "pass_fail": q.pass_fail} for q in quizzes],
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import analytics as models
+    from app.models.base import Base
+    from app.services import dashboard
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    print(f"{db_url.split('://')[0]}, median of {args.repeat}")
+    print(f"{'rows':>9} {'mode':<7} {'seconds':>9}")
+    for rows in args.sizes:
+        seed(engine, models, rows)
+        with SessionLocal() as db:
+            for mode, fn in (
+                ("rows", lambda: legacy_rows(db, models, 1)),
+                ("engine", lambda: dashboard.workshop_dashboard(db, 1)),
+            ):
+                print(f"{rows:>9} {mode:<7} {timed(fn, args.repeat):>9.3f}")
+                db.expunge_all()
+
+
+if __name__ == "__main__":
+    main()
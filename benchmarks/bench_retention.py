@@ -0,0 +1,97 @@
+"""
+Cohort retention for ``--learners`` learners (default 1M) over ``--weeks`` weeks.
+
+Seeds the weekly activity rollups with learners joining uniformly over the
+range and staying active with a decaying probability, then times the
+matrix built from every learner-week, the first (uncached) request, a
+cached one, and recording a consumer batch of ``--batch`` learners.
+
+    python benchmarks/bench_retention.py --learners 1000000 --weeks 52
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def activity(learners, weeks, start):
+    rng = np.random.default_rng(0)
+    first = start + rng.integers(0, weeks, learners)
+    # Weeks since joining: each later week is active with probability 0.7^since
+    since = np.arange(weeks)
+    active = rng.random((learners, weeks)) < 0.7 ** since
+    active &= first[:, None] + since < start + weeks
+    users, offsets = np.nonzero(active)
+    return first, users, first[users] + offsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=1_000_000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import analytics as models
+    from app.models.base import Base
+    from app.services import retention
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    start_week = retention.week_of(retention.EPOCH + timedelta(weeks=2800))
+    first, users, weeks = activity(args.learners, args.weeks, start_week)
+    clock = time.perf_counter()
+    matrix = retention.retention_matrix(first[users], weeks, None, start_week, args.weeks)
+    print(f"matrix from {len(weeks)} learner-weeks   {time.perf_counter() - clock:7.3f}s  "
+          f"(week 1 retention {matrix[:, 1].sum() / matrix[:-1, 0].sum():.2f})")
+
+    clock = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(models.LearnerCohort.__table__.insert(), [
+            {"workshop_id": 1, "user_id": u, "first_week": w} for u, w in enumerate(first.tolist())
+        ])
+        conn.execute(models.LearnerActiveWeek.__table__.insert(), [
+            {"workshop_id": 1, "user_id": u, "week": w} for u, w in zip(users.tolist(), weeks.tolist())
+        ])
+        conn.execute(models.RetentionCount.__table__.insert(), [
+            {"workshop_id": 1, "cohort_week": start_week + c, "week": start_week + c + s, "learners": int(matrix[c, s])}
+            for c, s in zip(*np.nonzero(matrix))
+        ])
+    print(f"seeded {args.learners} learners in {time.perf_counter() - clock:.1f}s ({db_url.split('://')[0]})")
+
+    start = retention.week_start(start_week)
+    end = retention.week_start(start_week + args.weeks - 1)
+    with SessionLocal() as db:
+        for label in ("first request", "cached request"):
+            clock = time.perf_counter()
+            result = retention.retention(db, start, end, 1)
+            print(f"{label:<31} {time.perf_counter() - clock:7.3f}s  ({len(result['cohorts'])} cohorts)")
+
+        rng = np.random.default_rng(1)
+        day = start + timedelta(weeks=args.weeks - 1)
+        batch = [(int(u), 1, day) for u in rng.choice(args.learners * 2, args.batch, replace=False)]
+        clock = time.perf_counter()
+        retention.record(db, batch)
+        db.commit()
+        print(f"record batch of {args.batch:<14} {time.perf_counter() - clock:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
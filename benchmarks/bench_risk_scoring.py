@@ -0,0 +1,87 @@
+"""
+At-risk scoring for ``--learners`` learners (default 1M).
+
+Seeds one progress row, one quiz summary and one login row per learner,
+then times a full run and an incremental run after ``--changed`` percent
+of the learners were marked dirty.
+
+    python benchmarks/bench_risk_scoring.py --learners 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def seed(engine, models, learners):
+    rng = np.random.default_rng(0)
+    now = datetime.utcnow()
+    started = [now - timedelta(days=int(d)) for d in rng.integers(1, 60, learners)]
+    idle = [now - timedelta(hours=int(h)) for h in rng.integers(1, 24 * 40, learners)]
+    percent = rng.uniform(0, 100, learners).round(2)
+    average = rng.uniform(0, 100, learners).round(2)
+    last = np.clip(average + rng.normal(0, 15, learners), 0, 100).round(2)
+    logins = rng.integers(1, 50, learners)
+    with engine.begin() as conn:
+        conn.execute(models.StudentModuleProgress.__table__.insert(), [
+            {"user_id": i, "workshop_id": i % 100, "modules_completed": int(p // 20), "percent_complete": float(p),
+             "started_at": started[i]}
+            for i, p in enumerate(percent)
+        ])
+        conn.execute(models.QuizScoresSummary.__table__.insert(), [
+            {"user_id": i, "quiz_id": i % 100, "workshop_id": i % 100, "average_score": float(average[i]),
+             "last_score": float(last[i]), "pass_fail": bool(average[i] >= 70), "attempts": 2}
+            for i in range(learners)
+        ])
+        conn.execute(models.LoginActivity.__table__.insert(), [
+            {"user_id": i, "last_login": idle[i], "login_count": int(logins[i])} for i in range(learners)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=1_000_000)
+    parser.add_argument("--changed", type=float, default=1.0, help="percent of learners changed before the incremental run")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import analytics as models
+    from app.models.base import Base
+    from app.services import risk_scoring
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    start = time.perf_counter()
+    seed(engine, models, args.learners)
+    print(f"seeded {args.learners} learners in {time.perf_counter() - start:.1f}s ({db_url.split('://')[0]})")
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        stats = risk_scoring.run(db, full=True)
+        print(f"full run        {time.perf_counter() - start:7.2f}s  {stats}")
+
+        changed = np.random.default_rng(1).choice(args.learners, int(args.learners * args.changed / 100), replace=False)
+        risk_scoring.mark_dirty(db, changed.tolist())
+        db.commit()
+        start = time.perf_counter()
+        stats = risk_scoring.run(db)
+        print(f"incremental run {time.perf_counter() - start:7.2f}s  {stats}")
+
+
+if __name__ == "__main__":
+    main()
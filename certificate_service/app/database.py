@@ -7,3 +7,11 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///:memory:')
 engine = create_engine(DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,7 +1,81 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.cert import IssuedCertificate
+from ..schemas.cert import CriteriaIn, EligibilityIn, RenderIn, TemplateIn
+from ..services import eligibility, rendering
+from ..services.criteria import CriteriaError, compile_criteria
+from ..services.rendering import RenderBusy, renderer
+from ..services.verification import code_for, verify_url
 
 router = APIRouter(prefix="/certificates", tags=["certificates"])
 
 @router.get("/ping")
 def ping():
     return {"status": "certificate service up"}
+
+
+@router.post("/templates", status_code=status.HTTP_201_CREATED)
+def create_template(data: TemplateIn, db: Session = Depends(get_db)):
+    try:
+        template = rendering.create_template(db, data, renderer.store)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"template_id": template.template_id, "preview_path": template.preview_path}
+
+
+@router.post("/{certificate_id}/render", status_code=status.HTTP_202_ACCEPTED)
+def render_certificates(certificate_id: int, data: RenderIn, db: Session = Depends(get_db)):
+    try:
+        job = rendering.new_job(db, certificate_id, data)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{str(e.args[0]).capitalize()} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid template: {e}")
+    try:
+        return renderer.submit(job).payload()
+    except RenderBusy:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many certificates waiting",
+                            headers={"Retry-After": "30"})
+
+
+@router.get("/render-jobs/{job_id}")
+def render_job(job_id: str):
+    job = renderer.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Render job not found")
+    return job.payload()
+
+
+@router.put("/{certificate_id}/criteria")
+def set_criteria(certificate_id: int, data: CriteriaIn, db: Session = Depends(get_db)):
+    try:
+        certificate = eligibility.set_criteria(db, certificate_id, data.criteria)
+    except CriteriaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid criteria: {e}")
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Certificate not found")
+    return {"certificate_id": certificate.certificate_id, "criteria": certificate.criteria,
+            "metrics": sorted(compile_criteria(certificate.criteria).metrics)}
+
+
+@router.post("/workshops/{workshop_id}/issue")
+def issue_certificates(workshop_id: int, data: EligibilityIn, db: Session = Depends(get_db)):
+    try:
+        certificates = eligibility.issue(db, workshop_id, data)
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No certificates for this workshop")
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Certificates were issued concurrently; send the request again")
+    return {"workshop_id": workshop_id, "learners": len(set(data.user_ids)), "certificates": certificates}
+
+
+@router.get("/{certificate_id}/users/{user_id}/verification")
+def verification_code(certificate_id: int, user_id: int, db: Session = Depends(get_db)):
+    if db.query(IssuedCertificate).get((certificate_id, user_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Certificate not issued")
+    code = code_for(certificate_id, user_id)
+    return {"certificate_id": certificate_id, "user_id": user_id, "code": code, "verify_url": verify_url(code)}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+
+from ..services.verification import VERIFY_CACHE_TTL, VERIFY_NEGATIVE_TTL, verifier
+
+router = APIRouter(prefix="/verify", tags=["verification"])
+
+
+@router.get("/{code}")
+async def verify(code: str):
+    # Cache hits are answered on the event loop; only misses go to a worker thread
+    found, body = verifier.cached(code)
+    if not found:
+        body = await run_in_threadpool(verifier.verify, code)
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or invalid certificate code",
+                            headers={"Cache-Control": f"public, max-age={int(VERIFY_NEGATIVE_TTL)}"})
+    return Response(content=body, media_type="application/json",
+                    headers={"Cache-Control": f"public, max-age={int(VERIFY_CACHE_TTL)}"})
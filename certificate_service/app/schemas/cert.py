@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, confloat, validator
+
+from ..services.criteria import METRICS
+from ..services.fonts import WIDTHS
+
+ELEMENT_TYPES = ("text", "rect")
+ALIGNMENTS = ("left", "center", "right")
+RENDER_FORMATS = ("pdf", "png")
+
+
+def _color(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return value
+    if len(value) != 7 or value[0] != "#":
+        raise ValueError("colors are #rrggbb")
+    int(value[1:], 16)
+    return value.lower()
+
+
+def _asset_name(value: Optional[str]) -> Optional[str]:
+    # A file name in CERTIFICATE_ASSET_DIR, never a path
+    if value is not None and (value in ("", ".", "..") or any(c in value for c in "/\\\0")):
+        raise ValueError("assets are file names in the asset directory")
+    return value
+
+
+class TemplateElement(BaseModel):
+    # Coordinates are points from the top-left corner; text y is the baseline
+    type: str = "text"
+    text: str = ""  # may hold {name}, {certificate}, {workshop_id}, {user_id}, {issued_on}, {verification_code}
+    # and {verify_url}
+    x: float = 0
+    y: float = 0
+    width: float = 0
+    height: float = 0
+    font: str = "Helvetica"
+    size: confloat(gt=0) = 12
+    align: str = "left"
+    color: str = "#000000"
+    fill: Optional[str] = None  # rect fill
+    stroke: confloat(ge=0) = 0  # rect border width
+
+    _colors = validator("color", "fill", allow_reuse=True)(_color)
+
+    @validator("type")
+    def known_type(cls, value):
+        if value not in ELEMENT_TYPES:
+            raise ValueError(f"type must be one of {', '.join(ELEMENT_TYPES)}")
+        return value
+
+    @validator("font")
+    def known_font(cls, value):
+        if value not in WIDTHS:
+            raise ValueError(f"font must be one of {', '.join(WIDTHS)}")
+        return value
+
+    @validator("align")
+    def known_alignment(cls, value):
+        if value not in ALIGNMENTS:
+            raise ValueError(f"align must be one of {', '.join(ALIGNMENTS)}")
+        return value
+
+
+class TemplateLayout(BaseModel):
+    """The layout stored in ``CertificateTemplate.format_json``; sizes are in points."""
+    width: confloat(gt=0) = 842  # A4 landscape
+    height: confloat(gt=0) = 595
+    background: str = "#ffffff"
+    background_image: Optional[str] = None  # file in CERTIFICATE_ASSET_DIR, stretched over the page
+    png_scale: confloat(gt=0, le=8) = 2.0  # PNG pixels per point
+    font_files: Dict[str, str] = {}  # font name -> TrueType file in CERTIFICATE_ASSET_DIR, for PNG output
+    elements: List[TemplateElement] = []
+
+    _background = validator("background", allow_reuse=True)(_color)
+    _background_image = validator("background_image", allow_reuse=True)(_asset_name)
+
+    @validator("font_files")
+    def font_file_names(cls, value):
+        for name in value.values():
+            _asset_name(name)
+        return value
+
+
+class TemplateIn(BaseModel):
+    layout: TemplateLayout
+
+
+class RenderIn(BaseModel):
+    template_id: int
+    format: str = "pdf"
+    user_ids: Optional[List[int]] = None  # default: every learner issued the certificate
+    names: Dict[int, str] = {}  # user_id -> name printed on the certificate
+    rerender: bool = False  # also render certificates that already have a file
+
+    @validator("format")
+    def known_format(cls, value):
+        if value not in RENDER_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(RENDER_FORMATS)}")
+        return value
+
+
+class CriteriaIn(BaseModel):
+    criteria: str = ""  # e.g. "completion >= 0.9 and final_score >= 70"; empty issues to everyone
+
+
+class EligibilityIn(BaseModel):
+    user_ids: List[int]  # the workshop's learners
+    metrics: Dict[str, List[Optional[float]]] = {}  # metric -> one value per learner, null when unknown
+    certificate_ids: Optional[List[int]] = None  # default: every certificate of the workshop
+
+    @validator("metrics")
+    def one_value_per_learner(cls, value, values):
+        unknown = set(value) - set(METRICS)
+        if unknown:
+            raise ValueError(f"unknown metrics {', '.join(sorted(unknown))}; use {', '.join(METRICS)}")
+        count = len(values.get("user_ids", ()))
+        for name, column in value.items():
+            if len(column) != count:
+                raise ValueError(f"{name} has {len(column)} values for {count} learners")
+        return value
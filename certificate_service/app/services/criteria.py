@@ -0,0 +1,231 @@
+"""
+Certificate criteria language.
+
+``Certificate.criteria`` holds an expression over a learner's metrics::
+
+    completion >= 0.9 and final_score >= 70
+    passed or (completion == 1 and final_score >= 50)
+
+Grammar, loosest binding first: ``or``; ``and``; ``not``; comparisons
+(``< <= > >= == !=``, not chained); ``+ -``; ``* /``; unary ``-``; then
+numbers, ``true``/``false``, metric names and parentheses.  An empty
+expression is ``true``.
+
+``compile_criteria`` parses and type-checks an expression once and turns
+it into a tree of NumPy operations, so a whole cohort is evaluated with a
+handful of array operations rather than once per learner.  Metrics a
+learner has no value for are NaN, and every comparison with them is
+false; a missing boolean metric is false.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+NUMBER, BOOLEAN = "number", "boolean"
+
+# Metric name -> type; boolean metrics are sent as 0/1 (or true/false)
+METRICS: Dict[str, str] = {
+    "completion": NUMBER,  # share of the workshop completed, 0 to 1
+    "modules_completed": NUMBER,
+    "final_score": NUMBER,  # final quiz score, 0 to 100
+    "average_score": NUMBER,  # average over the workshop's quizzes
+    "passed": BOOLEAN,  # final quiz passed
+}
+
+COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+               "==": np.equal, "!=": np.not_equal}
+ARITHMETIC = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide}
+KEYWORDS = ("and", "or", "not", "true", "false")
+
+TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?|\.\d+)|([A-Za-z_]\w*)|(<=|>=|==|!=|[<>()+\-*/]))")
+
+Columns = Dict[str, np.ndarray]
+Node = Callable[[Columns], np.ndarray]
+
+
+class CriteriaError(ValueError):
+    """The criteria expression is invalid."""
+
+
+def _tokens(text: str) -> List[Tuple[str, str, int]]:
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise CriteriaError(f"Unexpected {text[position:].strip()[:10]!r} at {position}")
+        number, name, symbol = match.groups()
+        start = match.start(match.lastindex)
+        if number:
+            tokens.append(("number", number, start))
+        elif name:
+            tokens.append(("keyword" if name in KEYWORDS else "name", name, start))
+        else:
+            tokens.append(("symbol", symbol, start))
+        position = match.end()
+    tokens.append(("end", "", len(text)))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser; each rule returns a (node, type) pair."""
+
+    def __init__(self, text: str):
+        self.tokens = _tokens(text)
+        self.index = 0
+
+    def peek(self) -> Tuple[str, str, int]:
+        return self.tokens[self.index]
+
+    def take(self) -> None:
+        self.index += 1
+
+    def expect(self, value: str) -> None:
+        kind, text, position = self.peek()
+        if kind == "end" or text != value:
+            raise CriteriaError(f"Expected {value!r} at {position}" + (f", found {text!r}" if text else ""))
+        self.index += 1
+
+    def parse(self):
+        if self.peek()[0] == "end":
+            return (lambda columns: True), BOOLEAN
+        node, kind = self.disjunction()
+        _, text, position = self.peek()
+        if text:
+            raise CriteriaError(f"Unexpected {text!r} at {position}")
+        if kind != BOOLEAN:
+            raise CriteriaError("Criteria must be a condition, e.g. final_score >= 70")
+        return node, kind
+
+    def _logical(self, operand, keyword: str, ufunc):
+        node, kind = operand()
+        while self.peek()[1] == keyword and self.peek()[0] == "keyword":
+            position = self.peek()[2]
+            self.take()
+            right, right_kind = operand()
+            _check(kind == right_kind == BOOLEAN, f"'{keyword}' needs conditions on both sides", position)
+            node = (lambda a, b: lambda columns: ufunc(a(columns), b(columns)))(node, right)
+        return node, kind
+
+    def disjunction(self):
+        return self._logical(self.conjunction, "or", np.logical_or)
+
+    def conjunction(self):
+        return self._logical(self.negation, "and", np.logical_and)
+
+    def negation(self):
+        kind, text, position = self.peek()
+        if kind == "keyword" and text == "not":
+            self.take()
+            operand, operand_kind = self.negation()
+            _check(operand_kind == BOOLEAN, "'not' needs a condition", position)
+            return (lambda columns: np.logical_not(operand(columns))), BOOLEAN
+        return self.comparison()
+
+    def comparison(self):
+        left, kind = self.sum()
+        _, text, position = self.peek()
+        if text not in COMPARISONS:
+            return left, kind
+        self.take()
+        right, right_kind = self.sum()
+        if text in ("==", "!="):
+            _check(kind == right_kind, f"'{text}' compares values of the same type", position)
+        else:
+            _check(kind == right_kind == NUMBER, f"'{text}' compares numbers", position)
+        if self.peek()[1] in COMPARISONS:
+            raise CriteriaError(f"Comparisons cannot be chained, at {self.peek()[2]}; use 'and'")
+        ufunc = COMPARISONS[text]
+        if kind == NUMBER:
+            # NaN != x is true in NumPy; an unknown metric satisfies no comparison
+            def compare(columns):
+                a, b = left(columns), right(columns)
+                return ufunc(a, b) & ~np.isnan(a) & ~np.isnan(b)
+            return compare, BOOLEAN
+        return (lambda columns: ufunc(left(columns), right(columns))), BOOLEAN
+
+    def _arithmetic(self, operand, symbols: str):
+        node, kind = operand()
+        while self.peek()[0] == "symbol" and self.peek()[1] in symbols:
+            _, symbol, position = self.peek()
+            self.take()
+            right, right_kind = operand()
+            _check(kind == right_kind == NUMBER, f"'{symbol}' needs numbers", position)
+            node = (lambda a, b, ufunc: lambda columns: ufunc(a(columns), b(columns)))(node, right, ARITHMETIC[symbol])
+        return node, kind
+
+    def sum(self):
+        return self._arithmetic(self.product, "+-")
+
+    def product(self):
+        return self._arithmetic(self.unary, "*/")
+
+    def unary(self):
+        _, text, position = self.peek()
+        if text == "-":
+            self.take()
+            operand, kind = self.unary()
+            _check(kind == NUMBER, "'-' needs a number", position)
+            return (lambda columns: np.negative(operand(columns))), NUMBER
+        return self.atom()
+
+    def atom(self):
+        kind, text, position = self.peek()
+        if kind == "number":
+            self.take()
+            value = float(text)
+            return (lambda columns: value), NUMBER
+        if kind == "keyword" and text in ("true", "false"):
+            self.take()
+            value = text == "true"
+            return (lambda columns: value), BOOLEAN
+        if kind == "name":
+            if text not in METRICS:
+                raise CriteriaError(f"Unknown metric {text!r} at {position}; use {', '.join(METRICS)}")
+            self.take()
+            return (lambda columns: columns[text]), METRICS[text]
+        if text == "(":
+            self.take()
+            node = self.disjunction()
+            self.expect(")")
+            return node
+        raise CriteriaError(f"Unexpected {text!r} at {position}" if text else "Unexpected end of criteria")
+
+
+def _check(condition: bool, message: str, position: int) -> None:
+    if not condition:
+        raise CriteriaError(f"{message} (at {position})")
+
+
+class Criteria:
+    def __init__(self, text: str, node: Node, metrics: FrozenSet[str]):
+        self.text = text
+        self.metrics = metrics
+        self._node = node
+
+    def evaluate(self, columns: Columns, size: int) -> np.ndarray:
+        """Boolean mask over ``size`` learners; ``columns`` maps metric names to float arrays."""
+        prepared = {}
+        for name in self.metrics:
+            values = columns.get(name)
+            if values is None:
+                values = np.full(size, np.nan)
+            elif METRICS[name] == BOOLEAN:
+                values = np.nan_to_num(values, nan=0.0) != 0
+            prepared[name] = values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mask = self._node(prepared)
+        return np.broadcast_to(np.asarray(mask, dtype=bool), (size,))
+
+
+@lru_cache(maxsize=256)
+def compile_criteria(text: str) -> Criteria:
+    """Parse ``text`` once into a vectorized predicate; raises CriteriaError if it is invalid."""
+    text = text or ""
+    parser = _Parser(text)
+    node, _ = parser.parse()
+    metrics = frozenset(value for kind, value, _ in parser.tokens if kind == "name")
+    return Criteria(text, node, metrics)
@@ -0,0 +1,105 @@
+"""
+Issuing certificates to the learners who meet their criteria.
+
+The caller (the workshop service, once a cohort's results are final)
+sends a workshop's learners as columns: ``user_ids`` and one list of
+values per metric.  Each certificate of the workshop is evaluated over the
+whole cohort with its compiled criteria (see ``criteria.py``).  Learners
+who already hold a certificate are found with chunked lookups on the
+(certificate_id, user_id) primary key, and everyone else eligible is
+issued with one bulk insert.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.cert import Certificate, IssuedCertificate
+from ..schemas.cert import EligibilityIn
+from .criteria import CriteriaError, compile_criteria
+
+LOOKUP_CHUNK = 450  # (certificate_id, user_id) pairs per IN list
+
+
+def _columns(data: EligibilityIn):
+    user_ids = np.asarray(data.user_ids, dtype=np.int64)
+    # A learner sent twice keeps their last row
+    _, last = np.unique(user_ids[::-1], return_index=True)
+    keep = np.sort(len(user_ids) - 1 - last)
+    columns = {name: np.asarray(values, dtype=float)[keep] for name, values in data.metrics.items()}  # None -> NaN
+    return user_ids[keep], columns
+
+
+def _issued(db: Session, eligible: Dict[int, np.ndarray]) -> Dict[int, np.ndarray]:
+    pairs = [(certificate_id, user_id) for certificate_id, user_ids in eligible.items()
+             for user_id in user_ids.tolist()]
+    held: Dict[int, List[int]] = {}
+    for start in range(0, len(pairs), LOOKUP_CHUNK):
+        rows = db.query(IssuedCertificate.certificate_id, IssuedCertificate.user_id).filter(
+            tuple_(IssuedCertificate.certificate_id, IssuedCertificate.user_id).in_(pairs[start:start + LOOKUP_CHUNK])
+        )
+        for certificate_id, user_id in rows:
+            held.setdefault(certificate_id, []).append(user_id)
+    return {certificate_id: np.asarray(user_ids, dtype=np.int64) for certificate_id, user_ids in held.items()}
+
+
+def issue(db: Session, workshop_id: int, data: EligibilityIn, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Issue the workshop's certificates to every eligible learner without one
+    and commit.  Returns a summary per certificate; a certificate whose
+    stored criteria are invalid is reported with ``error`` and skipped.
+    Raises LookupError if the workshop has no certificates, and
+    IntegrityError if another request issued the same certificates first.
+    """
+    query = db.query(Certificate).filter(Certificate.workshop_id == workshop_id)
+    if data.certificate_ids is not None:
+        query = query.filter(Certificate.certificate_id.in_(data.certificate_ids))
+    certificates = query.order_by(Certificate.certificate_id).all()
+    if not certificates:
+        raise LookupError(workshop_id)
+
+    user_ids, columns = _columns(data)
+    summaries, eligible = [], {}
+    for certificate in certificates:
+        summary = {"certificate_id": certificate.certificate_id, "criteria": certificate.criteria or ""}
+        summaries.append(summary)
+        try:
+            criteria = compile_criteria(certificate.criteria or "")
+        except CriteriaError as e:
+            summary["error"] = str(e)
+            continue
+        eligible[certificate.certificate_id] = user_ids[criteria.evaluate(columns, len(user_ids))]
+
+    held = _issued(db, eligible)
+    now = now or datetime.utcnow()
+    rows = []
+    for summary in summaries:
+        if "error" in summary:
+            continue
+        certificate_id = summary["certificate_id"]
+        candidates = eligible[certificate_id]
+        new = candidates[~np.isin(candidates, held.get(certificate_id, ()))].tolist()
+        rows.extend({"certificate_id": certificate_id, "user_id": user_id, "issued_at": now} for user_id in new)
+        summary.update(eligible=len(candidates), already_issued=len(candidates) - len(new), issued=new)
+    try:
+        db.bulk_insert_mappings(IssuedCertificate, rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    return summaries
+
+
+def set_criteria(db: Session, certificate_id: int, text: str) -> Certificate:
+    """Store ``text`` once it compiles; raises CriteriaError or LookupError.  Commits."""
+    compile_criteria(text)
+    certificate = db.query(Certificate).get(certificate_id)
+    if certificate is None:
+        raise LookupError(certificate_id)
+    certificate.criteria = text
+    db.commit()
+    return certificate
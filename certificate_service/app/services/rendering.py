@@ -0,0 +1,287 @@
+"""
+Certificate rendering pipeline.
+
+A render job covers issued certificates of one certificate, with one
+template and format.  Jobs wait in a queue; a dispatcher thread cuts each
+into chunks of ``RENDER_CHUNK`` certificates for a process pool of
+``CERTIFICATE_RENDER_WORKERS`` (default: every core).  A worker compiles a
+template the first time it sees its layout and keeps it, writes the files
+of a chunk to the store and returns their paths; the dispatcher records
+each chunk's ``file_url`` with one batched update.
+
+Backpressure: at most two chunks per worker are in flight, and new jobs
+are refused while ``RENDER_QUEUE_LIMIT`` certificates are waiting.
+
+Files are written atomically to ``CERTIFICATE_STORE_DIR`` as
+``{certificate_id}/{verification_code}.{format}`` and served under
+``CERTIFICATE_FILE_URL``.  The signed code, not the learner's id, names
+the file, so certificates cannot be fetched by counting ids.  Job status is kept in this process for the
+last ``RENDER_JOB_HISTORY`` jobs.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models.cert import Certificate, CertificateTemplate, IssuedCertificate
+from ..schemas.cert import RenderIn, TemplateIn
+from .templates import SAMPLE_FIELDS, CompiledTemplate, compile_template, layout_key
+from .verification import code_for, verify_url
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATE_STORE_DIR = os.getenv("CERTIFICATE_STORE_DIR", "certificate_files")
+CERTIFICATE_FILE_URL = os.getenv("CERTIFICATE_FILE_URL", "/certificates/files")
+CERTIFICATE_RENDER_WORKERS = int(os.getenv("CERTIFICATE_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+RENDER_CHUNK = int(os.getenv("RENDER_CHUNK", "100"))
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "100000"))
+RENDER_JOB_HISTORY = 1000
+MAX_ERRORS = 20
+LOOKUP_CHUNK = 900  # bound parameters per IN list
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class RenderBusy(Exception):
+    """Too many certificates are waiting to be rendered."""
+
+
+_compiled: Dict[str, CompiledTemplate] = {}  # per process, by layout hash
+
+
+def cached_template(format_json: str) -> CompiledTemplate:
+    key = layout_key(format_json)
+    template = _compiled.get(key)
+    if template is None:
+        template = _compiled[key] = compile_template(format_json)
+    return template
+
+
+def write_file(store: str, path: str, data: bytes) -> None:
+    target = os.path.join(store, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f"{target}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, target)
+
+
+def render_chunk(format_json: str, fmt: str, store: str,
+                 records: List[dict]) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    """Render and store ``records`` in a worker; (user_id, path, error) for each."""
+    template = cached_template(format_json)
+    results = []
+    for record in records:
+        path = f"{record['certificate_id']}/{record['code']}.{fmt}"
+        try:
+            write_file(store, path, template.render(fmt, record["fields"]))
+            results.append((record["user_id"], path, None))
+        except Exception as e:
+            results.append((record["user_id"], None, str(e)))
+    return results
+
+
+@dataclass
+class RenderJob:
+    certificate_id: int
+    template_id: int
+    format: str
+    format_json: str
+    records: List[dict]
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    rendered: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def payload(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "certificate_id": self.certificate_id,
+            "template_id": self.template_id,
+            "format": self.format,
+            "status": self.status,
+            "total": len(self.records),
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _issued_on(issued_at: Optional[datetime]) -> str:
+    issued_at = issued_at or datetime.utcnow()
+    return f"{issued_at.day} {issued_at:%B %Y}"
+
+
+def new_job(db: Session, certificate_id: int, data: RenderIn) -> RenderJob:
+    """A job for the issued certificates ``data`` selects; LookupError if the certificate or template is unknown."""
+    certificate = db.query(Certificate).get(certificate_id)
+    template = db.query(CertificateTemplate).get(data.template_id)
+    if certificate is None or template is None:
+        raise LookupError("certificate" if certificate is None else "template")
+    cached_template(template.format_json or "{}")  # raises ValueError for a broken layout
+
+    query = db.query(IssuedCertificate.user_id, IssuedCertificate.issued_at).filter(
+        IssuedCertificate.certificate_id == certificate_id
+    )
+    if not data.rerender:
+        query = query.filter(IssuedCertificate.file_url.is_(None))
+    if data.user_ids is None:
+        rows = query.all()
+    else:
+        user_ids = sorted(set(data.user_ids))
+        rows = [row for start in range(0, len(user_ids), LOOKUP_CHUNK)
+                for row in query.filter(IssuedCertificate.user_id.in_(user_ids[start:start + LOOKUP_CHUNK]))]
+    common = {"certificate": certificate.name or "", "workshop_id": str(certificate.workshop_id or "")}
+    records = []
+    for row in rows:
+        code = code_for(certificate_id, row.user_id)
+        records.append({
+            "certificate_id": certificate_id,
+            "user_id": row.user_id,
+            "code": code,
+            "fields": {**common, "name": data.names.get(row.user_id) or f"Learner {row.user_id}",
+                       "user_id": str(row.user_id), "issued_on": _issued_on(row.issued_at),
+                       "verification_code": code, "verify_url": verify_url(code)},
+        })
+    return RenderJob(certificate_id, data.template_id, data.format, template.format_json or "{}", records)
+
+
+def create_template(db: Session, data: TemplateIn, store: str) -> CertificateTemplate:
+    """Store a layout and write its PNG preview, with sample fields, to ``store``.  Commits."""
+    format_json = data.layout.json()
+    preview = cached_template(format_json).render_png(SAMPLE_FIELDS)
+    template = CertificateTemplate(format_json=format_json)
+    db.add(template)
+    db.flush()
+    path = f"templates/{template.template_id}.png"
+    write_file(store, path, preview)
+    template.preview_path = f"{CERTIFICATE_FILE_URL}/{path}"
+    db.commit()
+    return template
+
+
+class RenderPipeline:
+    def __init__(self, workers: int = CERTIFICATE_RENDER_WORKERS, chunk: int = RENDER_CHUNK,
+                 queue_limit: int = RENDER_QUEUE_LIMIT, store: str = CERTIFICATE_STORE_DIR,
+                 file_url: str = CERTIFICATE_FILE_URL):
+        self.workers = workers
+        self.chunk = chunk
+        self.queue_limit = queue_limit
+        self.store = store
+        self.file_url = file_url
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, RenderJob]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[RenderJob]]" = queue.Queue()
+        self._waiting = 0  # certificates queued or in flight
+        self._session_factory = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def max_in_flight(self) -> int:
+        return 2 * self.workers
+
+    def start(self, session_factory) -> None:
+        self._session_factory = session_factory
+        # Spawned workers do not inherit the server's threads and connections
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._thread = threading.Thread(target=self.run, daemon=True, name="certificate-render")
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def submit(self, job: RenderJob) -> RenderJob:
+        if self._thread is None:
+            raise RuntimeError("The render pipeline is not started")
+        with self._lock:
+            # A job larger than the limit still runs when nothing else waits
+            if self._waiting and self._waiting + len(job.records) > self.queue_limit:
+                raise RenderBusy(self._waiting)
+            self._waiting += len(job.records)
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > RENDER_JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        return self._jobs.get(job_id)
+
+    def run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            except Exception as e:
+                logger.exception("Render job %s failed", job.job_id)
+                job.status = FAILED
+                job.errors.append({"error": str(e)})
+            finally:
+                job.finished_at = datetime.utcnow()
+                with self._lock:
+                    self._waiting -= len(job.records) - job.rendered - job.failed
+
+    def _process(self, job: RenderJob) -> None:
+        job.status, job.started_at = RUNNING, datetime.utcnow()
+        chunks: Dict[Future, List[dict]] = {}
+        with self._session_factory() as db:
+            for start in range(0, len(job.records), self.chunk):
+                if len(chunks) >= self.max_in_flight:
+                    done, _ = wait(chunks, return_when=FIRST_COMPLETED)
+                    self._collect(db, job, {future: chunks.pop(future) for future in done})
+                records = job.records[start:start + self.chunk]
+                chunks[self._pool.submit(render_chunk, job.format_json, job.format, self.store, records)] = records
+            self._collect(db, job, {future: chunks[future] for future in wait(chunks).done})
+        job.status = FAILED if job.failed and not job.rendered else DONE
+
+    def _collect(self, db: Session, job: RenderJob, chunks: Dict[Future, List[dict]]) -> None:
+        rows = []
+        failed = 0
+        for future, records in chunks.items():
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(record["user_id"], None, str(e)) for record in records]
+            for user_id, path, error in results:
+                if path is None:
+                    failed += 1
+                    if len(job.errors) < MAX_ERRORS:
+                        job.errors.append({"user_id": user_id, "error": error})
+                else:
+                    rows.append({"certificate_id": job.certificate_id, "user_id": user_id,
+                                 "file_url": f"{self.file_url}/{path}"})
+        db.bulk_update_mappings(IssuedCertificate, rows)
+        db.commit()
+        job.rendered += len(rows)
+        job.failed += failed
+        with self._lock:
+            self._waiting -= len(rows) + failed
+
+
+renderer = RenderPipeline()
@@ -0,0 +1,265 @@
+"""
+Certificate templates, compiled once and rendered many times.
+
+``compile_template`` parses a template's layout and prepares everything
+that does not depend on the learner:
+
+- PDF: the objects before the page content (catalog, page, standard fonts
+  and the background image as JPEG) as bytes, the cross-reference table,
+  and the page content as static drawing operators interleaved with the
+  text elements that hold ``{field}`` placeholders;
+- PNG: the page drawn at ``png_scale`` with the background and every
+  static element, and the fonts of the placeholder text loaded.
+
+Rendering a certificate then only fills and measures the placeholder text
+and joins bytes, or draws that text on a copy of the base image.
+
+Background images and TrueType fonts are named by file name and read only
+from ``CERTIFICATE_ASSET_DIR``; images over ``CERTIFICATE_MAX_IMAGE_PIXELS``
+are refused before they are decoded.
+"""
+
+import hashlib
+import io
+import os
+from string import Formatter
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ..schemas.cert import TemplateElement, TemplateLayout
+from .fonts import text_width
+
+PNG_COMPRESS_LEVEL = int(os.getenv("CERTIFICATE_PNG_COMPRESS_LEVEL", "3"))
+CERTIFICATE_ASSET_DIR = os.getenv("CERTIFICATE_ASSET_DIR", "certificate_assets")
+MAX_IMAGE_PIXELS = int(os.getenv("CERTIFICATE_MAX_IMAGE_PIXELS", str(6000 * 6000)))
+
+FIELDS = ("name", "certificate", "workshop_id", "user_id", "issued_on", "verification_code", "verify_url")
+SAMPLE_FIELDS = {"name": "Ada Lovelace", "certificate": "Sample Certificate", "workshop_id": "1", "user_id": "1",
+                 "issued_on": "1 January 2026", "verification_code": "AQAAAAEAAAABc2FtcGxlY29k",
+                 "verify_url": "/verify/AQAAAAEAAAABc2FtcGxlY29k"}
+PNG_ANCHORS = {"left": "ls", "center": "ms", "right": "rs"}
+
+Segments = Tuple[Tuple[str, Optional[str]], ...]  # (literal text, field or None)
+
+
+def layout_key(format_json: str) -> str:
+    return hashlib.blake2b(format_json.encode(), digest_size=16).hexdigest()
+
+
+def asset_path(name: str) -> str:
+    """Path of the asset file ``name``; ValueError unless it is a file inside the asset directory."""
+    root = os.path.realpath(CERTIFICATE_ASSET_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    # realpath also resolves symlinks that point out of the directory
+    if os.path.dirname(path) != root or not os.path.isfile(path):
+        raise ValueError(f"Unknown asset {name!r}")
+    return path
+
+
+def _open_image(name: str) -> Image.Image:
+    try:
+        image = Image.open(asset_path(name))
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError(f"Cannot read background image {name!r}")
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        image.close()
+        raise ValueError(f"Background image {name!r} is larger than {MAX_IMAGE_PIXELS} pixels")
+    return image
+
+
+def _segments(text: str) -> Segments:
+    try:
+        parsed = list(Formatter().parse(text))
+    except ValueError as e:
+        raise ValueError(f"Invalid placeholder in {text!r}: {e}")
+    for _, field, _, _ in parsed:
+        if field is not None and field not in FIELDS:
+            raise ValueError(f"Unknown field {{{field}}}; use {', '.join(FIELDS)}")
+    return tuple((literal, field) for literal, field, _, _ in parsed)
+
+
+def _fill(segments: Segments, fields: Dict[str, str]) -> str:
+    return "".join(literal + (fields.get(field, "") if field else "") for literal, field in segments)
+
+
+def _rgb(color: str) -> Tuple[int, int, int]:
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _pdf_color(color: str, operator: str) -> str:
+    return " ".join(_num(c / 255) for c in _rgb(color)) + f" {operator}"
+
+
+def _pdf_string(text: str) -> bytes:
+    data = text.replace("\r", " ").replace("\n", " ").encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class DynamicText:
+    __slots__ = ("element", "segments", "resource", "color")
+
+    def __init__(self, element: TemplateElement, segments: Segments, resource: str):
+        self.element = element
+        self.segments = segments
+        self.resource = resource
+        self.color = _pdf_color(element.color, "rg")
+
+
+class CompiledTemplate:
+    def __init__(self, layout: TemplateLayout):
+        self.layout = layout
+        self._texts = {id(e): _segments(e.text) for e in layout.elements if e.type == "text"}
+        self._png: Optional[Tuple[Image.Image, List[Tuple[TemplateElement, Segments, ImageFont.ImageFont]]]] = None
+        self._font_paths = {font: asset_path(name) for font, name in layout.font_files.items()}
+        self._compile_pdf()
+
+    def _dynamic(self, element: TemplateElement) -> bool:
+        return any(field for _, field in self._texts[id(element)])
+
+    def _text_ops(self, element: TemplateElement, text: str, resource: str, color: str) -> bytes:
+        x = element.x
+        if element.align != "left":
+            width = text_width(element.font, element.size, text)
+            x -= width / 2 if element.align == "center" else width
+        y = self.layout.height - element.y
+        return (f"BT /{resource} {_num(element.size)} Tf {color} {_num(x)} {_num(y)} Td ".encode()
+                + _pdf_string(text) + b" Tj ET\n")
+
+    def _compile_pdf(self) -> None:
+        layout = self.layout
+        fonts = sorted({e.font for e in layout.elements if e.type == "text"})
+        resources = {font: f"F{n}" for n, font in enumerate(fonts, start=1)}
+        # 1 catalog, 2 pages, 3 page, 4 content (written last, per certificate), then fonts and the image
+        objects: Dict[int, bytes] = {
+            1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            2: b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        }
+        font_refs = []
+        for n, font in enumerate(fonts, start=5):
+            objects[n] = f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>".encode()
+            font_refs.append(f"/{resources[font]} {n} 0 R")
+        image_ref = ""
+        ops: List[Union[bytes, DynamicText]] = [
+            f"{_pdf_color(layout.background, 'rg')} 0 0 {_num(layout.width)} {_num(layout.height)} re f\n".encode()
+        ]
+        if layout.background_image:
+            with _open_image(layout.background_image) as image:
+                image = image.convert("RGB")
+                jpeg = io.BytesIO()
+                image.save(jpeg, format="JPEG", quality=90)
+            number = 5 + len(fonts)
+            objects[number] = (
+                f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} /ColorSpace /DeviceRGB "
+                f"/BitsPerComponent 8 /Filter /DCTDecode /Length {jpeg.tell()} >>\nstream\n".encode()
+                + jpeg.getvalue() + b"\nendstream"
+            )
+            image_ref = f" /XObject << /Im1 {number} 0 R >>"
+            ops.append(f"q {_num(layout.width)} 0 0 {_num(layout.height)} 0 0 cm /Im1 Do Q\n".encode())
+        objects[3] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(layout.width)} {_num(layout.height)}] "
+            f"/Resources << /Font << {' '.join(font_refs)} >>{image_ref} >> /Contents 4 0 R >>"
+        ).encode()
+
+        for element in layout.elements:
+            if element.type == "rect":
+                y = layout.height - element.y - element.height
+                box = f"{_num(element.x)} {_num(y)} {_num(element.width)} {_num(element.height)} re"
+                if element.fill:
+                    ops.append(f"{_pdf_color(element.fill, 'rg')} {box} f\n".encode())
+                if element.stroke:
+                    ops.append(f"{_pdf_color(element.color, 'RG')} {_num(element.stroke)} w {box} S\n".encode())
+            elif self._dynamic(element):
+                ops.append(DynamicText(element, self._texts[id(element)], resources[element.font]))
+            else:
+                text = _fill(self._texts[id(element)], {})
+                ops.append(self._text_ops(element, text, resources[element.font], _pdf_color(element.color, "rg")))
+
+        # Merge runs of static operators
+        self._pdf_ops: List[Union[bytes, DynamicText]] = []
+        for op in ops:
+            if isinstance(op, bytes) and self._pdf_ops and isinstance(self._pdf_ops[-1], bytes):
+                self._pdf_ops[-1] += op
+            else:
+                self._pdf_ops.append(op)
+
+        head = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = len(head)
+            head += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+        offsets[4] = len(head)
+        size = max(offsets) + 1
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        xref += [b"%010d 00000 n \n" % offsets[number] for number in range(1, size)]
+        xref.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n" % size)
+        self._pdf_head = bytes(head)
+        self._pdf_xref = b"".join(xref)
+
+    def render_pdf(self, fields: Dict[str, str]) -> bytes:
+        parts = [
+            op if isinstance(op, bytes) else
+            self._text_ops(op.element, _fill(op.segments, fields), op.resource, op.color)
+            for op in self._pdf_ops
+        ]
+        content = b"".join(parts)
+        body = b"4 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n" % (len(content), content)
+        return b"".join([self._pdf_head, body, self._pdf_xref, b"%d\n%%%%EOF\n" % (len(self._pdf_head) + len(body))])
+
+    def _font(self, element: TemplateElement) -> ImageFont.ImageFont:
+        size = element.size * self.layout.png_scale
+        path = self._font_paths.get(element.font)
+        if path is None:
+            return ImageFont.load_default(size)
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            raise ValueError(f"Cannot read font file {self.layout.font_files[element.font]!r}")
+
+    def _compile_png(self):
+        layout, scale = self.layout, self.layout.png_scale
+        base = Image.new("RGB", (round(layout.width * scale), round(layout.height * scale)), _rgb(layout.background))
+        if layout.background_image:
+            with _open_image(layout.background_image) as image:
+                base.paste(image.convert("RGB").resize(base.size))
+        draw = ImageDraw.Draw(base)
+        dynamic = []
+        for element in layout.elements:
+            if element.type == "rect":
+                box = [element.x * scale, element.y * scale,
+                       (element.x + element.width) * scale, (element.y + element.height) * scale]
+                draw.rectangle(box, fill=_rgb(element.fill) if element.fill else None,
+                               outline=_rgb(element.color) if element.stroke else None,
+                               width=max(round(element.stroke * scale), 1 if element.stroke else 0))
+            elif self._dynamic(element):
+                dynamic.append((element, self._texts[id(element)], self._font(element)))
+            else:
+                draw.text((element.x * scale, element.y * scale), _fill(self._texts[id(element)], {}),
+                          fill=_rgb(element.color), font=self._font(element), anchor=PNG_ANCHORS[element.align])
+        return base, dynamic
+
+    def render_png(self, fields: Dict[str, str]) -> bytes:
+        if self._png is None:
+            self._png = self._compile_png()
+        base, dynamic = self._png
+        image = base.copy()
+        draw = ImageDraw.Draw(image)
+        scale = self.layout.png_scale
+        for element, segments, font in dynamic:
+            draw.text((element.x * scale, element.y * scale), _fill(segments, fields), fill=_rgb(element.color),
+                      font=font, anchor=PNG_ANCHORS[element.align])
+        out = io.BytesIO()
+        image.save(out, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+        return out.getvalue()
+
+    def render(self, fmt: str, fields: Dict[str, str]) -> bytes:
+        return self.render_pdf(fields) if fmt == "pdf" else self.render_png(fields)
+
+
+def compile_template(format_json: str) -> CompiledTemplate:
+    """Parse and compile a stored layout; raises ValueError if it is invalid."""
+    return CompiledTemplate(TemplateLayout.parse_raw(format_json))
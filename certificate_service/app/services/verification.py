@@ -0,0 +1,213 @@
+"""
+Public verification of issued certificates.
+
+An issued certificate's verification code is derived from its key, so it
+needs no storage: a version byte, ``certificate_id`` and ``user_id`` (four
+bytes each) and the first nine bytes of their HMAC-SHA256 under
+``CERTIFICATE_SIGNING_KEY``, base64url encoded into 24 characters.
+
+``Verifier.verify`` avoids the database whenever it can:
+
+- a code that is malformed or whose signature does not match is refused
+  after a local HMAC check;
+- summaries of verified certificates are kept as encoded JSON in an LRU
+  of ``VERIFY_CACHE_SIZE`` entries for ``VERIFY_CACHE_TTL`` seconds;
+- refused codes, and correctly signed codes for certificates that are not
+  issued, are kept in a separate LRU of ``VERIFY_NEGATIVE_CACHE_SIZE`` for
+  ``VERIFY_NEGATIVE_TTL`` seconds, so a flood of junk cannot evict real
+  entries.
+
+Concurrent misses for the same code share one query.  A certificate issued
+or re-rendered in the meantime is seen once its entry expires.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from ..models.cert import Certificate, IssuedCertificate
+
+CERTIFICATE_SIGNING_KEY = os.getenv("CERTIFICATE_SIGNING_KEY", "change_this_secret")
+CERTIFICATE_VERIFY_URL = os.getenv("CERTIFICATE_VERIFY_URL", "/verify")
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "100000"))
+VERIFY_CACHE_TTL = float(os.getenv("VERIFY_CACHE_TTL", "300"))
+VERIFY_NEGATIVE_CACHE_SIZE = int(os.getenv("VERIFY_NEGATIVE_CACHE_SIZE", "100000"))
+VERIFY_NEGATIVE_TTL = float(os.getenv("VERIFY_NEGATIVE_TTL", "60"))
+
+VERSION = 1
+KEY = struct.Struct(">BII")
+SIGNATURE_BYTES = 9
+CODE_LENGTH = 24  # (9 + 9) bytes of base64
+
+
+def _signature(key: bytes, message: bytes) -> bytes:
+    return hmac.new(key, message, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def code_for(certificate_id: int, user_id: int, key: str = CERTIFICATE_SIGNING_KEY) -> str:
+    try:
+        message = KEY.pack(VERSION, certificate_id, user_id)
+    except struct.error:
+        raise ValueError(f"Cannot encode certificate {certificate_id} for user {user_id}")
+    return base64.urlsafe_b64encode(message + _signature(key.encode(), message)).decode()
+
+
+def verify_url(code: str) -> str:
+    return f"{CERTIFICATE_VERIFY_URL}/{code}"
+
+
+def decode(code: str, key: str = CERTIFICATE_SIGNING_KEY) -> Optional[Tuple[int, int]]:
+    """(certificate_id, user_id) if ``code`` is well formed and correctly signed, else None."""
+    if len(code) != CODE_LENGTH:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(code)
+    except ValueError:
+        return None
+    if base64.urlsafe_b64encode(raw).decode() != code:  # also one code per certificate
+        return None
+    message, signature = raw[:KEY.size], raw[KEY.size:]
+    if raw[0] != VERSION or not hmac.compare_digest(signature, _signature(key.encode(), message)):
+        return None
+    _, certificate_id, user_id = KEY.unpack(message)
+    return certificate_id, user_id
+
+
+class _Lru:
+    """Entries expire ``ttl`` seconds after they are stored; not thread safe."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[bytes]]]" = OrderedDict()
+
+    def get(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, value: Optional[bytes], now: float) -> None:
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Verifier:
+    def __init__(self, session_factory=None, key: str = CERTIFICATE_SIGNING_KEY,
+                 size: int = VERIFY_CACHE_SIZE, ttl: float = VERIFY_CACHE_TTL,
+                 negative_size: int = VERIFY_NEGATIVE_CACHE_SIZE, negative_ttl: float = VERIFY_NEGATIVE_TTL,
+                 clock=time.monotonic):
+        self._session_factory = session_factory
+        self.key = key
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._valid = _Lru(size, ttl)
+        self._invalid = _Lru(negative_size, negative_ttl)
+        self._flights: Dict[str, threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from ..database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def cached(self, code: str) -> Tuple[bool, Optional[bytes]]:
+        """(found, body) from the caches alone; body is None for a code known to be invalid."""
+        now = self._clock()
+        with self._lock:
+            entry = self._valid.get(code, now) or self._invalid.get(code, now)
+            if entry is not None:
+                self.hits += 1
+                return True, entry[1]
+        return False, None
+
+    def verify(self, code: str) -> Optional[bytes]:
+        """JSON summary of the certificate ``code`` was issued for, or None if it is not valid."""
+        found, body = self.cached(code)
+        if found:
+            return body
+        key = decode(code, self.key)
+        if key is None:
+            with self._lock:
+                self.misses += 1
+                self._invalid.put(code, None, self._clock())
+            return None
+        while True:
+            with self._lock:
+                entry = self._valid.get(code, self._clock()) or self._invalid.get(code, self._clock())
+                if entry is not None:
+                    self.hits += 1
+                    return entry[1]
+                flight = self._flights.get(code)
+                if flight is None:
+                    flight = self._flights[code] = threading.Event()
+                    self.misses += 1
+                    break
+            flight.wait()  # another request is loading this code; read its result from the cache
+        try:
+            body = self._load(code, *key)
+        finally:
+            with self._lock:
+                del self._flights[code]
+            flight.set()
+        return body
+
+    def _load(self, code: str, certificate_id: int, user_id: int) -> Optional[bytes]:
+        with self._lock:
+            self.queries += 1
+        with self.session_factory() as db:
+            row = (
+                db.query(IssuedCertificate.issued_at, IssuedCertificate.file_url, Certificate.name,
+                         Certificate.workshop_id)
+                .join(Certificate, Certificate.certificate_id == IssuedCertificate.certificate_id)
+                .filter(IssuedCertificate.certificate_id == certificate_id, IssuedCertificate.user_id == user_id)
+                .first()
+            )
+        body = None
+        if row is not None:
+            body = json.dumps(jsonable_encoder({
+                "valid": True,
+                "code": code,
+                "certificate_id": certificate_id,
+                "certificate": row.name,
+                "workshop_id": row.workshop_id,
+                "user_id": user_id,
+                "issued_at": row.issued_at,
+                "file_url": row.file_url,
+            })).encode()
+        with self._lock:
+            (self._invalid if body is None else self._valid).put(code, body, self._clock())
+        return body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valid.clear()
+            self._invalid.clear()
+
+
+verifier = Verifier()
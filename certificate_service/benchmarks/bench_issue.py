@@ -0,0 +1,95 @@
+"""
+Issuing the certificates of a workshop with ``--learners`` learners
+(default 100000) and three certificates, a ``--held`` share of whom
+already hold the first one.
+
+Reports the time to compile and evaluate the criteria over the cohort, and
+the end-to-end time of ``eligibility.issue`` including the issued-lookup
+and the bulk insert.
+
+    python certificate_service/benchmarks/bench_issue.py --learners 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+CRITERIA = {
+    1: "completion >= 0.9 and final_score >= 70",
+    2: "passed and final_score >= 90",
+    3: "completion == 1 and (final_score >= 60 or average_score >= 75)",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=100000)
+    parser.add_argument("--held", type=float, default=0.3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    import numpy as np
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from certificate_service.app.database import Base
+    from certificate_service.app.models.cert import Certificate, IssuedCertificate
+    from certificate_service.app.schemas.cert import EligibilityIn
+    from certificate_service.app.services import eligibility
+    from certificate_service.app.services.criteria import compile_criteria
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    rng = np.random.default_rng(7)
+    n = args.learners
+    user_ids = np.arange(1, n + 1)
+    completion = np.round(np.where(rng.random(n) < 0.4, 1.0, rng.random(n)), 2)
+    final_score = rng.integers(0, 101, n).astype(float)
+    final_score[rng.random(n) < 0.05] = np.nan
+    data = EligibilityIn.construct(user_ids=user_ids.tolist(), certificate_ids=None, metrics={
+        "completion": completion.tolist(),
+        "final_score": [None if np.isnan(s) else s for s in final_score.tolist()],
+        "average_score": rng.integers(40, 101, n).astype(float).tolist(),
+        "passed": (final_score >= 50).astype(float).tolist(),
+    })
+
+    with SessionLocal() as db:
+        db.add_all([Certificate(certificate_id=c, workshop_id=1, name=f"Certificate {c}", criteria=text)
+                    for c, text in CRITERIA.items()])
+        held = rng.choice(user_ids, int(n * args.held), replace=False)
+        db.bulk_insert_mappings(IssuedCertificate, [{"certificate_id": 1, "user_id": int(u)} for u in held])
+        db.commit()
+
+    clock = time.perf_counter()
+    compiled = [compile_criteria.__wrapped__(text) for text in CRITERIA.values()]
+    print(f"compiled {len(compiled)} criteria in {(time.perf_counter() - clock) * 1000:.2f} ms")
+    columns = {name: np.asarray(values, dtype=float) for name, values in data.metrics.items()}
+    clock = time.perf_counter()
+    eligible = [int(criteria.evaluate(columns, n).sum()) for criteria in compiled]
+    elapsed = time.perf_counter() - clock
+    print(f"evaluated {n} learners x {len(compiled)} certificates in {elapsed * 1000:.2f} ms "
+          f"({n * len(compiled) / elapsed / 1e6:.1f}M checks/s), eligible {eligible}")
+
+    with SessionLocal() as db:
+        clock = time.perf_counter()
+        summaries = eligibility.issue(db, 1, data)
+        elapsed = time.perf_counter() - clock
+    issued = sum(len(summary["issued"]) for summary in summaries)
+    skipped = sum(summary["already_issued"] for summary in summaries)
+    print(f"issue: {issued} issued, {skipped} already held, in {elapsed:.2f}s")
+    with SessionLocal() as db:
+        clock = time.perf_counter()
+        eligibility.issue(db, 1, data)
+        print(f"issue again (nothing new): {time.perf_counter() - clock:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
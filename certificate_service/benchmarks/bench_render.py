@@ -0,0 +1,92 @@
+"""
+Rendering ``--certificates`` issued certificates (default 10000) through
+the render pipeline with ``--workers`` processes (default: every core), as
+when a cohort finishes.
+
+Reports the time to compile the template, the single-process rendering
+rate, and the pipeline's end-to-end throughput including writing the
+files and recording ``file_url``.
+
+    python certificate_service/benchmarks/bench_render.py --certificates 10000 --format pdf
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+LAYOUT = {
+    "elements": [
+        {"type": "rect", "x": 20, "y": 20, "width": 802, "height": 555, "stroke": 4, "color": "#1f3a5f"},
+        {"text": "Certificate of Completion", "x": 421, "y": 150, "font": "Helvetica-Bold", "size": 36, "align": "center"},
+        {"text": "awarded to", "x": 421, "y": 220, "size": 16, "align": "center"},
+        {"text": "{name}", "x": 421, "y": 290, "font": "Times-Bold", "size": 40, "align": "center", "color": "#1f3a5f"},
+        {"text": "for completing {certificate} on {issued_on}", "x": 421, "y": 350, "size": 14, "align": "center"},
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--certificates", type=int, default=10000)
+    parser.add_argument("--format", choices=["pdf", "png"], default="pdf")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from certificate_service.app.database import Base
+    from certificate_service.app.models.cert import Certificate, IssuedCertificate
+    from certificate_service.app.schemas.cert import RenderIn, TemplateIn
+    from certificate_service.app.services import rendering
+    from certificate_service.app.services.templates import SAMPLE_FIELDS, compile_template
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    store = os.path.join(workdir, "files")
+
+    clock = time.perf_counter()
+    template = compile_template(json.dumps(LAYOUT))
+    print(f"template compiled in {(time.perf_counter() - clock) * 1000:.1f} ms")
+    samples = 2000 if args.format == "pdf" else 50
+    clock = time.perf_counter()
+    for _ in range(samples):
+        template.render(args.format, SAMPLE_FIELDS)
+    print(f"single process: {samples / (time.perf_counter() - clock):.0f} {args.format}/s")
+
+    with SessionLocal() as db:
+        template_id = rendering.create_template(db, TemplateIn(layout=LAYOUT), store).template_id
+        db.add(Certificate(certificate_id=1, workshop_id=1, name="Data Engineering"))
+        db.bulk_insert_mappings(IssuedCertificate, [{"certificate_id": 1, "user_id": u}
+                                                    for u in range(1, args.certificates + 1)])
+        db.commit()
+        job = rendering.new_job(db, 1, RenderIn(template_id=template_id, format=args.format))
+
+    pipeline = rendering.RenderPipeline(workers=args.workers, store=store, queue_limit=args.certificates)
+    pipeline.start(SessionLocal)
+    # Warm the worker processes so the run measures rendering, not interpreter start-up
+    for future in [pipeline._pool.submit(rendering.cached_template, json.dumps(LAYOUT)) for _ in range(args.workers)]:
+        future.result()
+    clock = time.perf_counter()
+    pipeline.submit(job)
+    while job.status in ("queued", "running") or job.finished_at is None:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - clock
+    pipeline.stop()
+    print(f"{args.workers} workers: {job.rendered} {args.format} rendered and recorded in {elapsed:.2f}s "
+          f"({job.rendered / elapsed:.0f}/s), {job.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Sustained load on ``/verify/{code}``, as link crawlers and employers
+checking shared certificates produce it.
+
+``--certificates`` issued certificates (default 10000) are requested with
+a Zipf-like skew; ``--forged`` of the requests (default 20%) carry codes
+with a bad signature and ``--unissued`` (default 5%) correctly signed codes
+for certificates that do not exist.
+
+The verifier is first driven in-process, reporting verifications per
+second and how many reached the database.  Then the service runs under
+uvicorn and ``--clients`` threads with keep-alive connections send
+requests for ``--duration`` seconds, reporting requests per second and
+latency percentiles.
+
+    python certificate_service/benchmarks/bench_verify.py --duration 10 --clients 16
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+
+def workload(args, code_for, size: int):
+    import numpy as np
+
+    rng = np.random.default_rng(11)
+    ranks = np.minimum(rng.zipf(1.2, size), args.certificates) - 1
+    kind = rng.random(size)
+    codes = []
+    for rank, draw in zip(ranks.tolist(), kind.tolist()):
+        if draw < args.forged:
+            codes.append(rng.bytes(18).hex()[:24])
+        elif draw < args.forged + args.unissued:
+            codes.append(code_for(1, args.certificates + 1 + int(rng.integers(1_000_000))))
+        else:
+            codes.append(code_for(1, rank + 1))
+    return codes
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--certificates", type=int, default=10000)
+    parser.add_argument("--forged", type=float, default=0.2)
+    parser.add_argument("--unissued", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=200000, help="in-process verifications")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of HTTP load")
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    import httpx
+    import numpy as np
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from certificate_service.app.database import Base
+    from certificate_service.app.models.cert import Certificate, IssuedCertificate
+    from certificate_service.app.services.verification import Verifier, code_for
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(Certificate(certificate_id=1, workshop_id=1, name="Data Engineering"))
+        db.bulk_insert_mappings(IssuedCertificate, [
+            {"certificate_id": 1, "user_id": u, "file_url": f"/certificates/files/1/{u}.pdf"}
+            for u in range(1, args.certificates + 1)
+        ])
+        db.commit()
+
+    codes = workload(args, code_for, args.requests)
+    verifier = Verifier(SessionLocal)
+    for run in ("cold", "warm"):
+        queries = verifier.queries
+        clock = time.perf_counter()
+        valid = sum(verifier.verify(code) is not None for code in codes)
+        elapsed = time.perf_counter() - clock
+        print(f"in-process, {run} cache: {len(codes)} verifications in {elapsed:.2f}s ({len(codes) / elapsed:.0f}/s), "
+              f"{valid} valid, {verifier.queries - queries} database queries")
+
+    port = free_port()
+    env = {**os.environ, "CERTIFICATE_RENDER_WORKERS": "1", "PYTHONPATH": str(ROOT)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "certificate_service.main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=str(ROOT), env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                httpx.get(f"{base}/certificates/ping")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def client(offset: int):
+            mine, counts = [], {}
+            with httpx.Client(base_url=base) as http:
+                i = offset
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    status = http.get(f"/verify/{codes[i % len(codes)]}").status_code
+                    mine.append(time.perf_counter() - start)
+                    counts[status] = counts.get(status, 0) + 1
+                    i += args.clients
+            with lock:
+                latencies.extend(mine)
+                for status, count in counts.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+        clock = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - clock
+    finally:
+        server.terminate()
+        server.wait()
+    p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99])
+    print(f"http ({args.clients} clients, {os.cpu_count()} cores shared with the server): "
+          f"{len(latencies)} requests in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"p50 {p50:.2f} ms, p99 {p99:.2f} ms, statuses {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
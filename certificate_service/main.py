@@ -1,11 +1,29 @@
 from fastapi import FastAPI
-from .app.database import Base, engine
+from fastapi.staticfiles import StaticFiles
+from .app.database import Base, SessionLocal, engine
 from .app.routes.base import router as cert_router
+from .app.routes.verify import router as verify_router
+from .app.services.rendering import CERTIFICATE_FILE_URL, CERTIFICATE_STORE_DIR, renderer
 
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Certificate Service")
 app.include_router(cert_router)
+app.include_router(verify_router)
+if CERTIFICATE_FILE_URL.startswith("/"):
+    app.mount(CERTIFICATE_FILE_URL, StaticFiles(directory=CERTIFICATE_STORE_DIR, check_dir=False), name="files")
+
+
+@app.on_event("startup")
+def start_renderer():
+    # Starts the render worker processes and the dispatcher thread
+    renderer.start(SessionLocal)
+
+
+@app.on_event("shutdown")
+def stop_renderer():
+    renderer.stop()
+
 
 @app.get("/ping-db")
 def ping_db():
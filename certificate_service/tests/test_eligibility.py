@@ -0,0 +1,103 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from certificate_service.app.database import Base, get_db
+from certificate_service.app.models.cert import Certificate, IssuedCertificate
+from certificate_service.app.services.criteria import CriteriaError, compile_criteria
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    from certificate_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'issue.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal
+    app.dependency_overrides.clear()
+
+
+def test_criteria_compile_to_vectorized_predicates():
+    columns = {"completion": np.array([0.95, 0.5, np.nan, 1.0]), "final_score": np.array([80, 90, 99, np.nan]),
+               "passed": np.array([1, 0, np.nan, 1.0])}
+    cases = {
+        "completion >= 0.9 and final_score >= 70": [True, False, False, False],
+        "passed or (completion == 1 and final_score >= 50)": [True, False, False, True],
+        "not passed and final_score / 2 + 10 > 50": [False, True, True, False],
+        "-final_score < -85 or false": [False, True, True, False],
+        "": [True] * 4,
+    }
+    for text, expected in cases.items():
+        assert compile_criteria(text).evaluate(columns, 4).tolist() == expected, text
+    assert compile_criteria("completion>.9 and passed").metrics == {"completion", "passed"}
+    # Unknown values fail every comparison, != included
+    assert compile_criteria("final_score != 0").evaluate({"final_score": np.array([np.nan, 0, 50])}, 3).tolist() \
+        == [False, False, True]
+    assert compile_criteria("final_score - 1 != completion").evaluate(columns, 4).tolist() == [True, True, False, False]
+    # Metrics nobody sent are missing for everyone
+    assert compile_criteria("average_score >= 0").evaluate(columns, 4).tolist() == [False] * 4
+
+    for broken in ("completion >=", "grade > 1", "passed > 1", "1 < final_score < 3", "final_score",
+                   "(passed", "passed and 3", "completion $ 2", "1 2"):
+        with pytest.raises(CriteriaError):
+            compile_criteria(broken)
+
+
+def test_issue_skips_learners_already_issued(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        db.add_all([Certificate(certificate_id=1, workshop_id=7, name="Completion"),
+                    Certificate(certificate_id=2, workshop_id=7, name="Distinction"),
+                    Certificate(certificate_id=3, workshop_id=7, name="Broken", criteria="score >"),
+                    Certificate(certificate_id=4, workshop_id=8, name="Other workshop")])
+        db.add(IssuedCertificate(certificate_id=1, user_id=2, issued_at=datetime(2026, 1, 1)))
+        db.commit()
+
+    assert client.put("/certificates/1/criteria", json={"criteria": "completion >= 0.9 and passed"}).json()["metrics"] \
+        == ["completion", "passed"]
+    assert client.put("/certificates/2/criteria", json={"criteria": "final_score >= 90"}).status_code == 200
+    assert client.put("/certificates/2/criteria", json={"criteria": "final_score >"}).status_code == 400
+    assert client.put("/certificates/9/criteria", json={"criteria": ""}).status_code == 404
+
+    cohort = {
+        "user_ids": [1, 2, 3, 4, 5, 1],
+        "metrics": {"completion": [0.5, 1, 0.95, 0.9, None, 1], "final_score": [99, 80, 95, 60, 100, 91],
+                    "passed": [True, True, True, False, True, True]},
+    }
+    response = client.post("/certificates/workshops/7/issue", json=cohort)
+    assert response.status_code == 200 and response.json()["learners"] == 5
+    first, second, broken = response.json()["certificates"]
+    # User 1's last row counts; user 2 already held certificate 1
+    assert (first["eligible"], first["already_issued"], sorted(first["issued"])) == (3, 1, [1, 3])
+    assert sorted(second["issued"]) == [1, 3, 5]
+    assert "error" in broken and "issued" not in broken
+
+    again = client.post("/certificates/workshops/7/issue", json=cohort).json()["certificates"]
+    assert [c.get("issued") for c in again] == [[], [], None]
+    with SessionLocal() as db:
+        issued = {(row.certificate_id, row.user_id) for row in db.query(IssuedCertificate)}
+    assert issued == {(1, 1), (1, 2), (1, 3), (2, 1), (2, 3), (2, 5)}
+
+    only = client.post("/certificates/workshops/7/issue", json={**cohort, "certificate_ids": [1]}).json()
+    assert [c["certificate_id"] for c in only["certificates"]] == [1]
+    assert client.post("/certificates/workshops/99/issue", json=cohort).status_code == 404
+    assert client.post("/certificates/workshops/7/issue",
+                       json={"user_ids": [1, 2], "metrics": {"completion": [1]}}).status_code == 422
+    assert client.post("/certificates/workshops/7/issue",
+                       json={"user_ids": [1], "metrics": {"grade": [1]}}).status_code == 422
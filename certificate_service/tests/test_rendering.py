@@ -0,0 +1,159 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import io
+import json
+import re
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from certificate_service.app.database import Base, get_db
+from certificate_service.app.models.cert import Certificate, IssuedCertificate
+from certificate_service.app.services import rendering
+from certificate_service.app.services.fonts import text_width
+from certificate_service.app.services.rendering import RenderJob, RenderPipeline
+from certificate_service.app.services.templates import SAMPLE_FIELDS, compile_template
+from certificate_service.app.services.verification import code_for
+
+LAYOUT = {
+    "width": 400, "height": 300, "png_scale": 1,
+    "elements": [
+        {"type": "rect", "x": 10, "y": 10, "width": 380, "height": 280, "stroke": 2, "color": "#203040"},
+        {"text": "Certificate (of) Completion", "x": 200, "y": 60, "font": "Helvetica-Bold", "size": 20, "align": "center"},
+        {"text": "{name}", "x": 200, "y": 150, "font": "Times-Bold", "size": 24, "align": "center"},
+        {"text": "{certificate} - {issued_on}", "x": 390, "y": 280, "size": 10, "align": "right"},
+    ],
+}
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    from certificate_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'render.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    store = tmp_path / "files"
+    pipeline = RenderPipeline(workers=2, chunk=3, queue_limit=20, store=str(store))
+    pipeline.start(TestingSessionLocal)
+    monkeypatch.setattr("certificate_service.app.routes.base.renderer", pipeline)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, pipeline, store
+    app.dependency_overrides.clear()
+    pipeline.stop()
+
+
+def test_compiled_pdf_is_well_formed():
+    template = compile_template(json.dumps(LAYOUT))
+    pdf = template.render_pdf({**SAMPLE_FIELDS, "name": "Zoë O'Brien (2nd)"})
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[startxref:].startswith(b"xref\n0 8\n")
+    offsets = [int(line[:10]) for line in pdf[startxref:].split(b"\n")[3:10]]
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[offset:].startswith(b"%d 0 obj" % number)
+    stream = re.search(rb"4 0 obj\n<< /Length (\d+) >>\nstream\n", pdf)
+    assert pdf[stream.end() + int(stream.group(1)):].startswith(b"\nendstream")
+    assert b"(Zo\xeb O'Brien \\(2nd\\))" in pdf and b"(Certificate \\(of\\) Completion)" in pdf
+    # Centred on x = 200
+    x = float(re.search(rb"/F3 24 Tf 0 0 0 rg ([\d.]+) ", pdf).group(1))
+    assert x == pytest.approx(200 - text_width("Times-Bold", 24, "Zo\xeb O'Brien (2nd)") / 2, abs=0.01)
+
+
+def test_png_and_invalid_layouts():
+    template = compile_template(json.dumps(LAYOUT))
+    image = Image.open(io.BytesIO(template.render_png(SAMPLE_FIELDS)))
+    assert image.size == (400, 300) and image.getpixel((10, 150)) == (32, 48, 64)
+    assert template.render_png(SAMPLE_FIELDS) == template.render_png(SAMPLE_FIELDS)
+    for broken in ({"elements": [{"text": "{grade}"}]}, {"elements": [{"font": "Comic Sans"}]},
+                   {"background": "blue"}, {"background_image": "/nonexistent.png"}):
+        with pytest.raises(ValueError):
+            compile_template(json.dumps(broken))
+
+
+def test_assets_only_come_from_the_asset_directory(tmp_path, monkeypatch):
+    from certificate_service.app.services import templates
+
+    assets, outside = tmp_path / "assets", tmp_path / "secret.png"
+    assets.mkdir()
+    Image.new("RGB", (40, 30), (200, 10, 10)).save(assets / "paper.png")
+    Image.new("RGB", (40, 30)).save(outside)
+    Image.new("RGB", (200, 200)).save(assets / "huge.png")
+    (assets / "link.png").symlink_to(outside)
+    monkeypatch.setattr(templates, "CERTIFICATE_ASSET_DIR", str(assets))
+    monkeypatch.setattr(templates, "MAX_IMAGE_PIXELS", 100 * 100)
+
+    template = compile_template(json.dumps({**LAYOUT, "background_image": "paper.png"}))
+    assert b"/Subtype /Image" in template.render_pdf(SAMPLE_FIELDS)
+    assert Image.open(io.BytesIO(template.render_png(SAMPLE_FIELDS))).getpixel((100, 100)) == (200, 10, 10)
+    for name in (str(outside), "../secret.png", "link.png", "missing.png", "huge.png", "", ".."):
+        with pytest.raises(ValueError) as error:
+            compile_template(json.dumps({**LAYOUT, "background_image": name}))
+        assert "Errno" not in str(error.value)
+    with pytest.raises(ValueError):
+        compile_template(json.dumps({**LAYOUT, "font_files": {"Helvetica": "/etc/fonts/x.ttf"}}))
+
+
+def test_render_job_writes_files_and_urls(client_with_db):
+    client, SessionLocal, pipeline, store = client_with_db
+    created = client.post("/certificates/templates", json={"layout": LAYOUT})
+    assert created.status_code == 201
+    template_id = created.json()["template_id"]
+    assert (store / "templates" / f"{template_id}.png").exists()
+    assert client.post("/certificates/templates",
+                       json={"layout": {**LAYOUT, "background_image": "/etc/passwd"}}).status_code == 422
+    missing = client.post("/certificates/templates", json={"layout": {**LAYOUT, "background_image": "nope.png"}})
+    assert missing.status_code == 400 and missing.json()["detail"] == "Unknown asset 'nope.png'"
+    with SessionLocal() as db:
+        db.add(Certificate(certificate_id=1, workshop_id=4, name="Data Science"))
+        db.add_all([IssuedCertificate(certificate_id=1, user_id=u, issued_at=datetime(2026, 3, 5)) for u in range(1, 11)])
+        db.add(IssuedCertificate(certificate_id=1, user_id=11, file_url="/elsewhere.pdf"))
+        db.commit()
+
+    job = client.post("/certificates/1/render", json={"template_id": template_id, "names": {"3": "Grace Hopper"}})
+    assert job.status_code == 202 and job.json()["total"] == 10
+    job_id = job.json()["job_id"]
+    for _ in range(200):
+        status = client.get(f"/certificates/render-jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert (status["status"], status["rendered"], status["failed"]) == ("done", 10, 0)
+
+    with SessionLocal() as db:
+        urls = {row.user_id: row.file_url for row in db.query(IssuedCertificate)}
+    code = code_for(1, 3)
+    assert urls[3] == f"/certificates/files/1/{code}.pdf" and urls[11] == "/elsewhere.pdf"
+    assert not (store / "1" / "3.pdf").exists()
+    pdf = (store / "1" / f"{code}.pdf").read_bytes()
+    assert b"(Grace Hopper)" in pdf and b"(Data Science - 5 March 2026)" in pdf
+    assert len(list((store / "1").glob("*.pdf"))) == 10
+
+    # Nothing left without a file; unknown ids
+    assert client.post("/certificates/1/render", json={"template_id": template_id}).json()["total"] == 0
+    assert client.post("/certificates/2/render", json={"template_id": template_id}).status_code == 404
+    assert client.post("/certificates/1/render", json={"template_id": 99}).status_code == 404
+    assert client.get("/certificates/render-jobs/nope").status_code == 404
+
+
+def test_backpressure_refuses_jobs_over_the_limit(client_with_db):
+    _, _, pipeline, _ = client_with_db
+    records = [{"certificate_id": 1, "user_id": u, "code": code_for(1, u), "fields": SAMPLE_FIELDS} for u in range(15)]
+    with pipeline._lock:
+        pipeline._waiting = 10  # as if a job were still in flight
+    with pytest.raises(rendering.RenderBusy):
+        pipeline.submit(RenderJob(1, 1, "pdf", json.dumps(LAYOUT), records))
+    assert pipeline.max_in_flight == 4
@@ -0,0 +1,118 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import base64
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from certificate_service.app.database import Base, get_db
+from certificate_service.app.models.cert import Certificate, IssuedCertificate
+from certificate_service.app.services.verification import Verifier, code_for, decode
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    from certificate_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'verify.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as db:
+        db.add(Certificate(certificate_id=3, workshop_id=9, name="Data Science"))
+        db.add(IssuedCertificate(certificate_id=3, user_id=42, issued_at=datetime(2026, 3, 5),
+                                 file_url="/certificates/files/3/42.pdf"))
+        db.commit()
+    clock = Clock()
+    verifier = Verifier(TestingSessionLocal, negative_ttl=60, ttl=300, clock=clock)
+    monkeypatch.setattr("certificate_service.app.routes.verify.verifier", verifier)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, verifier, clock
+    app.dependency_overrides.clear()
+
+
+def test_codes_are_compact_and_tamper_evident():
+    code = code_for(3, 42)
+    assert len(code) == 24 and decode(code) == (3, 42)
+    assert decode(code, key="another key") is None
+    raw = bytearray(base64.urlsafe_b64decode(code))
+    raw[4] ^= 1  # another certificate id with the old signature
+    assert decode(base64.urlsafe_b64encode(bytes(raw)).decode()) is None
+    for junk in ("", "x" * 24, "!" * 24, code[:-1], code + "A", code.replace(code[0], "+")):
+        assert decode(junk) is None
+    with pytest.raises(ValueError):
+        code_for(-1, 1)
+
+
+def test_verify_serves_from_cache_and_caches_invalid_codes(client_with_db):
+    client, SessionLocal, verifier, clock = client_with_db
+    issued = client.get("/certificates/3/users/42/verification").json()
+    assert issued["verify_url"] == f"/verify/{issued['code']}"
+    assert client.get("/certificates/3/users/41/verification").status_code == 404
+
+    for _ in range(5):
+        response = client.get(issued["verify_url"])
+        assert response.status_code == 200
+    assert response.json() == {"valid": True, "code": issued["code"], "certificate_id": 3,
+                               "certificate": "Data Science", "workshop_id": 9, "user_id": 42,
+                               "issued_at": "2026-03-05T00:00:00", "file_url": "/certificates/files/3/42.pdf"}
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert verifier.queries == 1
+
+    # Forged codes never reach the database; signed codes for unissued certificates do, once
+    unissued = code_for(3, 43)
+    for code in ("forged" * 4, unissued, "forged" * 4, unissued):
+        response = client.get(f"/verify/{code}")
+        assert response.status_code == 404 and response.headers["cache-control"] == "public, max-age=60"
+    assert verifier.queries == 2
+
+    with SessionLocal() as db:
+        db.add(IssuedCertificate(certificate_id=3, user_id=43))
+        db.commit()
+    assert client.get(f"/verify/{unissued}").status_code == 404
+    clock.now += 61
+    assert client.get(f"/verify/{unissued}").status_code == 200
+    assert verifier.queries == 3
+
+
+def test_concurrent_misses_share_one_query(client_with_db):
+    _, SessionLocal, verifier, _ = client_with_db
+    entered, release = threading.Event(), threading.Event()
+    factory = verifier.session_factory
+
+    def slow_factory():
+        entered.set()
+        release.wait()
+        return factory()
+
+    verifier._session_factory = slow_factory
+    code = code_for(3, 42)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(verifier.verify(code))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    entered.wait()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8 and len(set(results)) == 1 and results[0] is not None
+    assert verifier.queries == 1
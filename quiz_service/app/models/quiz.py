@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, JSON
+from sqlalchemy import DDL, Column, Integer, String, ForeignKey, DateTime, Boolean, JSON, Index, Float, BigInteger, LargeBinary, event
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -23,17 +23,59 @@ class Option(Base):
     label = Column(String)
     is_correct = Column(Boolean)
 
+class QuestionSignature(Base):
+    __tablename__ = 'question_signatures'
+    question_id = Column(Integer, ForeignKey('questions.question_id'), primary_key=True)
+    minhash = Column(LargeBinary, nullable=False)  # little-endian uint32 MinHash values
+
+class QuestionBucket(Base):
+    # One row per LSH band of each question's signature
+    __tablename__ = 'question_lsh_buckets'
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.question_id'), primary_key=True)
+
 class StudentQuizAttempt(Base):
     __tablename__ = 'student_quiz_attempts'
     attempt_id = Column(Integer, primary_key=True)
     user_id = Column(Integer)
     quiz_id = Column(Integer)
     started_at = Column(DateTime(timezone=False), server_default=func.now())
+    deadline = Column(DateTime(timezone=False))
+    status = Column(String(16), nullable=False, default='open')  # open, submitted, expired
+    answers = Column(JSON)  # {question_id: [option_id, ...]}, checkpointed while open
+    submitted_at = Column(DateTime(timezone=False))
+    score = Column(Float)  # points, with partial credit
+    total = Column(Integer)
+
+    __table_args__ = (
+        Index('ix_student_quiz_attempts_status', 'status'),
+        Index('ix_student_quiz_attempts_quiz_submitted', 'quiz_id', 'submitted_at'),
+    )
+
+# At most one open attempt per learner and quiz, where partial indexes exist
+event.listen(StudentQuizAttempt.__table__, 'after_create', DDL(
+    "CREATE UNIQUE INDEX uq_student_quiz_attempts_open ON student_quiz_attempts (user_id, quiz_id) "
+    "WHERE status = 'open'"
+).execute_if(dialect=('postgresql', 'sqlite')))
 
 class QuizResult(Base):
     __tablename__ = 'quiz_results'
     quiz_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, primary_key=True)
-    score = Column(Integer)
+    score = Column(Integer)  # percentage of the latest attempt
     pass_fail = Column(Boolean)
     result_json = Column(JSON)
+
+class QuestionReview(Base):
+    # A learner's spaced-repetition schedule for a question, from the first time they got it wrong
+    __tablename__ = 'question_reviews'
+    user_id = Column(Integer, primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, nullable=False)
+    repetitions = Column(Integer, nullable=False, default=0)  # passed in a row
+    interval_days = Column(Float, nullable=False, default=0)
+    ease = Column(Float, nullable=False, default=2.5)
+    lapses = Column(Integer, nullable=False, default=0)
+    last_quality = Column(Integer)  # 0-5
+    reviewed_at = Column(DateTime(timezone=False), nullable=False)
+    due_at = Column(DateTime(timezone=False), nullable=False)
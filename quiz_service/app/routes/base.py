@@ -1,7 +1,139 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import get_db
+from ..models.quiz import Quiz
+from ..schemas.quiz import AnswersIn, QuizIn
+from ..services import grading, quizzes
+from ..services.attempts import AttemptClosed, manager
+from ..services.item_analysis import analysis
+from ..services.leaderboard import leaderboards
+from ..services.question_bank import bank, deliver
+from ..services.question_import import Importer
+from ..services.reviews import queues as review_queues
 
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
 
 @router.get("/ping")
 def ping():
     return {"status": "quiz service up"}
+
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+def create_quiz(data: QuizIn, db: Session = Depends(get_db)):
+    quiz = quizzes.create_quiz(db, data)
+    return {"quiz_id": quiz.quiz_id}
+
+
+@router.put("/{quiz_id}")
+def replace_quiz(quiz_id: int, data: QuizIn, db: Session = Depends(get_db)):
+    try:
+        quiz = quizzes.replace_quiz(db, quiz_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if quiz is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+    return {"quiz_id": quiz_id}
+
+
+@router.get("/{quiz_id}/delivery")
+def deliver_quiz(quiz_id: int, user_id: int, attempt: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    # The session only connects if the quiz is not cached yet
+    quiz = bank.get(db, quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+    return Response(content=deliver(quiz, user_id, attempt), media_type="application/json")
+
+
+@router.post("/{quiz_id}/questions/import")
+async def import_questions(quiz_id: int, request: Request, fmt: Optional[str] = Query(None, alias="format"),
+                           db: Session = Depends(get_db)):
+    """Stream a CSV, JSON Lines or JSON question bank into a quiz; the format defaults from Content-Type."""
+    if await run_in_threadpool(db.query(Quiz).get, quiz_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+    content_type = request.headers.get("content-type", "")
+    fmt = fmt or ("csv" if "csv" in content_type else "jsonl" if "ndjson" in content_type or "jsonl" in content_type
+                     else "json")
+    try:
+        importer = Importer(db, quiz_id, fmt)
+        # Parsing and each chunk's inserts run off the event loop
+        async for data in request.stream():
+            await run_in_threadpool(importer.feed, data)
+        return await run_in_threadpool(importer.finish)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/{quiz_id}/item-analysis")
+def item_analysis(quiz_id: int, db: Session = Depends(get_db)):
+    report = analysis.get(db, quiz_id)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+    return report
+
+
+@router.get("/{quiz_id}/leaderboard")
+def leaderboard(quiz_id: int, limit: int = Query(10, ge=1, le=1000)):
+    return leaderboards.top(quiz_id, limit)
+
+
+@router.get("/{quiz_id}/leaderboard/users/{user_id}")
+def leaderboard_standing(quiz_id: int, user_id: int):
+    standing = leaderboards.standing(quiz_id, user_id)
+    if standing is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No result for this learner")
+    return standing
+
+
+@router.get("/{quiz_id}/leaderboard/users/{user_id}/around")
+def leaderboard_around(quiz_id: int, user_id: int, size: int = Query(5, ge=0, le=100)):
+    standing = leaderboards.around(quiz_id, user_id, size)
+    if standing is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No result for this learner")
+    return standing
+
+
+@router.get("/reviews/{user_id}/due")
+def due_reviews(user_id: int, limit: int = Query(20, ge=1, le=200), db: Session = Depends(get_db)):
+    # The session only connects if the learner's schedule is not loaded yet
+    return review_queues.due(db, user_id, limit)
+
+
+@router.post("/reviews/{user_id}/answers")
+def answer_reviews(user_id: int, data: AnswersIn, db: Session = Depends(get_db)):
+    return {"user_id": user_id, "reviewed": grading.grade_reviews(db, user_id, data.answers)}
+
+
+def _attempt_call(fn, *args):
+    try:
+        return fn(*args)
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attempt not found")
+    except AttemptClosed:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Attempt is closed")
+
+
+@router.post("/{quiz_id}/attempts", status_code=status.HTTP_201_CREATED)
+def start_attempt(quiz_id: int, user_id: int, db: Session = Depends(get_db)):
+    try:
+        return manager.start(db, quiz_id, user_id).payload()
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+
+@router.get("/attempts/{attempt_id}")
+def get_attempt(attempt_id: int, db: Session = Depends(get_db)):
+    return _attempt_call(manager.get, db, attempt_id).payload()
+
+
+@router.put("/attempts/{attempt_id}/answers")
+def save_answers(attempt_id: int, data: AnswersIn, db: Session = Depends(get_db)):
+    return _attempt_call(manager.save_answers, db, attempt_id, data.answers).payload()
+
+
+@router.post("/attempts/{attempt_id}/submit")
+def submit_attempt(attempt_id: int, data: AnswersIn = None, db: Session = Depends(get_db)):
+    return _attempt_call(manager.submit, db, attempt_id, data.answers if data else None)
@@ -0,0 +1,27 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, conlist
+
+
+class OptionIn(BaseModel):
+    option_id: Optional[int] = None  # an existing option to keep, when replacing a quiz
+    label: str
+    is_correct: bool = False
+
+
+class QuestionIn(BaseModel):
+    question_id: Optional[int] = None  # an existing question to keep, when replacing a quiz
+    content: str
+    type: str = "single"
+    options: conlist(OptionIn, min_items=1)
+
+
+class QuizIn(BaseModel):
+    title: str
+    linked_to: Optional[str] = None
+    duration: Optional[int] = None  # minutes
+    questions: List[QuestionIn] = []
+
+
+class AnswersIn(BaseModel):
+    answers: Dict[int, List[int]] = {}  # question_id -> selected option_ids
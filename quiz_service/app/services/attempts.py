@@ -0,0 +1,339 @@
+"""
+Timed quiz attempts.
+
+Open attempts live in memory: their answers in a dict and their deadlines
+in a hashed timing wheel, so saving an answer costs no query and finding
+expired attempts does not scan the table.  A background loop
+
+- advances the wheel every ``ATTEMPT_TICK_SECONDS`` and auto-submits the
+  attempts whose time is up, graded and written in bulk by ``grading``;
+- every ``ATTEMPT_CHECKPOINT_SECONDS`` writes the answers changed since
+  the last checkpoint in one batched update.
+
+Untimed quizzes get a deadline of ``UNTIMED_ATTEMPT_HOURS``.  Answers are
+accepted, and attempts are auto-submitted, ``ATTEMPT_GRACE_SECONDS``
+after the deadline to absorb network latency.
+
+On startup ``recover`` rebuilds the wheel from the open attempt rows;
+attempts that ran out while the service was down are auto-submitted on
+the first tick with their last checkpointed answers.  An attempt opened by
+another process is adopted on first use, including by ``start``, which
+looks for an open row before inserting one; a partial unique index on
+open attempts (PostgreSQL and SQLite) settles concurrent starts.
+
+Several processes may hold the same attempt, so submitting first claims
+it: ``UPDATE ... SET status WHERE status = 'open'``, in the grading
+transaction.  Only the claimed attempts are graded; a process that did not
+change an attempt's answers itself grades the answers last checkpointed.
+Checkpoints only write attempts that are still open.  If grading fails,
+the attempts go back on the wheel and are retried on a later tick.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.quiz import StudentQuizAttempt
+from . import grading
+from .question_bank import bank
+from .timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+ATTEMPT_TICK_SECONDS = float(os.getenv("ATTEMPT_TICK_SECONDS", "1"))
+ATTEMPT_CHECKPOINT_SECONDS = float(os.getenv("ATTEMPT_CHECKPOINT_SECONDS", "5"))
+ATTEMPT_GRACE_SECONDS = float(os.getenv("ATTEMPT_GRACE_SECONDS", "5"))
+UNTIMED_ATTEMPT_HOURS = float(os.getenv("UNTIMED_ATTEMPT_HOURS", "24"))
+CLAIM_CHUNK = 500  # attempt ids per claiming UPDATE
+
+EPOCH = datetime(1970, 1, 1)
+OPEN, SUBMITTED, EXPIRED = "open", "submitted", "expired"
+
+Answers = Dict[int, List[int]]
+
+
+class AttemptClosed(Exception):
+    """The attempt was already submitted or its time is up."""
+
+
+def _seconds(ts: datetime) -> float:
+    return (ts - EPOCH).total_seconds()
+
+
+@dataclass
+class OpenAttempt:
+    attempt_id: int
+    user_id: int
+    quiz_id: int
+    started_at: datetime
+    deadline: datetime
+    answers: Answers = field(default_factory=dict)
+    dirty: bool = False
+    touched: bool = False  # answers were saved through this process
+
+    @property
+    def closes_at(self) -> datetime:
+        return self.deadline + timedelta(seconds=ATTEMPT_GRACE_SECONDS)
+
+    def payload(self) -> dict:
+        return {
+            "attempt_id": self.attempt_id,
+            "quiz_id": self.quiz_id,
+            "user_id": self.user_id,
+            "status": OPEN,
+            "started_at": self.started_at,
+            "deadline": self.deadline,
+            "answers": self.answers,
+        }
+
+
+def _stored(answers: Answers) -> dict:
+    return {str(question_id): options for question_id, options in answers.items()}
+
+
+def _loaded(answers: Optional[dict]) -> Answers:
+    return {int(question_id): list(options) for question_id, options in (answers or {}).items()}
+
+
+def _update_returning(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return getattr(dialect, "update_returning", getattr(dialect, "full_returning", False))
+
+
+def claim(db: Session, attempts: List[OpenAttempt], status: str) -> List[OpenAttempt]:
+    """
+    Mark the attempts that are still open as ``status`` and return them,
+    untouched ones with their checkpointed answers.  Part of the caller's
+    transaction; the rows stay locked until it ends.
+    """
+    table = StudentQuizAttempt.__table__
+    ids = [attempt.attempt_id for attempt in attempts]
+    update = table.update().where(table.c.status == OPEN).values(status=status)
+    stored: Dict[int, Optional[dict]] = {}
+    if _update_returning(db):
+        for start in range(0, len(ids), CLAIM_CHUNK):
+            chunk = update.where(table.c.attempt_id.in_(ids[start:start + CLAIM_CHUNK]))
+            stored.update(db.execute(chunk.returning(table.c.attempt_id, table.c.answers)).all())
+    else:
+        claimed = [i for i in ids if db.execute(update.where(table.c.attempt_id == i)).rowcount]
+        for start in range(0, len(claimed), CLAIM_CHUNK):
+            stored.update(db.execute(select(table.c.attempt_id, table.c.answers).where(
+                table.c.attempt_id.in_(claimed[start:start + CLAIM_CHUNK]))).all())
+    result = []
+    for attempt in attempts:
+        if attempt.attempt_id in stored:
+            if not attempt.touched:
+                attempt.answers = _loaded(stored[attempt.attempt_id])
+            result.append(attempt)
+    return result
+
+
+class AttemptManager:
+    def __init__(self, tick: float = ATTEMPT_TICK_SECONDS):
+        self._lock = threading.Lock()
+        self._open: Dict[int, OpenAttempt] = {}
+        self._by_learner: Dict[Tuple[int, int], int] = {}
+        self._wheel = TimingWheel(_seconds(datetime.utcnow()), tick)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def _register(self, attempt: OpenAttempt) -> OpenAttempt:
+        with self._lock:
+            self._open[attempt.attempt_id] = attempt
+            self._by_learner[(attempt.user_id, attempt.quiz_id)] = attempt.attempt_id
+            self._wheel.add(attempt.attempt_id, _seconds(attempt.closes_at))
+        return attempt
+
+    def _release(self, attempt_ids: Iterable[int]) -> List[OpenAttempt]:
+        released = []
+        with self._lock:
+            for attempt_id in attempt_ids:
+                attempt = self._open.pop(attempt_id, None)
+                if attempt is None:
+                    continue
+                self._wheel.remove(attempt_id)
+                self._by_learner.pop((attempt.user_id, attempt.quiz_id), None)
+                released.append(attempt)
+        return released
+
+    @staticmethod
+    def _from_row(row: StudentQuizAttempt) -> OpenAttempt:
+        return OpenAttempt(row.attempt_id, row.user_id, row.quiz_id, row.started_at, row.deadline, _loaded(row.answers))
+
+    def get(self, db: Session, attempt_id: int) -> OpenAttempt:
+        """The open attempt; raises LookupError if unknown and AttemptClosed if no longer open."""
+        attempt = self._open.get(attempt_id)
+        if attempt is not None:
+            return attempt
+        row = db.query(StudentQuizAttempt).get(attempt_id)
+        if row is None:
+            raise LookupError(attempt_id)
+        if row.status != OPEN:
+            raise AttemptClosed(attempt_id)
+        return self._register(self._from_row(row))
+
+    def _open_row(self, db: Session, quiz_id: int, user_id: int) -> Optional[StudentQuizAttempt]:
+        return (
+            db.query(StudentQuizAttempt)
+            .filter(StudentQuizAttempt.user_id == user_id, StudentQuizAttempt.quiz_id == quiz_id,
+                    StudentQuizAttempt.status == OPEN)
+            .order_by(StudentQuizAttempt.attempt_id)
+            .first()
+        )
+
+    def start(self, db: Session, quiz_id: int, user_id: int) -> OpenAttempt:
+        """
+        Open an attempt, or return the learner's attempt that is still open,
+        whichever process opened it.  An open attempt whose time ran out is
+        auto-submitted first.
+        """
+        existing = self._by_learner.get((user_id, quiz_id))
+        if existing is not None and existing in self._open:
+            return self._open[existing]
+        quiz = bank.get(db, quiz_id)
+        if quiz is None:
+            raise LookupError(quiz_id)
+        row = self._open_row(db, quiz_id, user_id)
+        if row is not None:
+            attempt = self._register(self._from_row(row))
+            if datetime.utcnow() <= attempt.closes_at:
+                return attempt
+            released = self._release([attempt.attempt_id])
+            if released:
+                self._grade(db, released, EXPIRED)
+        now = datetime.utcnow()
+        limit = timedelta(minutes=quiz.duration) if quiz.duration else timedelta(hours=UNTIMED_ATTEMPT_HOURS)
+        row = StudentQuizAttempt(user_id=user_id, quiz_id=quiz_id, started_at=now, deadline=now + limit,
+                                 status=OPEN, answers={})
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process opened one first (the partial unique index on open attempts)
+            db.rollback()
+            row = self._open_row(db, quiz_id, user_id)
+            if row is None:
+                raise
+        return self._register(self._from_row(row))
+
+    def save_answers(self, db: Session, attempt_id: int, answers: Answers) -> OpenAttempt:
+        attempt = self.get(db, attempt_id)
+        if datetime.utcnow() > attempt.closes_at:
+            raise AttemptClosed(attempt_id)
+        with self._lock:
+            attempt.answers.update(answers)
+            attempt.dirty = attempt.touched = True
+        return attempt
+
+    def submit(self, db: Session, attempt_id: int, answers: Optional[Answers] = None) -> dict:
+        attempt = self.get(db, attempt_id)
+        late = datetime.utcnow() > attempt.closes_at
+        if answers and not late:
+            self.save_answers(db, attempt_id, answers)
+        released = self._release([attempt_id])
+        if not released:
+            # Auto-submitted between get() and now
+            raise AttemptClosed(attempt_id)
+        results = self._grade(db, released, EXPIRED if late else SUBMITTED)
+        if not results:
+            # Submitted by another process
+            raise AttemptClosed(attempt_id)
+        return results[0]
+
+    def expire(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Auto-submit every attempt whose time is up; return how many."""
+        with self._lock:
+            due = self._wheel.advance(_seconds(now or datetime.utcnow()))
+        attempts = self._release(due)
+        if not attempts:
+            return 0
+        graded = len(self._grade(db, attempts, EXPIRED))
+        logger.info("Auto-submitted %d expired attempts", graded)
+        return graded
+
+    def _grade(self, db: Session, attempts: List[OpenAttempt], status: str) -> List[dict]:
+        """Claim and grade released attempts; on failure they are put back on the wheel."""
+        try:
+            claimed = claim(db, attempts, status)
+            results = grading.grade(db, claimed, status) if claimed else []
+            db.commit()
+        except Exception:
+            db.rollback()
+            for attempt in attempts:
+                self._register(attempt)
+            raise
+        return results
+
+    def checkpoint(self, db: Session) -> int:
+        """Write the answers changed since the last checkpoint; return how many attempts."""
+        with self._lock:
+            dirty = [a for a in self._open.values() if a.dirty]
+            rows = [{"attempt_id": a.attempt_id, "answers": _stored(a.answers)} for a in dirty]
+            for attempt in dirty:
+                attempt.dirty = False
+        if rows:
+            table = StudentQuizAttempt.__table__
+            # A submit that committed since the snapshot keeps its final answers
+            update = (
+                table.update()
+                .where(table.c.attempt_id == bindparam("b_attempt_id"), table.c.status == OPEN)
+                .values(answers=bindparam("b_answers"))
+            )
+            try:
+                db.execute(update, [{"b_attempt_id": r["attempt_id"], "b_answers": r["answers"]} for r in rows])
+                db.commit()
+            except Exception:
+                with self._lock:
+                    for attempt in dirty:
+                        attempt.dirty = True
+                raise
+        return len(rows)
+
+    def recover(self, db: Session) -> int:
+        """Rebuild the open attempts and the wheel from the database."""
+        rows = db.query(StudentQuizAttempt).filter(StudentQuizAttempt.status == OPEN).all()
+        for row in rows:
+            self._register(self._from_row(row))
+        return len(rows)
+
+    def run(self, session_factory, stop: threading.Event) -> None:
+        checkpoint_every = max(1, round(ATTEMPT_CHECKPOINT_SECONDS / self._wheel.tick))
+        ticks = 0
+        while not stop.wait(self._wheel.tick):
+            ticks += 1
+            try:
+                with session_factory() as db:
+                    self.expire(db)
+                    if ticks % checkpoint_every == 0:
+                        self.checkpoint(db)
+            except Exception:
+                logger.exception("Attempt tick failed")
+
+    def start_background(self, session_factory) -> None:
+        with session_factory() as db:
+            recovered = self.recover(db)
+        logger.info("Recovered %d open attempts", recovered)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(session_factory, self._stop), daemon=True,
+                                        name="quiz-attempts")
+        self._thread.start()
+
+    def stop_background(self, session_factory) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with session_factory() as db:
+            self.checkpoint(db)
+
+
+manager = AttemptManager()
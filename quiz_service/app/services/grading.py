@@ -0,0 +1,170 @@
+"""
+Batch grading.
+
+A batch of attempts at one quiz becomes an attempts x options selection
+matrix.  Multiplying it by the quiz's answer key (options x questions,
+one matrix for correct and one for wrong options) gives, per attempt and
+question, how many correct and wrong options were selected, from which
+every question is scored at once:
+
+- ``single`` (and any other type) questions score 1 when exactly the
+  correct options are selected, else 0;
+- ``multiple`` questions give partial credit: correct selections minus
+  wrong ones over the number of correct options, floored at 0.
+
+``grade`` scores attempts of any quizzes, then writes the attempts with
+one batched update and the learners' ``QuizResult`` rows with one bulk
+upsert, records the results on the quiz leaderboards and reschedules the
+questions' spaced-repetition reviews.  ``grade_reviews`` scores answers to
+due review questions.
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.quiz import QuizResult, StudentQuizAttempt
+from . import reviews
+from .leaderboard import leaderboards
+from .question_bank import LoadedQuiz, bank
+from .upsert import upsert
+
+QUIZ_PASS_PERCENTAGE = float(os.getenv("QUIZ_PASS_PERCENTAGE", "70"))
+PARTIAL_CREDIT_TYPES = frozenset({"multiple"})
+
+Answers = Dict[int, List[int]]
+
+
+def answer_matrix(quiz: LoadedQuiz, answers: Sequence[Answers]) -> np.ndarray:
+    """
+    attempts x options matrix of selections.  Options that are not in the
+    quiz, or that were given for another question, are ignored.
+    """
+    counts = np.fromiter((len(options) for a in answers for options in a.values()), dtype=np.int64)
+    per_attempt = np.fromiter((len(a) for a in answers), dtype=np.int64, count=len(answers))
+    rows = np.repeat(np.repeat(np.arange(len(answers)), per_attempt), counts)
+    questions = np.repeat(np.fromiter((q for a in answers for q in a), dtype=np.int64, count=len(counts)), counts)
+    selected = np.fromiter((o for a in answers for options in a.values() for o in options), dtype=np.int64,
+                           count=int(counts.sum()))
+    order = np.argsort(quiz.option_ids)
+    columns = order[np.minimum(np.searchsorted(quiz.option_ids, selected, sorter=order), len(order) - 1)]
+    known = (quiz.option_ids[columns] == selected) & (quiz.question_ids[quiz.option_question[columns]] == questions)
+    matrix = np.zeros((len(answers), len(quiz.option_ids)), dtype=np.float32)
+    matrix[rows[known], columns[known]] = 1
+    return matrix
+
+
+def score(quiz: LoadedQuiz, matrix: np.ndarray) -> np.ndarray:
+    """attempts x questions credit, each between 0 and 1."""
+    key = np.zeros((len(quiz.option_ids), quiz.size), dtype=np.float32)
+    key[np.arange(len(quiz.option_ids)), quiz.option_question] = 1
+    right = matrix @ (key * quiz.correct[:, None])
+    wrong = matrix @ (key * ~quiz.correct[:, None])
+    expected = np.bincount(quiz.option_question[quiz.correct], minlength=quiz.size).astype(np.float32)
+    exact = (right == expected) & (wrong == 0)
+    partial = np.clip((right - wrong) / np.maximum(expected, 1), 0, 1)
+    partial_credit = np.fromiter((t in PARTIAL_CREDIT_TYPES for t in quiz.question_types), dtype=bool,
+                                 count=quiz.size)
+    return np.where(partial_credit, partial, exact.astype(np.float32))
+
+
+def grade(db: Session, attempts: Sequence, status: str) -> List[dict]:
+    """
+    Grade ``attempts`` (with ``attempt_id``, ``user_id``, ``quiz_id`` and
+    ``answers``), mark them ``status`` and record each learner's latest
+    result.  Returns one result per attempt, in order.  Commits.
+    """
+    now = datetime.utcnow()
+    by_quiz = defaultdict(list)
+    for i, attempt in enumerate(attempts):
+        by_quiz[attempt.quiz_id].append(i)
+    payloads: List[dict] = [{} for _ in attempts]
+    review_rows: List[dict] = []
+    for quiz_id, indexes in by_quiz.items():
+        quiz = bank.get(db, quiz_id)
+        if quiz is None or quiz.size == 0:
+            credit = np.zeros((len(indexes), 0), dtype=np.float32)
+        else:
+            credit = score(quiz, answer_matrix(quiz, [attempts[i].answers for i in indexes]))
+            review_rows += reviews.record(db, quiz_id, [attempts[i].user_id for i in indexes], quiz.question_ids,
+                                          credit, now)
+        points = credit.sum(axis=1)
+        correct = (credit == 1).sum(axis=1)
+        total = credit.shape[1]
+        percentage = points / total * 100 if total else np.zeros(len(indexes))
+        for n, i in enumerate(indexes):
+            payloads[i] = {
+                "attempt_id": attempts[i].attempt_id,
+                "status": status,
+                "correct": int(correct[n]),
+                "points": round(float(points[n]), 4),
+                "total": total,
+                "percentage": round(float(percentage[n]), 2),
+                "passed": bool(percentage[n] >= QUIZ_PASS_PERCENTAGE),
+            }
+
+    db.bulk_update_mappings(StudentQuizAttempt, [
+        {
+            "attempt_id": attempt.attempt_id,
+            "status": status,
+            "answers": {str(q): options for q, options in attempt.answers.items()},
+            "submitted_at": now,
+            "score": payload["points"],
+            "total": payload["total"],
+        }
+        for attempt, payload in zip(attempts, payloads)
+    ])
+    # The latest attempt in the batch is the learner's result
+    results = {
+        (attempt.quiz_id, attempt.user_id): {
+            "quiz_id": attempt.quiz_id,
+            "user_id": attempt.user_id,
+            "score": round(payload["percentage"]),
+            "pass_fail": payload["passed"],
+            "result_json": payload,
+        }
+        for attempt, payload in zip(attempts, payloads)
+    }
+    upsert(db, QuizResult, list(results.values()), ["quiz_id", "user_id"], lambda table, excluded: {
+        "score": excluded.score,
+        "pass_fail": excluded.pass_fail,
+        "result_json": excluded.result_json,
+    })
+    db.commit()
+    leaderboards.record((r["quiz_id"], r["user_id"], r["score"]) for r in results.values())
+    reviews.queues.apply(review_rows)
+    return payloads
+
+
+def grade_reviews(db: Session, user_id: int, answers: Answers, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Score the learner's answers to questions on their review schedule and
+    reschedule them; other questions are ignored.  Commits.
+    """
+    now = now or datetime.utcnow()
+    by_quiz: Dict[int, List[int]] = defaultdict(list)
+    for question_id, quiz_id in reviews.queues.quizzes(db, user_id, answers).items():
+        by_quiz[quiz_id].append(question_id)
+    rows: List[dict] = []
+    for quiz_id, question_ids in by_quiz.items():
+        quiz = bank.get(db, quiz_id)
+        if quiz is None:
+            continue
+        columns = np.searchsorted(quiz.question_ids, question_ids)
+        present = columns < quiz.size
+        present[present] = quiz.question_ids[columns[present]] == np.array(question_ids)[present]
+        if not present.any():
+            continue
+        credit = score(quiz, answer_matrix(quiz, [{q: answers[q] for q in question_ids}]))[:, columns[present]]
+        rows += reviews.record(db, quiz_id, [user_id], quiz.question_ids[columns[present]], credit, now)
+    db.commit()
+    reviews.queues.apply(rows)
+    return [
+        {"question_id": row["question_id"], "quality": row["last_quality"], "due_at": row["due_at"],
+         "interval_days": row["interval_days"]}
+        for row in rows
+    ]
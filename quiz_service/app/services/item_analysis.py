@@ -0,0 +1,188 @@
+"""
+Classical item analysis of a quiz's graded attempts.
+
+Per question:
+
+- difficulty: the mean credit (the item's p-value; higher is easier);
+- discrimination: mean credit in the top 27% of attempts by total score
+  minus that in the bottom 27%;
+- point-biserial: correlation of the item's credit with the total score;
+- per option, the share of attempts selecting it overall and in the top
+  and bottom groups.  A distractor chosen more by the top group than the
+  bottom one is likely misleading.
+
+Attempts are re-scored against the current answer key with the grading
+engine, then folded into sufficient statistics: running sums for the
+correlation, and per-question and per-option sums over 101 bins of the
+total score percentage for the groups (attempts tied in the boundary bin
+are split pro rata).  Each request reads only the attempts graded since
+the last one; a changed answer key rebuilds the quiz from scratch.
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.quiz import StudentQuizAttempt
+from .grading import answer_matrix, score
+from .question_bank import LoadedQuiz, bank
+
+# Attempts graded this long before the newest one seen are re-read, so an
+# attempt committed late by another process is not missed
+ITEM_ANALYSIS_SETTLE_SECONDS = float(os.getenv("ITEM_ANALYSIS_SETTLE_SECONDS", "60"))
+
+BINS = 101
+GROUP_FRACTION = 0.27
+TOO_EASY, TOO_HARD, LOW_DISCRIMINATION = 0.9, 0.2, 0.2
+
+
+def _signature(quiz: LoadedQuiz) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (quiz.question_ids, quiz.option_ids, quiz.correct):
+        digest.update(part.tobytes())
+    digest.update(repr(quiz.question_types).encode())
+    return digest.digest()
+
+
+def _group_weights(counts: np.ndarray, size: float) -> np.ndarray:
+    """Share of each bin's attempts among the first ``size`` attempts, taking bins in order."""
+    before = np.cumsum(counts) - counts
+    taken = np.clip(size - before, 0, counts)
+    return np.divide(taken, counts, out=np.zeros_like(taken), where=counts > 0)
+
+
+def _round(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+class ItemStats:
+    def __init__(self, quiz: LoadedQuiz):
+        self.signature = _signature(quiz)
+        self.count = 0
+        self.score_bins = np.zeros(BINS)
+        self.credit_bins = np.zeros((quiz.size, BINS))
+        self.option_bins = np.zeros((len(quiz.option_ids), BINS))
+        self.total_sum = 0.0
+        self.total_squares = 0.0
+        self.credit_squares = np.zeros(quiz.size)
+        self.credit_total = np.zeros(quiz.size)
+        self.watermark: Optional[datetime] = None
+        self.recent: Dict[int, datetime] = {}  # attempts graded within the settle window of the watermark
+
+    def add(self, quiz: LoadedQuiz, answers: List[Dict[int, List[int]]]) -> None:
+        selected = answer_matrix(quiz, answers)
+        credit = score(quiz, selected).astype(np.float64)
+        totals = credit.sum(axis=1)
+        bins = np.floor(totals / quiz.size * 100).astype(np.int64)
+        onehot = np.zeros((len(answers), BINS))
+        onehot[np.arange(len(answers)), bins] = 1
+        self.count += len(answers)
+        self.score_bins += onehot.sum(axis=0)
+        self.credit_bins += credit.T @ onehot
+        self.option_bins += selected.T.astype(np.float64) @ onehot
+        self.total_sum += totals.sum()
+        self.total_squares += (totals ** 2).sum()
+        self.credit_squares += (credit ** 2).sum(axis=0)
+        self.credit_total += credit.T @ totals
+
+    def report(self, quiz: LoadedQuiz) -> dict:
+        n = self.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            credit_sum = self.credit_bins.sum(axis=1)
+            difficulty = credit_sum / n
+            group = GROUP_FRACTION * n
+            lower = _group_weights(self.score_bins, group)
+            upper = _group_weights(self.score_bins[::-1], group)[::-1]
+            discrimination = (self.credit_bins @ upper - self.credit_bins @ lower) / group
+            covariance = self.credit_total / n - difficulty * (self.total_sum / n)
+            credit_variance = self.credit_squares / n - difficulty ** 2
+            total_variance = self.total_squares / n - (self.total_sum / n) ** 2
+            point_biserial = covariance / np.sqrt(credit_variance * total_variance)
+            # Constant items or totals have no defined correlation
+            point_biserial[(credit_variance <= 1e-12) | (total_variance <= 1e-12)] = np.nan
+            selection = self.option_bins.sum(axis=1) / n
+            upper_rate = self.option_bins @ upper / group
+            lower_rate = self.option_bins @ lower / group
+
+        difficulty, discrimination, point_biserial = _round(difficulty), _round(discrimination), _round(point_biserial)
+        selection, upper_rate, lower_rate = _round(selection), _round(upper_rate), _round(lower_rate)
+        correct, option_ids, start = quiz.correct.tolist(), quiz.option_ids.tolist(), quiz.option_start.tolist()
+        questions = []
+        for i, question_id in enumerate(quiz.question_ids.tolist()):
+            options = [
+                {
+                    "option_id": option_id,
+                    "is_correct": correct[k],
+                    "selection_rate": selection[k],
+                    "upper_rate": upper_rate[k],
+                    "lower_rate": lower_rate[k],
+                }
+                for k, option_id in enumerate(option_ids[start[i]:start[i + 1]], start=start[i])
+            ]
+            flags = []
+            if n:
+                if difficulty[i] > TOO_EASY:
+                    flags.append("too_easy")
+                if difficulty[i] < TOO_HARD:
+                    flags.append("too_hard")
+                if discrimination[i] < LOW_DISCRIMINATION:
+                    flags.append("low_discrimination")
+                if any(not o["is_correct"] and o["upper_rate"] > o["lower_rate"] for o in options):
+                    flags.append("misleading_distractor")
+            questions.append({
+                "question_id": question_id,
+                "type": quiz.question_types[i],
+                "difficulty": difficulty[i],
+                "discrimination": discrimination[i],
+                "point_biserial": point_biserial[i],
+                "flags": flags,
+                "options": options,
+            })
+        return {"quiz_id": quiz.quiz_id, "attempts": n, "questions": questions}
+
+
+class ItemAnalysis:
+    def __init__(self, settle: float = ITEM_ANALYSIS_SETTLE_SECONDS):
+        self.settle = timedelta(seconds=settle)
+        self._lock = threading.Lock()
+        self._stats: Dict[int, ItemStats] = {}
+
+    def _refresh(self, db: Session, quiz: LoadedQuiz, stats: ItemStats) -> None:
+        query = db.query(StudentQuizAttempt.attempt_id, StudentQuizAttempt.answers, StudentQuizAttempt.submitted_at).filter(
+            StudentQuizAttempt.quiz_id == quiz.quiz_id, StudentQuizAttempt.submitted_at.isnot(None)
+        )
+        if stats.watermark is not None:
+            query = query.filter(StudentQuizAttempt.submitted_at >= stats.watermark - self.settle)
+        rows = [row for row in query.all() if row.attempt_id not in stats.recent]
+        if not rows:
+            return
+        stats.add(quiz, [{int(q): options for q, options in (row.answers or {}).items()} for row in rows])
+        stats.watermark = max([stats.watermark or datetime.min] + [row.submitted_at for row in rows])
+        stats.recent.update((row.attempt_id, row.submitted_at) for row in rows)
+        horizon = stats.watermark - self.settle
+        stats.recent = {attempt_id: at for attempt_id, at in stats.recent.items() if at >= horizon}
+
+    def get(self, db: Session, quiz_id: int) -> Optional[dict]:
+        """The item analysis of a quiz, None if there is no such quiz."""
+        quiz = bank.get(db, quiz_id)
+        if quiz is None:
+            return None
+        with self._lock:
+            stats = self._stats.get(quiz_id)
+            if stats is None or stats.signature != _signature(quiz):
+                stats = self._stats[quiz_id] = ItemStats(quiz)
+            if quiz.size:
+                self._refresh(db, quiz, stats)
+            return stats.report(quiz)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+analysis = ItemAnalysis()
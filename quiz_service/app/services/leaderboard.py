@@ -0,0 +1,189 @@
+"""
+Per-quiz leaderboards.
+
+``QuizResult.score`` is an integer percentage, so a quiz's ranking is 101
+score buckets: a Fenwick tree of learner counts indexed from the top score
+down, and the sorted user ids in each bucket.  A learner's rank is one
+more than the learners in the buckets above theirs, a prefix sum; the
+learner at a given position is found by descending the tree.  Ties share
+a rank and are listed by user id.  Top-N, rank, percentile and the window
+around a learner are all answered from memory.
+
+``load`` builds every quiz from ``QuizResult`` in one query at startup;
+``grading`` records each result it writes.  Results graded by another
+process show up here after the next ``load``.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models.quiz import QuizResult
+
+MAX_SCORE = 100
+BUCKETS = MAX_SCORE + 1
+
+
+def _bucket(score: int) -> int:
+    """Bucket index of a score; the top score is bucket 0."""
+    return MAX_SCORE - min(max(int(score), 0), MAX_SCORE)
+
+
+class FenwickTree:
+    def __init__(self, counts: List[int]):
+        self.size = len(counts)
+        self._tree = [0] + list(counts)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self._tree[parent] += self._tree[i]
+        self._top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, index: int, delta: int) -> None:
+        index += 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, end: int) -> int:
+        """Sum of counts[:end]."""
+        total = 0
+        while end > 0:
+            total += self._tree[end]
+            end -= end & -end
+        return total
+
+    def find(self, position: int) -> int:
+        """Index holding the ``position``-th (0-based) counted item."""
+        index, step = 0, self._top
+        while step:
+            if index + step <= self.size and self._tree[index + step] <= position:
+                index += step
+                position -= self._tree[index]
+            step >>= 1
+        return index
+
+
+class Ranking:
+    def __init__(self, scores: Optional[Dict[int, int]] = None):
+        self.scores: Dict[int, int] = dict(scores or {})
+        self._users: List[List[int]] = [[] for _ in range(BUCKETS)]
+        for user_id, score in self.scores.items():
+            self._users[_bucket(score)].append(user_id)
+        for users in self._users:
+            users.sort()
+        self._counts = FenwickTree([len(users) for users in self._users])
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def set(self, user_id: int, score: int) -> None:
+        previous = self.scores.get(user_id)
+        if previous is not None:
+            if _bucket(previous) == _bucket(score):
+                self.scores[user_id] = score
+                return
+            users = self._users[_bucket(previous)]
+            del users[bisect_left(users, user_id)]
+            self._counts.add(_bucket(previous), -1)
+        self.scores[user_id] = score
+        insort(self._users[_bucket(score)], user_id)
+        self._counts.add(_bucket(score), 1)
+
+    def position(self, user_id: int) -> int:
+        """0-based place of the learner in (score desc, user id) order."""
+        bucket = _bucket(self.scores[user_id])
+        return self._counts.prefix(bucket) + bisect_left(self._users[bucket], user_id)
+
+    def entries(self, start: int, stop: int) -> List[dict]:
+        """Learners at positions start:stop, with their ranks."""
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        bucket = self._counts.find(start)
+        above = self._counts.prefix(bucket)
+        offset = start - above
+        result: List[dict] = []
+        while len(result) < stop - start:
+            users = self._users[bucket]
+            for user_id in users[offset:offset + stop - start - len(result)]:
+                result.append({"rank": above + 1, "user_id": user_id, "score": MAX_SCORE - bucket})
+            above += len(users)
+            bucket, offset = bucket + 1, 0
+        return result
+
+    def standing(self, user_id: int) -> Optional[dict]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        bucket = _bucket(score)
+        above = self._counts.prefix(bucket)
+        at_or_below = len(self) - above
+        return {
+            "user_id": user_id,
+            "score": score,
+            "rank": above + 1,
+            "percentile": round(at_or_below / len(self) * 100, 2),
+            "learners": len(self),
+        }
+
+
+class Leaderboards:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quizzes: Dict[int, Ranking] = {}
+
+    def load(self, db: Session) -> int:
+        """Rebuild every quiz's ranking from ``QuizResult``; returns the number of results."""
+        scores: Dict[int, Dict[int, int]] = defaultdict(dict)
+        rows = db.query(QuizResult.quiz_id, QuizResult.user_id, QuizResult.score).filter(
+            QuizResult.score.isnot(None)
+        )
+        count = 0
+        for quiz_id, user_id, score in rows:
+            scores[quiz_id][user_id] = score
+            count += 1
+        quizzes = {quiz_id: Ranking(users) for quiz_id, users in scores.items()}
+        with self._lock:
+            self._quizzes = quizzes
+        return count
+
+    def record(self, results: Iterable[Tuple[int, int, int]]) -> None:
+        """Apply (quiz_id, user_id, score) results."""
+        with self._lock:
+            for quiz_id, user_id, score in results:
+                ranking = self._quizzes.get(quiz_id)
+                if ranking is None:
+                    ranking = self._quizzes[quiz_id] = Ranking()
+                ranking.set(user_id, score)
+
+    def top(self, quiz_id: int, limit: int) -> dict:
+        with self._lock:
+            ranking = self._quizzes.get(quiz_id) or Ranking()
+            return {"quiz_id": quiz_id, "learners": len(ranking), "top": ranking.entries(0, limit)}
+
+    def standing(self, quiz_id: int, user_id: int) -> Optional[dict]:
+        with self._lock:
+            ranking = self._quizzes.get(quiz_id)
+            return ranking.standing(user_id) if ranking is not None else None
+
+    def around(self, quiz_id: int, user_id: int, size: int) -> Optional[dict]:
+        """The learner's standing and up to ``size`` learners either side of them."""
+        with self._lock:
+            ranking = self._quizzes.get(quiz_id)
+            if ranking is None or user_id not in ranking.scores:
+                return None
+            position = ranking.position(user_id)
+            standing = ranking.standing(user_id)
+            standing["around"] = ranking.entries(max(position - size, 0), position + size + 1)
+            return standing
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quizzes.clear()
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,82 @@
+"""
+MinHash signatures and LSH band keys for question text.
+
+A question's text is normalised (lower case, runs of anything but letters
+and digits collapsed to one space) and cut into character ``SHINGLE``-grams.
+Its signature is the minimum of each of ``NUM_PERM`` universal hashes
+over the shingles, so the share of equal positions in two signatures
+estimates the Jaccard similarity of their shingle sets.
+
+The signature is cut into ``BANDS`` bands of ``ROWS`` values and each band
+hashed to a 64-bit key.  Two questions share at least one key with
+probability 1 - (1 - s^ROWS)^BANDS: about 97% at similarity 0.6 and 18% at
+0.3, so looking up a question's keys finds its near-duplicates without
+comparing against the whole bank.
+"""
+
+import re
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+SHINGLE = 5
+BANDS, ROWS = 25, 4
+NUM_PERM = BANDS * ROWS
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalise(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def shingles(text: str) -> List[int]:
+    text = normalise(text)
+    grams = {text[i:i + SHINGLE] for i in range(max(len(text) - SHINGLE + 1, 1))}
+    return [zlib.crc32(gram.encode()) % _PRIME for gram in grams]
+
+
+def signatures(texts: Sequence[str]) -> np.ndarray:
+    """len(texts) x NUM_PERM uint32 MinHash signatures."""
+    if not texts:
+        return np.zeros((0, NUM_PERM), dtype=np.uint32)
+    hashed = [shingles(text) for text in texts]
+    counts = np.fromiter((len(h) for h in hashed), dtype=np.int64, count=len(hashed))
+    values = np.fromiter((v for h in hashed for v in h), dtype=np.uint64, count=int(counts.sum()))
+    permuted = (_A[:, None] * values[None, :] + _B[:, None]) % _PRIME
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return np.minimum.reduceat(permuted, starts, axis=1).T.astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """len(signatures) x BANDS int64 keys; the band number is part of the key."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.broadcast_to(np.arange(BANDS, dtype=np.uint64), (len(signatures), BANDS)).copy()
+    with np.errstate(over="ignore"):
+        for row in range(ROWS):
+            keys = (keys ^ bands[:, :, row]) * np.uint64(0x100000001B3)
+        # SplitMix64 finaliser, so keys spread over the whole range
+        keys ^= keys >> np.uint64(30)
+        keys *= np.uint64(0xBF58476D1CE4E5B9)
+        keys ^= keys >> np.uint64(27)
+        keys *= np.uint64(0x94D049BB133111EB)
+        keys ^= keys >> np.uint64(31)
+    return keys.view(np.int64)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of signature ``a`` with each row of ``b``."""
+    return (np.atleast_2d(b) == a).mean(axis=1)
+
+
+def to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
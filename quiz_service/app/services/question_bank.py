@@ -0,0 +1,176 @@
+"""
+In-process question bank.
+
+A quiz is loaded on first use with two queries (the quiz with its
+questions, then their options) and kept as compact arrays: question and
+option ids, the option range of each question (CSR offsets) and the
+correct-option mask, next to each question's and option's JSON encoded
+once.  Deliveries are assembled from those fragments, so serving a quiz
+does not touch the database.
+
+The question and option order a learner sees is drawn from a seed derived
+from (quiz, user, attempt) and ``QUIZ_SHUFFLE_SECRET``: the same attempt
+always gets the same order and nothing is stored.
+
+Edits made through this service invalidate the quiz in this process;
+other processes pick them up within ``QUESTION_BANK_TTL`` seconds.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.quiz import Option, Question, Quiz
+
+QUESTION_BANK_TTL = float(os.getenv("QUESTION_BANK_TTL", "300"))
+QUIZ_SHUFFLE_SECRET = os.getenv("QUIZ_SHUFFLE_SECRET", "quiz-shuffle").encode()[:64]
+
+
+def _json(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+@dataclass(frozen=True)
+class LoadedQuiz:
+    quiz_id: int
+    title: str
+    duration: Optional[int]
+    question_ids: np.ndarray
+    option_ids: np.ndarray
+    option_start: np.ndarray  # options of question i are option_start[i]:option_start[i + 1]
+    option_question: np.ndarray  # question index of each option
+    correct: np.ndarray
+    question_types: Tuple[str, ...]
+    header: bytes
+    question_json: Tuple[bytes, ...]
+    option_json: Tuple[bytes, ...]
+    loaded_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.question_ids)
+
+
+def load_quiz(db: Session, quiz_id: int) -> Optional[LoadedQuiz]:
+    rows = (
+        db.query(Quiz.title, Quiz.duration, Question.question_id, Question.content, Question.type)
+        .outerjoin(Question, Question.quiz_id == Quiz.quiz_id)
+        .filter(Quiz.quiz_id == quiz_id)
+        .order_by(Question.question_id)
+        .all()
+    )
+    if not rows:
+        return None
+    title, duration = rows[0].title, rows[0].duration
+    questions = [row for row in rows if row.question_id is not None]
+    options = (
+        db.query(Option.option_id, Option.question_id, Option.label, Option.is_correct)
+        .join(Question, Question.question_id == Option.question_id)
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(Option.question_id, Option.option_id)
+        .all()
+    )
+    question_ids = np.array([q.question_id for q in questions], dtype=np.int64)
+    option_question = np.searchsorted(question_ids, np.array([o.question_id for o in options], dtype=np.int64))
+    counts = np.bincount(option_question, minlength=len(question_ids))
+    return LoadedQuiz(
+        quiz_id=quiz_id,
+        title=title,
+        duration=duration,
+        question_ids=question_ids,
+        option_ids=np.array([o.option_id for o in options], dtype=np.int64),
+        option_start=np.concatenate([[0], np.cumsum(counts)]),
+        option_question=option_question,
+        correct=np.array([bool(o.is_correct) for o in options], dtype=bool),
+        question_types=tuple(q.type or "single" for q in questions),
+        header=f'{{"quiz_id":{quiz_id},"title":{_json(title)},"duration":{_json(duration)},'.encode(),
+        question_json=tuple(
+            f'{{"question_id":{q.question_id},"content":{_json(q.content)},"type":{_json(q.type)},"options":['.encode()
+            for q in questions
+        ),
+        option_json=tuple(f'{{"option_id":{o.option_id},"label":{_json(o.label)}}}'.encode() for o in options),
+        loaded_at=time.monotonic(),
+    )
+
+
+def shuffle_seed(quiz_id: int, user_id: int, attempt: int = 0) -> int:
+    digest = hashlib.blake2b(f"{quiz_id}:{user_id}:{attempt}".encode(), key=QUIZ_SHUFFLE_SECRET, digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def shuffle(quiz: LoadedQuiz, user_id: int, attempt: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Question order and option order (grouped by question, in ``option_start`` ranges) for an attempt."""
+    rng = np.random.default_rng(shuffle_seed(quiz.quiz_id, user_id, attempt))
+    question_order = rng.permutation(quiz.size)
+    option_order = np.lexsort((rng.random(len(quiz.option_ids)), quiz.option_question))
+    return question_order, option_order
+
+
+def deliver(quiz: LoadedQuiz, user_id: int, attempt: int = 0) -> bytes:
+    """JSON of the quiz as the learner sees it, without the answers."""
+    question_order, option_order = shuffle(quiz, user_id, attempt)
+    start = quiz.option_start
+    parts: List[bytes] = [quiz.header, f'"user_id":{user_id},"attempt":{attempt},"questions":['.encode()]
+    for n, i in enumerate(question_order.tolist()):
+        if n:
+            parts.append(b",")
+        parts.append(quiz.question_json[i])
+        parts.append(b",".join([quiz.option_json[k] for k in option_order[start[i]:start[i + 1]].tolist()]))
+        parts.append(b"]}")
+    parts.append(b"]}")
+    return b"".join(parts)
+
+
+class QuestionBank:
+    def __init__(self, ttl: float = QUESTION_BANK_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._quizzes: Dict[int, LoadedQuiz] = {}
+        self._loading: Dict[int, threading.Lock] = {}
+        self._generation: Dict[int, int] = {}
+
+    def _fresh(self, quiz_id: int) -> Optional[LoadedQuiz]:
+        quiz = self._quizzes.get(quiz_id)
+        if quiz is not None and time.monotonic() - quiz.loaded_at <= self.ttl:
+            return quiz
+        return None
+
+    def get(self, db: Session, quiz_id: int) -> Optional[LoadedQuiz]:
+        """The cached quiz, loading it once however many requests miss at the same time."""
+        quiz = self._fresh(quiz_id)
+        if quiz is not None:
+            return quiz
+        with self._lock:
+            loading = self._loading.setdefault(quiz_id, threading.Lock())
+        with loading:
+            quiz = self._fresh(quiz_id)
+            if quiz is not None:
+                return quiz
+            generation = self._generation.get(quiz_id, 0)
+            quiz = load_quiz(db, quiz_id)
+            with self._lock:
+                # Keep nothing loaded before an edit that raced with the load
+                if quiz is not None and self._generation.get(quiz_id, 0) == generation:
+                    self._quizzes[quiz_id] = quiz
+            return quiz
+
+    def invalidate(self, quiz_id: int) -> None:
+        with self._lock:
+            self._generation[quiz_id] = self._generation.get(quiz_id, 0) + 1
+            self._quizzes.pop(quiz_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            for quiz_id in self._quizzes:
+                self._generation[quiz_id] = self._generation.get(quiz_id, 0) + 1
+            self._quizzes.clear()
+
+
+bank = QuestionBank()
@@ -0,0 +1,160 @@
+"""
+Streaming question-bank import.
+
+The request body is fed to an ``Importer`` piece by piece as it arrives.
+Complete records are parsed and validated as ``QuestionIn``; every
+``IMPORT_CHUNK`` valid questions are checked for near-duplicates (against
+the bank and earlier questions of the same import), inserted with one
+flush and bulk inserts, and committed.  Invalid records are skipped and
+reported; near-duplicates are inserted and flagged.
+
+Formats:
+
+- ``csv``: a header row naming ``question`` (or ``content``), optional
+  ``type`` and ``correct`` columns, and one column per option whose name
+  starts with ``option``.  ``correct`` lists the 1-based numbers of the
+  correct options, separated by ``;``.  Quoted fields may span lines.
+- ``jsonl``: one ``QuestionIn`` object per line.
+- ``json``: an array of ``QuestionIn`` objects, parsed when complete.
+"""
+
+import codecs
+import csv
+import json
+import os
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from ..schemas.quiz import QuestionIn
+from . import minhash, similar_questions
+from .question_bank import bank
+from .quizzes import add_questions
+
+IMPORT_CHUNK = int(os.getenv("QUESTION_IMPORT_CHUNK", "500"))
+FORMATS = ("csv", "jsonl", "json")
+
+
+def _csv_question(header: List[str], values: List[str]) -> dict:
+    row = dict(zip(header, values))
+    correct = {int(n) for n in (row.get("correct") or "").replace(",", ";").split(";") if n.strip()}
+    labels = [row[name] for name in header if name.startswith("option")]
+    return {
+        "content": row.get("question") or row.get("content") or "",
+        "type": row.get("type") or "single",
+        "options": [{"label": label, "is_correct": n in correct}
+                    for n, label in enumerate(labels, start=1) if label and label.strip()],
+    }
+
+
+class Importer:
+    def __init__(self, db: Session, quiz_id: int, fmt: str, chunk: int = IMPORT_CHUNK):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt!r}")
+        self.db = db
+        self.quiz_id = quiz_id
+        self.fmt = fmt
+        self.chunk = chunk
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._text = ""  # incomplete last line, or the whole body for json
+        self._record = ""  # CSV record spanning lines
+        self._header: Optional[List[str]] = None
+        self._rows = 0
+        self._pending: List[tuple] = []  # (row, QuestionIn)
+        self.imported = 0
+        self.skipped: List[dict] = []
+        self.duplicates: List[dict] = []
+
+    def feed(self, data: bytes) -> None:
+        text = self._decoder.decode(data)
+        if self.fmt == "json":
+            self._text += text
+            return
+        lines = (self._text + text).split("\n")
+        self._text = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def finish(self) -> dict:
+        text = self._text + self._decoder.decode(b"", final=True)
+        self._text = ""
+        if self.fmt == "json":
+            try:
+                items = json.loads(text) if text.strip() else []
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+            if not isinstance(items, list):
+                raise ValueError("Expected a JSON array of questions")
+            for item in items:
+                self._add(item)
+        else:
+            if text:
+                self._line(text)
+            if self._record:
+                self._rows += 1
+                self.skipped.append({"row": self._rows, "error": "Unterminated quoted field"})
+        self._flush()
+        return {"imported": self.imported, "skipped": self.skipped, "duplicates": self.duplicates}
+
+    def _line(self, line: str) -> None:
+        if self.fmt == "jsonl":
+            if line.strip():
+                try:
+                    self._add(json.loads(line))
+                except ValueError as e:
+                    self._rows += 1
+                    self.skipped.append({"row": self._rows, "error": f"Invalid JSON: {e}"})
+            return
+        # A CSV record is complete once its quotes are balanced
+        self._record = f"{self._record}\n{line}" if self._record else line
+        if self._record.count('"') % 2:
+            return
+        record, self._record = self._record.rstrip("\r"), ""
+        if not record.strip():
+            return
+        values = next(csv.reader([record]))
+        if self._header is None:
+            self._header = [name.strip().lower() for name in values]
+            if not {"question", "content"} & set(self._header):
+                raise ValueError("CSV header needs a question column")
+            return
+        try:
+            self._add(_csv_question(self._header, values))
+        except ValueError as e:
+            self._rows += 1
+            self.skipped.append({"row": self._rows, "error": str(e)})
+
+    def _add(self, item) -> None:
+        self._rows += 1
+        try:
+            question = QuestionIn.parse_obj(item)
+        except ValidationError as e:
+            self.skipped.append({"row": self._rows, "error": str(e)})
+            return
+        self._pending.append((self._rows, question))
+        if len(self._pending) >= self.chunk:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        rows = [row for row, _ in self._pending]
+        questions = [question for _, question in self._pending]
+        self._pending = []
+        signatures = minhash.signatures([q.content for q in questions])
+        stored = similar_questions.find(self.db, signatures)
+        earlier = similar_questions.within(signatures)
+        question_ids = add_questions(self.db, self.quiz_id, questions, signatures)
+        self.db.commit()
+        bank.invalidate(self.quiz_id)
+        self.imported += len(question_ids)
+        for i, question_id in enumerate(question_ids):
+            matches = stored[i] + [(question_ids[j], score) for j, score in earlier[i]]
+            if matches:
+                self.duplicates.append({
+                    "row": rows[i],
+                    "question_id": question_id,
+                    "matches": [{"question_id": q, "similarity": score}
+                                for q, score in sorted(matches, key=lambda m: -m[1])],
+                })
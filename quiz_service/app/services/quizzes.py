@@ -0,0 +1,120 @@
+"""
+Quiz authoring.  Every change invalidates the quiz in the question bank.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.quiz import Option, Question, QuestionReview, Quiz
+from ..schemas.quiz import QuestionIn, QuizIn
+from . import minhash, similar_questions
+from .question_bank import bank
+
+
+def add_questions(db: Session, quiz_id: int, questions: Sequence[QuestionIn],
+                  signatures: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Insert questions with their options and near-duplicate signatures in
+    one flush and two bulk inserts; returns the new question ids.  Does not
+    commit.
+    """
+    if not questions:
+        return []
+    rows = [Question(quiz_id=quiz_id, content=q.content, type=q.type) for q in questions]
+    db.add_all(rows)
+    db.flush()
+    question_ids = [row.question_id for row in rows]
+    db.bulk_insert_mappings(Option, [
+        {"question_id": question_id, "label": o.label, "is_correct": o.is_correct}
+        for question_id, q in zip(question_ids, questions) for o in q.options
+    ])
+    if signatures is None:
+        signatures = minhash.signatures([q.content for q in questions])
+    similar_questions.store(db, question_ids, signatures)
+    return question_ids
+
+
+def create_quiz(db: Session, data: QuizIn) -> Quiz:
+    quiz = Quiz(title=data.title, linked_to=data.linked_to, duration=data.duration)
+    db.add(quiz)
+    db.flush()
+    add_questions(db, quiz.quiz_id, data.questions)
+    db.commit()
+    bank.invalidate(quiz.quiz_id)
+    return quiz
+
+
+def _check_ids(sent: List[Optional[int]], existing, what: str, owner: str) -> None:
+    ids = [i for i in sent if i is not None]
+    unknown = sorted(set(ids) - set(existing))
+    if unknown:
+        raise ValueError(f"{what} {unknown} do not belong to {owner}")
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"{what} are repeated in {owner}")
+
+
+def replace_quiz(db: Session, quiz_id: int, data: QuizIn) -> Optional[Quiz]:
+    """
+    Bring a quiz's details, questions and options in line with ``data``;
+    None if there is no such quiz.  Raises ValueError for an id that is not
+    part of the quiz.
+
+    Questions and options sent with their ids are updated in place, those
+    without one are added and those left out are deleted, along with the
+    review schedules of deleted questions.  Everything else keeps its id,
+    so open attempts' answers, review schedules and item-analysis history
+    stay attached to it.
+    """
+    quiz = db.query(Quiz).get(quiz_id)
+    if quiz is None:
+        return None
+    questions = {q.question_id: q for q in db.query(Question).filter(Question.quiz_id == quiz_id)}
+    options: Dict[int, Dict[int, Option]] = {question_id: {} for question_id in questions}
+    for option in db.query(Option).filter(Option.question_id.in_(list(questions))):
+        options[option.question_id][option.option_id] = option
+    _check_ids([q.question_id for q in data.questions], questions, "Questions", f"quiz {quiz_id}")
+    for q in data.questions:
+        if q.question_id is not None:
+            _check_ids([o.option_id for o in q.options], options[q.question_id],
+                       "Options", f"question {q.question_id}")
+
+    quiz.title, quiz.linked_to, quiz.duration = data.title, data.linked_to, data.duration
+    kept = {q.question_id for q in data.questions if q.question_id is not None}
+    reworded = []
+    for q in data.questions:
+        if q.question_id is None:
+            continue
+        row = questions[q.question_id]
+        if row.content != q.content:
+            reworded.append(q.question_id)
+        row.content, row.type = q.content, q.type
+        current = options[q.question_id]
+        for o in q.options:
+            if o.option_id is None:
+                db.add(Option(question_id=q.question_id, label=o.label, is_correct=o.is_correct))
+            else:
+                current[o.option_id].label, current[o.option_id].is_correct = o.label, o.is_correct
+        sent = {o.option_id for o in q.options}
+        for option_id, option in current.items():
+            if option_id not in sent:
+                db.delete(option)
+
+    removed = [question_id for question_id in questions if question_id not in kept]
+    if removed:
+        for question_id in removed:
+            for option in options[question_id].values():
+                db.delete(option)
+            db.delete(questions[question_id])
+        db.query(QuestionReview).filter(QuestionReview.question_id.in_(removed)).delete(synchronize_session=False)
+    if removed or reworded:
+        similar_questions.remove(db, removed + reworded)
+    if reworded:
+        similar_questions.store(db, reworded, minhash.signatures([questions[i].content for i in reworded]))
+    db.flush()
+    add_questions(db, quiz_id, [q for q in data.questions if q.question_id is None])
+    db.commit()
+    bank.invalidate(quiz_id)
+    return quiz
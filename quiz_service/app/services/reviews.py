@@ -0,0 +1,324 @@
+"""
+Spaced-repetition review of quiz questions.
+
+Grading passes every learner's credit on each question of the attempts it
+grades.  A question enters the learner's schedule the first time they
+score it below ``PASSING_QUALITY``; from then on every outcome, from a
+quiz attempt or a review, reschedules it with SM-2:
+
+- credit maps to a quality of 0-5;
+- a pass grows the interval to 1 day, then 6 days, then the previous
+  interval times the ease factor, and adjusts the ease factor by the
+  quality (never below ``MIN_EASE``);
+- a fail starts the repetitions over with a 1-day interval.
+
+Intervals are capped at ``REVIEW_MAX_INTERVAL_DAYS``.  The updates are
+computed for a whole batch on arrays and written with one bulk upsert.
+Rows for newly failed questions are first inserted in their initial state
+(``DO NOTHING``) and every row is then read ``FOR UPDATE``, so concurrent
+gradings for the same learner apply their steps one after the other.
+
+Each learner's schedule is kept in memory as a heap of (due_at,
+question_id), loaded with one query on first access and updated as
+outcomes are recorded.  A rescheduled question leaves its old entry in the
+heap; stale entries are dropped when they reach the top, so taking the
+next due question is O(log n).  A queue loaded while outcomes were being
+recorded for the same learner is used once and not kept.  Up to ``REVIEW_QUEUE_CACHE_SIZE`` learners
+are kept, least recently used first out, and each is reloaded after
+``REVIEW_QUEUE_TTL`` seconds to pick up other processes' writes.
+
+``recompute`` rewrites every due date from the stored schedule with the
+current settings.  Run it nightly with
+``python -m quiz_service.app.services.reviews``.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from ..models.quiz import QuestionReview
+from .upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+REVIEW_MAX_INTERVAL_DAYS = float(os.getenv("REVIEW_MAX_INTERVAL_DAYS", "365"))
+REVIEW_QUEUE_CACHE_SIZE = int(os.getenv("REVIEW_QUEUE_CACHE_SIZE", "10000"))
+REVIEW_QUEUE_TTL = float(os.getenv("REVIEW_QUEUE_TTL", "3600"))
+
+PASSING_QUALITY = 3
+INITIAL_EASE, MIN_EASE = 2.5, 1.3
+LOOKUP_CHUNK = 900  # bound parameters per IN list
+RECOMPUTE_CHUNK = 10000
+
+Schedule = Tuple[datetime, int]  # (due_at, quiz_id)
+
+
+def quality(credit: np.ndarray) -> np.ndarray:
+    """SM-2 quality 0-5 of a question credit between 0 and 1."""
+    return np.floor(np.asarray(credit, dtype=np.float64) * 5 + 1e-6).astype(np.int64)
+
+
+def sm2(repetitions: np.ndarray, interval: np.ndarray, ease: np.ndarray,
+        quality: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The next (repetitions, interval in days, ease) of each item."""
+    passed = quality >= PASSING_QUALITY
+    repetitions = np.where(passed, repetitions + 1, 0)
+    grown = np.where(repetitions == 1, 1.0, np.where(repetitions == 2, 6.0, np.round(interval * ease)))
+    interval = np.minimum(np.where(passed, grown, 1.0), REVIEW_MAX_INTERVAL_DAYS)
+    miss = 5 - quality
+    ease = np.where(passed, np.maximum(ease + 0.1 - miss * (0.08 + miss * 0.02), MIN_EASE), ease)
+    return repetitions, interval, ease
+
+
+def record(db: Session, quiz_id: int, user_ids: Sequence[int], question_ids: np.ndarray,
+           credit: np.ndarray, now: datetime) -> List[dict]:
+    """
+    Reschedule the questions ``question_ids`` of one quiz for each learner
+    from ``credit`` (learners x questions).  A learner listed more than
+    once keeps their last row.  Returns the rows written.  Does not commit.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    if not len(user_ids) or not len(question_ids):
+        return []
+    # Last occurrence of each learner
+    _, last = np.unique(user_ids[::-1], return_index=True)
+    keep = np.sort(len(user_ids) - 1 - last)
+    user_ids, credit = user_ids[keep], np.asarray(credit)[keep]
+    order = np.argsort(user_ids)  # a consistent lock order
+    user_ids, credit = user_ids[order], credit[order]
+
+    users = np.repeat(user_ids, len(question_ids))
+    questions = np.tile(np.asarray(question_ids, dtype=np.int64), len(user_ids))
+    q = quality(credit.ravel())
+
+    # Failed questions enter the schedule: create them first so they can be locked with the others
+    failed = q < PASSING_QUALITY
+    upsert(db, QuestionReview, [
+        {"user_id": user_id, "question_id": question_id, "quiz_id": quiz_id, "repetitions": 0,
+         "interval_days": 0.0, "ease": INITIAL_EASE, "lapses": 0, "reviewed_at": now, "due_at": now}
+        for user_id, question_id in zip(users[failed].tolist(), questions[failed].tolist())
+    ], ["user_id", "question_id"], None)
+    existing: Dict[Tuple[int, int], tuple] = {}
+    for start in range(0, len(user_ids), LOOKUP_CHUNK):
+        for row in db.query(QuestionReview.user_id, QuestionReview.question_id, QuestionReview.repetitions,
+                            QuestionReview.interval_days, QuestionReview.ease, QuestionReview.lapses).filter(
+            QuestionReview.quiz_id == quiz_id,
+            QuestionReview.user_id.in_(user_ids[start:start + LOOKUP_CHUNK].tolist()),
+        ).order_by(QuestionReview.user_id, QuestionReview.question_id).with_for_update():
+            existing[(row.user_id, row.question_id)] = (row.repetitions, row.interval_days, row.ease, row.lapses)
+
+    state = [existing.get(key) for key in zip(users.tolist(), questions.tolist())]
+    found = np.fromiter((s is not None for s in state), dtype=bool, count=len(state))
+    scheduled = found | (q < PASSING_QUALITY)
+    if not scheduled.any():
+        return []
+    picked = [s or (0, 0.0, INITIAL_EASE, 0) for s, keep in zip(state, scheduled.tolist()) if keep]
+    repetitions, interval, ease, lapses = (np.array(column) for column in zip(*picked))
+    q = q[scheduled]
+    repetitions, interval, ease = sm2(repetitions, interval, ease, q)
+    lapses = lapses + (q < PASSING_QUALITY)
+
+    due_at = np.datetime64(now, "us") + (interval * 86400e6).astype("timedelta64[us]")
+    rows = [
+        {
+            "user_id": user_id,
+            "question_id": question_id,
+            "quiz_id": quiz_id,
+            "repetitions": reps,
+            "interval_days": days,
+            "ease": e,
+            "lapses": lapse_count,
+            "last_quality": grade,
+            "reviewed_at": now,
+            "due_at": due,
+        }
+        for user_id, question_id, reps, days, e, lapse_count, grade, due in zip(
+            users[scheduled].tolist(), questions[scheduled].tolist(), repetitions.tolist(), interval.tolist(),
+            np.round(ease, 4).tolist(), lapses.tolist(), q.tolist(), due_at.tolist(),
+        )
+    ]
+    upsert(db, QuestionReview, rows, ["user_id", "question_id"], lambda table, excluded: {
+        "quiz_id": excluded.quiz_id,
+        "repetitions": excluded.repetitions,
+        "interval_days": excluded.interval_days,
+        "ease": excluded.ease,
+        "lapses": excluded.lapses,
+        "last_quality": excluded.last_quality,
+        "reviewed_at": excluded.reviewed_at,
+        "due_at": excluded.due_at,
+    })
+    return rows
+
+
+class LearnerQueue:
+    def __init__(self, rows: Iterable[Tuple[int, int, datetime]]):
+        self.items: Dict[int, Schedule] = {question_id: (due_at, quiz_id) for question_id, quiz_id, due_at in rows}
+        self._heap: List[Tuple[datetime, int]] = []
+        self._rebuild()
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _rebuild(self) -> None:
+        self._heap = [(due_at, question_id) for question_id, (due_at, _) in self.items.items()]
+        heapq.heapify(self._heap)
+
+    def _top(self) -> Optional[Tuple[datetime, int]]:
+        """The earliest current entry, dropping stale ones."""
+        while self._heap:
+            due_at, question_id = self._heap[0]
+            current = self.items.get(question_id)
+            if current is not None and current[0] == due_at:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def set(self, question_id: int, quiz_id: int, due_at: datetime) -> None:
+        if self.items.get(question_id) == (due_at, quiz_id):
+            return
+        self.items[question_id] = (due_at, quiz_id)
+        heapq.heappush(self._heap, (due_at, question_id))
+        if len(self._heap) > 2 * len(self.items) + 64:
+            self._rebuild()
+
+    def due(self, now: datetime, limit: int) -> Tuple[List[Tuple[datetime, int]], Optional[datetime]]:
+        """Up to ``limit`` questions due by ``now``, earliest first, and when the next one is due."""
+        taken = []
+        while len(taken) < limit:
+            top = self._top()
+            if top is None or top[0] > now:
+                break
+            taken.append(heapq.heappop(self._heap))
+        top = self._top()
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return taken, top[0] if top is not None else None
+
+
+class ReviewQueues:
+    def __init__(self, capacity: int = REVIEW_QUEUE_CACHE_SIZE, ttl: float = REVIEW_QUEUE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[int, LearnerQueue]" = OrderedDict()
+        # Learners whose queue is being loaded: (loads in flight, outcomes applied since the first began)
+        self._loading: Dict[int, List[int]] = {}
+
+    def _cached(self, user_id: int) -> Optional[LearnerQueue]:
+        queue = self._queues.get(user_id)
+        if queue is None or time.monotonic() - queue.loaded_at > self.ttl:
+            return None
+        self._queues.move_to_end(user_id)
+        return queue
+
+    def _queue(self, db: Session, user_id: int) -> LearnerQueue:
+        """The learner's queue, loading it if needed.  Call with the lock held."""
+        queue = self._cached(user_id)
+        if queue is not None:
+            return queue
+        loading = self._loading.setdefault(user_id, [0, 0])
+        loading[0] += 1
+        writes = loading[1]
+        self._lock.release()
+        try:
+            queue = LearnerQueue(db.query(QuestionReview.question_id, QuestionReview.quiz_id, QuestionReview.due_at)
+                                 .filter(QuestionReview.user_id == user_id))
+        finally:
+            self._lock.acquire()
+            loading[0] -= 1
+            if not loading[0]:
+                del self._loading[user_id]
+        # An outcome recorded while loading may be missing from the rows: use the queue once, keep nothing
+        if loading[1] == writes:
+            self._queues[user_id] = queue
+            self._queues.move_to_end(user_id)
+            while len(self._queues) > self.capacity:
+                self._queues.popitem(last=False)
+        return queue
+
+    def due(self, db: Session, user_id: int, limit: int, now: Optional[datetime] = None) -> dict:
+        with self._lock:
+            queue = self._queue(db, user_id)
+            taken, next_due = queue.due(now or datetime.utcnow(), limit)
+            return {
+                "user_id": user_id,
+                "scheduled": len(queue),
+                "due": [{"question_id": question_id, "quiz_id": queue.items[question_id][1], "due_at": due_at}
+                        for due_at, question_id in taken],
+                "next_due_at": next_due,
+            }
+
+    def quizzes(self, db: Session, user_id: int, question_ids: Iterable[int]) -> Dict[int, int]:
+        """Quiz of each of ``question_ids`` on the learner's schedule."""
+        with self._lock:
+            items = self._queue(db, user_id).items
+            return {question_id: items[question_id][1] for question_id in question_ids if question_id in items}
+
+    def apply(self, rows: Iterable[dict]) -> None:
+        """Reflect committed ``record`` rows in the loaded queues."""
+        rows = list(rows)
+        with self._lock:
+            for user_id in {row["user_id"] for row in rows} & self._loading.keys():
+                self._loading[user_id][1] += 1
+            for row in rows:
+                queue = self._queues.get(row["user_id"])
+                if queue is not None:
+                    queue.set(row["question_id"], row["quiz_id"], row["due_at"])
+
+    def clear(self) -> None:
+        with self._lock:
+            for loading in self._loading.values():
+                loading[1] += 1
+            self._queues.clear()
+
+
+queues = ReviewQueues()
+
+
+def recompute(db: Session, chunk: int = RECOMPUTE_CHUNK) -> dict:
+    """Rewrite every due date from its last review and capped interval; commits per chunk."""
+    clock = time.perf_counter()
+    seen = updated = 0
+    after = None
+    while True:
+        query = db.query(QuestionReview.user_id, QuestionReview.question_id, QuestionReview.interval_days,
+                         QuestionReview.reviewed_at, QuestionReview.due_at)
+        if after is not None:
+            query = query.filter(tuple_(QuestionReview.user_id, QuestionReview.question_id) > tuple_(*after))
+        rows = query.order_by(QuestionReview.user_id, QuestionReview.question_id).limit(chunk).all()
+        if not rows:
+            break
+        changes = []
+        for row in rows:
+            interval = min(row.interval_days, REVIEW_MAX_INTERVAL_DAYS)
+            due_at = row.reviewed_at + timedelta(days=interval)
+            if interval != row.interval_days or due_at != row.due_at:
+                changes.append({"user_id": row.user_id, "question_id": row.question_id,
+                                "interval_days": interval, "due_at": due_at})
+        db.bulk_update_mappings(QuestionReview, changes)
+        db.commit()
+        seen += len(rows)
+        updated += len(changes)
+        after = (rows[-1].user_id, rows[-1].question_id)
+    queues.clear()
+    stats = {"reviews": seen, "updated": updated, "seconds": round(time.perf_counter() - clock, 3)}
+    logger.info("Review schedule recompute: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        print(recompute(db))
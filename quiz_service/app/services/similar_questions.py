@@ -0,0 +1,90 @@
+"""
+Near-duplicate questions across the whole bank.
+
+Every question's MinHash signature is stored in ``question_signatures``
+and its LSH band keys in ``question_lsh_buckets``.  Finding the
+near-duplicates of new text reads only the questions sharing a band key
+with it, then keeps those whose estimated similarity is at least
+``QUESTION_DUPLICATE_SIMILARITY``.
+"""
+
+import os
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.quiz import QuestionBucket, QuestionSignature
+from . import minhash
+
+QUESTION_DUPLICATE_SIMILARITY = float(os.getenv("QUESTION_DUPLICATE_SIMILARITY", "0.6"))
+LOOKUP_CHUNK = 900  # bound parameters per IN list
+
+Matches = List[Tuple[int, float]]  # (question_id or row index, similarity), most similar first
+
+
+def _chunks(values: list):
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield values[start:start + LOOKUP_CHUNK]
+
+
+def _matches(signature: np.ndarray, ids: List[int], candidates: np.ndarray, threshold: float) -> Matches:
+    if not ids:
+        return []
+    scores = minhash.similarity(signature, candidates)
+    found = [(ids[k], round(float(scores[k]), 3)) for k in np.flatnonzero(scores >= threshold)]
+    return sorted(found, key=lambda match: -match[1])
+
+
+def store(db: Session, question_ids: Sequence[int], signatures: np.ndarray) -> None:
+    db.bulk_insert_mappings(QuestionSignature, [
+        {"question_id": question_id, "minhash": minhash.to_bytes(signature)}
+        for question_id, signature in zip(question_ids, signatures)
+    ])
+    keys = minhash.band_keys(signatures).tolist()
+    db.bulk_insert_mappings(QuestionBucket, [
+        {"bucket": key, "question_id": question_id}
+        for question_id, row in zip(question_ids, keys) for key in set(row)
+    ])
+
+
+def remove(db: Session, question_ids) -> None:
+    """Forget the questions ``question_ids`` (a list or a subquery) selects."""
+    db.query(QuestionBucket).filter(QuestionBucket.question_id.in_(question_ids)).delete(synchronize_session=False)
+    db.query(QuestionSignature).filter(QuestionSignature.question_id.in_(question_ids)).delete(synchronize_session=False)
+
+
+def find(db: Session, signatures: np.ndarray, threshold: float = QUESTION_DUPLICATE_SIMILARITY) -> List[Matches]:
+    """Stored questions similar to each signature."""
+    keys = minhash.band_keys(signatures)
+    holders: Dict[int, List[int]] = defaultdict(list)
+    for chunk in _chunks(np.unique(keys).tolist()):
+        for bucket, question_id in db.query(QuestionBucket.bucket, QuestionBucket.question_id).filter(
+            QuestionBucket.bucket.in_(chunk)
+        ):
+            holders[bucket].append(question_id)
+    candidates = [sorted({q for key in row for q in holders.get(key, ())}) for row in keys.tolist()]
+    stored: Dict[int, np.ndarray] = {}
+    for chunk in _chunks(sorted({q for ids in candidates for q in ids})):
+        for question_id, data in db.query(QuestionSignature.question_id, QuestionSignature.minhash).filter(
+            QuestionSignature.question_id.in_(chunk)
+        ):
+            stored[question_id] = minhash.from_bytes(data)
+    result = []
+    for signature, ids in zip(signatures, candidates):
+        ids = [q for q in ids if q in stored]
+        result.append(_matches(signature, ids, np.array([stored[q] for q in ids]), threshold))
+    return result
+
+
+def within(signatures: np.ndarray, threshold: float = QUESTION_DUPLICATE_SIMILARITY) -> List[Matches]:
+    """For each signature, the earlier ones in ``signatures`` similar to it, by index."""
+    holders: Dict[int, List[int]] = defaultdict(list)
+    result = []
+    for i, row in enumerate(minhash.band_keys(signatures).tolist()):
+        ids = sorted({j for key in row for j in holders[key]})
+        result.append(_matches(signatures[i], ids, signatures[ids], threshold))
+        for key in row:
+            holders[key].append(i)
+    return result
@@ -0,0 +1,53 @@
+"""
+Hashed timing wheel.
+
+Timers are hashed by their due tick into ``slots`` buckets.  Adding and
+cancelling are O(1); ``advance`` visits only the buckets of the ticks that
+elapsed (at most one revolution) and pops the timers that are due,
+leaving those due in a later revolution in place.
+"""
+
+import math
+from typing import Dict, Hashable, List
+
+
+class TimingWheel:
+    def __init__(self, now: float, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.current = math.floor(now / tick)
+        self._slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slot_of
+
+    def add(self, key: Hashable, deadline: float) -> None:
+        """Schedule ``key`` for the first ``advance`` at or after ``deadline``; replaces an earlier timer."""
+        self.remove(key)
+        due = max(math.ceil(deadline / self.tick), self.current + 1)
+        slot = due % len(self._slots)
+        self._slots[slot][key] = due
+        self._slot_of[key] = slot
+
+    def remove(self, key: Hashable) -> bool:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Move to ``now`` and return the keys that are due."""
+        target = math.floor(now / self.tick)
+        expired: List[Hashable] = []
+        for tick in range(self.current + 1, min(target, self.current + len(self._slots)) + 1):
+            bucket = self._slots[tick % len(self._slots)]
+            for key in [key for key, due in bucket.items() if due <= target]:
+                del bucket[key]
+                del self._slot_of[key]
+                expired.append(key)
+        self.current = max(self.current, target)
+        return expired
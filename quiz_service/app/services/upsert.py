@@ -0,0 +1,36 @@
+"""
+Dialect-aware bulk upsert.
+"""
+
+from typing import Callable, List, Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+UPSERT_CHUNK = 50000
+
+
+def upsert(db: Session, model, rows: List[dict], keys: List[str], update: Optional[Callable]) -> None:
+    """
+    Bulk ``INSERT ... ON CONFLICT (keys) DO UPDATE``.
+
+    ``update(table, excluded)`` returns the SET clause; without it existing
+    rows are left alone (``DO NOTHING``).  Callers must pre-aggregate rows
+    so that a key appears at most once per call.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect}")
+    if not rows:
+        return
+    stmt = insert(model.__table__)
+    if update is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=update(model.__table__, stmt.excluded))
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        db.execute(stmt, rows[start:start + UPSERT_CHUNK])
@@ -0,0 +1,77 @@
+"""
+Quiz delivery to ``--learners`` simultaneous learners (default 5000).
+
+Creates a quiz of ``--questions`` questions with four options each, then
+has a thread pool request a shuffled delivery for every learner the way
+the route does (new session, question bank, assemble), and reports
+the cold load, then throughput, latency percentiles and how many SQL
+statements were run.
+
+    python quiz_service/benchmarks/bench_delivery.py --learners 5000 --questions 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+
+    from quiz_service.app.database import Base
+    from quiz_service.app.schemas.quiz import QuizIn
+    from quiz_service.app.services import quizzes
+    from quiz_service.app.services.question_bank import bank, deliver
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False} if db_url.startswith("sqlite") else {})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        quiz_id = quizzes.create_quiz(db, QuizIn(title="Benchmark", duration=30, questions=[
+            {"content": f"Question {q} " + "text " * 20,
+             "options": [{"label": f"Option {o} for question {q}", "is_correct": o == 0} for o in range(4)]}
+            for q in range(args.questions)
+        ])).quiz_id
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    def request(user_id):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            body = deliver(bank.get(db, quiz_id), user_id)
+        return time.perf_counter() - started, len(body)
+
+    cold, _ = request(0)
+    print(f"cold load and first delivery {cold * 1000:.1f} ms")
+    clock = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(request, range(1, args.learners + 1)))
+    elapsed = time.perf_counter() - clock
+    latency = np.array([r[0] for r in results]) * 1000
+    print(f"{args.learners} deliveries of {args.questions} questions in {elapsed:.2f}s "
+          f"({args.learners / elapsed:.0f}/s, {results[0][1]} bytes each)")
+    print(f"latency p50 {np.percentile(latency, 50):.2f} ms  p99 {np.percentile(latency, 99):.2f} ms")
+    print(f"SQL statements: {len(statements)} (all from the cold load)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Grading ``--attempts`` closed attempts (default 10000) of a
+``--questions``-question quiz (default 50) at once, as at the end of a
+timed exam.
+
+Half of the questions are ``multiple`` (two of four options correct,
+partial credit), the rest ``single``.  Every learner answers every
+question at random.  Reports the time to build the answer matrix and score
+it, and the full ``grade`` call including the batched attempt update, the
+``QuizResult`` upsert and the review schedule upsert.
+
+    python quiz_service/benchmarks/bench_grading.py --attempts 10000 --questions 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from quiz_service.app.database import Base
+    from quiz_service.app.models.quiz import StudentQuizAttempt
+    from quiz_service.app.schemas.quiz import QuizIn
+    from quiz_service.app.services import grading, quizzes
+    from quiz_service.app.services.question_bank import bank
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    rng = np.random.default_rng(0)
+    with SessionLocal() as db:
+        quiz_id = quizzes.create_quiz(db, QuizIn(title="Final exam", duration=60, questions=[
+            {"content": f"Question {q}", "type": "multiple" if q % 2 else "single",
+             "options": [{"label": f"Option {o}", "is_correct": o < (2 if q % 2 else 1)} for o in range(4)]}
+            for q in range(args.questions)
+        ])).quiz_id
+        quiz = bank.get(db, quiz_id)
+        options = [quiz.option_ids[quiz.option_start[i]:quiz.option_start[i + 1]].tolist() for i in range(quiz.size)]
+        attempts = []
+        for n in range(args.attempts):
+            picks = rng.integers(0, 4, size=(quiz.size, 2))
+            attempts.append(SimpleNamespace(
+                attempt_id=n + 1, user_id=n + 1, quiz_id=quiz_id,
+                answers={q: sorted({options[i][picks[i, 0]], options[i][picks[i, 1]]}) if quiz.question_types[i] == "multiple"
+                         else [options[i][picks[i, 0]]]
+                         for i, q in enumerate(quiz.question_ids.tolist())},
+            ))
+        db.bulk_insert_mappings(StudentQuizAttempt, [
+            {"attempt_id": a.attempt_id, "user_id": a.user_id, "quiz_id": quiz_id, "status": "open"} for a in attempts
+        ])
+        db.commit()
+
+    clock = time.perf_counter()
+    matrix = grading.answer_matrix(quiz, [a.answers for a in attempts])
+    built = time.perf_counter() - clock
+    credit = grading.score(quiz, matrix)
+    scored = time.perf_counter() - clock - built
+    print(f"answer matrix {matrix.shape[0]} x {matrix.shape[1]} in {built * 1000:.0f} ms, "
+          f"scored in {scored * 1000:.1f} ms (mean {credit.sum(axis=1).mean():.1f} points)")
+
+    with SessionLocal() as db:
+        clock = time.perf_counter()
+        results = grading.grade(db, attempts, "expired")
+        elapsed = time.perf_counter() - clock
+    passed = sum(r["passed"] for r in results)
+    print(f"graded and wrote {len(results)} attempts in {elapsed:.2f}s ({passed} passed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Streaming import of ``--questions`` CSV questions (default 1000) into a
+bank that already holds ``--bank`` questions (default 100000).
+
+The bank is filled through ``quizzes.add_questions`` in chunks.  The CSV,
+a tenth of which are lightly reworded copies of bank questions, is fed to
+the importer in 64 KiB pieces as the route does.  Reports the import
+throughput, how many near-duplicates were flagged, and how many stored
+signatures the duplicate check had to read.
+
+    python quiz_service/benchmarks/bench_import.py --bank 100000 --questions 1000
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+COMMON = "which what how many the a of in on for is are does to with and".split()
+
+
+def vocabulary(rng, size=5000):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return COMMON + ["".join(rng.choice(letters, rng.integers(4, 10))) for _ in range(size)]
+
+
+def sentence(rng, words, weights) -> str:
+    # Zipf-like word frequencies: a few words are in most questions
+    return " ".join(rng.choice(words, rng.integers(8, 16), p=weights)).capitalize() + "?"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bank", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from quiz_service.app.database import Base
+    from quiz_service.app.schemas.quiz import QuestionIn, QuizIn
+    from quiz_service.app.services import minhash, quizzes
+    from quiz_service.app.services.question_import import Importer
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    rng = np.random.default_rng(0)
+    words = vocabulary(rng)
+    weights = 1 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    existing = [sentence(rng, words, weights) for _ in range(args.bank)]
+    clock = time.perf_counter()
+    with SessionLocal() as db:
+        quiz_id = quizzes.create_quiz(db, QuizIn(title="Bank")).quiz_id
+        for start in range(0, len(existing), 5000):
+            quizzes.add_questions(db, quiz_id, [
+                QuestionIn(content=text, options=[{"label": "yes", "is_correct": True}, {"label": "no"}])
+                for text in existing[start:start + 5000]
+            ])
+            db.commit()
+        target = quizzes.create_quiz(db, QuizIn(title="Imported")).quiz_id
+    print(f"bank of {args.bank} questions filled in {time.perf_counter() - clock:.1f}s")
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["question", "type", "correct", "option1", "option2", "option3"])
+    for n in range(args.questions):
+        text = existing[rng.integers(len(existing))].rstrip("?") + " exactly?" if n % 10 == 0 else sentence(rng, words, weights)
+        writer.writerow([text, "single", 1, "first", "second", "third"])
+    body = out.getvalue().encode()
+
+    read = []
+    from_bytes = minhash.from_bytes
+    minhash.from_bytes = lambda data: read.append(1) or from_bytes(data)
+    clock = time.perf_counter()
+    with SessionLocal() as db:
+        importer = Importer(db, target, "csv")
+        for start in range(0, len(body), 65536):
+            importer.feed(body[start:start + 65536])
+        report = importer.finish()
+    elapsed = time.perf_counter() - clock
+    print(f"imported {report['imported']} questions in {elapsed:.2f}s ({report['imported'] / elapsed:.0f}/s), "
+          f"{len(report['duplicates'])} flagged as near-duplicates")
+    print(f"stored signatures read by the duplicate check: {len(read)} of {args.bank} "
+          f"({len(read) / args.questions:.1f} per imported question)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
 from fastapi import FastAPI
-from .app.database import Base, engine
+from .app.database import Base, SessionLocal, engine
 from .app.routes.base import router as quiz_router
+from .app.services.attempts import manager as attempts
+from .app.services.leaderboard import leaderboards
 
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Quiz Service")
 app.include_router(quiz_router)
 
+
+@app.on_event("startup")
+def load_leaderboards():
+    with SessionLocal() as db:
+        leaderboards.load(db)
+
+
+@app.on_event("startup")
+def start_attempts():
+    # Rebuilds the timing wheel from the open attempts, then expires and checkpoints in the background
+    attempts.start_background(SessionLocal)
+
+
+@app.on_event("shutdown")
+def stop_attempts():
+    attempts.stop_background(SessionLocal)
+
+
 @app.get("/ping-db")
 def ping_db():
     from sqlalchemy import text
@@ -0,0 +1,240 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import QuizResult, StudentQuizAttempt
+from quiz_service.app.services import attempts
+from quiz_service.app.services.attempts import AttemptManager
+from quiz_service.app.services.question_bank import bank
+from quiz_service.app.services.timing_wheel import TimingWheel
+
+
+def quiz_body(questions=4, duration=10):
+    return {
+        "title": "Timed",
+        "duration": duration,
+        "questions": [
+            {"content": f"question {q}", "options": [{"label": f"q{q} option {o}", "is_correct": o == 0} for o in range(3)]}
+            for q in range(questions)
+        ],
+    }
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'quiz.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+    manager = AttemptManager()
+    monkeypatch.setattr("quiz_service.app.routes.base.manager", manager)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, manager
+    app.dependency_overrides.clear()
+
+
+def correct_answers(client, quiz_id, right):
+    body = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1}).json()
+    quiz = bank.get(None, quiz_id)
+    correct = set(quiz.option_ids[quiz.correct].tolist())
+    answers = {}
+    for i, question in enumerate(body["questions"]):
+        options = [o["option_id"] for o in question["options"]]
+        pick = [o for o in options if (o in correct) == (i < right)][0]
+        answers[str(question["question_id"])] = [pick]
+    return answers
+
+
+def test_timing_wheel():
+    wheel = TimingWheel(now=100, tick=1, slots=8)
+    wheel.add("a", 103)
+    wheel.add("b", 103.5)
+    wheel.add("c", 120)  # more than one revolution away
+    wheel.add("d", 50)  # already due: fires on the next tick
+    assert len(wheel) == 4
+    assert wheel.advance(101) == ["d"]
+    assert wheel.advance(102) == []
+    assert wheel.advance(103) == ["a"]
+    assert wheel.remove("b") and "b" not in wheel
+    assert wheel.advance(112) == []
+    assert wheel.advance(130) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_attempt_lifecycle(client_with_db):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body()).json()["quiz_id"]
+
+    attempt = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 5})
+    assert attempt.status_code == 201
+    attempt = attempt.json()
+    assert attempt["status"] == "open"
+    assert client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 5}).json()["attempt_id"] == attempt["attempt_id"]
+    assert client.post("/quizzes/999/attempts", params={"user_id": 5}).status_code == 404
+
+    answers = correct_answers(client, quiz_id, right=3)
+    saved = client.put(f"/quizzes/attempts/{attempt['attempt_id']}/answers", json={"answers": answers})
+    assert saved.status_code == 200 and len(saved.json()["answers"]) == 4
+    with SessionLocal() as db:
+        assert db.query(StudentQuizAttempt).get(attempt["attempt_id"]).answers == {}
+        assert manager.checkpoint(db) == 1
+        assert manager.checkpoint(db) == 0
+        assert len(db.query(StudentQuizAttempt).get(attempt["attempt_id"]).answers) == 4
+
+    result = client.post(f"/quizzes/attempts/{attempt['attempt_id']}/submit").json()
+    assert result["status"] == "submitted"
+    assert (result["correct"], result["total"], result["passed"]) == (3, 4, True)
+    assert client.post(f"/quizzes/attempts/{attempt['attempt_id']}/submit").status_code == 409
+    assert client.put(f"/quizzes/attempts/{attempt['attempt_id']}/answers", json={"answers": answers}).status_code == 409
+    assert client.get("/quizzes/attempts/999").status_code == 404
+    with SessionLocal() as db:
+        row = db.query(StudentQuizAttempt).get(attempt["attempt_id"])
+        assert (row.status, row.score, row.total) == ("submitted", 3, 4)
+        assert db.query(QuizResult).get((quiz_id, 5)).pass_fail is True
+    assert len(manager) == 0
+
+
+def test_expired_attempts_are_graded_in_bulk(client_with_db):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(duration=10)).json()["quiz_id"]
+    answers = correct_answers(client, quiz_id, right=1)
+    ids = []
+    for user_id in range(1, 21):
+        ids.append(client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": user_id}).json()["attempt_id"])
+        client.put(f"/quizzes/attempts/{ids[-1]}/answers", json={"answers": answers})
+
+    with SessionLocal() as db:
+        assert manager.expire(db, datetime.utcnow() + timedelta(minutes=9)) == 0
+        assert manager.expire(db, datetime.utcnow() + timedelta(minutes=11)) == 20
+        rows = db.query(StudentQuizAttempt).all()
+        assert {(r.status, r.score) for r in rows} == {("expired", 1)}
+        assert db.query(QuizResult).filter(QuizResult.pass_fail.is_(False)).count() == 20
+    assert client.get(f"/quizzes/attempts/{ids[0]}").status_code == 409
+
+
+def test_recovery_rebuilds_the_wheel(client_with_db, monkeypatch):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(duration=10)).json()["quiz_id"]
+    answers = correct_answers(client, quiz_id, right=4)
+    kept = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 1}).json()["attempt_id"]
+    lost = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 2}).json()["attempt_id"]
+    client.put(f"/quizzes/attempts/{kept}/answers", json={"answers": answers})
+    with SessionLocal() as db:
+        manager.checkpoint(db)
+    client.put(f"/quizzes/attempts/{lost}/answers", json={"answers": answers})  # never checkpointed
+
+    # The process dies; a new one starts from the database
+    restarted = AttemptManager()
+    monkeypatch.setattr("quiz_service.app.routes.base.manager", restarted)
+    with SessionLocal() as db:
+        assert restarted.recover(db) == 2
+    assert len(restarted) == 2
+    assert len(client.get(f"/quizzes/attempts/{kept}").json()["answers"]) == 4
+    assert client.get(f"/quizzes/attempts/{lost}").json()["answers"] == {}
+
+    with SessionLocal() as db:
+        assert restarted.expire(db, datetime.utcnow() + timedelta(minutes=11)) == 2
+        scores = {r.user_id: r.score for r in db.query(StudentQuizAttempt).all()}
+    assert scores == {1: 4, 2: 0}
+
+
+def test_attempt_held_by_two_processes_is_graded_once(client_with_db):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(duration=10)).json()["quiz_id"]
+    answers = correct_answers(client, quiz_id, right=4)
+    attempt_id = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 3}).json()["attempt_id"]
+    other = AttemptManager()  # another process holding a stale copy
+    with SessionLocal() as db:
+        assert other.recover(db) == 1
+
+    client.put(f"/quizzes/attempts/{attempt_id}/answers", json={"answers": answers})
+    assert client.post(f"/quizzes/attempts/{attempt_id}/submit").json()["correct"] == 4
+    with SessionLocal() as db:
+        assert other.expire(db, datetime.utcnow() + timedelta(minutes=11)) == 0
+        row = db.query(StudentQuizAttempt).get(attempt_id)
+        assert (row.status, row.score, len(row.answers)) == ("submitted", 4, 4)
+        assert db.query(QuizResult).get((quiz_id, 3)).score == 100
+        with pytest.raises(attempts.AttemptClosed):
+            other.submit(db, attempt_id)
+
+    # An untouched copy grades the answers its owner checkpointed
+    second = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 4}).json()["attempt_id"]
+    with SessionLocal() as db:
+        other.recover(db)
+    client.put(f"/quizzes/attempts/{second}/answers", json={"answers": answers})
+    with SessionLocal() as db:
+        manager.checkpoint(db)
+        assert other.expire(db, datetime.utcnow() + timedelta(minutes=12)) == 1
+        assert db.query(StudentQuizAttempt).get(second).score == 4
+
+
+def test_failed_grading_is_retried_and_checkpoints_skip_closed_attempts(client_with_db, monkeypatch):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(duration=10)).json()["quiz_id"]
+    answers = correct_answers(client, quiz_id, right=2)
+    attempt_id = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 1}).json()["attempt_id"]
+    client.put(f"/quizzes/attempts/{attempt_id}/answers", json={"answers": answers})
+
+    grade = attempts.grading.grade
+    def failing(*args, **kwargs):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(attempts.grading, "grade", failing)
+    later = datetime.utcnow() + timedelta(minutes=11)
+    with SessionLocal() as db:
+        with pytest.raises(RuntimeError):
+            manager.expire(db, later)
+        assert len(manager) == 1 and db.query(StudentQuizAttempt).get(attempt_id).status == "open"
+    monkeypatch.setattr(attempts.grading, "grade", grade)
+    with SessionLocal() as db:
+        assert manager.expire(db, later + timedelta(seconds=2)) == 1
+        assert db.query(StudentQuizAttempt).get(attempt_id).score == 2
+
+    # A checkpoint snapshot older than a committed submit does not overwrite its answers
+    attempt_id = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 2}).json()["attempt_id"]
+    client.put(f"/quizzes/attempts/{attempt_id}/answers", json={"answers": answers})
+    with SessionLocal() as db:
+        row = db.query(StudentQuizAttempt).get(attempt_id)
+        row.status, row.answers = "submitted", {"1": [1]}
+        db.commit()
+        assert manager.checkpoint(db) == 1
+        db.expire_all()
+        assert db.query(StudentQuizAttempt).get(attempt_id).answers == {"1": [1]}
+
+
+def test_one_open_attempt_across_processes(client_with_db):
+    client, SessionLocal, manager = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body()).json()["quiz_id"]
+    first = client.post(f"/quizzes/{quiz_id}/attempts", params={"user_id": 5}).json()
+
+    # Another process, or this one after a restart, adopts the open attempt
+    with SessionLocal() as db:
+        assert AttemptManager().start(db, quiz_id, 5).attempt_id == first["attempt_id"]
+        db.add(StudentQuizAttempt(user_id=5, quiz_id=quiz_id, status="open"))
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+
+        # An open attempt that ran out while nobody held it is closed before a new one opens
+        row = db.query(StudentQuizAttempt).get(first["attempt_id"])
+        row.deadline = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+        second = AttemptManager().start(db, quiz_id, 5)
+        assert second.attempt_id != first["attempt_id"]
+        assert db.query(StudentQuizAttempt).get(first["attempt_id"]).status == "expired"
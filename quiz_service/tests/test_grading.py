@@ -0,0 +1,80 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base
+from quiz_service.app.models.quiz import QuizResult, StudentQuizAttempt
+from quiz_service.app.schemas.quiz import QuizIn
+from quiz_service.app.services import grading, quizzes
+from quiz_service.app.services.question_bank import bank
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'grading.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+    return sessionmaker(bind=engine), engine
+
+
+def make_quiz(db):
+    # q0: single, option a correct; q1: multiple, options a and b correct
+    quiz = quizzes.create_quiz(db, QuizIn(title="Mixed", questions=[
+        {"content": "single", "options": [{"label": "a", "is_correct": True}, {"label": "b"}, {"label": "c"}]},
+        {"content": "multi", "type": "multiple", "options": [
+            {"label": "a", "is_correct": True}, {"label": "b", "is_correct": True}, {"label": "c"}, {"label": "d"},
+        ]},
+    ]))
+    loaded = bank.get(db, quiz.quiz_id)
+    (q0, q1) = loaded.question_ids.tolist()
+    options = loaded.option_ids.tolist()
+    return loaded, q0, q1, options[:3], options[3:]
+
+
+def test_scores_exact_and_partial_credit(session_factory):
+    SessionLocal, _ = session_factory
+    with SessionLocal() as db:
+        quiz, q0, q1, single, multi = make_quiz(db)
+    answers = [
+        {q0: [single[0]], q1: [multi[0], multi[1]]},  # all right
+        {q0: [single[0], single[1]], q1: [multi[0]]},  # extra option on single, half of multi
+        {q0: [single[1]], q1: [multi[0], multi[2]]},  # wrong, one right and one wrong cancel out
+        {q1: [multi[0], multi[2], multi[3]]},  # unanswered, floored at 0
+        {q0: [999999], q1: [single[0], multi[1]]},  # unknown option ignored, other question's option is wrong
+        {},
+    ]
+    credit = grading.score(quiz, grading.answer_matrix(quiz, answers))
+    np.testing.assert_allclose(credit, [[1, 1], [0, 0.5], [0, 0], [0, 0], [0, 0.5], [0, 0]])
+
+
+def test_grade_writes_results_in_one_upsert(session_factory):
+    SessionLocal, engine = session_factory
+    with SessionLocal() as db:
+        quiz, q0, q1, single, multi = make_quiz(db)
+        db.add_all([StudentQuizAttempt(attempt_id=i, user_id=i, quiz_id=quiz.quiz_id, status="open") for i in (1, 2, 3)])
+        db.add(QuizResult(quiz_id=quiz.quiz_id, user_id=3, score=0, pass_fail=False))
+        db.commit()
+        attempts = [
+            SimpleNamespace(attempt_id=1, user_id=1, quiz_id=quiz.quiz_id, answers={q0: [single[0]], q1: multi[:2]}),
+            SimpleNamespace(attempt_id=2, user_id=2, quiz_id=quiz.quiz_id, answers={q1: multi[:1]}),
+            SimpleNamespace(attempt_id=3, user_id=3, quiz_id=quiz.quiz_id, answers={q0: [single[0]], q1: multi[:1]}),
+        ]
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        results = grading.grade(db, attempts, "submitted")
+        assert sum("quiz_results" in s for s in statements) == 1
+
+        assert [(r["points"], r["percentage"], r["passed"]) for r in results] == [
+            (2, 100, True), (0.5, 25, False), (1.5, 75, True),
+        ]
+        assert {r.user_id: (r.score, r.pass_fail) for r in db.query(QuizResult)} == {
+            1: (100, True), 2: (25, False), 3: (75, True),
+        }
+        assert {r.attempt_id: (r.status, r.score) for r in db.query(StudentQuizAttempt)} == {
+            1: ("submitted", 2), 2: ("submitted", 0.5), 3: ("submitted", 1.5),
+        }
@@ -0,0 +1,135 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import StudentQuizAttempt
+from quiz_service.app.services import grading
+from quiz_service.app.services.item_analysis import ItemAnalysis, ItemStats
+from quiz_service.app.services.question_bank import bank
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'items.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+    analysis = ItemAnalysis()
+    monkeypatch.setattr("quiz_service.app.routes.base.analysis", analysis)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+
+
+def create_quiz(client):
+    body = {"title": "Items", "questions": [
+        {"content": f"question {q}", "options": [{"label": f"q{q} {o}", "is_correct": o == 0} for o in range(3)]}
+        for q in range(3)
+    ]}
+    return client.post("/quizzes", json=body).json()["quiz_id"]
+
+
+def submit(SessionLocal, quiz_id, choices, first_id):
+    """Graded attempts choosing option ``choices[n][i]`` (0 is correct) for question i."""
+    with SessionLocal() as db:
+        quiz = bank.get(db, quiz_id)
+        options = [quiz.option_ids[quiz.option_start[i]:quiz.option_start[i + 1]].tolist() for i in range(quiz.size)]
+        attempts = [
+            SimpleNamespace(attempt_id=first_id + n, user_id=first_id + n, quiz_id=quiz_id,
+                            answers={q: [options[i][c]] for i, (q, c) in enumerate(zip(quiz.question_ids.tolist(), row))})
+            for n, row in enumerate(choices)
+        ]
+        db.add_all([StudentQuizAttempt(attempt_id=a.attempt_id, user_id=a.user_id, quiz_id=quiz_id) for a in attempts])
+        db.commit()
+        grading.grade(db, attempts, "submitted")
+
+
+def test_item_statistics(client_with_db):
+    client, SessionLocal, _ = client_with_db
+    quiz_id = create_quiz(client)
+    rng = np.random.default_rng(3)
+    ability = rng.random(200)
+    # q0 tracks ability, q1 is answered right by nearly everyone, q2 lures strong learners to option 1
+    choices = np.stack([
+        np.where(rng.random(200) < ability, 0, 2),
+        np.where(rng.random(200) < 0.97, 0, 1),
+        np.where(ability > 0.6, 1, np.where(rng.random(200) < 0.5, 0, 2)),
+    ], axis=1)
+    submit(SessionLocal, quiz_id, choices.tolist(), first_id=1)
+
+    report = client.get(f"/quizzes/{quiz_id}/item-analysis").json()
+    assert report["attempts"] == 200
+    q0, q1, q2 = report["questions"]
+    credit = (choices == 0).astype(float)
+    totals = credit.sum(axis=1)
+    for i, question in enumerate(report["questions"]):
+        assert question["difficulty"] == pytest.approx(credit[:, i].mean(), abs=1e-4)
+        assert question["point_biserial"] == pytest.approx(np.corrcoef(credit[:, i], totals)[0, 1], abs=1e-4)
+        rates = [o["selection_rate"] for o in question["options"]]
+        assert rates == pytest.approx([(choices[:, i] == c).mean() for c in range(3)], abs=1e-4)
+    assert q0["discrimination"] > 0.5 and q0["flags"] == []
+    assert "too_easy" in q1["flags"]
+    assert "misleading_distractor" in q2["flags"]
+    assert q2["options"][1]["upper_rate"] > q2["options"][1]["lower_rate"]
+    assert client.get("/quizzes/999/item-analysis").status_code == 404
+
+
+def test_refresh_reads_only_new_attempts(client_with_db, monkeypatch):
+    client, SessionLocal, _ = client_with_db
+    quiz_id = create_quiz(client)
+    rng = np.random.default_rng(4)
+    batches = [rng.integers(0, 3, size=(50, 3)).tolist() for _ in range(3)]
+    submit(SessionLocal, quiz_id, batches[0], first_id=1)
+    assert client.get(f"/quizzes/{quiz_id}/item-analysis").json()["attempts"] == 50
+    # An open attempt does not count
+    with SessionLocal() as db:
+        db.add(StudentQuizAttempt(attempt_id=1000, user_id=1000, quiz_id=quiz_id, status="open"))
+        db.commit()
+    submit(SessionLocal, quiz_id, batches[1], first_id=101)
+    submit(SessionLocal, quiz_id, batches[2], first_id=201)
+
+    folded = []
+    add = ItemStats.add
+    monkeypatch.setattr(ItemStats, "add", lambda self, quiz, answers: folded.append(len(answers)) or add(self, quiz, answers))
+    incremental = client.get(f"/quizzes/{quiz_id}/item-analysis").json()
+    assert incremental["attempts"] == 150
+    assert folded == [100]
+
+    with SessionLocal() as db:
+        fresh = ItemAnalysis().get(db, quiz_id)
+    assert incremental == fresh
+    assert client.get(f"/quizzes/{quiz_id}/item-analysis").json() == fresh
+    assert folded == [100, 150]
+
+
+def test_changed_answer_key_rebuilds(client_with_db):
+    client, SessionLocal, _ = client_with_db
+    quiz_id = create_quiz(client)
+    submit(SessionLocal, quiz_id, [[0, 0, 0], [0, 1, 2]], first_id=1)
+    assert client.get(f"/quizzes/{quiz_id}/item-analysis").json()["questions"][0]["difficulty"] == 1.0
+    assert client.get(f"/quizzes/{quiz_id}/item-analysis").json()["attempts"] == 2
+
+    body = {"title": "Items", "questions": [
+        {"content": f"question {q}", "options": [{"label": f"q{q} {o}", "is_correct": o == 1} for o in range(3)]}
+        for q in range(3)
+    ]}
+    client.put(f"/quizzes/{quiz_id}", json=body)
+    report = client.get(f"/quizzes/{quiz_id}/item-analysis").json()
+    assert report["attempts"] == 2 and report["questions"][0]["difficulty"] == 0.0
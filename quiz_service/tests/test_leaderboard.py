@@ -0,0 +1,113 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import QuizResult, StudentQuizAttempt
+from quiz_service.app.services import grading
+from quiz_service.app.services.leaderboard import FenwickTree, Ranking, leaderboards
+from quiz_service.app.services.question_bank import bank
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'leaderboard.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+    leaderboards.clear()
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+    leaderboards.clear()
+
+
+def test_fenwick_prefix_and_find():
+    counts = [3, 0, 2, 5, 0, 1]
+    tree = FenwickTree(counts)
+    tree.add(1, 2)
+    counts[1] += 2
+    assert [tree.prefix(i) for i in range(len(counts) + 1)] == [0, 3, 5, 7, 12, 12, 13]
+    assert [tree.find(p) for p in range(sum(counts))] == [i for i, c in enumerate(counts) for _ in range(c)]
+
+
+def test_ranking_matches_sorting():
+    rng = np.random.default_rng(7)
+    ranking = Ranking({user_id: int(rng.integers(0, 101)) for user_id in range(300)})
+    for user_id in rng.integers(0, 400, 200).tolist():
+        ranking.set(user_id, int(rng.integers(0, 101)))
+
+    order = sorted(ranking.scores, key=lambda u: (-ranking.scores[u], u))
+    entries = ranking.entries(0, len(ranking) + 10)
+    assert [e["user_id"] for e in entries] == order
+    for n, user_id in enumerate(order):
+        score = ranking.scores[user_id]
+        assert ranking.position(user_id) == n
+        assert ranking.standing(user_id)["rank"] == 1 + sum(s > score for s in ranking.scores.values())
+    assert ranking.entries(40, 45) == entries[40:45]
+
+
+def test_endpoints_follow_grading_without_queries(client_with_db):
+    client, SessionLocal, engine = client_with_db
+    quiz_id = client.post("/quizzes", json={"title": "Ranked", "questions": [
+        {"content": f"q{n}", "options": [{"label": "right", "is_correct": True}, {"label": "wrong"}]} for n in range(4)
+    ]}).json()["quiz_id"]
+    with SessionLocal() as db:
+        quiz = bank.get(db, quiz_id)
+        right = quiz.option_ids[quiz.correct].tolist()
+        db.add_all([StudentQuizAttempt(attempt_id=i, user_id=i, quiz_id=quiz_id, status="open") for i in range(1, 8)])
+        db.commit()
+        attempts = [
+            SimpleNamespace(attempt_id=user_id, user_id=user_id, quiz_id=quiz_id,
+                            answers=dict(zip(quiz.question_ids.tolist(), [[o] for o in right[:correct]])))
+            for user_id, correct in [(1, 2), (2, 4), (3, 1), (4, 2), (5, 3), (6, 0)]
+        ]
+        grading.grade(db, attempts, "submitted")
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    top = client.get(f"/quizzes/{quiz_id}/leaderboard", params={"limit": 4}).json()
+    assert top["learners"] == 6
+    assert [(e["rank"], e["user_id"], e["score"]) for e in top["top"]] == [(1, 2, 100), (2, 5, 75), (3, 1, 50), (3, 4, 50)]
+    assert client.get(f"/quizzes/{quiz_id}/leaderboard/users/4").json() == {
+        "user_id": 4, "score": 50, "rank": 3, "percentile": 66.67, "learners": 6,
+    }
+    around = client.get(f"/quizzes/{quiz_id}/leaderboard/users/1/around", params={"size": 1}).json()
+    assert [e["user_id"] for e in around["around"]] == [5, 1, 4]
+    assert client.get(f"/quizzes/{quiz_id}/leaderboard/users/99").status_code == 404
+    assert statements == []
+
+    with SessionLocal() as db:
+        grading.grade(db, [SimpleNamespace(attempt_id=7, user_id=6, quiz_id=quiz_id,
+                                           answers={q: [o] for q, o in zip(quiz.question_ids.tolist(), right)})], "submitted")
+    assert client.get(f"/quizzes/{quiz_id}/leaderboard/users/6").json()["rank"] == 1
+    assert client.get(f"/quizzes/{quiz_id}/leaderboard/users/2").json()["rank"] == 1
+    assert client.get(f"/quizzes/{quiz_id}/leaderboard/users/5").json()["rank"] == 3
+
+
+def test_load_rebuilds_from_results(client_with_db):
+    client, SessionLocal, _ = client_with_db
+    with SessionLocal() as db:
+        db.add_all([QuizResult(quiz_id=1, user_id=u, score=s, pass_fail=s >= 70) for u, s in [(1, 90), (2, 40), (3, 90)]])
+        db.add(QuizResult(quiz_id=2, user_id=1, score=10, pass_fail=False))
+        db.commit()
+        assert leaderboards.load(db) == 4
+    assert [e["user_id"] for e in client.get("/quizzes/1/leaderboard").json()["top"]] == [1, 3, 2]
+    assert client.get("/quizzes/2/leaderboard/users/1").json()["percentile"] == 100.0
+    assert client.get("/quizzes/3/leaderboard").json() == {"quiz_id": 3, "learners": 0, "top": []}
@@ -0,0 +1,160 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import QuestionReview
+from quiz_service.app.services.question_bank import bank, shuffle
+
+
+def quiz_body(title="Python basics", questions=6, options=4):
+    return {
+        "title": title,
+        "duration": 20,
+        "questions": [
+            {
+                "content": f"{title} question {q}",
+                "options": [{"label": f"q{q} option {o}", "is_correct": o == 0} for o in range(options)],
+            }
+            for q in range(questions)
+        ],
+    }
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'quiz.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_delivery_is_shuffled_per_learner_and_hides_answers(client_with_db):
+    client, _, _ = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body()).json()["quiz_id"]
+
+    first = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 7}).json()
+    assert first["title"] == "Python basics" and first["duration"] == 20
+    assert len(first["questions"]) == 6
+    assert all(len(q["options"]) == 4 and set(q["options"][0]) == {"option_id", "label"} for q in first["questions"])
+    for question in first["questions"]:
+        number = question["content"].split()[-1]
+        assert all(o["label"].startswith(f"q{number} ") for o in question["options"])
+
+    def order(user_id, attempt=0):
+        body = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": user_id, "attempt": attempt}).json()
+        return [(q["question_id"], [o["option_id"] for o in q["options"]]) for q in body["questions"]]
+
+    assert order(7) == order(7)
+    orders = {str(order(user_id)) for user_id in range(20)}
+    assert len(orders) == 20
+    assert order(7, attempt=1) != order(7)
+    assert sorted((q, sorted(o)) for q, o in order(3)) == sorted((q, sorted(o)) for q, o in order(4))
+
+
+def test_hot_path_does_not_touch_the_database(client_with_db):
+    client, _, engine = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(questions=50)).json()["quiz_id"]
+    statements = count_statements(engine)
+    client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1})
+    assert len(statements) == 2
+    for user_id in range(2, 50):
+        assert client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": user_id}).status_code == 200
+    assert len(statements) == 2
+
+
+def test_edit_invalidates_the_quiz(client_with_db):
+    client, _, _ = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body()).json()["quiz_id"]
+    client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1})
+    assert client.put(f"/quizzes/{quiz_id}", json=quiz_body("Revised", questions=2, options=3)).status_code == 200
+    body = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1}).json()
+    assert body["title"] == "Revised"
+    assert [len(q["options"]) for q in body["questions"]] == [3, 3]
+    assert client.put("/quizzes/999", json=quiz_body()).status_code == 404
+    assert client.get("/quizzes/999/delivery", params={"user_id": 1}).status_code == 404
+
+
+def test_edit_updates_questions_in_place(client_with_db):
+    client, SessionLocal, _ = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body(questions=3, options=2)).json()["quiz_id"]
+    delivered = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1}).json()["questions"]
+    q0, q1, q2 = sorted(delivered, key=lambda q: q["question_id"])
+    kept_option = min(o["option_id"] for o in q0["options"])
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.add_all([QuestionReview(user_id=5, question_id=q["question_id"], quiz_id=quiz_id, reviewed_at=now, due_at=now)
+                    for q in (q0, q2)])
+        db.commit()
+
+    body = quiz_body(questions=0)
+    body["questions"] = [
+        {"question_id": q0["question_id"], "content": "reworded",
+         "options": [{"option_id": kept_option, "label": "edited", "is_correct": True}, {"label": "new"}]},
+        {"question_id": q1["question_id"], "content": q1["content"],
+         "options": [{"option_id": o["option_id"], "label": o["label"]} for o in q1["options"]]},
+        {"content": "added", "options": [{"label": "only", "is_correct": True}]},
+    ]
+    assert client.put(f"/quizzes/{quiz_id}", json=body).status_code == 200
+
+    after = sorted(client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1}).json()["questions"],
+                   key=lambda q: q["question_id"])
+    assert [q["question_id"] for q in after[:2]] == [q0["question_id"], q1["question_id"]]
+    assert [q["content"] for q in after] == ["reworded", q1["content"], "added"]
+    labels = {o["option_id"]: o["label"] for o in after[0]["options"]}
+    assert labels[kept_option] == "edited" and sorted(labels.values()) == ["edited", "new"]
+    assert {o["option_id"] for o in after[1]["options"]} == {o["option_id"] for o in q1["options"]}
+    with SessionLocal() as db:
+        assert [r.question_id for r in db.query(QuestionReview)] == [q0["question_id"]]
+
+    body["questions"][0]["question_id"] = q2["question_id"]
+    assert client.put(f"/quizzes/{quiz_id}", json=body).status_code == 400
+
+
+def test_concurrent_misses_load_once(client_with_db):
+    client, SessionLocal, engine = client_with_db
+    quiz_id = client.post("/quizzes", json=quiz_body()).json()["quiz_id"]
+    statements = count_statements(engine)
+    start = threading.Barrier(16)
+    loaded = []
+
+    def learner():
+        start.wait()
+        with SessionLocal() as db:
+            loaded.append(bank.get(db, quiz_id))
+
+    threads = [threading.Thread(target=learner) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(statements) == 2
+    assert len({id(quiz) for quiz in loaded}) == 1
+    question_order, option_order = shuffle(loaded[0], user_id=5)
+    assert sorted(question_order.tolist()) == list(range(6))
+    assert loaded[0].correct[option_order].sum() == 6
@@ -0,0 +1,128 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import Option, Question, QuestionBucket
+from quiz_service.app.services import minhash, question_import
+from quiz_service.app.services.question_bank import bank
+
+CSV = (
+    'question,type,correct,option1,option2,option3\n'
+    'What is the capital city of France ?,single,2,Lyon,Paris,Nice\n'
+    '"Which keyword defines a function\n'
+    'in Python?",single,1,def,func,"lambda, sort of"\n'
+    'Which planet is known as the red planet?,single,3,Venus,Jupiter,Mars\n'
+    'Pick the even numbers,multiple,1;3,2,3,4\n'
+    'Broken row,single,x,a,b,c\n'
+    'No options,single,1,,,\n'
+    'Which planet is known as the Red Planet??,single,3,Venus,Jupiter,Mars\n'
+)
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+
+
+def test_minhash_estimates_jaccard():
+    a = "How many bytes are in a kilobyte according to the IEC standard?"
+    b = "According to the IEC standard, how many bytes are in one kilobyte?"
+    exact = len(set(minhash.shingles(a)) & set(minhash.shingles(b))) / len(set(minhash.shingles(a)) | set(minhash.shingles(b)))
+    signatures = minhash.signatures([a, b, a.upper()])
+    assert minhash.similarity(signatures[0], signatures[1:]) == pytest.approx([exact, 1.0], abs=0.1)
+    keys = minhash.band_keys(signatures)
+    assert keys.shape == (3, minhash.BANDS) and (keys[0] == keys[2]).all()
+
+
+def test_streamed_csv_import_flags_near_duplicates(client_with_db, monkeypatch):
+    client, SessionLocal, _ = client_with_db
+    monkeypatch.setattr(question_import, "IMPORT_CHUNK", 2)
+    quiz_id = client.post("/quizzes", json={"title": "Existing", "questions": [
+        {"content": "What is the capital city of France?", "options": [{"label": "Paris", "is_correct": True}]},
+    ]}).json()["quiz_id"]
+    existing = client.get(f"/quizzes/{quiz_id}/delivery", params={"user_id": 1}).json()["questions"][0]["question_id"]
+    target = client.post("/quizzes", json={"title": "Imported"}).json()["quiz_id"]
+
+    body = CSV.encode()
+    pieces = [body[i:i + 7] for i in range(0, len(body), 7)]
+    report = client.post(f"/quizzes/{target}/questions/import", content=iter(pieces),
+                         headers={"content-type": "text/csv"}).json()
+
+    assert report["imported"] == 5
+    assert [s["row"] for s in report["skipped"]] == [5, 6]
+    flagged = {d["row"]: d["matches"] for d in report["duplicates"]}
+    assert set(flagged) == {1, 7}
+    assert flagged[1] == [{"question_id": existing, "similarity": 1.0}]
+    red_planet = client.get(f"/quizzes/{target}/delivery", params={"user_id": 1}).json()["questions"]
+    assert flagged[7][0]["question_id"] in {q["question_id"] for q in red_planet if "red planet" in q["content"]}
+
+    with SessionLocal() as db:
+        question = db.query(Question).filter(Question.content.like("Which keyword%")).one()
+        assert question.content == "Which keyword defines a function\nin Python?"
+        options = db.query(Option).filter(Option.question_id == question.question_id).order_by(Option.option_id).all()
+        assert [(o.label, o.is_correct) for o in options] == [("def", True), ("func", False), ("lambda, sort of", False)]
+        even = db.query(Question).filter(Question.content == "Pick the even numbers").one()
+        assert even.type == "multiple"
+        assert db.query(QuestionBucket).count() <= 6 * minhash.BANDS
+    assert len(client.get(f"/quizzes/{target}/delivery", params={"user_id": 1}).json()["questions"]) == 5
+
+
+def test_json_formats(client_with_db):
+    client, _, _ = client_with_db
+    quiz_id = client.post("/quizzes", json={"title": "Json"}).json()["quiz_id"]
+    topics = ["the water cycle", "prime factorisation", "medieval trade routes", "photosynthesis in leaves"]
+    questions = [{"content": f"Explain {topic}.", "options": [{"label": "yes", "is_correct": True}, {"label": "no"}]}
+                 for topic in topics]
+    lines = "\n".join(json.dumps(q) for q in questions[:2]) + "\nnot json\n"
+    report = client.post(f"/quizzes/{quiz_id}/questions/import", content=lines,
+                         headers={"content-type": "application/x-ndjson"}).json()
+    assert (report["imported"], [s["row"] for s in report["skipped"]], report["duplicates"]) == (2, [3], [])
+    report = client.post(f"/quizzes/{quiz_id}/questions/import", json=questions[2:]).json()
+    assert report["imported"] == 2 and report["duplicates"] == []
+    report = client.post(f"/quizzes/{quiz_id}/questions/import", json=questions[:1]).json()
+    assert len(report["duplicates"]) == 1
+
+    assert client.post(f"/quizzes/{quiz_id}/questions/import", content="{", headers={"content-type": "application/json"}).status_code == 400
+    assert client.post(f"/quizzes/{quiz_id}/questions/import", content="a,b\n1,2\n",
+                       headers={"content-type": "text/csv"}).status_code == 400
+    assert client.post("/quizzes/999/questions/import", json=questions).status_code == 404
+
+
+def test_duplicate_check_reads_only_candidates(client_with_db, monkeypatch):
+    client, _, _ = client_with_db
+    quiz_id = client.post("/quizzes", json={"title": "Bank"}).json()["quiz_id"]
+    rng = np.random.default_rng(1)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz "))
+    bank_questions = [{"content": "".join(rng.choice(letters, 60)), "options": [{"label": "x", "is_correct": True}]}
+                      for _ in range(300)]
+    assert client.post(f"/quizzes/{quiz_id}/questions/import", json=bank_questions).json()["duplicates"] == []
+
+    read = []
+    from_bytes = minhash.from_bytes
+    monkeypatch.setattr(minhash, "from_bytes", lambda data: read.append(1) or from_bytes(data))
+    report = client.post(f"/quizzes/{quiz_id}/questions/import", json=bank_questions[:1]).json()
+    assert [m["similarity"] for m in report["duplicates"][0]["matches"]] == [1.0]
+    assert len(read) < 10
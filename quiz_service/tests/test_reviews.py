@@ -0,0 +1,161 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from quiz_service.app.database import Base, get_db
+from quiz_service.app.models.quiz import QuestionReview, StudentQuizAttempt
+from quiz_service.app.services import grading, reviews
+from quiz_service.app.services.question_bank import bank
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    from quiz_service.main import app
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bank.clear()
+    reviews.queues.clear()
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+    reviews.queues.clear()
+
+
+def test_sm2_intervals():
+    repetitions, interval, ease = np.zeros(1, dtype=np.int64), np.zeros(1), np.full(1, reviews.INITIAL_EASE)
+    intervals = []
+    for q in [5, 5, 4, 1, 3]:
+        repetitions, interval, ease = reviews.sm2(repetitions, interval, ease, np.array([q]))
+        intervals.append((int(repetitions[0]), float(interval[0]), round(float(ease[0]), 2)))
+    assert intervals == [(1, 1.0, 2.6), (2, 6.0, 2.7), (3, 16.0, 2.7), (0, 1.0, 2.7), (1, 1.0, 2.56)]
+    assert reviews.quality(np.array([0, 0.5, 0.6, 1], dtype=np.float32)).tolist() == [0, 2, 3, 5]
+
+
+def test_queue_pops_due_and_skips_stale_entries():
+    now = datetime(2026, 1, 10)
+    queue = reviews.LearnerQueue([(q, 1, now + timedelta(days=q - 5)) for q in range(10)])
+    for q in range(5):
+        queue.set(q, 1, now + timedelta(days=30 + q))  # rescheduled into the future
+    queue.set(9, 1, now - timedelta(days=10))
+    taken, next_due = queue.due(now, 3)
+    assert [q for _, q in taken] == [9, 5]
+    assert next_due == now + timedelta(days=1)
+    assert queue.due(now, 1)[0] == taken[:1]
+
+
+def attempts_for(quiz, right, outcomes, first_id=1):
+    return [
+        SimpleNamespace(attempt_id=first_id + n, user_id=user_id, quiz_id=quiz.quiz_id,
+                        answers={q: [right[i]] for i, q in enumerate(quiz.question_ids.tolist()) if i in correct})
+        for n, (user_id, correct) in enumerate(outcomes)
+    ]
+
+
+def test_wrong_answers_come_back_due(client_with_db):
+    client, SessionLocal, engine = client_with_db
+    quiz_id = client.post("/quizzes", json={"title": "Review", "questions": [
+        {"content": f"q{n}", "options": [{"label": "right", "is_correct": True}, {"label": "wrong"}]} for n in range(3)
+    ]}).json()["quiz_id"]
+    with SessionLocal() as db:
+        quiz = bank.get(db, quiz_id)
+        right = quiz.option_ids[quiz.correct].tolist()
+        q0, q1, q2 = quiz.question_ids.tolist()
+        db.add(StudentQuizAttempt(attempt_id=1, user_id=1, quiz_id=quiz_id, status="open"))
+        db.commit()
+        grading.grade(db, attempts_for(quiz, right, [(1, {0})]), "submitted")
+        schedule = {r.question_id: r for r in db.query(QuestionReview).filter(QuestionReview.user_id == 1)}
+        assert set(schedule) == {q1, q2}
+        assert (schedule[q1].repetitions, schedule[q1].interval_days, schedule[q1].lapses) == (0, 1.0, 1)
+
+    later = datetime.utcnow() + timedelta(days=2)
+    with SessionLocal() as db:
+        due = reviews.queues.due(db, 1, 10, now=later)
+    assert sorted(d["question_id"] for d in due["due"]) == [q1, q2] and due["scheduled"] == 2
+
+    # Warm: reading again and recording outcomes do not reload the schedule
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda *args: statements.append(args[2]) if "question_reviews" in args[2] and args[2].startswith("SELECT") else None)
+    assert client.get("/quizzes/reviews/1/due").json()["due"] == []
+    reviewed = client.post("/quizzes/reviews/1/answers", json={"answers": {q1: [right[1]], q0: [right[0]]}}).json()["reviewed"]
+    assert [(r["question_id"], r["quality"], r["interval_days"]) for r in reviewed] == [(q1, 5, 1.0)]
+    with SessionLocal() as db:
+        due = reviews.queues.due(db, 1, 10, now=later)
+        assert sorted(d["question_id"] for d in due["due"]) == [q1, q2]
+        # On a retake q1 passes again (6 days out), q2 passes for the first time (1 day) and q0, now wrong, joins
+        db.add(StudentQuizAttempt(attempt_id=2, user_id=1, quiz_id=quiz_id, status="open"))
+        db.commit()
+        grading.grade(db, attempts_for(quiz, right, [(1, {1, 2})], first_id=2), "submitted")
+        due = reviews.queues.due(db, 1, 10, now=later)
+    assert [d["question_id"] for d in due["due"]] == [q0, q2]
+    assert due["next_due_at"] is not None
+    # Only record()'s lookups of existing schedules, for the review answer and the retake
+    assert len(statements) == 2 and all("user_id IN" in sql for sql in statements)
+
+
+def test_lazy_load_lru_and_recompute(client_with_db, monkeypatch):
+    client, SessionLocal, _ = client_with_db
+    now = datetime(2026, 1, 1)
+    with SessionLocal() as db:
+        db.add_all([QuestionReview(user_id=u, question_id=q, quiz_id=1, repetitions=3, interval_days=400.0, ease=2.5,
+                                   lapses=0, reviewed_at=now, due_at=now + timedelta(days=400))
+                    for u in (1, 2, 3) for q in (10, 11)])
+        db.commit()
+        queues = reviews.ReviewQueues(capacity=2)
+        for user_id in (1, 2, 3):
+            assert queues.due(db, user_id, 5, now=now + timedelta(days=401))["scheduled"] == 2
+        assert list(queues._queues) == [2, 3]
+
+        monkeypatch.setattr(reviews, "RECOMPUTE_CHUNK", 4)
+        monkeypatch.setattr(reviews, "REVIEW_MAX_INTERVAL_DAYS", 365.0)
+        assert {k: v for k, v in reviews.recompute(db, chunk=4).items() if k != "seconds"} == {"reviews": 6, "updated": 6}
+        assert {r.due_at for r in db.query(QuestionReview)} == {now + timedelta(days=365)}
+        assert reviews.recompute(db)["updated"] == 0
+
+
+def test_outcomes_for_another_learner_do_not_drop_a_loading_queue(client_with_db, monkeypatch):
+    _, SessionLocal, _ = client_with_db
+    now = datetime(2026, 1, 1)
+    with SessionLocal() as db:
+        db.add_all([QuestionReview(user_id=u, question_id=10, quiz_id=1, repetitions=0, interval_days=1.0, ease=2.5,
+                                   lapses=1, reviewed_at=now, due_at=now) for u in (1, 2)])
+        db.commit()
+    queues = reviews.ReviewQueues()
+    load = reviews.LearnerQueue
+
+    def loading(row):
+        def load_during_write(rows):
+            queue = load(rows)
+            queues.apply([row])  # recorded while the query ran
+            return queue
+        return load_during_write
+
+    other = {"user_id": 2, "question_id": 10, "quiz_id": 1, "due_at": now}
+    monkeypatch.setattr(reviews, "LearnerQueue", loading(other))
+    with SessionLocal() as db:
+        queues.due(db, 1, 5, now=now)
+    assert list(queues._queues) == [1]
+
+    # An outcome for the learner being loaded may be missing from the rows read
+    mine = {"user_id": 3, "question_id": 10, "quiz_id": 1, "due_at": now}
+    monkeypatch.setattr(reviews, "LearnerQueue", loading(mine))
+    with SessionLocal() as db:
+        queues.due(db, 3, 5, now=now)
+    assert list(queues._queues) == [1] and not queues._loading
@@ -0,0 +1,165 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path / 'test.db'}"
+    from app.main import app
+    from app.database import get_db
+    from app.models.base import Base
+    from app.services import at_risk, response_cache
+
+    engine = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(at_risk, "top_k", at_risk.TopKCache(k=10, ttl=3600))
+    monkeypatch.setattr(response_cache, "cache", response_cache.ResponseCache())
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal, engine
+    app.dependency_overrides.clear()
+
+
+def seed(SessionLocal):
+    from app.models.analytics import AtRiskStudent, WorkshopTrainer
+
+    rows = [
+        # Repeated scores exercise the tie-breakers in the cursor
+        {"user_id": u, "workshop_id": w, "risk_score": round(((u * 7 + w * 3) % 10) / 10, 1), "flagged_reason": "inactive"}
+        for u in range(30)
+        for w in (1, 2, 3)
+    ]
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(AtRiskStudent, rows)
+        db.bulk_insert_mappings(WorkshopTrainer, [
+            {"workshop_id": 1, "trainer_id": 100},
+            {"workshop_id": 2, "trainer_id": 100},
+            {"workshop_id": 3, "trainer_id": 200},
+        ])
+        db.commit()
+    return sorted(rows, key=lambda r: (-r["risk_score"], r["user_id"], r["workshop_id"]))
+
+
+def keys(items):
+    return [(i["user_id"], i["workshop_id"]) for i in items]
+
+
+def walk(client, **params):
+    items, cursor = [], None
+    while True:
+        query = dict(params, limit=7)
+        if cursor:
+            query["cursor"] = cursor
+        page = client.get("/analytics/at-risk", params=query).json()
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_keyset_pages_cover_ranking_once(client_with_db):
+    client, SessionLocal, _ = client_with_db
+    expected = seed(SessionLocal)
+    assert keys(walk(client)) == keys(expected)
+    assert keys(walk(client, workshop_id=2)) == keys(r for r in expected if r["workshop_id"] == 2)
+    assert keys(walk(client, trainer_id=100)) == keys(r for r in expected if r["workshop_id"] in (1, 2))
+
+
+def test_first_page_served_from_top_k_without_query(client_with_db):
+    from app.services import at_risk
+
+    client, SessionLocal, engine = client_with_db
+    expected = seed(SessionLocal)
+    with SessionLocal() as db:
+        at_risk.top_k.refresh(db)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        overall = client.get("/analytics/at-risk", params={"limit": 10}).json()
+        trainer = client.get("/analytics/at-risk", params={"limit": 5, "trainer_id": 200}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert statements == []
+    assert keys(overall["items"]) == keys(expected[:10])
+    assert keys(trainer["items"]) == keys([r for r in expected if r["workshop_id"] == 3][:5])
+
+    # Pages beyond the cache come from the database
+    second = client.get("/analytics/at-risk", params={"limit": 10, "cursor": overall["next_cursor"]}).json()
+    assert keys(second["items"]) == keys(expected[10:20])
+
+
+def test_invalid_cursor(client_with_db):
+    client, _, _ = client_with_db
+    assert client.get("/analytics/at-risk", params={"cursor": "nope"}).status_code == 400
+
+
+def test_cursor_after_entry_without_workshop(client_with_db):
+    from app.models.analytics import AtRiskStudent
+
+    client, SessionLocal, _ = client_with_db
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(AtRiskStudent, [
+            {"user_id": 1, "workshop_id": None, "risk_score": 0.9, "flagged_reason": "manual"},
+            {"user_id": 1, "workshop_id": 4, "risk_score": 0.9, "flagged_reason": "inactive"},
+            {"user_id": 2, "workshop_id": None, "risk_score": 0.5, "flagged_reason": "manual"},
+        ])
+        db.commit()
+
+    items, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/analytics/at-risk", params=params)
+        assert page.status_code == 200
+        items.extend(page.json()["items"])
+        cursor = page.json()["next_cursor"]
+        if cursor is None:
+            break
+    assert keys(items) == [(1, None), (1, 4), (2, None)]
+
+
+def test_expired_top_k_reloads_once(monkeypatch):
+    import threading
+    import time
+
+    from app.services import at_risk
+
+    cache = at_risk.TopKCache(k=10, ttl=0)
+    release = threading.Event()
+    refreshes = []
+
+    def refresh(db):
+        refreshes.append(db)
+        release.wait(5)
+        cache._loaded_at = time.monotonic()
+
+    cache._loaded_at = time.monotonic() - 1
+    monkeypatch.setattr(cache, "refresh", refresh)
+    loader = threading.Thread(target=cache.get, args=("first", 5))
+    loader.start()
+    while not refreshes:
+        time.sleep(0.001)
+    # Others serve the previous entries rather than reloading too
+    assert cache.get("second", 5) == []
+    release.set()
+    loader.join()
+    assert refreshes == ["first"]
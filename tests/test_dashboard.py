@@ -0,0 +1,103 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path / 'test.db'}"
+    from app.main import app
+    from app.database import get_db
+    from app.models.base import Base
+    from app.services import response_cache
+
+    response_cache.cache.clear()
+    engine = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal
+    app.dependency_overrides.clear()
+
+
+def seed(SessionLocal):
+    from app.models.analytics import QuizScoresSummary, StudentModuleProgress
+
+    rng = np.random.default_rng(7)
+    percent = rng.uniform(0, 100, 250).round(2)
+    percent[:10] = 100.0
+    scores = {quiz_id: rng.uniform(0, 100, 250).round(2) for quiz_id in (11, 12)}
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(StudentModuleProgress, [
+            {"user_id": u, "workshop_id": 1, "modules_completed": int(p // 20), "percent_complete": float(p)}
+            for u, p in enumerate(percent)
+        ] + [{"user_id": 1, "workshop_id": 2, "modules_completed": 0, "percent_complete": 5.0}])
+        db.bulk_insert_mappings(QuizScoresSummary, [
+            {"user_id": u, "quiz_id": quiz_id, "workshop_id": 1, "average_score": float(s), "pass_fail": bool(s >= 70), "attempts": 1}
+            for quiz_id, values in scores.items()
+            for u, s in enumerate(values)
+        ])
+        db.commit()
+    return percent, scores
+
+
+def test_dashboard_distributions(client_with_db):
+    client, SessionLocal = client_with_db
+    percent, scores = seed(SessionLocal)
+    data = client.get("/analytics/dashboard", params={"workshop_id": 1}).json()
+
+    completion = data["completion"]
+    assert completion["learners"] == 250
+    assert completion["completed"] == 10
+    assert completion["percentiles"]["p50"] == pytest.approx(np.percentile(percent, 50))
+    assert completion["histogram"]["counts"] == np.histogram(percent, bins=np.linspace(0, 100, 11))[0].tolist()
+
+    assert [q["quiz_id"] for q in data["quizzes"]] == [11, 12]
+    for quiz in data["quizzes"]:
+        values = scores[quiz["quiz_id"]]
+        assert quiz["pass_rate"] == pytest.approx(np.mean(values >= 70))
+        assert quiz["mean_score"] == pytest.approx(values.mean())
+        for q in (25, 50, 90):
+            assert quiz["percentiles"][f"p{q}"] == pytest.approx(np.percentile(values, q))
+        assert quiz["histogram"]["counts"] == np.histogram(values, bins=np.linspace(0, 100, 11))[0].tolist()
+
+
+def test_dashboard_empty_workshop(client_with_db):
+    client, _ = client_with_db
+    data = client.get("/analytics/dashboard", params={"workshop_id": 99}).json()
+    assert data["completion"]["learners"] == 0
+    assert data["completion"]["percentiles"]["p50"] is None
+    assert data["quizzes"] == []
+
+
+def test_dashboard_learners_are_paginated(client_with_db):
+    client, SessionLocal = client_with_db
+    seed(SessionLocal)
+    seen, after = [], None
+    while True:
+        params = {"workshop_id": 1, "limit": 100}
+        if after is not None:
+            params["after"] = after
+        page = client.get("/analytics/dashboard/learners", params=params).json()
+        seen.extend(item["user_id"] for item in page["items"])
+        after = page["next_after"]
+        if after is None:
+            break
+    assert seen == list(range(250))
+    first = client.get("/analytics/dashboard/learners", params={"workshop_id": 1, "limit": 1}).json()["items"][0]
+    assert [q["quiz_id"] for q in first["quiz_scores"]] == [11, 12]
@@ -0,0 +1,96 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.services import distributions
+from app.services.broker import InMemoryBroker, TOPIC_PROGRESS, TOPIC_QUIZ
+from app.services.event_consumer import EventConsumer
+from app.services.tdigest import TDigest
+
+# Largest accepted |rank of estimate - q| per quantile
+RANK_ERROR = {0.5: 0.005, 0.9: 0.003, 0.99: 0.001}
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def rank_error(values, estimate, q):
+    ordered = np.sort(values)
+    low = np.searchsorted(ordered, estimate, side="left") / len(ordered)
+    high = np.searchsorted(ordered, estimate, side="right") / len(ordered)
+    # Ties (rounded scores) make a whole rank range exact
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+DATASETS = {
+    "lognormal": lambda rng: rng.lognormal(6, 1, 100000),
+    "scores": lambda rng: np.round(rng.beta(5, 2, 100000) * 100, 2),
+    "bimodal": lambda rng: np.concatenate([rng.normal(60, 5, 70000), rng.normal(3600, 300, 30000)]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(DATASETS))
+def test_merged_digest_matches_exact_quantiles(name):
+    values = DATASETS[name](np.random.default_rng(1))
+    digest = TDigest()
+    for chunk in np.array_split(values, 200):
+        part = TDigest()
+        part.add(chunk)
+        digest.merge(TDigest.from_bytes(part.to_bytes()))
+    assert digest.count == len(values)
+    assert len(digest.means) <= digest.delta
+    assert digest.quantile(0) == values.min() and digest.quantile(1) == values.max()
+    for q, bound in RANK_ERROR.items():
+        assert rank_error(values, digest.quantile(q), q) <= bound, q
+
+
+def test_consumer_maintains_module_distributions(session_factory):
+    rng = random.Random(2)
+    broker = InMemoryBroker()
+    times = {1: [], 2: []}
+    scores = {1: [], 2: []}
+    for i in range(8000):
+        module_id = rng.choice([1, 2])
+        seconds = int(rng.lognormvariate(5 + module_id, 0.8)) + 1
+        times[module_id].append(seconds)
+        broker.publish(TOPIC_PROGRESS, {
+            "event_id": f"p{i}", "user_id": i % 500, "workshop_id": 9, "module_id": module_id,
+            "modules_completed": 0, "percent_complete": 10, "time_spent": seconds,
+        })
+        if i % 4 == 0:
+            score = round(rng.betavariate(4, 2) * 100, 2)
+            scores[module_id].append(score)
+            broker.publish(TOPIC_QUIZ, {
+                "event_id": f"q{i}", "user_id": i % 500, "quiz_id": module_id, "workshop_id": 9,
+                "module_id": module_id, "score": score, "passed": score >= 70,
+            })
+    consumer = EventConsumer(broker, session_factory, batch_size=600)
+    while consumer.run_once():
+        pass
+
+    with session_factory() as db:
+        result = distributions.workshop_distributions(db, 9)
+    assert [m["module_id"] for m in result["modules"]] == [1, 2]
+    exact = {
+        "time_spent": {**times, "overall": times[1] + times[2]},
+        "score": {**scores, "overall": scores[1] + scores[2]},
+    }
+    summaries = {m["module_id"]: m for m in result["modules"]}
+    summaries["overall"] = result["overall"]
+    for key, summary in summaries.items():
+        for metric in distributions.METRICS:
+            values = np.array(exact[metric][key])
+            assert summary[metric]["count"] == len(values)
+            for q in distributions.QUANTILES:
+                # Smaller samples than above; allow a slightly wider band
+                assert rank_error(values, summary[metric][f"p{round(q * 100)}"], q) <= 2 * RANK_ERROR[q], (key, metric, q)
@@ -0,0 +1,118 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.analytics import LoginActivity, ProcessedEvent, QuizScoresSummary, StudentModuleProgress
+from app.services.broker import FileBroker, InMemoryBroker, TOPIC_LOGIN, TOPIC_PROGRESS, TOPIC_QUIZ
+from app.services import event_consumer
+from app.services.event_consumer import EventConsumer
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def publish_sample(broker):
+    broker.publish(TOPIC_PROGRESS, {"event_id": "p1", "user_id": 1, "workshop_id": 7, "modules_completed": 1, "percent_complete": 25.0, "ts": "2024-01-01T10:00:00"})
+    broker.publish(TOPIC_PROGRESS, {"event_id": "p2", "user_id": 1, "workshop_id": 7, "modules_completed": 2, "percent_complete": 50.0, "ts": "2024-01-01T11:00:00"})
+    broker.publish(TOPIC_QUIZ, {"event_id": "q1", "user_id": 1, "quiz_id": 3, "score": 40.0, "passed": False})
+    broker.publish(TOPIC_QUIZ, {"event_id": "q2", "user_id": 1, "quiz_id": 3, "score": 80.0, "passed": True})
+    broker.publish(TOPIC_LOGIN, {"event_id": "l1", "user_id": 1, "device_info": "laptop", "ts": "2024-01-01T09:00:00"})
+    broker.publish(TOPIC_LOGIN, {"event_id": "l2", "user_id": 1, "device_info": "phone", "ts": "2024-01-02T09:00:00"})
+
+
+def test_batches_are_upserted_and_offsets_committed(session_factory):
+    broker = InMemoryBroker()
+    publish_sample(broker)
+    consumer = EventConsumer(broker, session_factory, batch_size=3)
+    while consumer.run_once():
+        pass
+
+    # A second batch for existing keys updates the same rows
+    broker.publish(TOPIC_QUIZ, {"event_id": "q3", "user_id": 1, "quiz_id": 3, "score": 60.0, "passed": False})
+    broker.publish(TOPIC_PROGRESS, {"event_id": "p0", "user_id": 1, "workshop_id": 7, "modules_completed": 0, "percent_complete": 0.0, "ts": "2023-12-31T00:00:00"})
+    consumer.run_once()
+
+    with session_factory() as db:
+        progress = db.query(StudentModuleProgress).one()
+        assert (progress.modules_completed, progress.percent_complete) == (2, 50.0)
+        quiz = db.query(QuizScoresSummary).one()
+        assert quiz.attempts == 3
+        assert quiz.average_score == pytest.approx(60.0)
+        assert quiz.pass_fail is True
+        login = db.query(LoginActivity).one()
+        assert login.login_count == 2
+        assert login.device_info == "phone"
+
+    metrics = consumer.metrics()
+    assert metrics["total_lag"] == 0
+    assert metrics["events_applied"] == 8
+
+
+def test_redelivered_events_are_skipped(session_factory):
+    broker = InMemoryBroker()
+    publish_sample(broker)
+    EventConsumer(broker, session_factory).run_once()
+
+    # Same events again, e.g. after offsets were lost
+    publish_sample(broker)
+    consumer = EventConsumer(broker, session_factory)
+    consumer.run_once()
+    assert consumer.metrics()["duplicates_skipped"] == 6
+
+    with session_factory() as db:
+        assert db.query(QuizScoresSummary).one().attempts == 2
+        assert db.query(LoginActivity).one().login_count == 2
+        assert db.query(ProcessedEvent).count() == 6
+
+
+def test_processed_ids_are_pruned_after_the_redelivery_window(session_factory):
+    broker = InMemoryBroker()
+    publish_sample(broker)
+    consumer = EventConsumer(broker, session_factory)
+    consumer.run_once()
+
+    assert consumer.prune() == 0
+    later = datetime.utcnow() + timedelta(hours=event_consumer.PROCESSED_EVENT_RETENTION_HOURS + 1)
+    assert consumer.prune(now=later) == 6
+    with session_factory() as db:
+        assert db.query(ProcessedEvent).count() == 0
+
+
+def test_offsets_not_committed_when_apply_fails(session_factory, tmp_path):
+    broker = FileBroker(str(tmp_path / "events"))
+    broker.publish(TOPIC_PROGRESS, {"event_id": "bad", "user_id": 1, "workshop_id": 7})
+    consumer = EventConsumer(broker, session_factory)
+    with pytest.raises(KeyError):
+        consumer.run_once()
+    assert broker.committed("analytics") == {}
+    assert consumer.metrics()["total_lag"] == 1
+    with session_factory() as db:
+        assert db.query(ProcessedEvent).count() == 0
+
+
+def test_workshop_events_record_trainers(session_factory):
+    from app.models.analytics import WorkshopTrainer
+    from app.services.broker import TOPIC_WORKSHOP
+
+    broker = InMemoryBroker()
+    broker.publish(TOPIC_WORKSHOP, {"event_id": "w1", "workshop_id": 7, "trainer_id": 1})
+    broker.publish(TOPIC_WORKSHOP, {"event_id": "w2", "workshop_id": 7, "trainer_id": 2})
+    EventConsumer(broker, session_factory).run_once()
+    with session_factory() as db:
+        assert db.query(WorkshopTrainer.trainer_id).filter_by(workshop_id=7).scalar() == 2
+
+    # A deleted workshop is published with no trainer
+    broker.publish(TOPIC_WORKSHOP, {"event_id": "w3", "workshop_id": 7, "trainer_id": None})
+    EventConsumer(broker, session_factory).run_once()
+    with session_factory() as db:
+        assert db.query(WorkshopTrainer).filter_by(workshop_id=7).count() == 0
@@ -0,0 +1,84 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import random
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.analytics import ActiveUserSketch
+from app.services import active_users
+from app.services.broker import InMemoryBroker, TOPIC_LOGIN, TOPIC_PROGRESS
+from app.services.event_consumer import EventConsumer
+from app.services.hll import HyperLogLog, standard_error
+
+# Three standard errors: a correct sketch fails this less than 0.3% of the time per estimate
+BOUND = 3 * standard_error()
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.mark.parametrize("cardinality", [10, 1000, 20000, 300000])
+def test_estimate_within_error_bound(cardinality):
+    rng = np.random.default_rng(cardinality)
+    users = rng.choice(10 ** 9, size=cardinality, replace=False)
+    sketch = HyperLogLog()
+    # Duplicates must not change the estimate
+    sketch.add(np.concatenate([users, users[: cardinality // 2]]))
+    assert abs(sketch.count() - cardinality) / cardinality <= BOUND
+
+
+def test_merge_counts_the_union_and_survives_serialization():
+    rng = np.random.default_rng(7)
+    days = [rng.choice(200000, size=15000, replace=False) for _ in range(30)]
+    merged = HyperLogLog()
+    for users in days:
+        sketch = HyperLogLog()
+        sketch.add(users)
+        merged.merge(HyperLogLog.from_bytes(sketch.to_bytes()))
+    exact = len(np.unique(np.concatenate(days)))
+    assert abs(merged.count() - exact) / exact <= BOUND
+    assert len(HyperLogLog().to_bytes()) < 100
+
+
+def test_consumer_maintains_daily_sketches(session_factory):
+    rng = random.Random(5)
+    end = date(2024, 5, 31)
+    broker = InMemoryBroker()
+    active = {}
+    for i in range(6000):
+        day = end - timedelta(days=rng.randrange(30))
+        user_id, workshop_id = rng.randrange(3000), rng.choice([1, 2])
+        active.setdefault((workshop_id, day), set()).add(user_id)
+        ts = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(1440))
+        if i % 2:
+            broker.publish(TOPIC_LOGIN, {"event_id": f"l{i}", "user_id": user_id, "workshop_id": workshop_id,
+                                         "ts": ts.isoformat()})
+        else:
+            broker.publish(TOPIC_PROGRESS, {"event_id": f"p{i}", "user_id": user_id, "workshop_id": workshop_id,
+                                            "modules_completed": 1, "percent_complete": 10, "ts": ts.isoformat()})
+    consumer = EventConsumer(broker, session_factory, batch_size=700)
+    while consumer.run_once():
+        pass
+
+    def exact(workshop_id, days):
+        window = {end - timedelta(days=d) for d in range(days)}
+        return len(set().union(*(
+            users for (w, day), users in active.items() if day in window and workshop_id in (None, w)
+        )))
+
+    with session_factory() as db:
+        assert db.query(ActiveUserSketch).count() == 90
+        for workshop_id in (None, 1, 2):
+            counts = active_users.active_users(db, end, workshop_id)
+            for name, days in active_users.WINDOWS.items():
+                expected = exact(workshop_id, days)
+                assert abs(counts[name] - expected) <= max(BOUND * expected, 2), (workshop_id, name)
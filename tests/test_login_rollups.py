@@ -0,0 +1,106 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.analytics import LoginDaily, LoginEvent, LoginHourly
+from app.services import login_rollups
+from app.services.broker import InMemoryBroker, TOPIC_LOGIN
+from app.services.event_consumer import EventConsumer
+
+START = datetime(2024, 3, 1)
+NOW = START + timedelta(days=5)
+
+
+@pytest.fixture()
+def session_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(login_rollups, "ROLLUP_SETTLE_SECONDS", -60)
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def ingest(session_factory, times, prefix):
+    broker = InMemoryBroker()
+    for i, (ts, workshop_id) in enumerate(times):
+        broker.publish(TOPIC_LOGIN, {
+            "event_id": f"{prefix}{i}", "user_id": i % 17, "workshop_id": workshop_id, "ts": ts.isoformat(),
+        })
+    consumer = EventConsumer(broker, session_factory, batch_size=1000)
+    while consumer.run_once():
+        pass
+
+
+def random_times(rng, count):
+    return [(START + timedelta(minutes=rng.randrange(4 * 24 * 60)), rng.choice([1, 2])) for _ in range(count)]
+
+
+def exact(times, start, end, workshop_id=None):
+    return sum(1 for ts, w in times if start <= ts < end and (workshop_id is None or w == workshop_id))
+
+
+RANGES = [
+    (START + timedelta(hours=5, minutes=20), START + timedelta(days=3, hours=2, minutes=40)),
+    (START + timedelta(days=1), START + timedelta(days=3)),
+    (START + timedelta(hours=3), START + timedelta(hours=9)),
+    (START + timedelta(minutes=10), START + timedelta(minutes=50)),
+]
+
+
+def test_ranges_match_exact_counts_across_sources(session_factory):
+    rng = random.Random(3)
+    rolled = random_times(rng, 2000)
+    ingest(session_factory, rolled, "a")
+    with session_factory() as db:
+        assert login_rollups.compact(db) == 2000
+        assert db.query(LoginDaily).count() == 8
+
+    # Not yet compacted: served from raw rows on top of the rollups
+    pending = random_times(rng, 300)
+    ingest(session_factory, pending, "b")
+    times = rolled + pending
+    with session_factory() as db:
+        for start, end in RANGES:
+            for workshop_id in (None, 2):
+                result = login_rollups.login_counts(db, start, end, "day", workshop_id, now=NOW)
+                assert result["total"] == exact(times, start, end, workshop_id)
+        result = login_rollups.login_counts(db, *RANGES[0], now=NOW)
+        assert {piece["source"] for piece in result["sources"]} == {"raw", "hourly", "daily"}
+
+        hourly = login_rollups.login_counts(db, RANGES[2][0], RANGES[2][1], "hour", now=NOW)
+        assert [entry["logins"] for entry in hourly["series"]] == [
+            exact(times, RANGES[2][0] + timedelta(hours=h), RANGES[2][0] + timedelta(hours=h + 1)) for h in range(6)
+        ]
+
+
+def test_purge_keeps_rollups_and_unrolled_rows(session_factory, monkeypatch):
+    rng = random.Random(5)
+    times = random_times(rng, 500)
+    ingest(session_factory, times, "a")
+    with session_factory() as db:
+        login_rollups.compact(db, batch_size=200)  # only part of the rows is rolled up
+        monkeypatch.setattr(login_rollups, "PURGE_BATCH_SIZE", 50)
+        removed = login_rollups.purge(db, now=START + timedelta(days=30), batch_size=50)
+        assert removed == 200
+        assert db.query(LoginEvent).count() == 300
+
+        while login_rollups.compact(db, batch_size=200):
+            pass
+        login_rollups.purge(db, now=START + timedelta(days=30), batch_size=50)
+        assert db.query(LoginEvent).count() == 0
+        assert db.query(LoginHourly).count() > 0
+        start, end = RANGES[1]
+        assert login_rollups.login_counts(db, start, end, now=START + timedelta(days=30))["total"] == exact(times, start, end)
+
+        # Edges that need purged raw rows are refused, not counted as zero
+        with pytest.raises(ValueError, match="whole hours"):
+            login_rollups.login_counts(db, *RANGES[0], now=START + timedelta(days=30))
+        hours = (START + timedelta(hours=5), START + timedelta(days=2, hours=3))
+        assert login_rollups.login_counts(db, *hours, now=START + timedelta(days=30))["total"] == exact(times, *hours)
+        with pytest.raises(ValueError, match="whole days"):
+            login_rollups.login_counts(db, *hours, now=START + timedelta(days=120))
@@ -0,0 +1,122 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services import response_cache
+from app.services.broker import InMemoryBroker, TOPIC_PROGRESS
+from app.services.event_consumer import EventConsumer
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path / 'test.db'}"
+    from app.main import app
+    from app.database import get_db
+    from app.models.base import Base
+
+    engine = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(response_cache, "cache", response_cache.ResponseCache())
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app), TestingSessionLocal
+    app.dependency_overrides.clear()
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = response_cache.ResponseCache()
+    calls = []
+    start = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": len(calls)}
+
+    bodies = []
+
+    def request():
+        start.wait()
+        bodies.append(cache.get(("dashboard", 1), 5, compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert bodies == [b'{"value": 1}'] * 8
+
+    assert cache.get(("dashboard", 1), 5, compute) == b'{"value": 1}'
+    assert cache.get(("dashboard", 1), 6, compute) == b'{"value": 2}'
+    # A slow request that read an older watermark does not replace the newer entry
+    assert cache.get(("dashboard", 1), 5, compute) == b'{"value": 3}'
+    assert cache.get(("dashboard", 1), 6, compute) == b'{"value": 2}'
+
+
+def test_errors_are_shared_and_not_cached():
+    cache = response_cache.ResponseCache()
+    with pytest.raises(ValueError):
+        cache.get(("at-risk",), 1, lambda: int("not a number"))
+    assert cache.get(("at-risk",), 1, lambda: []) == b"[]"
+
+
+def test_entries_are_evicted_least_recently_used_first():
+    cache = response_cache.ResponseCache(size=2)
+    for key in ("a", "b"):
+        cache.get((key,), 0, lambda: key)
+    cache.get(("a",), 0, lambda: "recomputed")
+    cache.get(("c",), 0, lambda: "c")
+    assert cache.get(("a",), 0, lambda: "recomputed") == b'"a"'
+    assert cache.get(("b",), 0, lambda: "recomputed") == b'"recomputed"'
+
+
+def test_dashboard_recomputed_only_when_events_land(client_with_db, monkeypatch):
+    from app.services import analytics_service
+
+    client, SessionLocal = client_with_db
+    broker = InMemoryBroker()
+    consumer = EventConsumer(broker, SessionLocal)
+
+    def progress(event_id, user_id, workshop_id):
+        broker.publish(TOPIC_PROGRESS, {"event_id": event_id, "user_id": user_id, "workshop_id": workshop_id,
+                                        "modules_completed": 1, "percent_complete": 50.0})
+        consumer.run_once()
+
+    calls = []
+    get_dashboard = analytics_service.get_dashboard
+    monkeypatch.setattr(analytics_service, "get_dashboard", lambda db, w: calls.append(w) or get_dashboard(db, w))
+
+    progress("e1", 1, 1)
+    first = client.get("/analytics/dashboard", params={"workshop_id": 1})
+    assert first.json()["completion"]["learners"] == 1
+    assert client.get("/analytics/dashboard", params={"workshop_id": 1}).content == first.content
+    assert calls == [1]
+
+    # Events for another workshop leave this workshop's entry valid
+    progress("e2", 2, 2)
+    client.get("/analytics/dashboard", params={"workshop_id": 1})
+    assert calls == [1]
+
+    progress("e3", 3, 1)
+    assert client.get("/analytics/dashboard", params={"workshop_id": 1}).json()["completion"]["learners"] == 2
+    assert calls == [1, 1]
+    with SessionLocal() as db:
+        assert response_cache.watermark(db, 1) == 2
+        assert response_cache.watermark(db) == 3
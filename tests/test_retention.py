@@ -0,0 +1,89 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.services import retention
+from app.services.broker import InMemoryBroker, TOPIC_LOGIN, TOPIC_PROGRESS
+from app.services.event_consumer import EventConsumer
+
+START = date(2024, 1, 1)  # a Monday
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    retention.cache.clear()
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def ingest(session_factory, activity, prefix="e"):
+    broker = InMemoryBroker()
+    for i, (user_id, workshop_id, day) in enumerate(activity):
+        ts = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+        if i % 2:
+            broker.publish(TOPIC_LOGIN, {"event_id": f"{prefix}{i}", "user_id": user_id, "workshop_id": workshop_id,
+                                         "ts": ts.isoformat()})
+        else:
+            broker.publish(TOPIC_PROGRESS, {"event_id": f"{prefix}{i}", "user_id": user_id, "workshop_id": workshop_id,
+                                            "modules_completed": 0, "percent_complete": 5, "ts": ts.isoformat()})
+    consumer = EventConsumer(broker, session_factory, batch_size=500)
+    while consumer.run_once():
+        pass
+
+
+def exact(activity, workshop_id, weeks):
+    active = {}
+    for user_id, w, day in activity:
+        if workshop_id is None or w == workshop_id:
+            active.setdefault(user_id, set()).add((day - START).days // 7)
+    matrix = [[0] * weeks for _ in range(weeks)]
+    for learner_weeks in active.values():
+        first = min(learner_weeks)
+        for week in learner_weeks:
+            if first < weeks and week < weeks:
+                matrix[first][week - first] += 1
+    return matrix
+
+
+def test_matrix_matches_exact_counts(session_factory):
+    rng = random.Random(4)
+    activity = []
+    for user_id in range(400):
+        joined = rng.randrange(10)
+        for week in range(joined, 12):
+            if rng.random() < 0.6 ** (week - joined) or week == joined:
+                activity.append((user_id, rng.choice([1, 2]), START + timedelta(weeks=week, days=rng.randrange(7))))
+    rng.shuffle(activity)  # late events move learners into earlier cohorts
+    ingest(session_factory, activity)
+
+    end = START + timedelta(weeks=9, days=6)
+    with session_factory() as db:
+        for workshop_id in (None, 1, 2):
+            result = retention.retention(db, START, end, workshop_id)
+            expected = exact(activity, workshop_id, 10)
+            assert len(result["cohorts"]) == 10
+            for i, cohort in enumerate(result["cohorts"]):
+                assert cohort["week_start"] == START + timedelta(weeks=i)
+                assert cohort["active"] == expected[i][:10 - i]
+                assert cohort["size"] == expected[i][0]
+                if cohort["size"]:
+                    assert cohort["rates"][0] == 1.0
+
+
+def test_results_are_cached_per_range(session_factory):
+    ingest(session_factory, [(1, 1, START), (1, 1, START + timedelta(weeks=1))])
+    end = START + timedelta(weeks=3)
+    with session_factory() as db:
+        first = retention.retention(db, START, end, 1)
+        ingest(session_factory, [(2, 1, START)], prefix="late")
+        assert retention.retention(db, START, end, 1) is first
+        assert retention.retention(db, START, end + timedelta(weeks=1), 1)["cohorts"][0]["size"] == 2
+        with pytest.raises(ValueError):
+            retention.retention(db, START, START + timedelta(weeks=retention.MAX_WEEKS))
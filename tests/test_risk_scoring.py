@@ -0,0 +1,120 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.analytics import AtRiskStudent, LoginActivity, QuizScoresSummary, RiskDirtyLearner, StudentModuleProgress
+from app.services import risk_scoring
+from app.services.broker import InMemoryBroker, TOPIC_LOGIN
+from app.services.event_consumer import EventConsumer
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed(db):
+    now = datetime.utcnow()
+    started = now - timedelta(days=10)
+    db.bulk_insert_mappings(StudentModuleProgress, [
+        # Engaged: fast progress, good scores, logs in often
+        {"user_id": 1, "workshop_id": 1, "modules_completed": 4, "percent_complete": 80.0, "started_at": started},
+        # Struggling: slow, falling scores, gone for weeks
+        {"user_id": 2, "workshop_id": 1, "modules_completed": 0, "percent_complete": 5.0, "started_at": started},
+        # Finished
+        {"user_id": 3, "workshop_id": 1, "modules_completed": 5, "percent_complete": 100.0, "started_at": started},
+    ])
+    db.bulk_insert_mappings(QuizScoresSummary, [
+        {"user_id": 1, "quiz_id": 1, "workshop_id": 1, "average_score": 90.0, "last_score": 95.0, "pass_fail": True, "attempts": 2},
+        {"user_id": 2, "quiz_id": 1, "workshop_id": 1, "average_score": 45.0, "last_score": 20.0, "pass_fail": False, "attempts": 3},
+    ])
+    db.bulk_insert_mappings(LoginActivity, [
+        {"user_id": 1, "last_login": now - timedelta(hours=2), "login_count": 12},
+        {"user_id": 2, "last_login": now - timedelta(days=25), "login_count": 1},
+    ])
+    db.commit()
+
+
+def scores(db):
+    return {r.user_id: r for r in db.query(AtRiskStudent)}
+
+
+def test_full_run_ranks_struggling_learner_highest(session_factory):
+    with session_factory() as db:
+        seed(db)
+        stats = risk_scoring.run(db)
+        assert stats["full"] and stats["scored"] == 3
+        result = scores(db)
+    assert result[2].risk_score > 0.6
+    assert result[1].risk_score < 0.2
+    assert result[3].risk_score == 0.0 and result[3].flagged_reason is None
+    assert result[2].flagged_reason in risk_scoring.REASONS
+
+
+def test_incremental_run_rescores_only_changed_learners(session_factory):
+    with session_factory() as db:
+        seed(db)
+        risk_scoring.run(db)
+        before = {user_id: r.scored_at for user_id, r in scores(db).items()}
+
+    # Learner 2 comes back: the consumer marks them for rescoring
+    broker = InMemoryBroker()
+    for i in range(15):
+        broker.publish(TOPIC_LOGIN, {"event_id": f"l{i}", "user_id": 2, "device_info": "laptop"})
+    EventConsumer(broker, session_factory).run_once()
+
+    with session_factory() as db:
+        previous = scores(db)[2].risk_score
+        stats = risk_scoring.run(db)
+        assert not stats["full"] and stats["scored"] == 1
+        after = scores(db)
+        assert after[1].scored_at == before[1]
+        assert after[2].risk_score < previous
+        assert db.query(RiskDirtyLearner).count() == 0
+
+        # Scores older than the rescore window are refreshed even without activity
+        stats = risk_scoring.run(db, rescore_after=timedelta(0))
+        assert stats["scored"] == 3
+
+
+def test_marks_committed_during_a_run_are_kept(session_factory, monkeypatch):
+    with session_factory() as db:
+        seed(db)
+        risk_scoring.run(db)
+        risk_scoring.mark_dirty(db, [1])
+        db.commit()
+
+    compute = risk_scoring.compute_features
+
+    def late_mark(*args):
+        # Marked before the run started, committed after it read the marks
+        with session_factory() as other:
+            other.add(RiskDirtyLearner(user_id=2, marked_at=datetime.utcnow() - timedelta(minutes=1)))
+            other.commit()
+        return compute(*args)
+
+    monkeypatch.setattr(risk_scoring, "compute_features", late_mark)
+    with session_factory() as db:
+        assert risk_scoring.run(db)["scored"] == 1
+        assert [m.user_id for m in db.query(RiskDirtyLearner)] == [2]
+
+
+def test_scoring_job_runs_in_the_background(session_factory):
+    with session_factory() as db:
+        seed(db)
+    job = risk_scoring.ScoringJob(session_factory)
+    status = job.request(full=True)
+    assert status["running"]
+    job.wait(10)
+    status = job.status()
+    assert not status["running"] and not status["pending"] and status["last_error"] is None
+    assert status["last_run"]["full"] and status["last_run"]["scored"] == 3
+    with session_factory() as db:
+        assert len(scores(db)) == 3
@@ -4,32 +4,45 @@ FastAPI router for workshop operations.
 This module defines REST endpoints for managing workshops, including
 listing existing workshops, creating new workshops (trainers only),
 retrieving details of a specific workshop with sections and quiz
-questions, and recording student progress through sections.  It also
-provides endpoints for adding, updating and removing sections and
-quiz questions within a workshop.
+questions, cloning a workshop's content tree, streaming content changes
+since a sequence number (compaction runs from cron, see
+``compact_changes``), and recording student progress through
+sections.  It also provides endpoints for adding, updating and removing
+sections and quiz questions within a workshop.
+
+Workshop reads are served from raw rows (see ``raw_read``) and encoded
+with orjson; the ``response_model`` schemas document the shape.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from ..db.database import get_db
-from .. import crud, schemas
+from .. import crud, raw_read, schemas
+from ..blobstore import blob_response
 
 
 router = APIRouter(prefix="/workshops", tags=["Workshops"])
 
-
-@router.get("/", response_model=list[schemas.WorkshopOut])
+@router.get("/", response_model=list[schemas.WorkshopOut], response_class=ORJSONResponse)
 def list_workshops(db: Session = Depends(get_db)):
-    return crud.get_workshops(db)
+    return ORJSONResponse(raw_read.load_workshops(db))
+
 
+@router.get("/blobs/{digest}")
+def get_blob(digest: str, range: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    return blob_response(digest, range, if_none_match)
 
-@router.get("/{workshop_id}", response_model=schemas.WorkshopOut)
+
+@router.get("/{workshop_id}", response_model=schemas.WorkshopOut, response_class=ORJSONResponse)
 def get_workshop(workshop_id: int, db: Session = Depends(get_db)):
-    workshop = crud.get_workshop(db, workshop_id)
+    workshop = raw_read.load_workshops(db, workshop_id)
     if not workshop:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workshop not found")
-    return workshop
+    return ORJSONResponse(workshop[0])
 
 
 @router.post("/", response_model=schemas.WorkshopOut, status_code=status.HTTP_201_CREATED)
@@ -53,6 +66,24 @@ def delete_workshop(workshop_id: int, db: Session = Depends(get_db)):
     return None
 
 
+@router.post("/{workshop_id}/clone", response_model=schemas.WorkshopSummary, status_code=status.HTTP_201_CREATED)
+def clone_workshop(workshop_id: int, options: schemas.WorkshopClone, db: Session = Depends(get_db)):
+    clone = crud.clone_workshop(db, workshop_id, options)
+    if not clone:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workshop not found")
+    return clone
+
+
+@router.get("/{workshop_id}/changes")
+def get_workshop_changes(
+    workshop_id: int,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    return crud.get_changes(db, workshop_id, since, limit)
+
+
 @router.post("/progress", status_code=status.HTTP_200_OK)
 def update_progress(progress: schemas.ProgressUpdate, db: Session = Depends(get_db)):
     return crud.record_progress(db, progress)
@@ -86,7 +117,10 @@ def delete_section(section_id: int, db: Session = Depends(get_db)):
 # Quiz question management endpoints
 @router.post("/sections/{section_id}/questions", response_model=schemas.QuizQuestionOut, status_code=status.HTTP_201_CREATED)
 def create_question(section_id: int, question: schemas.CreateQuestion, db: Session = Depends(get_db)):
-    new_question = crud.create_question(db, section_id, question)
+    try:
+        new_question = crud.create_question(db, section_id, question)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     if not new_question:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Section not found")
     return new_question
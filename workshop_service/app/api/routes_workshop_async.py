@@ -0,0 +1,30 @@
+"""
+Async variants of the learner hot paths.
+
+Included ahead of the sync workshop router when ``USE_ASYNC_DB`` is set,
+so these handlers take precedence for the paths they define while the
+remaining (trainer-facing) endpoints stay on the sync engine.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.database import get_async_db
+from .. import async_crud, raw_read, schemas
+
+
+router = APIRouter(prefix="/workshops", tags=["Workshops"])
+
+
+@router.get("/{workshop_id}", response_model=schemas.WorkshopOut, response_class=ORJSONResponse)
+async def get_workshop(workshop_id: int, db: AsyncSession = Depends(get_async_db)):
+    workshop = await raw_read.load_workshops_async(db, workshop_id)
+    if not workshop:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workshop not found")
+    return ORJSONResponse(workshop[0])
+
+
+@router.post("/progress", status_code=status.HTTP_200_OK)
+async def update_progress(progress: schemas.ProgressUpdate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.record_progress(db, progress)
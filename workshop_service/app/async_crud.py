@@ -0,0 +1,32 @@
+"""
+Async counterparts of the hot-path CRUD operations.
+
+Lazy loading is not available on an ``AsyncSession``, so queries here
+must load everything the caller reads up front.  Workshop reads go
+through ``raw_read.load_workshops_async`` instead of the ORM.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import models
+from . import schemas
+
+
+async def record_progress(db: AsyncSession, progress: schemas.ProgressUpdate) -> models.StudentSubProgress:
+    result = await db.execute(
+        select(models.StudentSubProgress).where(
+            models.StudentSubProgress.student_id == progress.student_id,
+            models.StudentSubProgress.subsection_id == progress.subsection_id,
+        )
+    )
+    record = result.scalars().first()
+    if record is None:
+        record = models.StudentSubProgress(student_id=progress.student_id, subsection_id=progress.subsection_id)
+        db.add(record)
+    record.completed = progress.completed
+    record.completed_at = datetime.utcnow() if progress.completed else None
+    await db.commit()
+    return record
@@ -0,0 +1,217 @@
+"""
+Content-addressed storage for large workshop bodies.
+
+Section code and substep content can run to megabytes.  Instead of
+keeping them inline in the database, bodies larger than
+``BLOB_INLINE_LIMIT`` bytes are written to a local directory under their
+SHA-256 digest and the row only records the digest and size.  Identical
+bodies (for example in cloned workshops) share a single file, and since
+a digest always names the same bytes, blobs can be served with
+long-lived cache headers.
+
+Assigning a body only stages its blob; the file is written when the
+session commits, so a rolled-back transaction writes nothing.  Files left
+behind by a commit that failed after writing, or no longer referenced
+after a body was replaced or its row deleted, are removed by ``collect``,
+run from cron (``python -m app.collect_blobs``).
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+BLOB_INLINE_LIMIT = int(os.getenv("BLOB_INLINE_LIMIT", "8192"))
+BLOB_URL_PREFIX = "/workshops/blobs"
+# Unreferenced files younger than this are kept: their transaction may still be committing
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class BlobStore:
+    """Hash-named files under ``root``, fanned out by the first two bytes of the digest."""
+
+    def __init__(self, root: str, inline_limit: int = BLOB_INLINE_LIMIT):
+        self.root = root
+        self.inline_limit = inline_limit
+
+    def path(self, digest: str) -> str:
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` and return its digest.  Existing blobs are only touched, to restart their grace period."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as fh:
+            return fh.read()
+
+    def split(self, body: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[bytes]]:
+        """Return ``(inline, digest, size, data)`` for a body about to be stored on a row; ``data`` is still to be put."""
+        if body is None:
+            return None, None, None, None
+        data = body.encode("utf-8")
+        if len(data) <= self.inline_limit:
+            return body, None, len(data), None
+        return None, hashlib.sha256(data).hexdigest(), len(data), data
+
+    def collect(self, referenced: Iterable[str], grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+        """Delete files not named in ``referenced`` and older than ``grace_seconds``; return how many."""
+        keep = set(referenced)
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name in keep:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+store = BlobStore(BLOB_STORE_DIR)
+
+
+def blob_url(digest: Optional[str]) -> Optional[str]:
+    """Where the API serves the blob named by ``digest``, if there is one."""
+    return f"{BLOB_URL_PREFIX}/{digest}" if digest else None
+
+
+def blob_body(inline_attr: str, digest_attr: str, size_attr: str) -> property:
+    """
+    Build a model property that reads and writes a body through the blob store.
+
+    The inline column should be ``deferred`` so that loading a row does not
+    fetch the body until the property is accessed.  The file behind a new
+    body is written when the session commits, and a body read from the
+    store is cached on the instance for as long as its digest does not
+    change.
+    """
+    cache_attr = f"_blob_cache{inline_attr}"
+
+    def getter(self):
+        digest = getattr(self, digest_attr)
+        if not digest:
+            return getattr(self, inline_attr)
+        cached = self.__dict__.get(cache_attr)
+        if cached is None or cached[0] != digest:
+            cached = self.__dict__[cache_attr] = (digest, store.get(digest).decode("utf-8"))
+        return cached[1]
+
+    def setter(self, value):
+        inline, digest, size, data = store.split(value)
+        setattr(self, inline_attr, inline)
+        setattr(self, digest_attr, digest)
+        setattr(self, size_attr, size)
+        if data is not None:
+            self.__dict__.setdefault("_blob_pending", {})[digest] = (store, data)
+            self.__dict__[cache_attr] = (digest, value)
+
+    return property(getter, setter)
+
+
+@event.listens_for(Session, "before_flush")
+def _stage_pending(db: Session, flush_context, instances) -> None:
+    for obj in list(db.new) + list(db.dirty):
+        pending = obj.__dict__.pop("_blob_pending", None)
+        if pending:
+            db.info.setdefault("blob_writes", {}).update(pending)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(db: Session) -> None:
+    # Flush first so bodies assigned since the last flush are staged too
+    db.flush()
+    pending = db.info.pop("blob_writes", None)
+    for target, data in (pending or {}).values():
+        target.put(data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop("blob_writes", None)
+
+
+def blob_response(digest: str, range_header: Optional[str] = None, if_none_match: Optional[str] = None) -> Response:
+    """Serve a blob with immutable caching, ETag revalidation and single byte ranges."""
+    try:
+        path = store.path(digest)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blob not found")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blob not found")
+
+    etag = f'"{digest}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = "text/plain"
+    if not range_header:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    size = os.path.getsize(path)
+    match = _RANGE_RE.match(range_header.strip())
+    start = end = None
+    if match and (match.group(1) or match.group(2)):
+        if match.group(1):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(match.group(2)), 0)
+            end = size - 1
+        end = min(end, size - 1)
+    if start is None or start > end:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        chunk = fh.read(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=chunk,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers,
+    )
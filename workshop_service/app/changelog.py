@@ -0,0 +1,199 @@
+"""
+Append-only change log for workshop content.
+
+Every content write appends a row with a monotonically increasing
+sequence number, the workshop it belongs to and the node that changed.
+Clients remember the last sequence they applied and call
+``/workshops/{id}/changes?since=<seq>`` to receive only the nodes that
+changed after it, plus tombstones for deleted nodes.  A tombstone for a
+node implies that its children are gone as well.
+
+``record`` only queues entries on the session.  They are written when
+the transaction commits: a single counter row is advanced by the number of
+queued entries, which locks it until the commit, and the entries take the
+sequences it hands out.  Sequences are therefore committed in increasing
+order, and a client never reads past a sequence that is still to commit.
+
+Compaction runs from cron (``python -m app.compact_changes``), not over
+HTTP.  It first drops entries superseded by a newer entry for the same
+node, which never changes what a client receives.  Entries older than the
+retention window are then dropped and the highest dropped sequence is
+recorded as the workshop's floor; clients asking for changes from before
+the floor are told to reload the whole workshop.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import Session
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Loads the current state of nodes of one type: (db, ids) -> {id: payload}
+NodeLoader = Callable[[Session, List[int]], Dict[int, dict]]
+
+
+class ContentChangeMixin:
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    workshop_id = Column(Integer, nullable=False)
+    node_type = Column(String(20), nullable=False)
+    node_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (Index(f"ix_{cls.__tablename__}_workshop_seq", "workshop_id", "seq"),)
+
+
+class ChangeLogFloorMixin:
+    workshop_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False)
+
+
+class ChangeLogHeadMixin:
+    # A single row holding the last sequence handed out
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False)
+
+
+def record(db: Session, model, head_model, workshop_id: int, node_type: str, node_ids, op: str = UPSERT) -> None:
+    """Queue entries for ``node_ids``; they are written when the caller's transaction commits."""
+    if isinstance(node_ids, int):
+        node_ids = [node_ids]
+    pending = db.info.setdefault("change_log", {}).setdefault((model, head_model), [])
+    pending.extend(
+        {"workshop_id": workshop_id, "node_type": node_type, "node_id": node_id, "op": op}
+        for node_id in node_ids
+    )
+
+
+def _allocate(db: Session, model, head_model, count: int) -> int:
+    """Advance the counter row by ``count`` and return the new last sequence; the row stays locked."""
+    advance = update(head_model).where(head_model.id == 1).values(seq=head_model.seq + count)
+    while db.execute(advance).rowcount == 0:
+        # First entry on this database: start after any existing entries
+        try:
+            with db.begin_nested():
+                start = db.query(func.max(model.seq)).scalar() or 0
+                db.add(head_model(id=1, seq=start))
+        except IntegrityError:
+            pass  # another transaction created it first
+    return db.query(head_model.seq).filter(head_model.id == 1).scalar()
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(db: Session) -> None:
+    pending = db.info.pop("change_log", None)
+    if not pending:
+        return
+    # Everything else is written first, so the counter row is locked only for the commit itself
+    db.flush()
+    now = datetime.utcnow()
+    for (model, head_model), rows in pending.items():
+        last = _allocate(db, model, head_model, len(rows))
+        for seq, row in enumerate(rows, start=last - len(rows) + 1):
+            row.update(seq=seq, changed_at=now)
+        db.bulk_insert_mappings(model, rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop("change_log", None)
+
+
+def changes_since(
+    db: Session,
+    model,
+    floor_model,
+    workshop_id: int,
+    since: int,
+    loaders: Dict[str, NodeLoader],
+    limit: int = 500,
+) -> dict:
+    """
+    Return the nodes of a workshop that changed after sequence ``since``.
+
+    At most ``limit`` log entries are read per call; repeated entries for
+    the same node are collapsed into the latest one.  ``next_since`` is
+    the cursor for the following call and ``has_more`` tells whether more
+    entries are waiting.
+    """
+    floor = db.query(floor_model).get(workshop_id)
+    latest = db.query(func.max(model.seq)).filter(model.workshop_id == workshop_id).scalar() or 0
+    latest = max(latest, floor.seq if floor else 0)
+    if floor and since < floor.seq:
+        return {"workshop_id": workshop_id, "reset": True, "next_since": latest, "has_more": False, "changes": []}
+
+    rows = (
+        db.query(model)
+        .filter(model.workshop_id == workshop_id, model.seq > since)
+        .order_by(model.seq)
+        .limit(limit)
+        .all()
+    )
+    newest: Dict[tuple, object] = {}
+    for row in rows:
+        key = (row.node_type, row.node_id)
+        newest.pop(key, None)
+        newest[key] = row
+
+    wanted: Dict[str, List[int]] = {}
+    for (node_type, node_id), row in newest.items():
+        if row.op == UPSERT:
+            wanted.setdefault(node_type, []).append(node_id)
+    nodes = {node_type: loaders[node_type](db, ids) for node_type, ids in wanted.items()}
+
+    changes = []
+    for (node_type, node_id), row in newest.items():
+        node = nodes.get(node_type, {}).get(node_id) if row.op == UPSERT else None
+        changes.append({
+            "seq": row.seq,
+            "type": node_type,
+            "id": node_id,
+            # A node that no longer exists is reported as deleted
+            "op": row.op if node is not None or row.op == DELETE else DELETE,
+            "node": node,
+        })
+    return {
+        "workshop_id": workshop_id,
+        "reset": False,
+        "next_since": rows[-1].seq if rows else max(since, latest),
+        "has_more": len(rows) == limit,
+        "changes": changes,
+    }
+
+
+def compact(db: Session, model, floor_model, retention: timedelta) -> int:
+    """Drop superseded entries and entries older than ``retention``; return how many were removed."""
+    newest = select(func.max(model.seq)).group_by(model.workshop_id, model.node_type, model.node_id)
+    removed = (
+        db.query(model)
+        .filter(model.seq.notin_(newest))
+        .delete(synchronize_session=False)
+    )
+
+    cutoff = datetime.utcnow() - retention
+    expired = (
+        db.query(model.workshop_id, func.max(model.seq))
+        .filter(model.changed_at < cutoff)
+        .group_by(model.workshop_id)
+        .all()
+    )
+    for workshop_id, seq in expired:
+        floor = db.query(floor_model).get(workshop_id)
+        if floor:
+            floor.seq = max(floor.seq, seq)
+        else:
+            db.add(floor_model(workshop_id=workshop_id, seq=seq))
+        removed += (
+            db.query(model)
+            .filter(model.workshop_id == workshop_id, model.seq <= seq)
+            .delete(synchronize_session=False)
+        )
+    db.commit()
+    return removed
@@ -0,0 +1,27 @@
+"""
+Blob garbage collection, run from cron::
+
+    python -m app.collect_blobs [--grace-seconds N]
+
+Removes stored blobs that no section references any more and that are
+older than ``BLOB_GC_GRACE_SECONDS`` (default 3600); see ``BlobStore.collect``.
+"""
+
+import argparse
+
+from . import blobstore
+from .db import models
+from .db.database import SessionLocal
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Delete unreferenced blobs from the blob store.")
+    parser.add_argument("--grace-seconds", type=int, default=blobstore.BLOB_GC_GRACE_SECONDS)
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        referenced = [digest for (digest,) in db.query(models.Section.code_digest).filter(models.Section.code_digest.isnot(None)).distinct()]
+    print(f"removed {blobstore.store.collect(referenced, args.grace_seconds)} blobs")
+
+
+if __name__ == "__main__":
+    main()
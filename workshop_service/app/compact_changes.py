@@ -0,0 +1,28 @@
+"""
+Change-log compaction, run from cron rather than over HTTP::
+
+    python -m app.compact_changes [--retention-days N]
+
+Drops superseded entries and entries older than ``CHANGE_LOG_RETENTION_DAYS``
+(default 30); see ``changelog.compact``.
+"""
+
+import argparse
+import os
+
+from . import crud
+from .db.database import SessionLocal
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compact the workshop content change log.")
+    parser.add_argument("--retention-days", type=int, default=CHANGE_LOG_RETENTION_DAYS)
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        print(f"removed {crud.compact_changes(db, args.retention_days)} change-log entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,49 @@ CRUD operations for the workshop microservice.
 
 This module defines helper functions for creating and retrieving
 workshops, sections, and quiz questions, as well as updating student
-progress.  These functions abstract away direct database access from
-the API route handlers.
+progress.  Content writes also append to the change log (see
+``changelog``) in the same transaction, and changes to a workshop's
+trainer queue a ``workshop.catalog`` event in the outbox (see ``outbox``).
+These functions abstract away direct database access from the API route
+handlers.
 """
 
-from sqlalchemy.orm import Session
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session, selectinload, undefer
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .db import models
-from . import schemas
+from . import changelog, outbox, schemas
+from .blobstore import blob_url
+
+
+def _log_change(db: Session, workshop_id: int, node_type: str, node_ids, op: str = changelog.UPSERT) -> None:
+    changelog.record(db, models.ContentChange, models.ChangeLogHead, workshop_id, node_type, node_ids, op)
+
+
+def _catalog_event(db: Session, workshop_id: int, trainer_id: Optional[int]) -> None:
+    """Tell the analytics service who trains ``workshop_id``; committed with the caller's write."""
+    outbox.enqueue(db, models.OutboxEvent, outbox.TOPIC_WORKSHOP,
+                   {"workshop_id": workshop_id, "trainer_id": trainer_id}, key=str(workshop_id))
+
+
+def _add_quiz_subsection(section: models.Section, questions: List[models.QuizQuestion]) -> None:
+    """Give a section being created a quiz subsection holding ``questions``, if there are any."""
+    if questions:
+        section.subsections.append(models.SubSection(
+            title="Quiz", content_type="quiz", order=len(section.subsections), questions=questions,
+        ))
+
+
+def _quiz_subsection(db: Session, section_id: int) -> Optional[models.SubSection]:
+    """Return the first quiz subsection of an existing section, or None if it has none."""
+    return (
+        db.query(models.SubSection)
+        .filter(models.SubSection.section_id == section_id, models.SubSection.content_type == "quiz")
+        .order_by(models.SubSection.order, models.SubSection.id)
+        .first()
+    )
 
 
 def create_workshop(db: Session, workshop_data: schemas.WorkshopCreate) -> models.Workshop:
@@ -23,22 +56,31 @@ def create_workshop(db: Session, workshop_data: schemas.WorkshopCreate) -> model
         trainer_id=workshop_data.trainer_id,
     )
     # Create nested sections and questions
+    questions = []
     for section_data in workshop_data.sections:
         section = models.Section(
             title=section_data.title,
             ppt_url=section_data.ppt_url,
             code=section_data.code,
         )
-        for question_data in section_data.questions:
-            question = models.QuizQuestion(
+        section_questions = [
+            models.QuizQuestion(
                 question=question_data.question,
                 options=question_data.options,
                 answer=question_data.answer,
                 explanation=question_data.explanation,
             )
-            section.questions.append(question)
+            for question_data in section_data.questions
+        ]
+        _add_quiz_subsection(section, section_questions)
+        questions.extend(section_questions)
         workshop.sections.append(section)
     db.add(workshop)
+    db.flush()
+    _log_change(db, workshop.id, "workshop", workshop.id)
+    _log_change(db, workshop.id, "section", [section.id for section in workshop.sections])
+    _log_change(db, workshop.id, "question", [question.id for question in questions])
+    _catalog_event(db, workshop.id, workshop.trainer_id)
     db.commit()
     db.refresh(workshop)
     return workshop
@@ -49,16 +91,117 @@ def get_workshops(db: Session) -> List[models.Workshop]:
 
 
 def get_workshop(db: Session, workshop_id: int) -> Optional[models.Workshop]:
-    return db.query(models.Workshop).filter(models.Workshop.id == workshop_id).first()
+    sections = selectinload(models.Workshop.sections)
+    return (
+        db.query(models.Workshop)
+        .options(sections.undefer(models.Section._code), sections.selectinload(models.Section.questions))
+        .filter(models.Workshop.id == workshop_id)
+        .first()
+    )
+
 
+def clone_workshop(db: Session, workshop_id: int, clone_data: schemas.WorkshopClone) -> Optional[models.Workshop]:
+    """
+    Duplicate a workshop with its sections, subsections and quiz questions.
 
-def record_progress(db: Session, progress: schemas.ProgressUpdate) -> models.StudentProgress:
+    Each level of the tree is copied with one ``INSERT ... SELECT``, so the
+    cost is a fixed number of statements regardless of the size of the
+    course.  Copied sections and subsections record their source row in
+    ``cloned_from_id``, and the next level's foreign keys are remapped by
+    joining on it.  Section code held in the blob store is shared by
+    digest rather than copied.  All statements run in a single transaction.
+    """
+    source = db.query(models.Workshop).filter(models.Workshop.id == workshop_id).first()
+    if not source:
+        return None
+    sections = models.Section.__table__
+    subsections = models.SubSection.__table__
+    questions = models.QuizQuestion.__table__
+    try:
+        clone = models.Workshop(
+            title=clone_data.title or source.title,
+            description=source.description,
+            trainer_id=clone_data.trainer_id if clone_data.trainer_id is not None else source.trainer_id,
+        )
+        db.add(clone)
+        db.flush()
+
+        db.execute(
+            sections.insert().from_select(
+                ["workshop_id", "title", "ppt_url", "code", "code_digest", "code_size", "cloned_from_id"],
+                select(
+                    literal(clone.id),
+                    sections.c.title,
+                    sections.c.ppt_url,
+                    sections.c.code,
+                    sections.c.code_digest,
+                    sections.c.code_size,
+                    sections.c.id,
+                )
+                .where(sections.c.workshop_id == workshop_id)
+                .order_by(sections.c.id),
+            )
+        )
+        new_sections = sections.alias("new_sections")
+        db.execute(
+            subsections.insert().from_select(
+                ["section_id", "title", "content_type", "content_url", "order", "cloned_from_id"],
+                select(
+                    new_sections.c.id,
+                    subsections.c.title,
+                    subsections.c.content_type,
+                    subsections.c.content_url,
+                    subsections.c.order,
+                    subsections.c.id,
+                )
+                .join(new_sections, new_sections.c.cloned_from_id == subsections.c.section_id)
+                .where(new_sections.c.workshop_id == clone.id)
+                .order_by(subsections.c.id),
+            )
+        )
+        new_section_ids = select(sections.c.id).where(sections.c.workshop_id == clone.id)
+
+        if clone_data.include_questions:
+            new_subsections = subsections.alias("new_subsections")
+            db.execute(
+                questions.insert().from_select(
+                    ["subsection_id", "question", "options", "answer", "explanation"],
+                    select(
+                        new_subsections.c.id,
+                        questions.c.question,
+                        questions.c.options,
+                        questions.c.answer,
+                        questions.c.explanation,
+                    )
+                    .join(new_subsections, new_subsections.c.cloned_from_id == questions.c.subsection_id)
+                    .where(new_subsections.c.section_id.in_(new_section_ids))
+                    .order_by(questions.c.id),
+                )
+            )
+        _log_change(db, clone.id, "workshop", clone.id)
+        _log_change(db, clone.id, "section", db.scalars(new_section_ids).all())
+        if clone_data.include_questions:
+            _log_change(db, clone.id, "question", db.scalars(
+                select(questions.c.id)
+                .join(subsections, subsections.c.id == questions.c.subsection_id)
+                .where(subsections.c.section_id.in_(new_section_ids))
+            ).all())
+        _catalog_event(db, clone.id, clone.trainer_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(clone)
+    return clone
+
+
+def record_progress(db: Session, progress: schemas.ProgressUpdate) -> models.StudentSubProgress:
     # Find existing progress record or create a new one
     existing = (
-        db.query(models.StudentProgress)
+        db.query(models.StudentSubProgress)
         .filter(
-            models.StudentProgress.student_id == progress.student_id,
-            models.StudentProgress.section_id == progress.section_id,
+            models.StudentSubProgress.student_id == progress.student_id,
+            models.StudentSubProgress.subsection_id == progress.subsection_id,
         )
         .first()
     )
@@ -69,9 +212,9 @@ def record_progress(db: Session, progress: schemas.ProgressUpdate) -> models.Stu
         db.refresh(existing)
         return existing
     else:
-        new_progress = models.StudentProgress(
+        new_progress = models.StudentSubProgress(
             student_id=progress.student_id,
-            section_id=progress.section_id,
+            subsection_id=progress.subsection_id,
             completed=progress.completed,
             completed_at=datetime.utcnow() if progress.completed else None,
         )
@@ -93,8 +236,10 @@ def update_workshop(db: Session, workshop_id: int, update_data: schemas.Workshop
         workshop.title = update_data.title
     if update_data.description is not None:
         workshop.description = update_data.description
-    if update_data.trainer_id is not None:
+    if update_data.trainer_id is not None and update_data.trainer_id != workshop.trainer_id:
         workshop.trainer_id = update_data.trainer_id
+        _catalog_event(db, workshop.id, workshop.trainer_id)
+    _log_change(db, workshop.id, "workshop", workshop.id)
     db.commit()
     db.refresh(workshop)
     return workshop
@@ -105,6 +250,8 @@ def delete_workshop(db: Session, workshop_id: int) -> bool:
     if not workshop:
         return False
     db.delete(workshop)
+    _log_change(db, workshop_id, "workshop", workshop_id, changelog.DELETE)
+    _catalog_event(db, workshop_id, None)
     db.commit()
     return True
 
@@ -119,15 +266,20 @@ def create_section(db: Session, workshop_id: int, section_data: schemas.SectionC
         ppt_url=section_data.ppt_url,
         code=section_data.code,
     )
-    for question_data in section_data.questions:
-        question = models.QuizQuestion(
+    questions = [
+        models.QuizQuestion(
             question=question_data.question,
             options=question_data.options,
             answer=question_data.answer,
             explanation=question_data.explanation,
         )
-        section.questions.append(question)
+        for question_data in section_data.questions
+    ]
+    _add_quiz_subsection(section, questions)
     db.add(section)
+    db.flush()
+    _log_change(db, workshop_id, "section", section.id)
+    _log_change(db, workshop_id, "question", [question.id for question in questions])
     db.commit()
     db.refresh(section)
     return section
@@ -143,6 +295,7 @@ def update_section(db: Session, section_id: int, update_data: schemas.SectionUpd
         section.ppt_url = update_data.ppt_url
     if update_data.code is not None:
         section.code = update_data.code
+    _log_change(db, section.workshop_id, "section", section.id)
     db.commit()
     db.refresh(section)
     return section
@@ -153,22 +306,33 @@ def delete_section(db: Session, section_id: int) -> bool:
     if not section:
         return False
     db.delete(section)
+    _log_change(db, section.workshop_id, "section", section_id, changelog.DELETE)
     db.commit()
     return True
 
 
 def create_question(db: Session, section_id: int, question_data: schemas.CreateQuestion):
+    """
+    Add a question to the section's quiz subsection.  Returns None if the
+    section does not exist and raises ValueError if it has no quiz
+    subsection; quiz subsections are only created along with a section.
+    """
     section = db.query(models.Section).filter(models.Section.id == section_id).first()
     if not section:
         return None
+    subsection = _quiz_subsection(db, section_id)
+    if subsection is None:
+        raise ValueError(f"Section {section_id} has no quiz subsection")
     question = models.QuizQuestion(
-        section_id=section_id,
+        subsection=subsection,
         question=question_data.question,
         options=question_data.options,
         answer=question_data.answer,
         explanation=question_data.explanation,
     )
     db.add(question)
+    db.flush()
+    _log_change(db, section.workshop_id, "question", question.id)
     db.commit()
     db.refresh(question)
     return question
@@ -186,6 +350,7 @@ def update_question(db: Session, question_id: int, update_data: schemas.QuizQues
         question.answer = update_data.answer
     if update_data.explanation is not None:
         question.explanation = update_data.explanation
+    _log_change(db, question.subsection.section.workshop_id, "question", question.id)
     db.commit()
     db.refresh(question)
     return question
@@ -195,6 +360,63 @@ def delete_question(db: Session, question_id: int) -> bool:
     question = db.query(models.QuizQuestion).filter(models.QuizQuestion.id == question_id).first()
     if not question:
         return False
+    workshop_id = question.subsection.section.workshop_id
     db.delete(question)
+    _log_change(db, workshop_id, "question", question_id, changelog.DELETE)
     db.commit()
-    return True
\ No newline at end of file
+    return True
+
+
+def _load_workshops(db: Session, ids: List[int]) -> dict:
+    return {
+        w.id: {"id": w.id, "title": w.title, "description": w.description, "trainer_id": w.trainer_id}
+        for w in db.query(models.Workshop).filter(models.Workshop.id.in_(ids))
+    }
+
+
+def _load_sections(db: Session, ids: List[int]) -> dict:
+    return {
+        s.id: {
+            "id": s.id,
+            "workshop_id": s.workshop_id,
+            "title": s.title,
+            "ppt_url": s.ppt_url,
+            "code": s._code,
+            "code_digest": s.code_digest,
+            "code_size": s.code_size,
+            "code_url": blob_url(s.code_digest),
+        }
+        for s in db.query(models.Section).options(undefer(models.Section._code)).filter(models.Section.id.in_(ids))
+    }
+
+
+def _load_questions(db: Session, ids: List[int]) -> dict:
+    return {
+        q.id: {
+            "id": q.id,
+            "subsection_id": q.subsection_id,
+            "question": q.question,
+            "options": q.options,
+            "answer": q.answer,
+            "explanation": q.explanation,
+        }
+        for q in db.query(models.QuizQuestion).filter(models.QuizQuestion.id.in_(ids))
+    }
+
+
+CHANGE_LOADERS = {
+    "workshop": _load_workshops,
+    "section": _load_sections,
+    "question": _load_questions,
+}
+
+
+def get_changes(db: Session, workshop_id: int, since: int, limit: int = 500) -> dict:
+    """Return content changes of a workshop after sequence ``since``."""
+    return changelog.changes_since(
+        db, models.ContentChange, models.ChangeLogFloor, workshop_id, since, CHANGE_LOADERS, limit
+    )
+
+
+def compact_changes(db: Session, retention_days: int) -> int:
+    return changelog.compact(db, models.ContentChange, models.ChangeLogFloor, timedelta(days=retention_days))
@@ -0,0 +1,40 @@
+"""
+Async database access for the workshop microservice.
+
+The hot learner paths (workshop fetch, quiz fetch, progress read/write)
+can run on an ``AsyncEngine`` instead of the threadpool-bound sync
+engine, so the number of in-flight requests is no longer capped by the
+threadpool size.  The option is enabled with ``USE_ASYNC_DB=true``; the
+async URL is derived from ``DATABASE_URL`` (``asyncpg`` for PostgreSQL,
+``aiosqlite`` for SQLite) unless ``ASYNC_DATABASE_URL`` is set.
+"""
+
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in ``url`` for its asyncio counterpart."""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def create_async_sessionmaker(url: str, **engine_kwargs) -> sessionmaker:
+    """
+    Build an ``AsyncSession`` factory for ``url``.
+
+    ``expire_on_commit`` is off so objects stay readable after commit;
+    with asyncio there is no implicit lazy loading to refresh them.
+    """
+    engine = create_async_engine(to_async_url(url), pool_pre_ping=True, **engine_kwargs)
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -35,3 +35,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+_AsyncSessionLocal = None
+
+
+async def get_async_db():
+    """Yield an ``AsyncSession``; the async engine is created on first use."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from .async_database import create_async_sessionmaker
+        _AsyncSessionLocal = create_async_sessionmaker(os.getenv("ASYNC_DATABASE_URL", DATABASE_URL))
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -7,7 +7,11 @@ progress.  Relationships are set up via foreign keys.
 
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, deferred
+
+from ..blobstore import blob_body
+from ..changelog import ChangeLogFloorMixin, ChangeLogHeadMixin, ContentChangeMixin
+from ..outbox import OutboxMixin
 
 Base = declarative_base()
 
@@ -28,10 +32,25 @@ class Section(Base):
     workshop_id = Column(Integer, ForeignKey("workshops.id"), nullable=False)
     title = Column(String(200), nullable=False)
     ppt_url = Column(String(255), nullable=True)
-    code = Column(Text, nullable=True)
+    # Large code bodies live in the blob store; only small ones stay inline.
+    _code = deferred(Column("code", Text, nullable=True))
+    code_digest = Column(String(64), nullable=True)
+    code_size = Column(Integer, nullable=True)
+    code = blob_body("_code", "code_digest", "code_size")
+    # The section this one was cloned from; lets a clone remap children in SQL
+    cloned_from_id = Column(Integer, nullable=True)
 
     workshop = relationship("Workshop", back_populates="sections")
     subsections = relationship("SubSection", back_populates="section", cascade="all, delete-orphan")
+    # Read-only view of the questions held by this section's subsections
+    questions = relationship(
+        "QuizQuestion",
+        secondary="subsections",
+        primaryjoin="Section.id == SubSection.section_id",
+        secondaryjoin="SubSection.id == QuizQuestion.subsection_id",
+        order_by="QuizQuestion.id",
+        viewonly=True,
+    )
 
 
 class SubSection(Base):
@@ -42,6 +61,7 @@ class SubSection(Base):
     content_type = Column(String(50), default="content")  # content, quiz, ppt, code
     content_url = Column(String(255), nullable=True)
     order = Column(Integer)
+    cloned_from_id = Column(Integer, nullable=True)  # as Section.cloned_from_id
 
     section = relationship("Section", back_populates="subsections")
     questions = relationship("QuizQuestion", back_populates="subsection", cascade="all, delete-orphan")
@@ -90,6 +110,22 @@ class PlatformSurvey(Base):
     rating = Column(Integer)
 
 
+class ContentChange(ContentChangeMixin, Base):
+    __tablename__ = "content_changes"
+
+
+class ChangeLogFloor(ChangeLogFloorMixin, Base):
+    __tablename__ = "change_log_floors"
+
+
+class ChangeLogHead(ChangeLogHeadMixin, Base):
+    __tablename__ = "change_log_head"
+
+
+class OutboxEvent(OutboxMixin, Base):
+    __tablename__ = "outbox"
+
+
 def init_db():
     from .database import engine  # local import to avoid circular dependency
     Base.metadata.create_all(bind=engine)
@@ -14,7 +14,11 @@ from sqlalchemy import text
 
 from .db.models import init_db
 from .api.routes_workshop import router as workshop_router
-from .db.database import engine
+from .api.routes_workshop_async import router as async_workshop_router
+from . import outbox
+from .db.async_database import USE_ASYNC_DB
+from .db.database import SessionLocal, engine
+from .db.models import OutboxEvent
 
 # Create tables on startup
 init_db()
@@ -34,9 +38,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include the workshop router
+# Include the workshop routers; async hot paths must come first to take precedence
+if USE_ASYNC_DB:
+    app.include_router(async_workshop_router)
 app.include_router(workshop_router)
 
+# Publish catalog events from this process; otherwise they wait in the outbox
+if os.getenv("OUTBOX_RELAY", "false").lower() in ("1", "true", "yes"):
+    relay = outbox.OutboxRelay(SessionLocal, OutboxEvent, outbox.publisher_from_env())
+    app.add_event_handler("startup", relay.start)
+    app.add_event_handler("shutdown", relay.stop)
+
 
 @app.get("/ping-db", tags=["Health Check"])
 def ping_db():
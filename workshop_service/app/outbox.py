@@ -0,0 +1,172 @@
+"""
+Transactional outbox for learner and workshop catalog events.
+
+Request handlers never talk to the broker.  They add an outbox row in the
+same transaction as the domain change, so an event exists exactly when
+the change was committed.  A background relay reads the outbox in id
+order, publishes each batch and deletes the published rows in bulk.  If
+publishing fails the rows stay put and the batch is retried, so delivery
+is at-least-once; every payload carries an ``event_id`` for consumers to
+deduplicate on.
+
+Publishers:
+
+- ``KafkaPublisher``: ``kafka-python`` producer with batch compression
+  (``OUTBOX_COMPRESSION``, default ``gzip``) and ``acks=all``.
+- ``FilePublisher``: appends JSON lines to ``<root>/<topic>.jsonl``, the
+  layout read by the analytics service's file broker.
+- ``InMemoryPublisher``: keeps messages in a list, for tests.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, delete, select
+from sqlalchemy.orm import Session
+
+TOPIC_PROGRESS = "learner.progress"
+TOPIC_QUIZ = "learner.quiz"
+TOPIC_FEEDBACK = "learner.feedback"
+TOPIC_WORKSHOP = "workshop.catalog"  # workshop_id, trainer_id (None once deleted)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+OUTBOX_COMPRESSION = os.getenv("OUTBOX_COMPRESSION", "gzip")
+
+logger = logging.getLogger(__name__)
+
+# (topic, key, value)
+OutboxMessage = Tuple[str, Optional[str], dict]
+
+
+class OutboxMixin:
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    topic = Column(String(100), nullable=False)
+    key = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=False)  # JSON encoded event
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+def enqueue(db: Session, model, topic: str, payload: dict, key: Optional[str] = None) -> str:
+    """Add an event to the outbox as part of the caller's transaction and return its id."""
+    event_id = uuid.uuid4().hex
+    event = {"event_id": event_id, "ts": datetime.utcnow().isoformat(), **payload}
+    db.add(model(topic=topic, key=key, payload=json.dumps(event)))
+    return event_id
+
+
+class InMemoryPublisher:
+    def __init__(self):
+        self.messages: List[OutboxMessage] = []
+
+    def publish(self, messages: List[OutboxMessage]) -> None:
+        self.messages.extend(messages)
+
+
+class FilePublisher:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def publish(self, messages: List[OutboxMessage]) -> None:
+        by_topic = {}
+        for topic, _key, value in messages:
+            by_topic.setdefault(topic, []).append(json.dumps(value) + "\n")
+        for topic, lines in by_topic.items():
+            # One write per topic keeps lines whole for readers tailing the file
+            with open(os.path.join(self.root, f"{topic}.jsonl"), "a") as fh:
+                fh.write("".join(lines))
+                fh.flush()
+                os.fsync(fh.fileno())
+
+
+class KafkaPublisher:
+    def __init__(self, bootstrap_servers: str, compression_type: str = OUTBOX_COMPRESSION, linger_ms: int = 20):
+        from kafka import KafkaProducer
+
+        self._producer = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            compression_type=compression_type,
+            linger_ms=linger_ms,
+            acks="all",
+            key_serializer=lambda key: key.encode("utf-8") if key is not None else None,
+            value_serializer=lambda value: json.dumps(value).encode("utf-8"),
+        )
+
+    def publish(self, messages: List[OutboxMessage]) -> None:
+        futures = [self._producer.send(topic, key=key, value=value) for topic, key, value in messages]
+        self._producer.flush()
+        for future in futures:
+            future.get()  # raises if the broker rejected the record
+
+
+def publisher_from_env():
+    """``KAFKA_BOOTSTRAP_SERVERS`` selects Kafka; otherwise ``EVENT_BROKER_DIR`` selects the file publisher."""
+    servers = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
+    if servers:
+        return KafkaPublisher(servers)
+    return FilePublisher(os.getenv("EVENT_BROKER_DIR", "events"))
+
+
+def relay_once(session_factory: Callable[[], Session], model, publisher, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Publish and delete up to ``batch_size`` outbox rows; return how many were relayed."""
+    with session_factory() as db:
+        # SKIP LOCKED lets several relays share the outbox on PostgreSQL
+        rows = db.execute(
+            select(model.id, model.topic, model.key, model.payload)
+            .order_by(model.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            db.rollback()
+            return 0
+        try:
+            publisher.publish([(row.topic, row.key, json.loads(row.payload)) for row in rows])
+            db.execute(delete(model).where(model.id.in_([row.id for row in rows])))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+
+
+class OutboxRelay:
+    """Background thread draining the outbox in batches."""
+
+    def __init__(self, session_factory, model, publisher, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.model = model
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.relayed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                count = relay_once(self.session_factory, self.model, self.publisher, self.batch_size)
+            except Exception:
+                logger.exception("Outbox relay failed; retrying")
+                count = 0
+            self.relayed += count
+            # Keep draining while batches come back full
+            if count < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, daemon=True, name="outbox-relay")
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,126 @@
+"""
+Raw-row read path for workshop trees.
+
+Building ``WorkshopOut`` responses through the ORM hydrates every
+workshop, section and question object and then re-validates them with
+``orm_mode`` schemas.  For deep trees that dominates CPU time.  The
+functions here run three Core ``select()`` statements (workshops,
+sections, questions), assemble nested dicts in a single pass keyed by
+parent id and leave encoding to ``ORJSONResponse``.  Code kept in the
+blob store is never read here: such sections carry ``code: None`` and a
+``code_url`` to fetch the body from.
+
+The output has exactly the shape of ``schemas.WorkshopOut``, which stays
+the documented contract; the test suite checks the two paths agree.
+"""
+
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .blobstore import blob_url
+from .db import models
+
+workshops = models.Workshop.__table__
+sections = models.Section.__table__
+subsections = models.SubSection.__table__
+questions = models.QuizQuestion.__table__
+
+
+def tree_statements(workshop_id: Optional[int] = None) -> Tuple[Select, Select, Select]:
+    """Return the workshop, section and question selects for one workshop, or all of them."""
+    workshop_stmt = select(
+        workshops.c.id, workshops.c.title, workshops.c.description, workshops.c.trainer_id
+    ).order_by(workshops.c.id)
+    section_stmt = select(
+        sections.c.id,
+        sections.c.workshop_id,
+        sections.c.title,
+        sections.c.ppt_url,
+        sections.c.code,
+        sections.c.code_digest,
+        sections.c.code_size,
+    ).order_by(sections.c.id)
+    question_stmt = (
+        select(
+            questions.c.id,
+            subsections.c.section_id,
+            questions.c.question,
+            questions.c.options,
+            questions.c.answer,
+            questions.c.explanation,
+        )
+        .join(subsections, subsections.c.id == questions.c.subsection_id)
+        .order_by(questions.c.id)
+    )
+    if workshop_id is not None:
+        workshop_stmt = workshop_stmt.where(workshops.c.id == workshop_id)
+        section_stmt = section_stmt.where(sections.c.workshop_id == workshop_id)
+        question_stmt = question_stmt.join(sections, sections.c.id == subsections.c.section_id).where(
+            sections.c.workshop_id == workshop_id
+        )
+    return workshop_stmt, section_stmt, question_stmt
+
+
+def assemble(
+    workshop_rows: Iterable[Mapping],
+    section_rows: Iterable[Mapping],
+    question_rows: Iterable[Mapping],
+) -> List[dict]:
+    """Nest section and question rows under their parents in one pass over each result."""
+    result = []
+    by_workshop = {}
+    for w in workshop_rows:
+        node = {
+            "title": w["title"],
+            "description": w["description"],
+            "trainer_id": w["trainer_id"],
+            "id": w["id"],
+            "sections": [],
+        }
+        by_workshop[w["id"]] = node["sections"]
+        result.append(node)
+
+    by_section = {}
+    for s in section_rows:
+        parent = by_workshop.get(s["workshop_id"])
+        if parent is None:
+            continue
+        digest = s["code_digest"]
+        node = {
+            "title": s["title"],
+            "ppt_url": s["ppt_url"],
+            "code": None if digest else s["code"],
+            "id": s["id"],
+            "code_digest": digest,
+            "code_size": s["code_size"],
+            "code_url": blob_url(digest),
+            "questions": [],
+        }
+        by_section[s["id"]] = node["questions"]
+        parent.append(node)
+
+    for q in question_rows:
+        parent = by_section.get(q["section_id"])
+        if parent is None:
+            continue
+        parent.append({
+            "question": q["question"],
+            "options": q["options"],
+            "answer": q["answer"],
+            "explanation": q["explanation"],
+            "id": q["id"],
+        })
+    return result
+
+
+def load_workshops(db: Session, workshop_id: Optional[int] = None) -> List[dict]:
+    return assemble(*(db.execute(stmt).mappings().all() for stmt in tree_statements(workshop_id)))
+
+
+async def load_workshops_async(db: AsyncSession, workshop_id: Optional[int] = None) -> List[dict]:
+    rows = [(await db.execute(stmt)).mappings().all() for stmt in tree_statements(workshop_id)]
+    return assemble(*rows)
@@ -4,7 +4,9 @@ workshop microservice.
 """
 
 from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, root_validator
+
+from .blobstore import blob_url
 
 
 class QuizQuestionBase(BaseModel):
@@ -50,11 +52,25 @@ class SectionUpdate(BaseModel):
 
 class SectionOut(SectionBase):
     id: int
+    code_digest: Optional[str] = None
+    code_size: Optional[int] = None
+    code_url: Optional[str] = None
     questions: List[QuizQuestionOut]
 
     class Config:
         orm_mode = True
 
+    @root_validator(pre=True)
+    def link_stored_code(cls, values):
+        """Code kept in the blob store is linked by ``code_url``, never read into the response."""
+        digest = values.get("code_digest")
+        if not digest:
+            return values
+        # Copy every field but ``code`` so an ORM row's blob-backed property is not touched
+        values = {name: values.get(name) for name in cls.__fields__ if name not in ("code", "code_url")}
+        values["code_url"] = blob_url(digest)
+        return values
+
 
 class WorkshopBase(BaseModel):
     title: str
@@ -80,6 +96,19 @@ class WorkshopOut(WorkshopBase):
         orm_mode = True
 
 
+class WorkshopClone(BaseModel):
+    title: Optional[str] = None
+    trainer_id: Optional[int] = None
+    include_questions: bool = True
+
+
+class WorkshopSummary(WorkshopBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+
 class CreateQuestion(BaseModel):
     question: str
     options: Dict[str, str]
@@ -89,5 +118,5 @@ class CreateQuestion(BaseModel):
 
 class ProgressUpdate(BaseModel):
     student_id: int
-    section_id: int
+    subsection_id: int
     completed: bool
\ No newline at end of file
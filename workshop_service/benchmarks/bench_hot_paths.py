@@ -0,0 +1,144 @@
+"""
+Load benchmark for the learner hot paths in sync and async mode.
+
+Simulates ``--learners`` concurrent learners, each fetching the workshop
+and then recording progress, against the sync router alone and against
+the async router mounted in front of it (as ``USE_ASYNC_DB`` does).
+Requests go through the ASGI stack in-process, so the numbers include
+routing, validation and serialization but no network hop.
+
+Point ``--database-url`` at PostgreSQL to measure the intended setup;
+the SQLite default only shows the threadpool ceiling of the sync mode.
+
+    python workshop_service/benchmarks/bench_hot_paths.py --learners 1000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def seed(SessionLocal, models, sections, subsections, questions):
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="Benchmark workshop", description="load test", trainer_id=1)
+        for s in range(sections):
+            section = models.Section(title=f"Section {s}", code="print('hello')\n" * 20)
+            for ss in range(subsections):
+                sub = models.SubSection(title=f"Sub {s}.{ss}", content_type="quiz", order=ss)
+                for q in range(questions):
+                    sub.questions.append(models.QuizQuestion(
+                        question=f"Question {s}.{ss}.{q}", options={"A": "1", "B": "2"}, answer="A"
+                    ))
+                section.subsections.append(sub)
+            workshop.sections.append(section)
+        db.add(workshop)
+        db.commit()
+        return workshop.id
+
+
+async def run_learners(app, workshop_id, learners):
+    import httpx
+
+    latencies = {"fetch": [], "progress": []}
+
+    async def learner(client, student_id):
+        start = time.perf_counter()
+        response = await client.get(f"/workshops/{workshop_id}")
+        response.raise_for_status()
+        latencies["fetch"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        response = await client.post(
+            "/workshops/progress", json={"student_id": student_id, "subsection_id": 1, "completed": True}
+        )
+        response.raise_for_status()
+        latencies["progress"].append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(learner(client, i) for i in range(learners)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--subsections", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    db_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("BLOB_STORE_DIR", os.path.join(tmpdir, "blobs"))
+
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from workshop_service.app.db import models
+    from workshop_service.app.db.async_database import create_async_sessionmaker
+    from workshop_service.app.db.database import get_async_db, get_db
+    from workshop_service.app.api.routes_workshop import router as workshop_router
+    from workshop_service.app.api.routes_workshop_async import router as async_workshop_router
+
+    if db_url.startswith("sqlite"):
+        sync_kwargs = {"connect_args": {"check_same_thread": False, "timeout": 60}}
+        async_kwargs = {"connect_args": {"timeout": 60}}
+    else:
+        # Same connection budget for both modes
+        sync_kwargs = async_kwargs = {"pool_size": 40, "max_overflow": 0}
+    engine = create_engine(db_url, **sync_kwargs)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = create_async_sessionmaker(db_url, **async_kwargs)
+    models.Base.metadata.create_all(bind=engine)
+    workshop_id = seed(SessionLocal, models, args.sections, args.subsections, args.questions)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    sync_app = FastAPI()
+    sync_app.include_router(workshop_router)
+    async_app = FastAPI()
+    async_app.include_router(async_workshop_router)
+    async_app.include_router(workshop_router)
+
+    print(f"{args.learners} concurrent learners, {args.sections}x{args.subsections}x{args.questions} workshop, {db_url.split('://')[0]}")
+    print(f"{'mode':<6} {'path':<9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'req/s':>9}")
+    for mode, app in (("sync", sync_app), ("async", async_app)):
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        latencies, elapsed = asyncio.run(run_learners(app, workshop_id, args.learners))
+        for path, values in latencies.items():
+            ms = [v * 1000 for v in values]
+            print(
+                f"{mode:<6} {path:<9} {percentile(ms, 50):>9.1f} {percentile(ms, 99):>9.1f} "
+                f"{statistics.mean(ms):>9.1f} {2 * args.learners / elapsed:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
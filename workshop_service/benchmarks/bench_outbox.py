@@ -0,0 +1,103 @@
+"""
+Request latency of the event-emitting endpoints with and without the outbox.
+
+Sends ``--requests`` progress updates and quiz submissions to the service
+in ``main.py`` in three modes:
+
+- ``none``: events disabled, the baseline cost of the endpoints.
+- ``outbox``: events written to the outbox in the request transaction,
+  with the relay draining it in a background thread.
+- ``direct``: events published synchronously from the request to a file
+  publisher, plus ``--broker-ms`` of simulated broker round trip.
+
+    python workshop_service/benchmarks/bench_outbox.py --requests 2000 --broker-ms 2
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--broker-ms", type=float, default=2.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault("BLOB_STORE_DIR", os.path.join(tmpdir, "blobs"))
+
+    from fastapi.testclient import TestClient
+
+    import main as service
+    from app import outbox
+
+    client = TestClient(service.app)
+    workshop_id = client.post("/workshops", json={
+        "title": "Benchmark workshop",
+        "modules": [
+            {"title": f"Module {m}", "position": m,
+             "substeps": [{"title": f"Step {s}", "content": "text", "position": s} for s in range(10)]}
+            for m in range(5)
+        ],
+    }).json()["id"]
+    module_id = client.get(f"/workshops/{workshop_id}").json()["modules"][0]["id"]
+    client.post(f"/modules/{module_id}/quiz", json={
+        "title": "Quiz",
+        "questions": [{"text": f"Q{i}", "options": ["a", "b"], "correct_answer": 1} for i in range(10)],
+    })
+    quiz = client.get(f"/modules/{module_id}/quiz").json()
+    answers = {str(q["id"]): 1 for q in quiz["questions"]}
+
+    emit_event = service.emit_event
+    direct_publisher = outbox.FilePublisher(os.path.join(tmpdir, "direct"))
+
+    def publish_directly(db, topic, payload, key=None):
+        direct_publisher.publish([(topic, key, payload)])
+        time.sleep(args.broker_ms / 1000)
+
+    modes = {
+        "none": lambda db, topic, payload, key=None: None,
+        "outbox": emit_event,
+        "direct": publish_directly,
+    }
+
+    print(f"{args.requests} requests per path, {os.environ['DATABASE_URL'].split('://')[0]}, broker round trip {args.broker_ms} ms")
+    print(f"{'mode':<7} {'path':<9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for mode, emit in modes.items():
+        service.emit_event = emit
+        relay = None
+        if mode == "outbox":
+            relay = outbox.OutboxRelay(service.SessionLocal, service.OutboxEvent, outbox.FilePublisher(os.path.join(tmpdir, "relay")))
+            relay.start()
+        latencies = {"progress": [], "quiz": []}
+        for i in range(args.requests):
+            start = time.perf_counter()
+            client.post("/progress", json={"user_id": i, "module_id": module_id, "substep_position": i % 10})
+            latencies["progress"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            client.post(f"/quiz/{quiz['id']}/submit", json={"user_id": i, "answers": answers})
+            latencies["quiz"].append(time.perf_counter() - start)
+        if relay:
+            relay.stop()
+        for path, values in latencies.items():
+            ms = [v * 1000 for v in values]
+            print(f"{mode:<7} {path:<9} {percentile(ms, 50):>9.2f} {percentile(ms, 99):>9.2f} {statistics.mean(ms):>9.2f}")
+    service.emit_event = emit_event
+
+
+if __name__ == "__main__":
+    main()
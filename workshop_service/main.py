@@ -18,15 +18,22 @@ handled at the API gateway or by the client passing a valid JWT.
 
 import os
 import json
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query
 from pydantic import BaseModel, Field
 from sqlalchemy import (Column, Date, DateTime, ForeignKey, Integer, String,
-                        Text, create_engine)
+                        Text, create_engine, func, select)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, relationship, sessionmaker
+from sqlalchemy.orm import Session, deferred, relationship, selectinload, sessionmaker, undefer
+
+from app import blobstore, changelog, outbox
+from app.blobstore import blob_body, blob_response
+from app.db.async_database import USE_ASYNC_DB, create_async_sessionmaker
 
 # Read database URL from environment; default to local postgres
 DATABASE_URL = os.getenv(
@@ -37,6 +44,7 @@ DATABASE_URL = os.getenv(
 # Set up SQLAlchemy
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = create_async_sessionmaker(DATABASE_URL) if USE_ASYNC_DB else None
 Base = declarative_base()
 
 
@@ -79,9 +87,13 @@ class Substep(Base):
     id = Column(Integer, primary_key=True, index=True)
     module_id = Column(Integer, ForeignKey("modules.id"), nullable=False)
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    # Large bodies live in the content-addressed blob store; see app/blobstore.py
+    _content = deferred(Column("content", Text, nullable=True))
+    content_digest = Column(String(64), nullable=True)
+    content_size = Column(Integer, nullable=True)
     position = Column(Integer, nullable=False)
     module = relationship("Module", back_populates="substeps")
+    content = blob_body("_content", "content_digest", "content_size")
 
 
 class Quiz(Base):
@@ -136,9 +148,32 @@ class Feedback(Base):
     workshop = relationship("Workshop", back_populates="feedback")
 
 
+class ContentChange(changelog.ContentChangeMixin, Base):
+    __tablename__ = "content_changes"
+
+
+class ChangeLogFloor(changelog.ChangeLogFloorMixin, Base):
+    __tablename__ = "change_log_floors"
+
+
+class ChangeLogHead(changelog.ChangeLogHeadMixin, Base):
+    __tablename__ = "change_log_head"
+
+
+class OutboxEvent(outbox.OutboxMixin, Base):
+    __tablename__ = "outbox"
+
+
 # Create tables on startup
 Base.metadata.create_all(bind=engine)
 
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+# Run the outbox relay inside this process; otherwise events wait in the outbox
+OUTBOX_RELAY = os.getenv("OUTBOX_RELAY", "false").lower() in ("1", "true", "yes")
+QUIZ_PASS_PERCENTAGE = float(os.getenv("QUIZ_PASS_PERCENTAGE", "70"))
+# How long another process's module/substep changes may take to show in progress events
+WORKSHOP_SHAPE_TTL = float(os.getenv("WORKSHOP_SHAPE_TTL", "60"))
+
 
 # Pydantic Schemas
 class SubstepCreate(BaseModel):
@@ -200,10 +235,272 @@ def get_db():
         db.close()
 
 
+def log_change(db: Session, workshop_id: int, node_type: str, node_ids, op: str = changelog.UPSERT):
+    """Append to the content change log; committed together with the caller's write."""
+    changelog.record(db, ContentChange, ChangeLogHead, workshop_id, node_type, node_ids, op)
+    if node_type in ("module", "substep"):
+        shapes.invalidate(workshop_id)
+
+
+def emit_event(db: Session, topic: str, payload: dict, key: Optional[str] = None):
+    """Queue a learner event in the outbox; committed together with the caller's write."""
+    outbox.enqueue(db, OutboxEvent, topic, payload, key)
+
+
+class WorkshopShapes:
+    """
+    Workshop and substep count per module, for progress events.
+
+    Entries last ``ttl`` seconds; this process drops a workshop's entries
+    as soon as it logs a module or substep change (see ``log_change``).
+    """
+
+    def __init__(self, ttl: float = WORKSHOP_SHAPE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._modules: Dict[int, tuple] = {}  # module_id -> (expires, workshop_id, {module_id: substeps})
+
+    def get(self, module_id: int) -> Optional[tuple]:
+        """(workshop_id, substep counts per module) if cached, else None."""
+        with self._lock:
+            entry = self._modules.get(module_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1], entry[2]
+
+    def put(self, rows) -> Optional[tuple]:
+        """Cache the ``shape_statement`` rows of one workshop and return them as ``get`` would."""
+        if not rows:
+            return None
+        workshop_id = rows[0][0]
+        counts = {module_id: substeps for _, module_id, substeps in rows}
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for module_id in counts:
+                self._modules[module_id] = (expires, workshop_id, counts)
+        return workshop_id, counts
+
+    def invalidate(self, workshop_id: int) -> None:
+        with self._lock:
+            for module_id in [m for m, entry in self._modules.items() if entry[1] == workshop_id]:
+                del self._modules[module_id]
+
+
+shapes = WorkshopShapes()
+
+
+def shape_statement(module_id: int):
+    """(workshop_id, module_id, substep count) for every module of ``module_id``'s workshop."""
+    workshop_id = select(Module.workshop_id).where(Module.id == module_id).scalar_subquery()
+    return (
+        select(Module.workshop_id, Module.id, func.count(Substep.id))
+        .outerjoin(Substep, Substep.module_id == Module.id)
+        .where(Module.workshop_id == workshop_id)
+        .group_by(Module.workshop_id, Module.id)
+    )
+
+
+def reached_statement(user_id: int, module_ids):
+    """The learner's highest substep per module."""
+    return select(StudentProgress.module_id, StudentProgress.highest_substep).where(
+        StudentProgress.user_id == user_id, StudentProgress.module_id.in_(module_ids)
+    )
+
+
+def progress_event(progress: ProgressUpdate, workshop_id: int, counts, reached) -> dict:
+    """Workshop-level progress for the learner, as read by analytics."""
+    counts, reached = dict(counts), dict(reached)
+    completed = 0
+    total_ratio = 0.0
+    for module_id, total in counts.items():
+        if module_id not in reached:
+            continue
+        ratio = min((reached[module_id] + 1) / (total or 1), 1.0)
+        total_ratio += ratio
+        completed += ratio >= 1.0
+    return {
+        "type": "progress",
+        "user_id": progress.user_id,
+        "workshop_id": workshop_id,
+        "module_id": progress.module_id,
+        "modules_completed": completed,
+        "percent_complete": round(total_ratio / len(counts) * 100, 2) if counts else 0.0,
+        "time_spent": progress.time_spent or 0,
+    }
+
+
+def emit_progress(db: Session, progress: ProgressUpdate) -> None:
+    shape = shapes.get(progress.module_id) or shapes.put(db.execute(shape_statement(progress.module_id)).all())
+    if shape is None:
+        return
+    workshop_id, counts = shape
+    db.flush()
+    reached = db.execute(reached_statement(progress.user_id, list(counts))).all()
+    emit_event(db, outbox.TOPIC_PROGRESS, progress_event(progress, workshop_id, counts, reached), key=str(progress.user_id))
+
+
+async def emit_progress_async(db: AsyncSession, progress: ProgressUpdate) -> None:
+    shape = shapes.get(progress.module_id) or shapes.put((await db.execute(shape_statement(progress.module_id))).all())
+    if shape is None:
+        return
+    workshop_id, counts = shape
+    await db.flush()
+    reached = (await db.execute(reached_statement(progress.user_id, list(counts)))).all()
+    emit_event(db, outbox.TOPIC_PROGRESS, progress_event(progress, workshop_id, counts, reached), key=str(progress.user_id))
+
+
+# Response builders shared by the sync and async handlers
+def quiz_payload(qz: Quiz) -> dict:
+    return {
+        "id": qz.id,
+        "title": qz.title,
+        "questions": [
+            {
+                "id": q.id,
+                "text": q.text,
+                "options": json.loads(q.options),
+            }
+            for q in qz.questions
+        ],
+    }
+
+
+def substep_payload(s: Substep) -> dict:
+    """Large bodies are left to ``/blobs/{digest}``; load ``Substep._content`` undeferred."""
+    return {
+        "id": s.id,
+        "title": s.title,
+        "content": None if s.content_digest else s._content,
+        "content_digest": s.content_digest,
+        "content_size": s.content_size,
+        "content_url": f"/blobs/{s.content_digest}" if s.content_digest else None,
+        "position": s.position,
+    }
+
+
+def workshop_options():
+    """Eager loads for ``workshop_payload``: one query per level and no deferred body loads."""
+    modules = selectinload(Workshop.modules)
+    return (
+        modules.selectinload(Module.substeps).options(undefer(Substep._content)),
+        modules.selectinload(Module.quiz).selectinload(Quiz.questions),
+    )
+
+
+def workshop_payload(w: Workshop) -> dict:
+    return {
+        "id": w.id,
+        "title": w.title,
+        "description": w.description,
+        "start_date": str(w.start_date) if w.start_date else None,
+        "end_date": str(w.end_date) if w.end_date else None,
+        "modules": [
+            {
+                "id": m.id,
+                "title": m.title,
+                "description": m.description,
+                "position": m.position,
+                "substeps": [substep_payload(s) for s in sorted(m.substeps, key=lambda x: x.position)],
+                "quiz": quiz_payload(m.quiz) if m.quiz else None,
+            }
+            for m in sorted(w.modules, key=lambda x: x.position)
+        ],
+    }
+
+
+def progress_payload(user_id: int, records: List[StudentProgress]) -> dict:
+    return {
+        "user_id": user_id,
+        "modules": [
+            {
+                "module_id": r.module_id,
+                "highest_substep": r.highest_substep,
+                "time_spent": r.time_spent,
+                "updated_at": r.updated_at,
+            }
+            for r in records
+        ],
+    }
+
+
+def apply_progress(db, rec: Optional[StudentProgress], progress: ProgressUpdate) -> None:
+    """Fold a progress update into ``rec``, adding a new record to ``db`` if there is none."""
+    if rec:
+        if progress.substep_position > rec.highest_substep:
+            rec.highest_substep = progress.substep_position
+        rec.time_spent = (rec.time_spent or 0) + (progress.time_spent or 0)
+        rec.updated_at = datetime.utcnow()
+    else:
+        rec = StudentProgress(
+            user_id=progress.user_id,
+            module_id=progress.module_id,
+            highest_substep=progress.substep_position,
+            time_spent=progress.time_spent,
+            updated_at=datetime.utcnow(),
+        )
+        db.add(rec)
+
+
+# Async hot paths.  With USE_ASYNC_DB enabled these are registered before the
+# sync handlers below and take precedence for the same paths.  Everything the
+# payload builders read is eager-loaded, as lazy loads are not possible on an
+# AsyncSession.
+async_router = APIRouter()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@async_router.get("/workshops/{workshop_id}")
+async def get_workshop_async(workshop_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(Workshop).where(Workshop.id == workshop_id).options(*workshop_options()))
+    w = result.scalars().first()
+    if not w:
+        raise HTTPException(status_code=404, detail="Workshop not found")
+    return workshop_payload(w)
+
+
+@async_router.get("/modules/{module_id}/quiz")
+async def get_quiz_async(module_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(Quiz).where(Quiz.module_id == module_id).options(selectinload(Quiz.questions))
+    )
+    qz = result.scalars().first()
+    if not qz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return quiz_payload(qz)
+
+
+@async_router.post("/progress", status_code=204)
+async def update_progress_async(progress: ProgressUpdate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(StudentProgress).filter_by(user_id=progress.user_id, module_id=progress.module_id)
+    )
+    apply_progress(db, result.scalars().first(), progress)
+    await emit_progress_async(db, progress)
+    await db.commit()
+    return
+
+
+@async_router.get("/progress/{user_id}")
+async def get_user_progress_async(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(StudentProgress).filter_by(user_id=user_id))
+    return progress_payload(user_id, result.scalars().all())
+
+
 app = FastAPI(
     title="Workshop Service",
     description="Manage workshops, modules, quizzes, student progress and analytics."
 )
+if USE_ASYNC_DB:
+    app.include_router(async_router)
+
+if OUTBOX_RELAY:
+    relay = outbox.OutboxRelay(SessionLocal, OutboxEvent, outbox.publisher_from_env())
+    app.add_event_handler("startup", relay.start)
+    app.add_event_handler("shutdown", relay.stop)
 
 
 # Workshop endpoints
@@ -216,6 +513,8 @@ def create_workshop_endpoint(workshop: WorkshopCreate, db: Session = Depends(get
         end_date=workshop.end_date,
     )
     db.add(w)
+    db.flush()
+    log_change(db, w.id, "workshop", w.id)
     db.commit()
     db.refresh(w)
     # Add modules and substeps
@@ -228,9 +527,12 @@ def create_workshop_endpoint(workshop: WorkshopCreate, db: Session = Depends(get
                 position=m.position,
             )
             db.add(mod)
+            db.flush()
+            log_change(db, w.id, "module", mod.id)
             db.commit()
             db.refresh(mod)
             if m.substeps:
+                substeps = []
                 for s in m.substeps:
                     ss = Substep(
                         module_id=mod.id,
@@ -239,6 +541,9 @@ def create_workshop_endpoint(workshop: WorkshopCreate, db: Session = Depends(get
                         position=s.position,
                     )
                     db.add(ss)
+                    substeps.append(ss)
+                db.flush()
+                log_change(db, w.id, "substep", [ss.id for ss in substeps])
                 db.commit()
     return {"id": w.id, "title": w.title}
 
@@ -260,52 +565,77 @@ def list_workshops_endpoint(db: Session = Depends(get_db)):
 
 @app.get("/workshops/{workshop_id}")
 def get_workshop_endpoint(workshop_id: int, db: Session = Depends(get_db)):
-    w = db.query(Workshop).get(workshop_id)
+    w = db.query(Workshop).options(*workshop_options()).filter(Workshop.id == workshop_id).first()
     if not w:
         raise HTTPException(status_code=404, detail="Workshop not found")
+    return workshop_payload(w)
+
+
+@app.get("/blobs/{digest}")
+def get_blob_endpoint(digest: str, range: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    return blob_response(digest, range, if_none_match)
+
+
+def _load_workshops(db: Session, ids: List[int]) -> dict:
     return {
-        "id": w.id,
-        "title": w.title,
-        "description": w.description,
-        "start_date": str(w.start_date) if w.start_date else None,
-        "end_date": str(w.end_date) if w.end_date else None,
-        "modules": [
-            {
-                "id": m.id,
-                "title": m.title,
-                "description": m.description,
-                "position": m.position,
-                "substeps": [
-                    {
-                        "id": s.id,
-                        "title": s.title,
-                        "content": s.content,
-                        "position": s.position,
-                    }
-                    for s in sorted(m.substeps, key=lambda x: x.position)
-                ],
-                "quiz": (
-                    {
-                        "id": m.quiz.id,
-                        "title": m.quiz.title,
-                        "questions": [
-                            {
-                                "id": q.id,
-                                "text": q.text,
-                                "options": json.loads(q.options),
-                            }
-                            for q in m.quiz.questions
-                        ],
-                    }
-                    if m.quiz
-                    else None
-                ),
-            }
-            for m in sorted(w.modules, key=lambda x: x.position)
-        ],
+        w.id: {
+            "id": w.id,
+            "title": w.title,
+            "description": w.description,
+            "start_date": str(w.start_date) if w.start_date else None,
+            "end_date": str(w.end_date) if w.end_date else None,
+        }
+        for w in db.query(Workshop).filter(Workshop.id.in_(ids))
+    }
+
+
+def _load_modules(db: Session, ids: List[int]) -> dict:
+    return {
+        m.id: {"id": m.id, "title": m.title, "description": m.description, "position": m.position}
+        for m in db.query(Module).filter(Module.id.in_(ids))
+    }
+
+
+def _load_substeps(db: Session, ids: List[int]) -> dict:
+    return {
+        s.id: {**substep_payload(s), "module_id": s.module_id}
+        for s in db.query(Substep).options(undefer(Substep._content)).filter(Substep.id.in_(ids))
+    }
+
+
+def _load_quizzes(db: Session, ids: List[int]) -> dict:
+    return {
+        q.id: {"id": q.id, "module_id": q.module_id, "title": q.title}
+        for q in db.query(Quiz).filter(Quiz.id.in_(ids))
     }
 
 
+def _load_questions(db: Session, ids: List[int]) -> dict:
+    return {
+        q.id: {"id": q.id, "quiz_id": q.quiz_id, "text": q.text, "options": json.loads(q.options)}
+        for q in db.query(Question).filter(Question.id.in_(ids))
+    }
+
+
+CHANGE_LOADERS = {
+    "workshop": _load_workshops,
+    "module": _load_modules,
+    "substep": _load_substeps,
+    "quiz": _load_quizzes,
+    "question": _load_questions,
+}
+
+
+@app.get("/workshops/{workshop_id}/changes")
+def get_workshop_changes_endpoint(
+    workshop_id: int,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    return changelog.changes_since(db, ContentChange, ChangeLogFloor, workshop_id, since, CHANGE_LOADERS, limit)
+
+
 # Modules and substeps
 @app.post("/workshops/{workshop_id}/modules", status_code=201)
 def add_module_endpoint(workshop_id: int, module: ModuleCreate, db: Session = Depends(get_db)):
@@ -318,9 +648,12 @@ def add_module_endpoint(workshop_id: int, module: ModuleCreate, db: Session = De
         position=module.position,
     )
     db.add(mod)
+    db.flush()
+    log_change(db, workshop_id, "module", mod.id)
     db.commit()
     db.refresh(mod)
     if module.substeps:
+        substeps = []
         for s in module.substeps:
             ss = Substep(
                 module_id=mod.id,
@@ -329,13 +662,17 @@ def add_module_endpoint(workshop_id: int, module: ModuleCreate, db: Session = De
                 position=s.position,
             )
             db.add(ss)
+            substeps.append(ss)
+        db.flush()
+        log_change(db, workshop_id, "substep", [ss.id for ss in substeps])
         db.commit()
     return {"id": mod.id, "title": mod.title}
 
 
 @app.post("/modules/{module_id}/substeps", status_code=201)
 def add_substep_endpoint(module_id: int, substep: SubstepCreate, db: Session = Depends(get_db)):
-    if not db.query(Module).get(module_id):
+    mod = db.query(Module).get(module_id)
+    if not mod:
         raise HTTPException(status_code=404, detail="Module not found")
     ss = Substep(
         module_id=module_id,
@@ -344,6 +681,8 @@ def add_substep_endpoint(module_id: int, substep: SubstepCreate, db: Session = D
         position=substep.position,
     )
     db.add(ss)
+    db.flush()
+    log_change(db, mod.workshop_id, "substep", ss.id)
     db.commit()
     db.refresh(ss)
     return {"id": ss.id, "title": ss.title}
@@ -359,8 +698,11 @@ def create_quiz_endpoint(module_id: int, quiz: QuizCreate, db: Session = Depends
         raise HTTPException(status_code=400, detail="Quiz already exists for module")
     qz = Quiz(module_id=module_id, title=quiz.title)
     db.add(qz)
+    db.flush()
+    log_change(db, mod.workshop_id, "quiz", qz.id)
     db.commit()
     db.refresh(qz)
+    questions = []
     for qu in quiz.questions:
         question = Question(
             quiz_id=qz.id,
@@ -369,6 +711,9 @@ def create_quiz_endpoint(module_id: int, quiz: QuizCreate, db: Session = Depends
             correct_answer=str(qu.correct_answer),
         )
         db.add(question)
+        questions.append(question)
+    db.flush()
+    log_change(db, mod.workshop_id, "question", [q.id for q in questions])
     db.commit()
     return {"id": qz.id, "title": qz.title}
 
@@ -378,19 +723,7 @@ def get_quiz_endpoint(module_id: int, db: Session = Depends(get_db)):
     mod = db.query(Module).get(module_id)
     if not mod or not mod.quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    qz = mod.quiz
-    return {
-        "id": qz.id,
-        "title": qz.title,
-        "questions": [
-            {
-                "id": q.id,
-                "text": q.text,
-                "options": json.loads(q.options),
-            }
-            for q in qz.questions
-        ],
-    }
+    return quiz_payload(mod.quiz)
 
 
 @app.post("/quiz/{quiz_id}/submit")
@@ -416,6 +749,18 @@ def submit_quiz_endpoint(quiz_id: int, submission: QuizSubmission, db: Session =
         completed_at=datetime.utcnow(),
     )
     db.add(rec)
+    percentage = round(correct / total * 100, 2) if total else 0.0
+    emit_event(db, outbox.TOPIC_QUIZ, {
+        "type": "quiz",
+        "user_id": submission.user_id,
+        "quiz_id": quiz_id,
+        "module_id": qz.module_id,
+        "workshop_id": qz.module.workshop_id,
+        "score": percentage,
+        "correct": correct,
+        "total": total,
+        "passed": percentage >= QUIZ_PASS_PERCENTAGE,
+    }, key=str(submission.user_id))
     db.commit()
     return {"score": correct, "total": total}
 
@@ -428,20 +773,8 @@ def update_progress_endpoint(progress: ProgressUpdate, db: Session = Depends(get
         .filter_by(user_id=progress.user_id, module_id=progress.module_id)
         .first()
     )
-    if rec:
-        if progress.substep_position > rec.highest_substep:
-            rec.highest_substep = progress.substep_position
-        rec.time_spent = (rec.time_spent or 0) + (progress.time_spent or 0)
-        rec.updated_at = datetime.utcnow()
-    else:
-        rec = StudentProgress(
-            user_id=progress.user_id,
-            module_id=progress.module_id,
-            highest_substep=progress.substep_position,
-            time_spent=progress.time_spent,
-            updated_at=datetime.utcnow(),
-        )
-        db.add(rec)
+    apply_progress(db, rec, progress)
+    emit_progress(db, progress)
     db.commit()
     return
 
@@ -449,18 +782,7 @@ def update_progress_endpoint(progress: ProgressUpdate, db: Session = Depends(get
 @app.get("/progress/{user_id}")
 def get_user_progress_endpoint(user_id: int, db: Session = Depends(get_db)):
     records = db.query(StudentProgress).filter_by(user_id=user_id).all()
-    return {
-        "user_id": user_id,
-        "modules": [
-            {
-                "module_id": r.module_id,
-                "highest_substep": r.highest_substep,
-                "time_spent": r.time_spent,
-                "updated_at": r.updated_at,
-            }
-            for r in records
-        ],
-    }
+    return progress_payload(user_id, records)
 
 
 # Statistics and analytics
@@ -591,5 +913,33 @@ def create_feedback_endpoint(feedback: FeedbackCreate, db: Session = Depends(get
         created_at=datetime.utcnow(),
     )
     db.add(fdbk)
+    emit_event(db, outbox.TOPIC_FEEDBACK, {
+        "type": "feedback",
+        "user_id": feedback.user_id,
+        "workshop_id": feedback.workshop_id,
+        "stars": feedback.stars,
+        "comments": feedback.comments,
+    }, key=str(feedback.user_id))
     db.commit()
-    return {"detail": "Feedback submitted"}
\ No newline at end of file
+    return {"detail": "Feedback submitted"}
+
+
+if __name__ == "__main__":
+    # Maintenance runs from cron:
+    #   python main.py compact-changes [retention_days]
+    #   python main.py collect-blobs [grace_seconds]
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "compact-changes":
+        retention_days = int(sys.argv[2]) if len(sys.argv) > 2 else CHANGE_LOG_RETENTION_DAYS
+        with SessionLocal() as db:
+            removed = changelog.compact(db, ContentChange, ChangeLogFloor, timedelta(days=retention_days))
+        print(f"removed {removed} change-log entries")
+    elif command == "collect-blobs":
+        grace_seconds = int(sys.argv[2]) if len(sys.argv) > 2 else blobstore.BLOB_GC_GRACE_SECONDS
+        with SessionLocal() as db:
+            referenced = [digest for (digest,) in db.query(Substep.content_digest).filter(Substep.content_digest.isnot(None)).distinct()]
+        print(f"removed {blobstore.store.collect(referenced, grace_seconds)} blobs")
+    else:
+        sys.exit("usage: python main.py compact-changes [retention_days] | collect-blobs [grace_seconds]")
@@ -0,0 +1,94 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import blobstore
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+from workshop_service.app.db.async_database import create_async_sessionmaker, to_async_url
+
+
+@pytest.fixture()
+def clients(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    os.environ["DATABASE_URL"] = db_url
+    monkeypatch.setattr(blobstore, "store", blobstore.BlobStore(str(tmp_path / "blobs"), inline_limit=16))
+
+    from workshop_service.app.api.routes_workshop import router as workshop_router
+    from workshop_service.app.api.routes_workshop_async import router as async_workshop_router
+    from workshop_service.app.db.database import get_async_db, get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestingSessionLocal = create_async_sessionmaker(db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    sync_app = FastAPI()
+    sync_app.include_router(workshop_router)
+    async_app = FastAPI()
+    async_app.include_router(async_workshop_router)
+    async_app.include_router(workshop_router)
+    for app in (sync_app, async_app):
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+
+    with TestClient(sync_app) as sync_client, TestClient(async_app) as async_client:
+        yield sync_client, async_client, TestingSessionLocal
+
+
+def test_to_async_url():
+    assert to_async_url("postgresql+psycopg2://u:p@db:5432/w") == "postgresql+asyncpg://u:p@db:5432/w"
+    assert to_async_url("sqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+    assert to_async_url("postgresql+asyncpg://db/w") == "postgresql+asyncpg://db/w"
+
+
+def test_async_workshop_fetch_matches_sync(clients):
+    sync_client, async_client, SessionLocal = clients
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", description="d", trainer_id=3)
+        for s in range(2):
+            section = models.Section(title=f"S{s}", code="x = 1\n" * (s * 10))
+            sub = models.SubSection(title="Quiz", content_type="quiz", order=0)
+            sub.questions.append(models.QuizQuestion(question=f"Q{s}", options={"A": "a", "B": "b"}, answer="B"))
+            section.subsections.append(sub)
+            workshop.sections.append(section)
+        db.add(workshop)
+        db.commit()
+        workshop_id = workshop.id
+
+    expected = sync_client.get(f"/workshops/{workshop_id}")
+    assert expected.status_code == 200
+    assert expected.json()["sections"][1]["code_digest"] is not None
+    assert [q["question"] for s in expected.json()["sections"] for q in s["questions"]] == ["Q0", "Q1"]
+    assert async_client.get(f"/workshops/{workshop_id}").json() == expected.json()
+    assert async_client.get("/workshops/999").status_code == 404
+
+
+def test_async_progress_write(clients):
+    _, async_client, SessionLocal = clients
+    for completed in (False, True):
+        response = async_client.post("/workshops/progress", json={"student_id": 1, "subsection_id": 5, "completed": completed})
+        assert response.status_code == 200
+        assert response.json()["completed"] is completed
+
+    with SessionLocal() as db:
+        records = db.query(models.StudentSubProgress).all()
+        assert len(records) == 1
+        assert records[0].completed and records[0].completed_at is not None
@@ -0,0 +1,139 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import blobstore
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    os.environ["DATABASE_URL"] = db_url
+    monkeypatch.setattr(blobstore, "store", blobstore.BlobStore(str(tmp_path / "blobs"), inline_limit=16))
+
+    from workshop_service.app.main import app
+    from workshop_service.app.db.database import get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as c:
+        yield c, TestingSessionLocal
+
+    app.dependency_overrides.clear()
+
+
+def test_large_code_moves_to_blob_store(client_with_db):
+    client, SessionLocal = client_with_db
+    body = "print('hello world')\n" * 10
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        workshop.sections.append(models.Section(title="big", code=body))
+        workshop.sections.append(models.Section(title="small", code="x = 1"))
+        db.add(workshop)
+        db.commit()
+        workshop_id = workshop.id
+
+    client.post(f"/workshops/{workshop_id}/clone", json={"include_questions": False})
+
+    with SessionLocal() as db:
+        big = db.query(models.Section).filter_by(title="big").order_by(models.Section.id).all()
+        small = db.query(models.Section).filter_by(title="small").first()
+        assert len(big) == 2
+        assert big[0]._code is None
+        assert big[0].code_size == len(body)
+        # The clone shares the stored body instead of writing a second copy
+        assert big[0].code_digest == big[1].code_digest
+        assert big[1].code == body
+        assert small.code_digest is None and small.code == "x = 1"
+        digest = big[0].code_digest
+
+    stored = [p for p in pathlib.Path(blobstore.store.root).rglob("*") if p.is_file()]
+    assert [p.name for p in stored] == [digest]
+
+    response = client.get(f"/workshops/blobs/{digest}")
+    assert response.status_code == 200
+    assert response.text == body
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(f"/workshops/blobs/{digest}", headers={"Range": "bytes=6-12"})
+    assert response.status_code == 206
+    assert response.text == body[6:13]
+    assert response.headers["content-range"] == f"bytes 6-12/{len(body)}"
+
+    response = client.get(f"/workshops/blobs/{digest}", headers={"Range": f"bytes={len(body)}-"})
+    assert response.status_code == 416
+
+    response = client.get(f"/workshops/blobs/{digest}", headers={"If-None-Match": f'"{digest}"'})
+    assert response.status_code == 304
+
+
+def test_unknown_blob_is_404(client_with_db):
+    client, _ = client_with_db
+    assert client.get("/workshops/blobs/" + "0" * 64).status_code == 404
+    assert client.get("/workshops/blobs/not-a-digest").status_code == 404
+
+
+def test_blobs_are_written_on_commit_and_cached(client_with_db, monkeypatch):
+    _, SessionLocal = client_with_db
+    root = pathlib.Path(blobstore.store.root)
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        workshop.sections.append(models.Section(title="big", code="rolled back " * 4))
+        db.add(workshop)
+        db.flush()
+        db.rollback()
+    assert not [p for p in root.rglob("*") if p.is_file()]
+
+    body = "kept " * 10
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        workshop.sections.append(models.Section(title="big", code=body))
+        db.add(workshop)
+        db.commit()
+        section_id = workshop.sections[0].id
+    assert [p.name for p in root.rglob("*") if p.is_file()] == [blobstore.hashlib.sha256(body.encode()).hexdigest()]
+
+    reads = []
+    get = blobstore.store.get
+    monkeypatch.setattr(blobstore.store, "get", lambda digest: reads.append(digest) or get(digest))
+    with SessionLocal() as db:
+        section = db.get(models.Section, section_id)
+        assert section.code == body and section.code == body
+    assert len(reads) == 1
+
+
+def test_collect_removes_unreferenced_blobs(client_with_db):
+    _, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        workshop.sections.append(models.Section(title="old", code="replaced body " * 4))
+        db.add(workshop)
+        db.commit()
+        section = workshop.sections[0]
+        old_digest = section.code_digest
+        section.code = "current body " * 4
+        db.commit()
+        current_digest = section.code_digest
+
+    assert blobstore.store.collect([current_digest]) == 0  # still within the grace period
+    assert blobstore.store.collect([current_digest], grace_seconds=-1) == 1
+    assert not blobstore.store.exists(old_digest)
+    assert blobstore.store.exists(current_digest)
@@ -0,0 +1,96 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import crud, outbox, schemas
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from workshop_service.app.main import app
+    from workshop_service.app.db.database import get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as c:
+        yield c, TestingSessionLocal
+
+    app.dependency_overrides.clear()
+
+
+def queued(SessionLocal):
+    with SessionLocal() as db:
+        rows = db.query(models.OutboxEvent).order_by(models.OutboxEvent.id).all()
+        return [(row.topic, json.loads(row.payload)) for row in rows]
+
+
+def test_trainer_changes_queue_catalog_events(client_with_db):
+    _, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop_id = crud.create_workshop(db, schemas.WorkshopCreate(title="W", trainer_id=1, sections=[])).id
+        crud.update_workshop(db, workshop_id, schemas.WorkshopUpdate(title="W2"))
+        crud.update_workshop(db, workshop_id, schemas.WorkshopUpdate(trainer_id=2))
+        clone_id = crud.clone_workshop(db, workshop_id, schemas.WorkshopClone(trainer_id=3)).id
+        crud.delete_workshop(db, workshop_id)
+
+    events = queued(SessionLocal)
+    assert {topic for topic, _ in events} == {outbox.TOPIC_WORKSHOP}
+    assert [(payload["workshop_id"], payload["trainer_id"]) for _, payload in events] == [
+        (workshop_id, 1), (workshop_id, 2), (clone_id, 3), (workshop_id, None),
+    ]
+
+
+def test_catalog_events_are_relayed_from_the_routes(client_with_db):
+    client, SessionLocal = client_with_db
+    workshop_id = client.post("/workshops/", json={"title": "W", "trainer_id": 4, "sections": []}).json()["id"]
+    assert client.delete(f"/workshops/{workshop_id}").status_code == 204
+    # A missing workshop changes nothing and queues nothing
+    assert client.delete(f"/workshops/{workshop_id}").status_code == 404
+
+    publisher = outbox.InMemoryPublisher()
+    assert outbox.relay_once(SessionLocal, models.OutboxEvent, publisher) == 2
+    assert queued(SessionLocal) == []
+    assert [(topic, key) for topic, key, _ in publisher.messages] == [(outbox.TOPIC_WORKSHOP, str(workshop_id))] * 2
+    created, deleted = (payload for _, _, payload in publisher.messages)
+    # The shape the analytics consumer applies to workshop_trainers
+    assert {"event_id", "workshop_id", "trainer_id"} <= created.keys()
+    assert (created["trainer_id"], deleted["trainer_id"]) == (4, None)
+    assert created["event_id"] != deleted["event_id"]
+
+
+def test_catalog_event_rolls_back_with_the_write(client_with_db):
+    _, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop_id = crud.create_workshop(db, schemas.WorkshopCreate(title="W", trainer_id=1, sections=[])).id
+    with SessionLocal() as db:
+        db.query(models.OutboxEvent).delete()
+        db.commit()
+
+    with SessionLocal() as db:
+        workshop = db.get(models.Workshop, workshop_id)
+        workshop.trainer_id = 5
+        crud._catalog_event(db, workshop_id, 5)
+        db.rollback()
+    assert queued(SessionLocal) == []
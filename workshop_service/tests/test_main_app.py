@@ -0,0 +1,193 @@
+import functools
+import importlib
+import json
+import os
+import pathlib
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[1]
+
+
+@functools.lru_cache(maxsize=None)
+def load_main(tmp_path):
+    """Import the standalone ``workshop_service/main.py`` the way its Dockerfile runs it, once."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path / 'main.db'}"
+    # main.py imports its helpers as the top-level ``app`` package
+    shadowed = {name: sys.modules.pop(name) for name in list(sys.modules)
+                if name == "app" or name.startswith("app.")}
+    path = sys.path[:]
+    # workshop_service/app is a namespace package; any regular ``app`` package on the path would win
+    sys.path[:] = [str(SERVICE_DIR)] + [p for p in path if not (pathlib.Path(p) / "app" / "__init__.py").exists()]
+    try:
+        main = importlib.import_module("main")
+        blobstore = importlib.import_module("app.blobstore")
+    finally:
+        sys.path[:] = path
+        for name in [name for name in sys.modules if name == "app" or name.startswith("app.")]:
+            del sys.modules[name]
+        sys.modules.update(shadowed)
+    return main, blobstore
+
+
+@pytest.fixture()
+def standalone(tmp_path_factory, tmp_path, monkeypatch):
+    main, blobstore = load_main(tmp_path_factory.getbasetemp())
+    monkeypatch.setattr(blobstore, "store", blobstore.BlobStore(str(tmp_path / "blobs"), inline_limit=16))
+    monkeypatch.setattr(main, "shapes", main.WorkshopShapes())
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    main.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = override_get_db
+    yield main, TestClient(main.app), engine
+    main.app.dependency_overrides.clear()
+
+
+def test_workshop_links_large_substeps_to_the_blob_store(standalone):
+    main, client, engine = standalone
+    large = "x" * 1000
+    created = client.post("/workshops", json={
+        "title": "W",
+        "modules": [{"title": f"M{m}", "position": m, "substeps": [
+            {"title": f"S{s}", "content": large if s % 2 else "short", "position": s} for s in range(5)
+        ]} for m in range(4)],
+    })
+    assert created.status_code == 201
+    workshop_id = created.json()["id"]
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    r = client.get(f"/workshops/{workshop_id}")
+    assert r.status_code == 200
+    # workshop, modules, substeps, quizzes and questions: no query per substep
+    assert len(statements) <= 5
+
+    substeps = [s for m in r.json()["modules"] for s in m["substeps"]]
+    assert len(substeps) == 20
+    for s in substeps:
+        if s["position"] % 2:
+            assert s["content"] is None
+            assert s["content_size"] == 1000
+            assert s["content_url"] == f"/blobs/{s['content_digest']}"
+        else:
+            assert s["content"] == "short"
+            assert s["content_digest"] is None and s["content_url"] is None
+    assert "x" * 100 not in r.text
+
+    blob = client.get(substeps[1]["content_url"])
+    assert blob.status_code == 200 and blob.text == large
+
+
+def test_change_feed_links_large_substeps_to_the_blob_store(standalone):
+    main, client, _ = standalone
+    workshop_id = client.post("/workshops", json={
+        "title": "W",
+        "modules": [{"title": "M", "position": 0, "substeps": [
+            {"title": "big", "content": "y" * 100, "position": 0},
+            {"title": "small", "content": "tiny", "position": 1},
+        ]}],
+    }).json()["id"]
+
+    changes = client.get(f"/workshops/{workshop_id}/changes", params={"since": 0}).json()
+    substeps = {c["node"]["title"]: c["node"] for c in changes["changes"] if c["type"] == "substep"}
+    assert substeps["big"]["content"] is None
+    assert substeps["big"]["content_url"] == f"/blobs/{substeps['big']['content_digest']}"
+    assert substeps["small"]["content"] == "tiny"
+
+
+def seed_quiz_workshop(client):
+    workshop_id = client.post("/workshops", json={
+        "title": "W",
+        "modules": [{"title": f"M{m}", "position": m, "substeps": [
+            {"title": f"S{s}", "content": "body", "position": s} for s in range(4)
+        ]} for m in range(2)],
+    }).json()["id"]
+    module_id = client.get(f"/workshops/{workshop_id}").json()["modules"][0]["id"]
+    client.post(f"/modules/{module_id}/quiz", json={"title": "Q", "questions": [
+        {"text": "1 + 1", "options": ["1", "2"], "correct_answer": 1},
+    ]})
+    quiz = client.get(f"/modules/{module_id}/quiz").json()
+    return workshop_id, module_id, quiz
+
+
+def learner_writes(client, workshop_id, module_id, quiz):
+    return [
+        client.post("/progress", json={"user_id": 5, "module_id": module_id, "substep_position": 3}),
+        client.post(f"/quiz/{quiz['id']}/submit", json={"user_id": 5, "answers": {quiz["questions"][0]["id"]: 1}}),
+        client.post("/feedback", json={"user_id": 5, "workshop_id": workshop_id, "stars": 4}),
+    ]
+
+
+def test_learner_writes_queue_events_in_their_transaction(standalone):
+    main, client, engine = standalone
+    workshop_id, module_id, quiz = seed_quiz_workshop(client)
+    assert [r.status_code for r in learner_writes(client, workshop_id, module_id, quiz)] == [204, 200, 201]
+
+    with sessionmaker(bind=engine)() as db:
+        events = [json.loads(e.payload) for e in db.query(main.OutboxEvent).order_by(main.OutboxEvent.id)]
+        assert db.query(main.StudentProgress).count() == 1
+        assert db.query(main.StudentQuizScore).count() == 1
+        assert db.query(main.Feedback).count() == 1
+    assert [e["type"] for e in events] == ["progress", "quiz", "feedback"]
+    assert events[0]["workshop_id"] == workshop_id
+    assert events[0]["modules_completed"] == 1 and events[0]["percent_complete"] == 50.0
+    assert events[1]["passed"] is True and events[2]["stars"] == 4
+
+
+def test_failed_commit_drops_write_and_event(standalone):
+    main, client, engine = standalone
+    workshop_id, module_id, quiz = seed_quiz_workshop(client)
+    FailingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def failing_get_db():
+        db = FailingSession()
+        def commit():
+            db.rollback()
+            raise RuntimeError("commit failed")
+        db.commit = commit
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = failing_get_db
+    failing = TestClient(main.app, raise_server_exceptions=False)
+    assert [r.status_code for r in learner_writes(failing, workshop_id, module_id, quiz)] == [500, 500, 500]
+
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(main.OutboxEvent).count() == 0
+        assert db.query(main.StudentProgress).count() == 0
+        assert db.query(main.StudentQuizScore).count() == 0
+        assert db.query(main.Feedback).count() == 0
+
+
+def test_progress_events_reuse_the_workshop_shape(standalone):
+    main, client, engine = standalone
+    workshop_id, module_id, _ = seed_quiz_workshop(client)
+    client.post("/progress", json={"user_id": 5, "module_id": module_id, "substep_position": 0})
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    client.post("/progress", json={"user_id": 5, "module_id": module_id, "substep_position": 1})
+    # progress row read and written, reached substeps read, outbox row written
+    assert len(statements) == 4
+    assert not any("count(" in s for s in statements)
+
+    # A new substep is counted in the next event
+    client.post(f"/modules/{module_id}/substeps", json={"title": "S4", "content": "body", "position": 4})
+    client.post("/progress", json={"user_id": 5, "module_id": module_id, "substep_position": 3})
+    with sessionmaker(bind=engine)() as db:
+        last = json.loads(db.query(main.OutboxEvent).order_by(main.OutboxEvent.id.desc()).first().payload)
+    assert last["percent_complete"] == 40.0
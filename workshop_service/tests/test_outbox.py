@@ -0,0 +1,69 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import outbox
+
+Base = declarative_base()
+
+
+class OutboxEvent(outbox.OutboxMixin, Base):
+    __tablename__ = "outbox"
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def enqueue_events(session_factory, count):
+    with session_factory() as db:
+        ids = [outbox.enqueue(db, OutboxEvent, outbox.TOPIC_PROGRESS, {"user_id": i}, key=str(i)) for i in range(count)]
+        db.commit()
+    return ids
+
+
+def test_relay_publishes_in_order_and_deletes(session_factory):
+    ids = enqueue_events(session_factory, 5)
+    publisher = outbox.InMemoryPublisher()
+    assert outbox.relay_once(session_factory, OutboxEvent, publisher, batch_size=3) == 3
+    assert outbox.relay_once(session_factory, OutboxEvent, publisher, batch_size=3) == 2
+    assert outbox.relay_once(session_factory, OutboxEvent, publisher, batch_size=3) == 0
+    assert [value["event_id"] for _, _, value in publisher.messages] == ids
+    assert publisher.messages[0][:2] == (outbox.TOPIC_PROGRESS, "0")
+    with session_factory() as db:
+        assert db.query(OutboxEvent).count() == 0
+
+
+def test_failed_publish_keeps_rows(session_factory):
+    enqueue_events(session_factory, 2)
+
+    class BrokenPublisher:
+        def publish(self, messages):
+            raise ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        outbox.relay_once(session_factory, OutboxEvent, BrokenPublisher())
+    with session_factory() as db:
+        assert db.query(OutboxEvent).count() == 2
+
+
+def test_background_relay_to_file_publisher(session_factory, tmp_path):
+    enqueue_events(session_factory, 4)
+    relay = outbox.OutboxRelay(session_factory, OutboxEvent, outbox.FilePublisher(str(tmp_path / "events")), poll_interval=0.01)
+    relay.start()
+    try:
+        for _ in range(200):
+            if relay.relayed == 4:
+                break
+            relay._stop.wait(0.01)
+    finally:
+        relay.stop()
+    lines = (tmp_path / "events" / f"{outbox.TOPIC_PROGRESS}.jsonl").read_text().splitlines()
+    assert [json.loads(line)["user_id"] for line in lines] == [0, 1, 2, 3]
@@ -0,0 +1,106 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import blobstore, crud, raw_read, schemas
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+
+
+@pytest.fixture()
+def client_with_db(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    os.environ["DATABASE_URL"] = db_url
+    monkeypatch.setattr(blobstore, "store", blobstore.BlobStore(str(tmp_path / "blobs"), inline_limit=32))
+
+    from workshop_service.app.main import app
+    from workshop_service.app.db.database import get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as c:
+        yield c, TestingSessionLocal
+
+    app.dependency_overrides.clear()
+
+
+def seed(db):
+    ids = []
+    for w in range(3):
+        workshop = models.Workshop(title=f"W{w}", description=None if w else "first", trainer_id=w + 1)
+        for s in range(w + 1):
+            section = models.Section(title=f"S{w}.{s}", ppt_url=None, code="x = 1\n" * (s * 10) if s else None)
+            for ss in range(2):
+                sub = models.SubSection(title=f"Sub {ss}", content_type="quiz" if ss else "content", order=ss)
+                for q in range(ss * 3):
+                    sub.questions.append(models.QuizQuestion(
+                        question=f"Q{w}.{s}.{q}",
+                        options={"A": "yes", "B": "no"},
+                        answer="AB"[q % 2],
+                        explanation=None if q else "why",
+                    ))
+                section.subsections.append(sub)
+            workshop.sections.append(section)
+        db.add(workshop)
+        db.commit()
+        ids.append(workshop.id)
+    return ids
+
+
+def orm_output(workshop):
+    return json.loads(schemas.WorkshopOut.from_orm(workshop).json())
+
+
+def test_raw_rows_match_orm_schemas(client_with_db):
+    _, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        seed(db)
+        expected = [orm_output(w) for w in db.query(models.Workshop).order_by(models.Workshop.id)]
+        stored = expected[2]["sections"][1]
+        assert stored["code"] is None
+        assert stored["code_url"] == f"/workshops/blobs/{stored['code_digest']}"
+        assert expected[1]["sections"][0]["code"] is None and expected[1]["sections"][0]["code_url"] is None
+        assert raw_read.load_workshops(db) == expected
+
+
+def test_reads_do_not_open_blobs(client_with_db, monkeypatch):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        seed(db)
+    with monkeypatch.context() as m:
+        m.setattr(blobstore.store, "get", lambda digest: pytest.fail(f"read blob {digest}"))
+        listed = client.get("/workshops/").json()
+    assert listed[2]["sections"][1]["code"] is None
+    code_url = listed[2]["sections"][1]["code_url"]
+    assert client.get(code_url).text == "x = 1\n" * 10
+
+
+def test_endpoints_match_orm_schemas(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        ids = seed(db)
+        expected = {wid: orm_output(crud.get_workshop(db, wid)) for wid in ids}
+
+    for wid in ids:
+        response = client.get(f"/workshops/{wid}")
+        assert response.status_code == 200
+        assert response.json() == expected[wid]
+    assert client.get("/workshops/").json() == [expected[wid] for wid in ids]
+    assert client.get("/workshops/999").status_code == 404
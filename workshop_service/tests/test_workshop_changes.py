@@ -0,0 +1,180 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app import crud, schemas
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from workshop_service.app.main import app
+    from workshop_service.app.db.database import get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as c:
+        yield c, TestingSessionLocal
+
+    app.dependency_overrides.clear()
+
+
+def test_changes_since_returns_only_new_nodes_and_tombstones(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        section = models.Section(title="S1")
+        sub = models.SubSection(title="Quiz", content_type="quiz", order=0)
+        sub.questions.append(models.QuizQuestion(question="Q1", options={"A": "a"}, answer="A"))
+        section.subsections.append(sub)
+        workshop.sections.append(section)
+        db.add(workshop)
+        db.commit()
+        workshop_id, section_id = workshop.id, section.id
+        question_id = sub.questions[0].id
+
+    with SessionLocal() as db:
+        created_id = crud.create_section(db, workshop_id, schemas.SectionCreate(title="S2", questions=[])).id
+        crud.update_section(db, created_id, schemas.SectionUpdate(title="S2 renamed"))
+        crud.update_section(db, created_id, schemas.SectionUpdate(code="print(1)"))
+
+    changes = client.get(f"/workshops/{workshop_id}/changes").json()
+    assert changes["reset"] is False
+    # Three writes to the same section collapse into one entry with its latest state
+    assert [(c["type"], c["id"], c["op"]) for c in changes["changes"]] == [("section", created_id, "upsert")]
+    assert changes["changes"][0]["node"]["title"] == "S2 renamed"
+    assert changes["changes"][0]["node"]["code"] == "print(1)"
+    since = changes["next_since"]
+
+    client.put(f"/workshops/questions/{question_id}", json={"question": "Q1 edited"})
+    client.delete(f"/workshops/sections/{section_id}")
+
+    changes = client.get(f"/workshops/{workshop_id}/changes", params={"since": since}).json()
+    assert [(c["type"], c["id"], c["op"]) for c in changes["changes"]] == [
+        ("question", question_id, "delete"),
+        ("section", section_id, "delete"),
+    ]
+    assert all(c["node"] is None for c in changes["changes"])
+
+    latest = changes["next_since"]
+    assert client.get(f"/workshops/{workshop_id}/changes", params={"since": latest}).json()["changes"] == []
+
+
+def test_compaction_forces_reset_for_stale_clients(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop = models.Workshop(title="W", trainer_id=1)
+        db.add(workshop)
+        db.commit()
+        workshop_id = workshop.id
+
+    with SessionLocal() as db:
+        section_id = crud.create_section(db, workshop_id, schemas.SectionCreate(title="S", questions=[])).id
+        for title in ("a", "b", "c"):
+            crud.update_section(db, section_id, schemas.SectionUpdate(title=title))
+    latest = client.get(f"/workshops/{workshop_id}/changes").json()["next_since"]
+
+    # Superseded entries are dropped without affecting what clients see
+    with SessionLocal() as db:
+        assert crud.compact_changes(db, 30) == 3
+    changes = client.get(f"/workshops/{workshop_id}/changes").json()
+    assert [c["node"]["title"] for c in changes["changes"]] == ["c"]
+
+    with SessionLocal() as db:
+        assert crud.compact_changes(db, 0) == 1
+    assert client.post("/workshops/changes/compact").status_code in (404, 405)
+    changes = client.get(f"/workshops/{workshop_id}/changes", params={"since": latest - 1}).json()
+    assert changes["reset"] is True
+    assert changes["next_since"] == latest
+    changes = client.get(f"/workshops/{workshop_id}/changes", params={"since": latest}).json()
+    assert changes["reset"] is False and changes["changes"] == []
+
+
+def test_sequences_follow_commit_order(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop_id = crud.create_workshop(db, schemas.WorkshopCreate(title="W", trainer_id=1, sections=[])).id
+    first = client.get(f"/workshops/{workshop_id}/changes").json()
+
+    slow, fast = SessionLocal(), SessionLocal()
+    # The slow transaction records its change first but commits last
+    crud._log_change(slow, workshop_id, "workshop", workshop_id)
+    slow.flush()
+    crud.update_workshop(fast, workshop_id, schemas.WorkshopUpdate(title="W2"))
+    seen = client.get(f"/workshops/{workshop_id}/changes", params={"since": first["next_since"]}).json()
+    slow.query(models.Workshop).get(workshop_id).title = "W3"
+    slow.commit()
+    slow.close()
+    fast.close()
+
+    later = client.get(f"/workshops/{workshop_id}/changes", params={"since": seen["next_since"]}).json()
+    assert [c["node"]["title"] for c in seen["changes"]] == ["W2"]
+    assert [c["node"]["title"] for c in later["changes"]] == ["W3"]
+
+
+def test_rolled_back_changes_are_not_logged(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        workshop_id = crud.create_workshop(db, schemas.WorkshopCreate(title="W", trainer_id=1, sections=[])).id
+        crud._log_change(db, workshop_id, "workshop", workshop_id)
+        db.rollback()
+        db.commit()
+        assert db.query(models.ContentChange).count() == 1
+
+
+def test_nested_nodes_are_logged(client_with_db):
+    client, SessionLocal = client_with_db
+    question = {"question": "Q", "options": {"A": "a"}, "answer": "A"}
+    with SessionLocal() as db:
+        workshop_id = crud.create_workshop(db, schemas.WorkshopCreate(title="W", trainer_id=1, sections=[
+            {"title": "S1", "questions": [question, question]},
+        ])).id
+        crud.create_section(db, workshop_id, schemas.SectionCreate(title="S2", questions=[question]))
+        clone_id = crud.clone_workshop(db, workshop_id, schemas.WorkshopClone()).id
+
+    def logged(wid):
+        changes = client.get(f"/workshops/{wid}/changes").json()["changes"]
+        return sorted((c["type"], c["op"]) for c in changes)
+
+    expected = [("question", "upsert")] * 3 + [("section", "upsert")] * 2 + [("workshop", "upsert")]
+    assert logged(workshop_id) == expected
+    assert logged(clone_id) == expected
+
+
+def test_questions_join_an_existing_quiz_subsection(client_with_db):
+    client, SessionLocal = client_with_db
+    question = {"question": "Q", "options": {"A": "a"}, "answer": "A"}
+    workshop = client.post("/workshops/", json={"title": "W", "trainer_id": 1, "sections": [
+        {"title": "quiz", "questions": [question]},
+        {"title": "plain", "questions": []},
+    ]}).json()
+    quiz_id, plain_id = [s["id"] for s in workshop["sections"]]
+
+    assert client.post(f"/workshops/sections/{quiz_id}/questions", json=question).status_code == 201
+    response = client.post(f"/workshops/sections/{plain_id}/questions", json=question)
+    assert response.status_code == 409
+    assert client.post("/workshops/sections/999/questions", json=question).status_code == 404
+
+    with SessionLocal() as db:
+        subsections = db.query(models.SubSection).order_by(models.SubSection.id).all()
+        assert [(s.section_id, s.content_type, len(s.questions)) for s in subsections] == [(quiz_id, "quiz", 2)]
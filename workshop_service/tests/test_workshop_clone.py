@@ -0,0 +1,168 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from workshop_service.app.db import models
+from workshop_service.app.db.models import Base
+
+
+@pytest.fixture()
+def client_with_db(tmp_path):
+    db_path = tmp_path / "test.db"
+    db_url = f"sqlite:///{db_path}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from workshop_service.app.main import app
+    from workshop_service.app.db.database import get_db
+
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as c:
+        yield c, TestingSessionLocal
+
+    app.dependency_overrides.clear()
+
+
+def seed_workshop(db, title="Python 101", sections=3, subsections=4, questions=2):
+    workshop = models.Workshop(title=title, description="Intro course", trainer_id=7)
+    for s in range(sections):
+        section = models.Section(title=f"Section {s}", ppt_url=f"/ppt/{s}", code=f"print({s})")
+        for ss in range(subsections):
+            sub = models.SubSection(title=f"Sub {s}.{ss}", content_type="quiz", content_url=f"/c/{s}/{ss}", order=ss)
+            for q in range(questions):
+                sub.questions.append(models.QuizQuestion(
+                    question=f"Q {s}.{ss}.{q}",
+                    options={"A": "yes", "B": "no"},
+                    answer="A",
+                    explanation=f"because {q}",
+                ))
+            section.subsections.append(sub)
+        workshop.sections.append(section)
+    db.add(workshop)
+    db.commit()
+    return workshop.id
+
+
+def tree(workshop):
+    return [
+        (
+            s.title, s.ppt_url, s.code,
+            [
+                (
+                    ss.title, ss.content_type, ss.content_url, ss.order,
+                    [(q.question, q.options, q.answer, q.explanation) for q in sorted(ss.questions, key=lambda q: q.id)],
+                )
+                for ss in sorted(s.subsections, key=lambda ss: ss.id)
+            ],
+        )
+        for s in sorted(workshop.sections, key=lambda s: s.id)
+    ]
+
+
+def test_clone_copies_full_tree(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        # A second workshop makes sure only the source tree is copied
+        seed_workshop(db, title="Other", sections=2, subsections=1, questions=1)
+        source_id = seed_workshop(db)
+
+    response = client.post(f"/workshops/{source_id}/clone", json={"title": "Python 101 (Spring)"})
+    assert response.status_code == 201
+    data = response.json()
+    assert data["title"] == "Python 101 (Spring)"
+    assert data["trainer_id"] == 7
+    assert data["id"] != source_id
+
+    with SessionLocal() as db:
+        source = db.query(models.Workshop).get(source_id)
+        clone = db.query(models.Workshop).get(data["id"])
+        assert clone.description == source.description
+        assert tree(clone) == tree(source)
+        source_sub_ids = {ss.id for s in source.sections for ss in s.subsections}
+        assert not any(ss.id in source_sub_ids for s in clone.sections for ss in s.subsections)
+        assert db.query(models.QuizQuestion).count() == 2 * 24 + 2
+
+
+def test_clone_without_questions(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        source_id = seed_workshop(db)
+
+    response = client.post(f"/workshops/{source_id}/clone", json={"include_questions": False})
+    assert response.status_code == 201
+
+    with SessionLocal() as db:
+        clone = db.query(models.Workshop).get(response.json()["id"])
+        assert clone.title == "Python 101"
+        assert len(clone.sections) == 3
+        assert all(len(s.subsections) == 4 for s in clone.sections)
+        assert all(not ss.questions for s in clone.sections for ss in s.subsections)
+
+
+def test_clone_missing_workshop(client_with_db):
+    client, _ = client_with_db
+    response = client.post("/workshops/999/clone", json={})
+    assert response.status_code == 404
+
+
+def grow_out_of_order(db, workshop_id):
+    """Add rows so that ids no longer follow the tree order."""
+    workshop = db.query(models.Workshop).get(workshop_id)
+    first = workshop.sections[0]
+    late = models.SubSection(title="Late", content_type="quiz", order=9)
+    late.questions.append(models.QuizQuestion(question="Late Q", options={"A": "a"}, answer="A"))
+    first.subsections.append(late)
+    first.subsections[0].questions.append(models.QuizQuestion(question="Late Q0", options={"A": "a"}, answer="A"))
+    db.commit()
+
+
+def test_clone_maps_ids_explicitly(client_with_db):
+    client, SessionLocal = client_with_db
+    with SessionLocal() as db:
+        original_id = seed_workshop(db, sections=2, subsections=2, questions=1)
+    # Clone a clone, so cloned_from_id values are already present in the source
+    source_id = client.post(f"/workshops/{original_id}/clone", json={}).json()["id"]
+    with SessionLocal() as db:
+        grow_out_of_order(db, source_id)
+
+    response = client.post(f"/workshops/{source_id}/clone", json={})
+    assert response.status_code == 201
+
+    with SessionLocal() as db:
+        source = db.query(models.Workshop).get(source_id)
+        clone = db.query(models.Workshop).get(response.json()["id"])
+        assert tree(clone) == tree(source)
+        assert [s.cloned_from_id for s in clone.sections] == [s.id for s in source.sections]
+
+
+def test_clone_statements_do_not_grow_with_the_tree(client_with_db):
+    client, SessionLocal = client_with_db
+    engine = SessionLocal.kw["bind"]
+    counts = []
+    for size in (1, 1, 10):  # the first clone also starts the change-log counter
+        with SessionLocal() as db:
+            source_id = seed_workshop(db, sections=size, subsections=size, questions=2)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        assert client.post(f"/workshops/{source_id}/clone", json={}).status_code == 201
+        event.remove(engine, "before_cursor_execute", listener)
+        counts.append(len(statements))
+    assert counts[1] == counts[2]